@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Batch API 本地替身伺服器 - 在不連網、不付費的情況下測試批次模式
+
+支援的端點：
+┌─────────────────────────────────────────────────────────┐
+│  OpenAI Batch                                            │
+│     POST /v1/files                    上傳 JSONL 輸入檔    │
+│     POST /v1/batches                  建立批次工作         │
+│     GET  /v1/batches/{id}             查詢狀態             │
+│     POST /v1/batches/{id}/cancel      取消                │
+│     GET  /v1/files/{id}/content       下載輸出/錯誤檔       │
+│                                                         │
+│  Anthropic Message Batches                               │
+│     POST /v1/messages/batches               建立批次工作   │
+│     GET  /v1/messages/batches/{id}          查詢狀態       │
+│     POST /v1/messages/batches/{id}/cancel   取消          │
+│     GET  /v1/messages/batches/{id}/results  下載結果       │
+│                                                         │
+│  同步端點（互動模式測試用）                                   │
+│     POST /v1/chat/completions, POST /v1/messages          │
+│     （chat/completions 支援 stream=true 的 SSE 回應）       │
+└─────────────────────────────────────────────────────────┘
+
+批次工作建立後經過 --delay 秒才完成。回應內容由提示詞產生：
+品牌檢測提示詞會依回應文本是否包含品牌名稱回傳 JSON，其他提示詞
+回傳固定格式的文字；含有 "[stub-error]" 的提示詞會回傳錯誤結果。
+
+使用方式：
+    python scripts/batch_stub_server.py --port 8765 --delay 3
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 ANTHROPIC_BASE_URL=http://127.0.0.1:8765 \\
+        streamlit run src/firegeo/streamlit_app.py
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+ERROR_MARKER = "[stub-error]"
+
+_lock = threading.Lock()
+_files: Dict[str, bytes] = {}
+_openai_batches: Dict[str, Dict[str, Any]] = {}
+_anthropic_batches: Dict[str, Dict[str, Any]] = {}
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}{uuid.uuid4().hex[:24]}"
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _detection_answer(prompt: str) -> Optional[str]:
+    """為品牌檢測提示詞產生 JSON 答案：回應文本包含品牌名稱即視為提及"""
+    if "Expected JSON Format" not in prompt:
+        return None
+
+    def detections(section: str) -> List[Dict[str, Any]]:
+        brands_match = re.search(r"Brands to check:\n((?:- .*\n?)+)", section)
+        if brands_match:
+            brands = [line[2:].strip() for line in brands_match.group(1).splitlines() if line.startswith("- ")]
+        else:
+            single = re.search(r"brand '(.+?)' is mentioned", section)
+            brands = [single.group(1)] if single else []
+        response_match = re.search(r"AI Response:\s*(.*?)(?:\n\nResponse Requirements:|\Z)", section, re.DOTALL)
+        text = (response_match.group(1) if response_match else section).lower()
+        return [
+            {"brand_name": brand, "mentioned": brand.lower() in text, "confidence": 0.9, "reasoning": "Stub substring match"}
+            for brand in brands
+        ]
+
+    sections = re.split(r"^### Response id: ", prompt, flags=re.MULTILINE)
+    if len(sections) > 1:
+        responses = []
+        for section in sections[1:]:
+            item_id, _, body = section.partition("\n")
+            responses.append({"id": item_id.strip(), "detections": detections(body)})
+        return json.dumps({"responses": responses})
+
+    found = detections(prompt)
+    if "brand_mentioned" in prompt and "Brands to check" not in prompt:
+        first = found[0] if found else {"mentioned": False}
+        return json.dumps({"brand_mentioned": first["mentioned"], "confidence": 0.9, "reasoning": "Stub substring match"})
+    return json.dumps({"detections": found})
+
+
+def _answer(prompt: str) -> str:
+    """依提示詞產生回應文本"""
+    return _detection_answer(prompt) or f"[stub] Response to: {prompt[:200]}"
+
+
+def _openai_completion(body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if ERROR_MARKER in prompt:
+        return 400, {"error": {"message": "Stub error requested", "type": "invalid_request_error", "code": None}}
+    text = _answer(prompt)
+    return 200, {
+        "id": _new_id("chatcmpl-"),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": text},
+            "finish_reason": "stop",
+            "logprobs": None,
+        }],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                  "total_tokens": (len(prompt) + len(text)) // 4},
+    }
+
+
+def _anthropic_message(params: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+    prompt = "".join(str(m.get("content", "")) for m in params.get("messages", []))
+    if ERROR_MARKER in prompt:
+        return False, {"type": "error", "error": {"type": "invalid_request_error", "message": "Stub error requested"}}
+    text = _answer(prompt)
+    content: List[Dict[str, Any]] = [{"type": "text", "text": text}]
+    stop_reason = "end_turn"
+    tool_choice = params.get("tool_choice") or {}
+    if tool_choice.get("type") == "tool":
+        # 結構化輸出：以強制的工具調用回傳 JSON
+        content = [{"type": "tool_use", "id": _new_id("toolu_"), "name": tool_choice["name"], "input": json.loads(text)}]
+        stop_reason = "tool_use"
+    return True, {
+        "id": _new_id("msg_"),
+        "type": "message",
+        "role": "assistant",
+        "model": params.get("model", "stub"),
+        "content": content,
+        "stop_reason": stop_reason,
+        "stop_sequence": None,
+        "usage": {"input_tokens": len(prompt) // 4, "output_tokens": len(text) // 4},
+    }
+
+
+def _openai_stream_events(body: Dict[str, Any], payload: Dict[str, Any]) -> bytes:
+    """將完整回應拆成逐字的 SSE 片段；include_usage 時最後附上只有 usage 的片段"""
+    text = payload["choices"][0]["message"]["content"]
+    base = {"id": payload["id"], "object": "chat.completion.chunk", "created": payload["created"],
+            "model": payload["model"]}
+    chunks = [
+        {**base, "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+        for word in re.findall(r"\S+\s*", text)
+    ]
+    chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+    if (body.get("stream_options") or {}).get("include_usage"):
+        chunks.append({**base, "choices": [], "usage": payload["usage"]})
+    events = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n"
+    return events.encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """處理 OpenAI 與 Anthropic 的批次與同步端點"""
+
+    delay = 2.0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002
+        print(f"[stub] {self.command} {self.path} -> {args[1] if len(args) > 1 else ''}")
+
+    # ---- 共用工具 ----
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, payload: Any, content_type: str = "application/json"):
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self):
+        self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found_error"}})
+
+    # ---- 路由 ----
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/v1/files":
+            return self._openai_upload()
+        if path == "/v1/batches":
+            return self._openai_create_batch()
+        match = re.fullmatch(r"/v1/batches/([\w-]+)/cancel", path)
+        if match:
+            return self._openai_cancel(match.group(1))
+        if path == "/v1/chat/completions":
+            body = json.loads(self._body())
+            status, payload = _openai_completion(body)
+            if status == 200 and body.get("stream"):
+                return self._send(200, _openai_stream_events(body, payload), "text/event-stream")
+            return self._send(status, payload)
+        if path == "/v1/messages/batches":
+            return self._anthropic_create_batch()
+        match = re.fullmatch(r"/v1/messages/batches/([\w-]+)/cancel", path)
+        if match:
+            return self._anthropic_cancel(match.group(1))
+        if path == "/v1/messages":
+            ok, payload = _anthropic_message(json.loads(self._body()))
+            return self._send(200 if ok else 400, payload)
+        self._not_found()
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        match = re.fullmatch(r"/v1/batches/([\w-]+)", path)
+        if match:
+            return self._openai_get_batch(match.group(1))
+        match = re.fullmatch(r"/v1/files/([\w-]+)/content", path)
+        if match:
+            with _lock:
+                content = _files.get(match.group(1))
+            if content is None:
+                return self._not_found()
+            return self._send(200, content, "application/octet-stream")
+        match = re.fullmatch(r"/v1/messages/batches/([\w-]+)", path)
+        if match:
+            return self._anthropic_get_batch(match.group(1))
+        match = re.fullmatch(r"/v1/messages/batches/([\w-]+)/results", path)
+        if match:
+            return self._anthropic_results(match.group(1))
+        self._not_found()
+
+    # ---- OpenAI Batch ----
+    def _openai_upload(self):
+        raw = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode() + self._body()
+        message = BytesParser(policy=HTTP).parsebytes(raw)
+        content, filename, purpose = b"", "upload.jsonl", "batch"
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                content = part.get_payload(decode=True) or b""
+                filename = part.get_filename() or filename
+            elif name == "purpose":
+                purpose = (part.get_payload(decode=True) or b"batch").decode()
+        file_id = _new_id("file-")
+        with _lock:
+            _files[file_id] = content
+        self._send(200, {
+            "id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+            "filename": filename, "purpose": purpose, "status": "processed",
+        })
+
+    def _openai_create_batch(self):
+        body = json.loads(self._body())
+        with _lock:
+            if body.get("input_file_id") not in _files:
+                return self._send(400, {"error": {"message": "Unknown input file", "type": "invalid_request_error"}})
+            lines = [json.loads(line) for line in _files[body["input_file_id"]].decode().splitlines() if line.strip()]
+            batch_id = _new_id("batch_")
+            _openai_batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": body.get("endpoint", "/v1/chat/completions"),
+                "input_file_id": body["input_file_id"],
+                "completion_window": body.get("completion_window", "24h"),
+                "status": "validating",
+                "created_at": int(time.time()),
+                "output_file_id": None,
+                "error_file_id": None,
+                "errors": None,
+                "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+                "_lines": lines,
+                "_ready_at": time.time() + self.delay,
+            }
+            batch = self._openai_public(batch_id)
+        self._send(200, batch)
+
+    def _openai_public(self, batch_id: str) -> Dict[str, Any]:
+        """推進批次狀態並返回公開欄位（呼叫時須持有 _lock）"""
+        batch = _openai_batches[batch_id]
+        if batch["status"] in ("validating", "in_progress"):
+            if time.time() >= batch["_ready_at"]:
+                outputs, errors = [], []
+                for line in batch["_lines"]:
+                    status, payload = _openai_completion(line.get("body", {}))
+                    entry = {
+                        "id": _new_id("batch_req_"),
+                        "custom_id": line.get("custom_id"),
+                        "response": {"status_code": status, "request_id": _new_id("req_"), "body": payload},
+                        "error": None,
+                    }
+                    (outputs if status == 200 else errors).append(json.dumps(entry))
+                if outputs:
+                    batch["output_file_id"] = _new_id("file-")
+                    _files[batch["output_file_id"]] = "\n".join(outputs).encode()
+                if errors:
+                    batch["error_file_id"] = _new_id("file-")
+                    _files[batch["error_file_id"]] = "\n".join(errors).encode()
+                batch["request_counts"].update(completed=len(outputs), failed=len(errors))
+                batch["status"] = "completed"
+                batch["completed_at"] = int(time.time())
+            else:
+                batch["status"] = "in_progress"
+        return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+    def _openai_get_batch(self, batch_id: str):
+        with _lock:
+            if batch_id not in _openai_batches:
+                return self._not_found()
+            batch = self._openai_public(batch_id)
+        self._send(200, batch)
+
+    def _openai_cancel(self, batch_id: str):
+        with _lock:
+            if batch_id not in _openai_batches:
+                return self._not_found()
+            _openai_batches[batch_id]["status"] = "cancelled"
+            batch = self._openai_public(batch_id)
+        self._send(200, batch)
+
+    # ---- Anthropic Message Batches ----
+    def _anthropic_create_batch(self):
+        body = json.loads(self._body())
+        now = time.time()
+        batch_id = _new_id("msgbatch_")
+        with _lock:
+            _anthropic_batches[batch_id] = {
+                "id": batch_id,
+                "type": "message_batch",
+                "processing_status": "in_progress",
+                "created_at": _iso(now),
+                "expires_at": _iso(now + 24 * 3600),
+                "ended_at": None,
+                "archived_at": None,
+                "cancel_initiated_at": None,
+                "results_url": None,
+                "request_counts": {
+                    "processing": len(body.get("requests", [])),
+                    "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0,
+                },
+                "_requests": body.get("requests", []),
+                "_results": [],
+                "_ready_at": now + self.delay,
+            }
+            batch = self._anthropic_public(batch_id)
+        self._send(200, batch)
+
+    def _anthropic_public(self, batch_id: str) -> Dict[str, Any]:
+        """推進批次狀態並返回公開欄位（呼叫時須持有 _lock）"""
+        batch = _anthropic_batches[batch_id]
+        if batch["processing_status"] != "ended" and time.time() >= batch["_ready_at"]:
+            counts = {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+            for request in batch["_requests"]:
+                if batch["cancel_initiated_at"]:
+                    result = {"type": "canceled"}
+                else:
+                    ok, payload = _anthropic_message(request.get("params", {}))
+                    result = {"type": "succeeded", "message": payload} if ok else {"type": "errored", "error": payload}
+                counts[result["type"]] += 1
+                batch["_results"].append(json.dumps({"custom_id": request.get("custom_id"), "result": result}))
+            batch["request_counts"] = counts
+            batch["processing_status"] = "ended"
+            batch["ended_at"] = _iso(time.time())
+            host = self.headers.get("Host", f"127.0.0.1:{self.server.server_port}")
+            batch["results_url"] = f"http://{host}/v1/messages/batches/{batch_id}/results"
+        return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+    def _anthropic_get_batch(self, batch_id: str):
+        with _lock:
+            if batch_id not in _anthropic_batches:
+                return self._not_found()
+            batch = self._anthropic_public(batch_id)
+        self._send(200, batch)
+
+    def _anthropic_cancel(self, batch_id: str):
+        with _lock:
+            if batch_id not in _anthropic_batches:
+                return self._not_found()
+            batch = _anthropic_batches[batch_id]
+            batch["cancel_initiated_at"] = _iso(time.time())
+            batch["_ready_at"] = time.time()
+            public = self._anthropic_public(batch_id)
+        self._send(200, public)
+
+    def _anthropic_results(self, batch_id: str):
+        with _lock:
+            batch = _anthropic_batches.get(batch_id)
+            if batch is None or batch["processing_status"] != "ended":
+                return self._not_found()
+            content = "\n".join(batch["_results"]).encode()
+        self._send(200, content, "application/binary")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI and Anthropic batch APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=2.0, help="seconds before a batch job completes")
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Batch stub server listening on http://{args.host}:{args.port} (jobs finish after {args.delay}s)")
+    print(f"  OPENAI_BASE_URL=http://{args.host}:{args.port}/v1")
+    print(f"  ANTHROPIC_BASE_URL=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+檢測輸出解析基準測試 - 比較 JSON 擷取器與舊的正規表達式的解析結果與耗時，
+以及品牌限定的備用解析與舊的 _fallback_parse
+
+測試輸入（依 --sizes 指定的字元數產生）：
+┌─────────────────────────────────────────────────────────┐
+│  wrapped      說明文字 + ```json 區塊 + 說明文字（正常情況）   │
+│  quoted_brace 說明文字中帶引號的 "{" 之後才是檢測 JSON         │
+│  truncated    超過 max_tokens 被截斷的檢測 JSON              │
+│  open_braces  大量未閉合的 "{"                              │
+│  deep_nesting 極深的 "[[[[..."                             │
+│  stray_quotes 大量不成對的引號與括號                         │
+└─────────────────────────────────────────────────────────┘
+
+每個輸入的耗時取 --repeat 次中的最小值，並標示解析結果是否為完整的檢測
+JSON（ok）、錯誤的片段（partial，例如只取到單一檢測項目）或失敗（-）。
+舊正規表達式只允許一層巢狀，失敗的起點在下一個不成對的括號就停止，
+在這些輸入上都是線性時間；兩者的差別在於解析結果，而不是耗時。
+
+備用解析（JSON 完全失敗時）的輸入是依 --fallback-sizes 產生的自由文字
+檢測輸出，報告吞吐量（MB/s）以及找到的請求品牌數 / 誤判為品牌的單字數。
+舊模式超過 --fallback-legacy-limit 字元時略過。
+
+使用方式：
+    python scripts/benchmark_detection_parser.py
+    python scripts/benchmark_detection_parser.py --sizes 1000,10000,100000 --repeat 5
+    python scripts/benchmark_detection_parser.py --fallback-sizes 2000,8000,32000
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from firegeo.core.detection_parser import parse_detection_json, parse_fallback  # noqa: E402
+
+# 舊版 SimpleBrandDetector._parse_json_response 使用的正規表達式
+LEGACY_OBJECT_PATTERN = r'\{(?:[^{}]|{[^{}]*})*\}'
+LEGACY_ARRAY_PATTERN = r'\[(?:[^\[\]]|\[[^\[\]]*\])*\]'
+
+
+# 舊版 SimpleBrandDetector._fallback_parse 使用的正規表達式
+LEGACY_FALLBACK_PATTERNS = [
+    r'(\w+).*?mentioned.*?(true|false)',
+    r'(\w+).*?(?:is|was).*?(mentioned|not mentioned|found|not found)',
+    r'Brand.*?(\w+).*?(true|false|yes|no)',
+]
+
+FALLBACK_BRANDS = [f"Brand{i}" for i in range(20)]
+
+
+def legacy_parse(text: str):
+    """舊版的解析流程（不含 _fallback_parse）"""
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, RecursionError):
+        pass
+    match = re.search(LEGACY_OBJECT_PATTERN, text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group())
+        except json.JSONDecodeError:
+            pass
+    match = re.search(LEGACY_ARRAY_PATTERN, text, re.DOTALL)
+    if match:
+        try:
+            return {"detections": json.loads(match.group())}
+        except json.JSONDecodeError:
+            pass
+    return None
+
+
+def legacy_fallback(text: str, brands: List[str]) -> List[dict]:
+    """舊版的備用解析（每次呼叫重新編譯，品牌名稱取任意單字）"""
+    mentions = []
+    for pattern in LEGACY_FALLBACK_PATTERNS:
+        for match in re.findall(pattern, text, re.IGNORECASE):
+            mentions.append({"brand_name": match[0], "mentioned": match[1].lower() in ["true", "yes", "mentioned", "found"]})
+    return mentions
+
+
+def fallback_text(size: int) -> str:
+    """自由文字的檢測輸出：每個品牌一行判斷，中間夾雜說明文字"""
+    lines = []
+    index = 0
+    while sum(len(line) + 1 for line in lines) < size:
+        brand = FALLBACK_BRANDS[index % len(FALLBACK_BRANDS)]
+        verdict = "true" if index % 2 == 0 else "false"
+        lines.append(f"- {brand}: mentioned = {verdict}. The response was compared with the listed tools and "
+                     f"it is found that the wording matches the recommendation section.")
+        index += 1
+    return "\n".join(lines)[:size]
+
+
+def fallback_row(parse: Callable[[str, List[str]], List[dict]], text: str, repeat: int) -> str:
+    seconds, result = measure(lambda value: parse(value, FALLBACK_BRANDS), text, repeat)
+    names = {item["brand_name"] for item in result or []}
+    known = len(names & set(FALLBACK_BRANDS))
+    return f"{len(text) / 1e6 / max(seconds, 1e-9):.1f} MB/s {known}/{len(names) - known}"
+
+
+def detection_json(brand_count: int) -> str:
+    return json.dumps({"detections": [
+        {"brand_name": f"Brand {i}", "mentioned": i % 2 == 0, "confidence": 0.9,
+         "reasoning": "The response lists this brand among the recommended tools {see above}."}
+        for i in range(brand_count)
+    ]}, indent=2)
+
+
+def build_inputs(size: int) -> Dict[str, str]:
+    prose = "The response discusses several tools and compares pricing, features and support. "
+    filler = (prose * (size // len(prose) + 1))[:size // 2]
+    payload = detection_json(max(1, size // 400))
+    return {
+        "wrapped": f"{filler}\n```json\n{payload}\n```\n{filler}",
+        "quoted_brace": f'{filler} Note the "{{" character.\n{payload}',
+        "truncated": payload[:max(10, len(payload) * 3 // 4)],
+        "open_braces": ("{ note " * (size // 7 + 1))[:size],
+        "deep_nesting": "[" * size,
+        "stray_quotes": ('" { ] } [ "x' * (size // 12 + 1))[:size],
+    }
+
+
+def measure(parse: Callable[[str], object], text: str, repeat: int) -> Tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            result = parse(text)
+        except RecursionError:
+            result = None
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def verdict(result: object) -> str:
+    detections = result.get("detections") if isinstance(result, dict) else None
+    if detections and isinstance(detections, list) and all(isinstance(item, dict) for item in detections):
+        return "ok"
+    return "partial" if result else "-"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the detection output parser")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated input sizes in characters")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per input (the fastest is reported)")
+    parser.add_argument("--fallback-sizes", default="2000,8000,32000",
+                        help="comma-separated free-text output sizes for the fallback parser")
+    parser.add_argument("--fallback-legacy-limit", type=int, default=8000,
+                        help="skip the legacy fallback patterns on outputs larger than this")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    print(f"{'input':<14}{'chars':>10}{'extractor (ms)':>22}{'legacy regex (ms)':>22}")
+    for size in sizes:
+        for name, text in build_inputs(size).items():
+            seconds, result = measure(parse_detection_json, text, args.repeat)
+            extractor = f"{seconds * 1000:.2f} {verdict(result)}"
+            seconds, result = measure(legacy_parse, text, args.repeat)
+            legacy = f"{seconds * 1000:.2f} {verdict(result)}"
+            print(f"{name:<14}{len(text):>10}{extractor:>22}{legacy:>22}")
+
+    print()
+    print(f"{'fallback':<14}{'chars':>10}{'parse_fallback':>22}{'legacy patterns':>22}")
+    for size in (int(size) for size in args.fallback_sizes.split(",") if size.strip()):
+        text = fallback_text(size)
+        current = fallback_row(parse_fallback, text, args.repeat)
+        if len(text) > args.fallback_legacy_limit:
+            legacy = "skipped"
+        else:
+            legacy = fallback_row(legacy_fallback, text, args.repeat)
+        print(f"{'free_text':<14}{len(text):>10}{current:>22}{legacy:>22}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
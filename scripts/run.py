@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """
-LLM Brand Detector 簡單啟動腳本
+LLM Brand Detector 簡單啟動腳本 - 以命令列執行分析（參數見 --help）
+
+範例：
+    python scripts/run.py --target Notion --competitor Asana --prompts prompts.txt
 """
 
 import sys
@@ -13,20 +16,21 @@ src_path = project_root / "src"
 sys.path.insert(0, str(src_path))
 
 try:
-    from firegeo.main import main
+    from firegeo.cli import main
     
     if __name__ == "__main__":
-        print("🔥 Starting LLM Brand Detector Monitor...")
-        print("=" * 50)
+        # 標準輸出保留給 NDJSON 結果，提示訊息寫到標準錯誤輸出
+        print("🔥 Starting LLM Brand Detector Monitor...", file=sys.stderr)
+        print("=" * 50, file=sys.stderr)
         
         # 檢查環境變數文件
         env_file = project_root / ".env"
         if not env_file.exists():
-            print("⚠️  Warning: .env file not found")
-            print("   Please copy .env.example to .env and add your API keys")
-            print("")
+            print("⚠️  Warning: .env file not found", file=sys.stderr)
+            print("   Please copy .env.example to .env and add your API keys", file=sys.stderr)
+            print("", file=sys.stderr)
         
-        main()
+        sys.exit(main())
 
 except ImportError as e:
     print(f"❌ Import error: {e}")
@@ -0,0 +1,340 @@
+"""
+命令列介面 - 不需 Streamlit 即可執行完整分析，結果以 NDJSON 逐行輸出
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  llm-brand-detector-cli --target ... --prompts FILE      │
+│     │                                                   │
+│     ├── 讀取品牌、競爭對手、提示詞（檔案、參數或標準輸入）     │
+│     ├── 從環境變數讀取 API 金鑰（OPENAI_API_KEY 等）         │
+│     ├── --estimate：只輸出預估的 token 與成本                 │
+│     ├── run_analysis：與 Streamlit 介面相同的分析流程        │
+│     │     ├── 每個單元完成 → 寫入檢查點（--resume 續跑）       │
+│     │     └── 每個提示詞完成 → 立即寫出一行 NDJSON            │
+│     │         (PromptAnalysisResult)                      │
+│     └── 結束時在標準錯誤輸出統計摘要                          │
+└─────────────────────────────────────────────────────────┘
+
+不受介面的提示詞與競爭對手數量上限限制，適合排程執行的大量監測。
+
+範例：
+    llm-brand-detector-cli --target "Notion | Notion AI" \\
+        --competitors competitors.txt --prompts prompts.txt \\
+        --providers openai,google --output results.ndjson
+
+    # 先看預估成本，再以 --budget 設定上限執行
+    llm-brand-detector-cli --target Notion --prompts prompts.txt --estimate
+    llm-brand-detector-cli --target Notion --prompts prompts.txt --budget 0.50
+
+    # 中斷後續跑：只調用尚未完成的單元，已寫出的提示詞不再輸出
+    llm-brand-detector-cli --resume <run_id> --output results.ndjson --append
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from .core.cache import CACHE_MODES, CACHE_USE, CACHE_BYPASS
+from .core.checkpoint import CheckpointLog
+from .core.pipeline import run_analysis
+from .core.scheduler import EXECUTION_BATCH, EXECUTION_INTERACTIVE, estimate_analysis_cost
+from .models.analysis import PromptAnalysisResult, SimpleAnalysisRequest
+from .models.config import SUPPORTED_PROVIDERS, StreamlitConfig
+from .utils.brand_input import parse_brand_entry, parse_brand_lines
+
+logger = logging.getLogger(__name__)
+
+# 提供商 → 讀取 API 金鑰的環境變數（依序嘗試）
+API_KEY_ENV_VARS: Dict[str, Tuple[str, ...]] = {
+    "openai": ("OPENAI_API_KEY",),
+    "anthropic": ("ANTHROPIC_API_KEY",),
+    "google": ("GOOGLE_GENERATIVE_AI_API_KEY", "GOOGLE_API_KEY"),
+    "perplexity": ("PERPLEXITY_API_KEY",),
+}
+
+
+def read_text_source(source: str) -> str:
+    """讀取檔案內容；"-" 表示標準輸入"""
+    if source == "-":
+        return sys.stdin.read()
+    with open(source, encoding="utf-8") as f:
+        return f.read()
+
+
+def read_prompts(text: str) -> List[str]:
+    """每行一個提示詞，忽略空行與 # 開頭的註解"""
+    return [
+        line.strip() for line in text.splitlines()
+        if line.strip() and not line.strip().startswith("#")
+    ]
+
+
+def load_api_keys(providers: Optional[List[str]] = None) -> Dict[str, str]:
+    """從環境變數讀取 API 金鑰；providers 指定時只讀取這些提供商"""
+    api_keys: Dict[str, str] = {}
+    for provider_key, env_vars in API_KEY_ENV_VARS.items():
+        if providers is not None and provider_key not in providers:
+            continue
+        for env_var in env_vars:
+            if os.getenv(env_var):
+                api_keys[provider_key] = os.environ[env_var]
+                break
+    return api_keys
+
+
+def parse_models(entries: List[str]) -> Dict[str, str]:
+    """解析 --model provider=model 參數"""
+    models: Dict[str, str] = {}
+    for entry in entries:
+        provider_key, _, model = entry.partition("=")
+        provider_key = provider_key.strip().lower()
+        if provider_key not in SUPPORTED_PROVIDERS or not model.strip():
+            raise ValueError(f"Invalid --model '{entry}', expected PROVIDER=MODEL with PROVIDER in {list(SUPPORTED_PROVIDERS)}")
+        models[provider_key] = model.strip()
+    return models
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="llm-brand-detector-cli",
+        description="Run a brand visibility analysis without the web UI and write one NDJSON line per prompt.",
+        epilog="API keys are read from OPENAI_API_KEY, ANTHROPIC_API_KEY, "
+               "GOOGLE_GENERATIVE_AI_API_KEY (or GOOGLE_API_KEY) and PERPLEXITY_API_KEY.",
+    )
+    inputs = parser.add_argument_group("inputs")
+    inputs.add_argument("--target", help='target brand, optionally with aliases: "Brand | Alias 1 | Alias 2"')
+    inputs.add_argument("--competitors", metavar="FILE", help='file with one competitor per line ("Brand | Alias" supported), "-" for stdin')
+    inputs.add_argument("--competitor", action="append", default=[], metavar="NAME", help="competitor brand (repeatable)")
+    inputs.add_argument("--prompts", metavar="FILE", help='file with one prompt per line, "-" for stdin')
+    inputs.add_argument("--prompt", action="append", default=[], metavar="TEXT", help="prompt (repeatable)")
+
+    providers = parser.add_argument_group("providers")
+    providers.add_argument("--providers", help=f"comma-separated providers to use (default: all with API keys; choices: {','.join(SUPPORTED_PROVIDERS)})")
+    providers.add_argument("--model", action="append", default=[], metavar="PROVIDER=MODEL", help="model for a provider (repeatable)")
+
+    execution = parser.add_argument_group("execution")
+    execution.add_argument("--concurrency", type=int, default=None, help="global limit of concurrent provider calls")
+    execution.add_argument("--cache", choices=CACHE_MODES, default=CACHE_USE, help="response cache mode (default: use)")
+    execution.add_argument("--no-detection-memo-persist", action="store_true", help="keep the detection memo in memory only")
+    execution.add_argument("--no-detection-cascade", action="store_true", help="detect brands with a single model instead of a fast model that escalates low-confidence brands")
+    execution.add_argument("--batch", action="store_true", help="use provider batch APIs (OpenAI, Anthropic); cheaper but slower")
+    execution.add_argument("--batch-detection", action="store_true", help="with --batch, run brand detection through the batch API too")
+    execution.add_argument("--batch-poll-interval", type=float, default=None, help="seconds between batch status checks")
+    execution.add_argument("--hedge", action="store_true", help="hedge slow requests")
+    execution.add_argument("--budget", type=float, default=None, metavar="USD", help="stop dispatching new calls once spend reaches this cap")
+    execution.add_argument("--estimate", action="store_true", help="print the projected tokens and cost as JSON and exit without calling providers")
+
+    checkpoint = parser.add_argument_group("checkpoint")
+    checkpoint.add_argument("--run-id", help="checkpoint ID for this run (default: generated and printed to stderr)")
+    checkpoint.add_argument("--resume", metavar="RUN_ID", help="resume an interrupted run; prompts and brands are read from its checkpoint")
+    checkpoint.add_argument("--no-checkpoint", action="store_true", help="do not write a checkpoint")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("-o", "--output", default="-", help='NDJSON output path (default: "-" for stdout)')
+    output.add_argument("--append", action="store_true", help="append to the output file instead of overwriting it")
+    output.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    return parser
+
+
+def build_request(args: argparse.Namespace) -> SimpleAnalysisRequest:
+    """依命令列參數建立分析請求（--resume 時從檢查點讀取提示詞與品牌）"""
+    if args.resume:
+        return build_resume_request(args)
+    if not args.target:
+        raise ValueError("--target is required (or --resume RUN_ID)")
+    if args.competitors == "-" and args.prompts == "-":
+        raise ValueError("Only one of --competitors and --prompts can read from stdin")
+
+    target_brand, target_aliases = parse_brand_entry(args.target)
+    if not target_brand:
+        raise ValueError("--target must not be empty")
+
+    competitor_text = "\n".join(args.competitor)
+    if args.competitors:
+        competitor_text += "\n" + read_text_source(args.competitors)
+    competitors, brand_aliases = parse_brand_lines(competitor_text)
+    if target_aliases:
+        brand_aliases[target_brand] = target_aliases
+
+    prompts = [prompt.strip() for prompt in args.prompt if prompt.strip()]
+    if args.prompts:
+        prompts += read_prompts(read_text_source(args.prompts))
+    if not prompts:
+        raise ValueError("No prompts given (use --prompts FILE or --prompt TEXT)")
+
+    selected_providers = None
+    if args.providers:
+        selected_providers = [name.strip().lower() for name in args.providers.split(",") if name.strip()]
+        unknown = [name for name in selected_providers if name not in SUPPORTED_PROVIDERS]
+        if unknown:
+            raise ValueError(f"Unknown providers: {unknown}")
+    api_keys = load_api_keys(selected_providers)
+    if not api_keys:
+        raise ValueError("No API keys found in the environment for the selected providers")
+    if args.batch_detection and not args.batch:
+        raise ValueError("--batch-detection requires --batch")
+
+    return SimpleAnalysisRequest(
+        target_brand=target_brand,
+        competitors=competitors,
+        prompts=prompts,
+        api_keys=api_keys,
+        selected_models=parse_models(args.model),
+        brand_aliases=brand_aliases,
+        cache_mode=args.cache,
+        hedge_requests=args.hedge,
+        execution_mode=EXECUTION_BATCH if args.batch else EXECUTION_INTERACTIVE,
+        batch_detection=args.batch_detection,
+        budget_usd=args.budget
+    )
+
+
+def build_resume_request(args: argparse.Namespace) -> SimpleAnalysisRequest:
+    """從檢查點還原請求；API 金鑰重新從環境變數讀取，執行選項取自命令列"""
+    if args.target or args.prompts or args.prompt or args.competitors or args.competitor or args.providers or args.model:
+        raise ValueError("--resume reads prompts, brands and models from the checkpoint; do not pass them again")
+    if args.no_checkpoint or args.run_id:
+        raise ValueError("--resume cannot be combined with --run-id or --no-checkpoint")
+    checkpoint = CheckpointLog(args.resume)
+    if not checkpoint.exists():
+        raise ValueError(f"No checkpoint found for run '{args.resume}' at {checkpoint.path}")
+    recorded = checkpoint.load_request()
+    api_keys = load_api_keys(list(recorded.api_keys))
+    missing = [provider for provider in recorded.api_keys if provider not in api_keys]
+    if missing:
+        raise ValueError(f"Missing API keys in the environment for {missing}")
+    if args.batch_detection and not args.batch:
+        raise ValueError("--batch-detection requires --batch")
+    return recorded.model_copy(update={
+        "api_keys": api_keys,
+        "cache_mode": args.cache,
+        "hedge_requests": args.hedge,
+        "execution_mode": EXECUTION_BATCH if args.batch else EXECUTION_INTERACTIVE,
+        "batch_detection": args.batch_detection,
+        "budget_usd": args.budget,
+    })
+
+
+def build_config(args: argparse.Namespace) -> StreamlitConfig:
+    """依命令列參數調整分析設定"""
+    config = StreamlitConfig()
+    updates = {}
+    if args.concurrency:
+        updates["max_concurrency"] = args.concurrency
+    if args.cache == CACHE_BYPASS:
+        updates["response_cache_enabled"] = False
+    if args.no_detection_memo_persist:
+        updates["detection_memo_persistent"] = False
+    if args.batch_poll_interval:
+        updates["batch_poll_interval"] = args.batch_poll_interval
+    if args.no_detection_cascade:
+        updates["detection_fast_model"] = None
+    return config.model_copy(update=updates)
+
+
+async def run_cli(
+    request: SimpleAnalysisRequest,
+    config: StreamlitConfig,
+    output: TextIO,
+    checkpoint: Optional[CheckpointLog] = None
+) -> dict:
+    """
+    執行分析，每個提示詞完成時立即寫出一行 NDJSON
+
+    返回：
+        統計摘要（寫到標準錯誤輸出）
+    """
+    def on_prompt_complete(prompt_result: PromptAnalysisResult, completed_units: int, total_units: int):
+        output.write(prompt_result.model_dump_json() + "\n")
+        output.flush()
+        logger.info(f"Prompt {prompt_result.prompt_index + 1}/{len(request.prompts)} done ({completed_units}/{total_units} calls)")
+
+    def on_batch_status(provider_name: str, status):
+        logger.info(f"{provider_name} batch {status.batch_id}: {status.status} ({status.completed + status.failed}/{status.total})")
+
+    result = await run_analysis(
+        request,
+        config,
+        on_prompt_complete=on_prompt_complete,
+        on_batch_status=on_batch_status,
+        checkpoint=checkpoint
+    )
+
+    errors = sum(
+        1
+        for prompt_result in result.results_by_prompt
+        for response in prompt_result.ai_responses.values()
+        if response.error
+    )
+    return {
+        "prompts": result.total_prompts,
+        "completed_prompts": result.completed_prompts,
+        "provider_errors": errors,
+        "duration_seconds": round(result.analysis_duration, 2),
+        "run_id": result.run_id,
+        "resumed_units": result.resumed_units,
+        "cache_stats": result.cache_stats,
+        "circuit_states": result.circuit_states,
+        "total_cost_usd": round(result.total_cost, 6),
+        "estimated_cost_usd": round(result.estimated_cost, 6) if result.estimated_cost is not None else None,
+        "budget_skipped_units": result.budget_skipped_units,
+        "usage_by_provider": result.usage_by_provider,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令列進入點；返回結束碼（0 成功，1 有提供商失敗，2 參數錯誤）"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    # 標準輸出保留給 NDJSON，日誌一律寫到標準錯誤輸出
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        stream=sys.stderr,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+    try:
+        request = build_request(args)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    config = build_config(args)
+
+    if args.estimate:
+        # 只預估，不調用提供商
+        print(estimate_analysis_cost(request, config=config).model_dump_json(indent=2))
+        return 0
+
+    checkpoint = None
+    if not args.no_checkpoint:
+        try:
+            checkpoint = CheckpointLog(args.resume or args.run_id)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.run_id and checkpoint.exists():
+            parser.error(f"A checkpoint for run '{args.run_id}' already exists; use --resume {args.run_id}")
+        print(f"Run ID: {checkpoint.run_id} (resume with --resume {checkpoint.run_id})", file=sys.stderr)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "a" if args.append else "w", encoding="utf-8")
+    try:
+        summary = asyncio.run(run_cli(request, config, output, checkpoint))
+    except KeyboardInterrupt:
+        if checkpoint is not None:
+            print(f"Interrupted; resume with --resume {checkpoint.run_id}", file=sys.stderr)
+        else:
+            print("Interrupted", file=sys.stderr)
+        return 130
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(json.dumps({"summary": summary}, ensure_ascii=False), file=sys.stderr)
+    return 1 if summary["provider_errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,19 @@
 """LLM Brand Detector Core Module - Simplified"""
 
 from .simple_detector import SimpleBrandDetector
+from .scheduler import AnalysisScheduler, create_providers
+from .pipeline import ProviderPool, run_analysis
+from .job_queue import JobQueue
+from .background import get_background_runner
 from . import ai_providers
 
 __all__ = [
     "SimpleBrandDetector",
+    "AnalysisScheduler",
+    "create_providers",
+    "run_analysis",
+    "ProviderPool",
+    "JobQueue",
+    "get_background_runner",
     "ai_providers",
 ]
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+自適應並行控制 - 以 AIMD（加法增加、乘法減少）調整同時進行的請求數
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  get_concurrency_limiter(provider_key, model)            │
+│     │                                                   │
+│     └── 全域註冊表：每個 (提供商, 模型) 共用一個控制器         │
+│            │                                            │
+│            ├── acquire()：進行中請求數 < 目前上限才放行       │
+│            └── release(結果)：                            │
+│                  ├── 成功且延遲正常 → 上限 += 1 / 上限        │
+│                  │   （每一輪上限的請求約 +1）               │
+│                  ├── 429 / 過載 / 逾時 / 延遲暴增            │
+│                  │   → 上限 × decrease_factor              │
+│                  └── x-ratelimit-remaining-* 接近 0        │
+│                      → 停止增加；為 0 時減少                 │
+└─────────────────────────────────────────────────────────┘
+
+控制器在不同事件迴圈（每次 Streamlit 分析）之間共用，學到的上限會
+延續到下一次分析。減少後有一段冷卻時間，避免同一波並行失敗把上限
+連續砍到底。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Mapping, Optional, Tuple
+
+from ..models.config import SUPPORTED_PROVIDERS
+
+logger = logging.getLogger(__name__)
+
+# 延遲超過基準的倍數時視為壅塞
+LATENCY_SPIKE_FACTOR = 2.5
+
+# 剩餘配額低於此比例時停止增加並行數
+LOW_REMAINING_RATIO = 0.1
+
+# 要解析的速率限制標頭（OpenAI / Perplexity 與 Anthropic 的命名不同）
+_RATE_LIMIT_HEADERS = {
+    "remaining_requests": ("x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining"),
+    "limit_requests": ("x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit"),
+    "remaining_tokens": ("x-ratelimit-remaining-tokens", "anthropic-ratelimit-tokens-remaining"),
+    "limit_tokens": ("x-ratelimit-limit-tokens", "anthropic-ratelimit-tokens-limit"),
+}
+
+def parse_rate_limit_headers(headers: Optional[Mapping[str, str]]) -> Dict[str, int]:
+    """從回應標頭取出剩餘 / 上限的請求數與 token 數（沒有的欄位不列出）"""
+    if not headers:
+        return {}
+    parsed: Dict[str, int] = {}
+    for field, names in _RATE_LIMIT_HEADERS.items():
+        for name in names:
+            value = headers.get(name)
+            if value is None:
+                continue
+            try:
+                parsed[field] = int(float(value))
+                break
+            except ValueError:
+                continue
+    return parsed
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD 並行上限控制器
+    
+    作用：
+        - acquire(): 等待直到進行中的請求數低於目前上限
+        - release(): 回報結果，依延遲、錯誤與速率限制標頭調整上限
+    可跨事件迴圈使用；狀態以執行緒鎖保護。
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease_factor: float = 0.5
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._lock = threading.Lock()
+        self._baseline_latency: Optional[float] = None
+        self._last_decrease = 0.0
+    
+    @property
+    def limit(self) -> int:
+        """目前允許同時進行的請求數"""
+        return int(self._limit)
+    
+    @property
+    def in_flight(self) -> int:
+        """目前進行中的請求數"""
+        return self._in_flight
+    
+    async def acquire(self):
+        """取得一個請求名額"""
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future.done() and not future.cancelled():
+                    # 已經分配到名額才被取消，把名額交給下一位
+                    self._in_flight -= 1
+                    self._wake_waiters()
+                elif future in self._waiters:
+                    self._waiters.remove(future)
+            raise
+    
+    def release(
+        self,
+        latency: Optional[float] = None,
+        overloaded: bool = False,
+        rate_limit: Optional[Dict[str, int]] = None
+    ):
+        """
+        歸還名額並回報結果
+        
+        參數：
+            latency: 成功請求的延遲秒數（失敗時為 None）
+            overloaded: 是否為 429、過載或逾時等壅塞訊號
+            rate_limit: parse_rate_limit_headers 的結果
+        """
+        with self._lock:
+            self._in_flight -= 1
+            previous = self.limit
+            now = time.monotonic()
+            
+            if overloaded:
+                self._decrease(now, "overloaded")
+            elif latency is not None:
+                self._observe_success(now, latency, rate_limit or {})
+            
+            if self.limit != previous:
+                logger.info(f"Concurrency limit for {self.name}: {previous} -> {self.limit}")
+            self._wake_waiters()
+    
+    def _observe_success(self, now: float, latency: float, rate_limit: Dict[str, int]):
+        """成功請求：依延遲與剩餘配額決定增加、維持或減少（呼叫者需持有鎖）"""
+        baseline = self._baseline_latency
+        if baseline is None:
+            self._baseline_latency = latency
+        elif latency > baseline * LATENCY_SPIKE_FACTOR:
+            self._decrease(now, f"latency {latency:.2f}s vs baseline {baseline:.2f}s")
+            return
+        else:
+            # 基準延遲緩慢追蹤近期的正常延遲
+            self._baseline_latency = baseline * 0.9 + latency * 0.1
+        
+        for remaining_key, limit_key in (("remaining_requests", "limit_requests"), ("remaining_tokens", "limit_tokens")):
+            remaining = rate_limit.get(remaining_key)
+            if remaining is None:
+                continue
+            if remaining <= 0:
+                self._decrease(now, f"{remaining_key} exhausted")
+                return
+            quota = rate_limit.get(limit_key)
+            if quota and remaining < quota * LOW_REMAINING_RATIO:
+                return
+        
+        self._limit = min(float(self.max_limit), self._limit + 1.0 / max(self._limit, 1.0))
+    
+    def _decrease(self, now: float, reason: str):
+        """乘法減少上限；冷卻期間內（約一個基準延遲）只減少一次（呼叫者需持有鎖）"""
+        cooldown = max(1.0, self._baseline_latency or 0.0)
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        logger.warning(f"{self.name} congestion ({reason}), reducing concurrency to {self.limit}")
+    
+    def _wake_waiters(self):
+        """依上限放行等待中的請求（呼叫者需持有鎖）"""
+        while self._waiters and self._in_flight < self.limit:
+            future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._in_flight += 1
+            future.get_loop().call_soon_threadsafe(_grant, future, self)
+
+def _grant(future: asyncio.Future, limiter: AdaptiveConcurrencyLimiter):
+    """在等待者的事件迴圈中喚醒它；等待者已取消時歸還名額"""
+    if future.done():
+        with limiter._lock:
+            limiter._in_flight -= 1
+            limiter._wake_waiters()
+        return
+    future.set_result(None)
+
+# 全域註冊表：(provider_key, model) → AdaptiveConcurrencyLimiter
+_registry: Dict[Tuple[str, str], AdaptiveConcurrencyLimiter] = {}
+_registry_lock = threading.Lock()
+
+def get_concurrency_limiter(provider_key: str, model: str) -> AdaptiveConcurrencyLimiter:
+    """取得 (提供商, 模型) 共用的並行控制器，首次使用時以 SUPPORTED_PROVIDERS 的設定建立"""
+    key = (provider_key, model)
+    with _registry_lock:
+        limiter = _registry.get(key)
+        if limiter is None:
+            provider_info = SUPPORTED_PROVIDERS.get(provider_key)
+            initial = provider_info.max_concurrency if provider_info else 4
+            ceiling = provider_info.max_adaptive_concurrency if provider_info else 32
+            limiter = AdaptiveConcurrencyLimiter(
+                f"{provider_key}/{model}",
+                initial_limit=initial,
+                max_limit=ceiling
+            )
+            _registry[key] = limiter
+        return limiter
+
+def reset_concurrency_limiters(provider_key: Optional[str] = None):
+    """清除註冊表中的控制器（設定變更後重新學習）"""
+    with _registry_lock:
+        if provider_key is None:
+            _registry.clear()
+        else:
+            for key in [k for k in _registry if k[0] == provider_key]:
+                del _registry[key]
@@ -1,6 +1,19 @@
 """AI ЛF!D"""
 
-from .base import BaseAIProvider
+from .base import BaseAIProvider, ProviderCompletion
+from .errors import (
+    ProviderError,
+    ProviderTimeoutError,
+    RateLimitError,
+    ServerError,
+    AuthenticationError,
+    ContentFilterError,
+    CircuitOpenError,
+    BudgetExceededError,
+)
+from .retry import call_with_retry
+from .batch import BatchCollector, BatchStatus
+from .streaming import ProviderStream, StreamUsage
 from .openai_provider import OpenAIProvider
 from .anthropic_provider import AnthropicProvider
 from .google_provider import GoogleProvider
@@ -8,6 +21,20 @@ from .perplexity_provider import PerplexityProvider
 
 __all__ = [
     "BaseAIProvider",
+    "ProviderCompletion",
+    "ProviderError",
+    "ProviderTimeoutError",
+    "RateLimitError",
+    "ServerError",
+    "AuthenticationError",
+    "ContentFilterError",
+    "CircuitOpenError",
+    "BudgetExceededError",
+    "call_with_retry",
+    "BatchCollector",
+    "BatchStatus",
+    "ProviderStream",
+    "StreamUsage",
     "OpenAIProvider", 
     "AnthropicProvider",
     "GoogleProvider",
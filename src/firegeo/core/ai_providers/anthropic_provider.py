@@ -1,7 +1,20 @@
 """簡化的Anthropic提供商"""
 
+import json
+from typing import AsyncIterator, Callable, Dict, Optional, Union
+
 import anthropic
-from .base import BaseAIProvider
+from .base import BaseAIProvider, ProviderCompletion
+from .batch import STRUCTURED_OUTPUT_NAME, BatchResults, BatchStatus, poll_until_done
+from .streaming import StreamUsage
+from .errors import (
+    ProviderError,
+    ProviderTimeoutError,
+    ServerError,
+    ContentFilterError,
+    error_from_status,
+)
+from ..adaptive_concurrency import parse_rate_limit_headers
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,9 +22,15 @@ logger = logging.getLogger(__name__)
 class AnthropicProvider(BaseAIProvider):
     """Anthropic 提供商實現"""
     
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514"):
+    provider_key = "anthropic"
+    supports_batch = True
+    max_batch_requests = 100000  # Message Batches API 單一批次的請求數上限
+    
+    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514", base_url: Optional[str] = None):
         super().__init__(api_key)
-        self.client = anthropic.AsyncAnthropic(api_key=api_key)
+        # 重試由 BaseAIProvider.complete 統一處理，停用 SDK 內建重試
+        # base_url 預設使用 SDK 的設定（ANTHROPIC_BASE_URL 或官方端點）
+        self.client = anthropic.AsyncAnthropic(api_key=api_key, base_url=base_url, max_retries=0)
         self.selected_model = model
         self.available_models = ["claude-sonnet-4-20250514", "claude-3-5-sonnet-20241022", "claude-opus-4-1-20250805", "claude-3-opus-20240229"]
     
@@ -19,23 +38,159 @@ class AnthropicProvider(BaseAIProvider):
     def provider_name(self) -> str:
         return "Anthropic"
     
-    async def get_response(self, prompt: str) -> str:
+    async def _generate(self, prompt: str) -> ProviderCompletion:
         """獲取Anthropic回應"""
+        # 使用 with_raw_response 以讀取 anthropic-ratelimit-* 標頭（供自適應並行控制）
+        raw_response = await self.client.messages.with_raw_response.create(**self._message_params(prompt))
+        response = raw_response.parse()
+        
+        if response.stop_reason == "refusal":
+            raise ContentFilterError("Response was refused by the safety system", self.provider_name)
+        
+        completion = self._completion_from_message(response)
+        completion.rate_limit = parse_rate_limit_headers(raw_response.headers)
+        return completion
+    
+    async def _generate_stream(self, prompt: str) -> AsyncIterator[Union[str, StreamUsage]]:
+        """以串流方式獲取 Anthropic 回應片段（結束後回報最終訊息的 token 用量）"""
+        async with self.client.messages.stream(**self._message_params(prompt)) as stream:
+            async for text in stream.text_stream:
+                yield text
+            message = await stream.get_final_message()
+        if message.stop_reason == "refusal":
+            raise ContentFilterError("Response was refused by the safety system", self.provider_name)
+        if message.usage:
+            yield StreamUsage(
+                prompt_tokens=message.usage.input_tokens,
+                completion_tokens=message.usage.output_tokens
+            )
+    
+    def _message_params(self, prompt: str, response_schema: Optional[dict] = None) -> dict:
+        """
+        Messages API 的請求參數（同步與批次共用）
+        
+        指定 response_schema 時強制模型調用以該 schema 為輸入的工具，
+        工具輸入即為結構化結果（見 _completion_from_message）
+        """
+        params = {
+            "model": self.selected_model,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "messages": [{"role": "user", "content": prompt}]
+        }
+        if response_schema is not None:
+            params["tools"] = [{
+                "name": STRUCTURED_OUTPUT_NAME,
+                "description": "Record the result in the required structure",
+                "input_schema": response_schema
+            }]
+            params["tool_choice"] = {"type": "tool", "name": STRUCTURED_OUTPUT_NAME}
+        return params
+    
+    def _completion_from_message(self, message) -> ProviderCompletion:
+        """
+        將 Message 物件轉為 ProviderCompletion（合併所有文字區塊，附上 token 用量）
+        
+        結構化輸出的工具調用以其輸入的 JSON 作為回應文本
+        """
+        response_text = "".join(
+            block.text for block in message.content if getattr(block, "type", "") == "text"
+        )
+        for block in message.content:
+            if getattr(block, "type", "") == "tool_use" and block.name == STRUCTURED_OUTPUT_NAME:
+                response_text = json.dumps(block.input, ensure_ascii=False)
+                break
+        usage = message.usage
+        return ProviderCompletion(
+            text=response_text,
+            model=message.model or self.selected_model,
+            finish_reason=message.stop_reason,
+            prompt_tokens=usage.input_tokens if usage else 0,
+            completion_tokens=usage.output_tokens if usage else 0
+        )
+    
+    async def complete_batch(
+        self,
+        prompts: Dict[str, str],
+        poll_interval: float = 30.0,
+        timeout: float = 24 * 3600,
+        on_status: Optional[Callable[[BatchStatus], None]] = None,
+        response_schemas: Optional[Dict[str, dict]] = None
+    ) -> BatchResults:
+        """
+        以 Message Batches API 送出一個批次工作並等待結果
+        
+        流程：建立批次 → 輪詢直到 processing_status 為 ended → 逐行讀取結果
+        """
         try:
-            # 移除速率限制 - 由於已限制分析提示詞數量上限，不易達到 RPM 限制
-            # await self._rate_limit_delay(100)  # Anthropic較低的RPM限制
+            batch = await self.client.messages.batches.create(requests=[
+                {"custom_id": custom_id, "params": self._message_params(prompt, (response_schemas or {}).get(custom_id))}
+                for custom_id, prompt in prompts.items()
+            ])
+            logger.info(f"Anthropic batch {batch.id} created with {len(prompts)} requests")
             
-            response = await self.client.messages.create(
-                model=self.selected_model,
-                max_tokens=4000,
-                temperature=0.7,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            async def fetch_status() -> BatchStatus:
+                nonlocal batch
+                batch = await self.client.messages.batches.retrieve(batch.id)
+                counts = batch.request_counts
+                return BatchStatus(
+                    batch_id=batch.id,
+                    status=batch.processing_status,
+                    total=len(prompts),
+                    completed=counts.succeeded,
+                    failed=counts.errored + counts.canceled + counts.expired,
+                    done=batch.processing_status == "ended"
+                )
+            
+            try:
+                await poll_until_done(fetch_status, poll_interval, timeout, on_status)
+            except ProviderTimeoutError:
+                await self.client.messages.batches.cancel(batch.id)
+                raise
             
-            return response.content[0].text
+            results: BatchResults = {}
+            async for entry in await self.client.messages.batches.results(batch.id):
+                results[entry.custom_id] = self._parse_batch_result(entry.result)
+        except ProviderError:
+            raise
         except Exception as e:
-            logger.error(f"Anthropic API error: {e}")
-            return f"Error: {str(e)}"
+            raise self._classify_error(e) from e
+        
+        for custom_id in prompts:
+            if custom_id not in results:
+                results[custom_id] = ProviderError("Batch request returned no result", self.provider_name)
+        return results
+    
+    def _parse_batch_result(self, result):
+        """將單一批次結果轉為 ProviderCompletion 或 ProviderError"""
+        if result.type == "succeeded":
+            if result.message.stop_reason == "refusal":
+                return ContentFilterError("Response was refused by the safety system", self.provider_name)
+            completion = self._completion_from_message(result.message)
+            completion.batch = True
+            return completion
+        if result.type == "errored":
+            error = result.error.error
+            if error.type in ("overloaded_error", "api_error"):
+                return ServerError(error.message, self.provider_name)
+            return ProviderError(f"{error.type}: {error.message}", self.provider_name)
+        # canceled / expired
+        return ProviderError(f"Batch request {result.type}", self.provider_name)
+    
+    def _translate_error(self, error: Exception) -> ProviderError:
+        """將 Anthropic SDK 例外轉換為 ProviderError 子類"""
+        if isinstance(error, anthropic.APITimeoutError):
+            return ProviderTimeoutError(str(error), self.provider_name)
+        if isinstance(error, anthropic.APIConnectionError):
+            return ServerError(str(error), self.provider_name)
+        if isinstance(error, anthropic.APIStatusError):
+            # 529 Overloaded 也屬於服務端錯誤
+            return error_from_status(error.status_code, str(error), self.provider_name, error.response.headers)
+        return super()._translate_error(error)
+    
+    async def aclose(self):
+        """關閉 Anthropic 客戶端的連線池"""
+        await self.client.close()
     
     def is_available(self) -> bool:
         """檢查Anthropic是否可用"""
@@ -8,37 +8,103 @@ AI提供商抽象基類 - 統一所有AI提供商的介面
 │  1. 初始化 (__init__)                                     │
 │     │                                                   │
 │     ├── 儲存 API 金鑰                                     │
-│     └── 初始化速率限制時間戳記                               │
+│     └── 設定預設生成參數 (max_tokens, temperature)          │
 │                                                         │
 │  2. 抽象方法 (Abstract Methods)                           │
 │     │                                                   │
 │     ├── provider_name() → 返回提供商名稱                   │
-│     ├── get_response() → 獲取AI回應                       │
+│     ├── _generate() → 調用 AI API，返回 ProviderCompletion │
 │     └── is_available() → 檢查可用性                       │
 │                                                         │
-│  3. 速率限制 (_rate_limit_delay)                          │
+│  2.5 統一調用流程 (complete)                               │
 │     │                                                   │
-│     ├── 計算最小請求間隔                                    │
-│     ├── 檢查距離上次請求的時間                              │
-│     ├── 如果間隔太短則等待                                 │
-│     └── 更新最後請求時間                                   │
+│     ├── 斷路器 → 速率限制 → 並行名額 → _generate → 修正 TPM  │
+│     ├── 可重試的失敗 → 指數退避 + 抖動後重試 (retry)         │
+│     └── SDK 例外 → _translate_error → ProviderError 子類  │
+│         （get_response 保留舊介面，失敗時返回 "Error: ..."）│
+│                                                         │
+│  2.55 串流模式 (stream)                                    │
+│     │                                                   │
+│     └── 返回 ProviderStream，async for 逐段取得文字          │
+│         （子類覆寫 _generate_stream；預設一次輸出完整回應）    │
+│                                                         │
+│  2.6 批次模式 (complete_batch)                             │
+│     │                                                   │
+│     └── supports_batch 的子類以 Batch API 一次送出多個提示詞 │
+│         （不經過速率限制、並行名額與斷路器，見 batch.py）     │
+│                                                         │
+│  3. 速率限制 (_acquire_rate_limit / _settle_rate_limit)    │
+│     │                                                   │
+│     ├── 依 (provider_key, 模型) 取得共用的令牌桶             │
+│     ├── 等待 RPM 與 TPM 額度                               │
+│     └── 回應後以實際長度修正 TPM 預留量                      │
 └─────────────────────────────────────────────────────────┘
 
 依賴關係：
 - abc.ABC: 抽象基類支援
-- asyncio: 非同步延遲功能
-- time: 時間計算
+- errors: 結構化的提供商錯誤類型
+- retry: 指數退避重試引擎
+- adaptive_concurrency: AIMD 自適應並行控制
+- hedging: 對沖請求
+- circuit_breaker: 斷路器
+- batch: 批次模式的狀態與結果類型
+- streaming: 串流回應
+- rate_limiter: 共用的 RPM/TPM 令牌桶
 - logging: 日誌記錄
 """
 
-from abc import ABC, abstractmethod
-from typing import Optional
 import asyncio
 import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Callable, Dict, Optional, Union
 import logging
 
+from pydantic import BaseModel
+
+from .errors import (
+    ProviderError,
+    ProviderTimeoutError,
+    CircuitOpenError,
+    is_overload_error,
+    is_outage_error,
+)
+from .batch import BatchResults, BatchStatus
+from .streaming import ProviderStream, StreamUsage
+from .circuit_breaker import CircuitBreaker, get_circuit_breaker
+from .retry import call_with_retry
+from .hedging import HedgeState, get_hedge_state, run_hedged
+from ...models.config import RetryPolicy, HedgePolicy
+from ..adaptive_concurrency import AdaptiveConcurrencyLimiter, get_concurrency_limiter
+from ..rate_limiter import (
+    RateLimiter,
+    get_rate_limiter,
+    estimate_tokens,
+    EXPECTED_OUTPUT_TOKENS,
+)
+
 logger = logging.getLogger(__name__)
 
+class ProviderCompletion(BaseModel):
+    """單次 AI 調用的成功結果"""
+    text: str
+    model: str = ""
+    finish_reason: Optional[str] = None
+    attempts: int = 1  # 含重試的嘗試次數
+    rate_limit: Dict[str, int] = {}  # 回應標頭中的剩餘配額（見 parse_rate_limit_headers）
+    hedged_requests: int = 0  # 為此結果額外送出的對沖請求數
+    hedge_won: bool = False  # 結果是否來自對沖請求
+    batch: bool = False  # 結果是否來自 Batch API
+    prompt_tokens: int = 0  # 提供商回報的輸入 token 數（未回報時為 0）
+    completion_tokens: int = 0  # 提供商回報的輸出 token 數
+    search_requests: int = 0  # 搜尋請求次數（Perplexity 用）
+    latency: Optional[float] = None  # 成功那次請求的耗時（秒，不含重試與排隊）
+    time_to_first_byte: Optional[float] = None  # 送出請求到收到第一段回應的秒數
+
+    @property
+    def has_usage(self) -> bool:
+        """提供商是否回報了 token 用量"""
+        return bool(self.prompt_tokens or self.completion_tokens)
+
 class BaseAIProvider(ABC):
     """
     AI 提供商抽象基類
@@ -49,6 +115,13 @@ class BaseAIProvider(ABC):
     - 統一抽象方法定義
     """
     
+    # SUPPORTED_PROVIDERS 中的鍵，用於查詢速率限制等設定（由子類覆寫）
+    provider_key: str = ""
+    
+    # 是否支援 Batch API（complete_batch），以及單一批次工作的請求數上限
+    supports_batch: bool = False
+    max_batch_requests: int = 10000
+    
     def __init__(self, api_key: str):
         """
         初始化 AI 提供商
@@ -63,7 +136,7 @@ class BaseAIProvider(ABC):
         └──────┬───────┘
                │
         ┌──────▼───────┐
-        │ 初始化時間戳記  │
+        │ 設定生成參數    │
         └──────┬───────┘
                │
         ┌──────▼───────┐
@@ -74,7 +147,11 @@ class BaseAIProvider(ABC):
             api_key (str): AI 提供商的 API 金鑰
         """
         self.api_key = api_key
-        self.last_request_time = 0  # 用於速率限制的時間戳記
+        self.selected_model = ""
+        self.max_tokens = 4000    # 最大回應長度
+        self.temperature = 0.7    # 創意度
+        self.retry_policy = RetryPolicy()  # 重試與逾時設定
+        self.hedge_policy = HedgePolicy()  # 對沖請求設定（預設關閉）
     
     @property
     @abstractmethod
@@ -89,10 +166,9 @@ class BaseAIProvider(ABC):
         """
         pass
     
-    @abstractmethod
-    async def get_response(self, prompt: str) -> str:
+    async def complete(self, prompt: str) -> ProviderCompletion:
         """
-        獲取 AI 回應的抽象方法
+        獲取 AI 回應（失敗時拋出結構化錯誤）
         
         流程圖：
         ┌─────────────┐
@@ -100,27 +176,280 @@ class BaseAIProvider(ABC):
         └─────┬───────┘
               │
         ┌─────▼───────┐
-        │  呼叫AI API  │
+        │  斷路器檢查   │◄─── 提供商故障中直接拋出 CircuitOpenError
+        └─────┬───────┘
+              │
+        ┌─────▼───────┐
+        │ 取得速率額度  │◄─── _acquire_rate_limit（每次嘗試都重新取得）
+        └─────┬───────┘
+              │
+        ┌─────▼───────┐
+        │ 取得並行名額  │◄─── concurrency_limiter（AIMD 自適應上限）
         └─────┬───────┘
               │
         ┌─────▼───────┐
-        │  處理回應     │
+        │  呼叫AI API  │◄─── _generate（由子類實現，受單次逾時限制）
+        └─────┬───────┘      超過近期 p95 延遲時可對沖（hedge_policy）
+              │
+        ┌─────▼───────┐
+        │ 修正TPM預留量 │◄─── _settle_rate_limit
+        └─────┬───────┘
+              │
+        ┌─────▼───────┐      可重試的錯誤（逾時、429、5xx）
+        │  成功？       │────► 指數退避 + 抖動後重試（call_with_retry）
         └─────┬───────┘
               │
         ┌─────▼───────┐
-        │  返回結果     │
+        │  返回結果     │◄─── attempts 記錄嘗試次數
         └─────────────┘
         
         參數：
             prompt (str): 發送給 AI 的提示詞
         
         返回：
-            str: AI 的回應文本
+            ProviderCompletion: 回應文本與相關資訊
+        
+        例外：
+            ProviderError: 重試後仍失敗的逾時、速率限制、驗證、服務端或內容過濾錯誤
+        """
+        async def attempt(timeout: float) -> ProviderCompletion:
+            completion, hedged_requests, hedge_won = await run_hedged(
+                lambda: self._attempt_once(prompt, timeout),
+                self.hedge_state,
+                self.hedge_policy,
+                label=self.provider_name
+            )
+            completion.hedged_requests += hedged_requests
+            completion.hedge_won = completion.hedge_won or hedge_won
+            return completion
+        
+        try:
+            completion, attempts = await call_with_retry(
+                attempt,
+                self.retry_policy,
+                self._classify_error,
+                label=self.provider_name
+            )
+        except ProviderError as e:
+            logger.error(f"{self.provider_name} API error after {e.attempts} attempt(s): {e}")
+            raise
+        
+        completion.attempts = attempts
+        return completion
+    
+    async def _attempt_once(self, prompt: str, timeout: float) -> ProviderCompletion:
+        """單次請求：斷路器 → 速率限制 → 並行名額 → _generate，並回報延遲與健康狀態"""
+        breaker = self.circuit_breaker
+        breaker.before_call(check_only=True)  # 斷開時直接拋出 CircuitOpenError，不等待額度
+        reserved_tokens = await self._acquire_rate_limit(prompt)
+        limiter = self.concurrency_limiter
+        try:
+            await limiter.acquire()
+        except BaseException:
+            # 等待並行名額時被取消（例如對沖落敗），退回預留的 token
+            self._settle_rate_limit(reserved_tokens, prompt, "")
+            raise
+        try:
+            # 等待名額期間斷路器可能已斷開，送出前再確認一次
+            probe = breaker.before_call()
+        except CircuitOpenError:
+            self._settle_rate_limit(reserved_tokens, prompt, "")
+            limiter.release()
+            raise
+        
+        started = time.monotonic()
+        try:
+            completion = await asyncio.wait_for(self._generate(prompt), timeout=timeout)
+        except BaseException as e:
+            # 失敗或被取消（例如對沖落敗）的請求沒有輸出，退回預留的輸出 token
+            self._settle_rate_limit(reserved_tokens, prompt, "")
+            error = self._classify_error(e) if isinstance(e, Exception) else None
+            limiter.release(overloaded=error is not None and is_overload_error(error))
+            if error is not None and is_outage_error(error):
+                breaker.record_failure(probe)
+            else:
+                breaker.record_ignored(probe)
+            if error is not None and error is not e:
+                raise error from e
+            raise
+        latency = time.monotonic() - started
+        breaker.record_success(probe)
+        limiter.release(latency=latency, rate_limit=completion.rate_limit)
+        self.hedge_state.record_latency(latency)
+        self._settle_rate_limit(reserved_tokens, prompt, completion.text, completion)
+        completion.latency = latency
+        if completion.time_to_first_byte is None:
+            # 非串流的回應一次到齊
+            completion.time_to_first_byte = latency
+        return completion
+    
+    def stream(self, prompt: str) -> ProviderStream:
+        """
+        以串流方式獲取 AI 回應
+        
+        用法：
+            stream = provider.stream(prompt)
+            async for delta in stream:
+                ...  # 逐段處理文字
+            completion = stream.completion()
+        
+        例外（迭代時拋出）：
+            ProviderError: 第一段文字前重試後仍失敗，或輸出途中失敗
+        """
+        return ProviderStream(self, prompt)
+    
+    async def _stream_once(self, prompt: str, timeout: float) -> AsyncIterator[Union[str, StreamUsage]]:
+        """
+        單次串流請求：與 _attempt_once 相同的保護流程，timeout 為等待每段文字的上限
+        
+        子類回報的 StreamUsage 原樣傳給 ProviderStream（不算文字片段）
+        """
+        breaker = self.circuit_breaker
+        breaker.before_call(check_only=True)
+        reserved_tokens = await self._acquire_rate_limit(prompt)
+        limiter = self.concurrency_limiter
+        await limiter.acquire()
+        try:
+            probe = breaker.before_call()
+        except CircuitOpenError:
+            self._settle_rate_limit(reserved_tokens, prompt, "")
+            limiter.release()
+            raise
+        
+        started = time.monotonic()
+        parts = []
+        usage: Optional[StreamUsage] = None
+        error: Optional[ProviderError] = None
+        finished = False
+        deltas = self._generate_stream(prompt).__aiter__()
+        try:
+            while True:
+                try:
+                    delta = await asyncio.wait_for(deltas.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    break
+                if isinstance(delta, StreamUsage):
+                    usage = delta
+                    yield delta
+                elif delta:
+                    parts.append(delta)
+                    yield delta
+            finished = True
+        except Exception as e:
+            error = self._classify_error(e)
+            if error is not e:
+                raise error from e
+            raise
+        finally:
+            await deltas.aclose()
+            self._settle_rate_limit(reserved_tokens, prompt, "".join(parts), usage)
+            if finished:
+                breaker.record_success(probe)
+                limiter.release(latency=time.monotonic() - started)
+            else:
+                # 失敗或呼叫端提前結束串流
+                limiter.release(overloaded=error is not None and is_overload_error(error))
+                if error is not None and is_outage_error(error):
+                    breaker.record_failure(probe)
+                else:
+                    breaker.record_ignored(probe)
+    
+    async def _generate_stream(self, prompt: str) -> AsyncIterator[Union[str, StreamUsage]]:
+        """
+        以串流方式調用 AI API，逐段產生文字
+        
+        預設呼叫 _generate 並一次輸出完整回應；支援串流的子類應覆寫。
+        提供商回報 token 用量時，最後產生一個 StreamUsage。
+        例外處理與 _generate 相同（交給 _translate_error 轉換）。
+        """
+        completion = await self._generate(prompt)
+        if completion.text:
+            yield completion.text
+        if completion.has_usage:
+            yield StreamUsage(
+                prompt_tokens=completion.prompt_tokens,
+                completion_tokens=completion.completion_tokens,
+                search_requests=completion.search_requests
+            )
+    
+    def _classify_error(self, error: BaseException) -> ProviderError:
+        """將任意例外轉為帶有提供商名稱的 ProviderError"""
+        if not isinstance(error, ProviderError):
+            error = self._translate_error(error)
+        error.provider = error.provider or self.provider_name
+        return error
+    
+    async def get_response(self, prompt: str) -> str:
+        """
+        獲取 AI 回應文本（舊介面）
+        
+        返回：
+            str: AI 的回應文本；失敗時返回 "Error: ..." 訊息
+        
+        注意：新的程式碼應使用 complete()，以便區分失敗與正常回應
+        """
+        try:
+            return (await self.complete(prompt)).text
+        except ProviderError as e:
+            return f"Error: {str(e)}"
+    
+    @abstractmethod
+    async def _generate(self, prompt: str) -> ProviderCompletion:
+        """
+        調用 AI API 的抽象方法
+        
+        子類只需處理成功路徑；SDK 拋出的例外由 complete() 交給
+        _translate_error 轉換。已知的失敗（例如被內容過濾）可直接
+        拋出 ProviderError 子類。
+        
+        參數：
+            prompt (str): 發送給 AI 的提示詞
         
-        注意：此為抽象方法，必須在子類中實現具體的 API 調用邏輯
+        返回：
+            ProviderCompletion: 回應文本與相關資訊
         """
         pass
     
+    def _translate_error(self, error: Exception) -> ProviderError:
+        """
+        將 SDK 例外轉換為 ProviderError 子類
+        
+        預設只辨識逾時；子類應覆寫以處理各自 SDK 的例外類型。
+        """
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+            return ProviderTimeoutError(str(error) or "Request timed out", self.provider_name)
+        return ProviderError(str(error), self.provider_name)
+    
+    async def complete_batch(
+        self,
+        prompts: Dict[str, str],
+        poll_interval: float = 30.0,
+        timeout: float = 24 * 3600,
+        on_status: Optional[Callable[[BatchStatus], None]] = None,
+        response_schemas: Optional[Dict[str, dict]] = None
+    ) -> BatchResults:
+        """
+        以 Batch API 送出一個批次工作並等待結果
+        
+        參數：
+            prompts: custom_id → 提示詞（不超過 max_batch_requests 筆）
+            poll_interval: 查詢批次狀態的間隔（秒）
+            timeout: 等待批次完成的上限（秒）
+            on_status: 每次查詢到批次狀態時的回調
+            response_schemas: custom_id → JSON Schema；這些請求以結構化輸出回傳
+                （完成結果的 text 為符合 schema 的 JSON）
+        
+        返回：
+            BatchResults: custom_id → ProviderCompletion（batch=True）或 ProviderError
+        
+        例外：
+            ProviderError: 批次工作建立失敗、整批失敗或逾時
+        
+        注意：只有 supports_batch 的子類實現此方法；批次請求不經過
+              速率限制、並行名額與斷路器
+        """
+        raise NotImplementedError(f"{self.provider_name} does not support batch requests")
+    
     @abstractmethod
     def is_available(self) -> bool:
         """
@@ -146,76 +475,72 @@ class BaseAIProvider(ABC):
         """
         pass
     
-    async def _rate_limit_delay(self, rpm: int = 60):
+    async def aclose(self):
+        """
+        釋放提供商持有的連線資源
+        
+        預設不做任何事；持有長期 HTTP 客戶端的子類應覆寫此方法。
+        """
+        pass
+    
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        """此提供商目前模型共用的斷路器"""
+        return get_circuit_breaker(self.provider_key, self.selected_model)
+    
+    @property
+    def hedge_state(self) -> HedgeState:
+        """此提供商目前模型共用的延遲樣本與對沖預算"""
+        return get_hedge_state(self.provider_key, self.selected_model)
+    
+    @property
+    def concurrency_limiter(self) -> AdaptiveConcurrencyLimiter:
+        """此提供商目前模型共用的自適應並行控制器"""
+        return get_concurrency_limiter(self.provider_key, self.selected_model)
+    
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """此提供商目前模型共用的 RPM/TPM 速率限制器"""
+        return get_rate_limiter(self.provider_key, self.selected_model)
+    
+    async def _acquire_rate_limit(self, prompt: str) -> int:
         """
-        實施速率限制延遲機制
+        送出請求前取得速率限制額度
         
         流程圖：
-        ┌─────────────────┐
-        │    開始速率限制    │
-        └─────────┬───────┘
+        ┌─────────────────────┐
+        │  估計本次請求 token 數  │◄─── 提示詞 token + 預期輸出 token
+        └─────────┬───────────┘
                   │
-        ┌─────────▼───────┐
-        │   檢查RPM是否>0   │◄─── rpm: 每分鐘請求數限制
-        └─────┬───────┬───┘
-              │       │
-              │ Y     │ N
-              │       └─────────┐
-        ┌─────▼───────┐          │
-        │ 計算最小間隔時間 │          │
-        │ (60秒/rpm)   │          │
-        └─────┬───────┘          │
-              │                  │
-        ┌─────▼───────┐          │
-        │ 獲取當前時間    │          │
-        └─────┬───────┘          │
-              │                  │
-        ┌─────▼───────┐          │
-        │計算距上次請求時間│          │
-        └─────┬───────┘          │
-              │                  │
-        ┌─────▼───────┐          │
-        │ 是否需要延遲？  │          │
-        └─────┬───┬───┘          │
-              │   │              │
-              │Y  │N             │
-              │   └──────┐       │
-        ┌─────▼───────┐  │       │
-        │ 執行異步等待   │  │       │
-        │ asyncio.sleep│  │       │
-        └─────┬───────┘  │       │
-              │          │       │
-        ┌─────▼──────────▼───────▼┐
-        │    更新最後請求時間       │
-        └─────────┬───────────────┘
+        ┌─────────▼───────────┐
+        │ 等待 RPM/TPM 令牌桶   │◄─── 所有並行任務共用同一組令牌桶
+        └─────────┬───────────┘
                   │
-        ┌─────────▼───────┐
-        │     結束延遲      │
-        └─────────────────┘
+        ┌─────────▼───────────┐
+        │   返回預留的 token 數  │◄─── 回應後交給 _settle_rate_limit 修正
+        └─────────────────────┘
         
         參數：
-            rpm (int): 每分鐘最大請求數，預設 60
-        
-        作用：
-            - 防止 API 呼叫過於頻繁
-            - 遵守各 AI 提供商的速率限制
-            - 避免觸發 429 錯誤（請求過多）
-        
-        實現邏輯：
-            1. 計算兩次請求間的最小間隔時間
-            2. 檢查距離上次請求的時間
-            3. 如果間隔不足，則異步等待
-            4. 更新最後請求時間戳記
-        """
-        if rpm <= 0:
-            return
-            
-        min_interval = 60.0 / rpm  # 計算最小間隔（秒）
-        current_time = time.time()
-        
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < min_interval:
-            delay = min_interval - time_since_last
-            await asyncio.sleep(delay)
-        
-        self.last_request_time = time.time()
\ No newline at end of file
+            prompt (str): 即將送出的提示詞
+        
+        返回：
+            int: 在 TPM 令牌桶中預留的 token 數
+        """
+        reserved_tokens = estimate_tokens(prompt) + min(self.max_tokens, EXPECTED_OUTPUT_TOKENS)
+        waited = await self.rate_limiter.acquire(reserved_tokens)
+        if waited > 0:
+            logger.info(f"{self.provider_name} rate limited: waited {waited:.2f}s")
+        return reserved_tokens
+    
+    def _settle_rate_limit(self, reserved_tokens: int, prompt: str, response_text: str, usage=None):
+        """
+        以實際用量修正預留的 TPM 額度
+        
+        usage（ProviderCompletion 或 StreamUsage）有提供商回報的 token 數時以其為準，
+        否則依提示詞與回應長度估計
+        """
+        if usage is not None and (usage.prompt_tokens or usage.completion_tokens):
+            actual_tokens = usage.prompt_tokens + usage.completion_tokens
+        else:
+            actual_tokens = estimate_tokens(prompt) + estimate_tokens(response_text)
+        self.rate_limiter.settle(reserved_tokens, actual_tokens)
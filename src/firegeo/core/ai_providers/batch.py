@@ -0,0 +1,222 @@
+"""
+批次模式 - 透過提供商的 Batch API 一次送出大量請求
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  BatchCollector（每個提供商一個）                           │
+│     │                                                   │
+│     ├── request(prompt)：登記請求並等待結果                 │
+│     ├── skip()：此單元不需調用（例如快取命中）                │
+│     └── 送出時機：                                        │
+│           ├── expected 個單元都已登記或略過（排程器）        │
+│           └── window 秒內沒有新請求（檢測器）               │
+│                                                         │
+│  provider.complete_batch({custom_id: prompt})            │
+│     ├── 上傳 / 建立批次工作                                │
+│     ├── poll_until_done：定期查詢狀態直到結束                │
+│     └── 下載結果 → {custom_id: ProviderCompletion | ProviderError} │
+└─────────────────────────────────────────────────────────┘
+
+批次端點約為同步價格的一半，且不佔用同步的 RPM/TPM 額度，適合
+不需要即時回應的大量監測。呼叫端沿用逐一請求的寫法，批次的建立、
+切分與結果分派都在這一層完成。
+"""
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+from .errors import ProviderError, ProviderTimeoutError
+
+if TYPE_CHECKING:
+    from .base import BaseAIProvider, ProviderCompletion
+
+logger = logging.getLogger(__name__)
+
+# 結構化輸出的 schema / 工具名稱（OpenAI json_schema、Anthropic 強制工具共用）
+STRUCTURED_OUTPUT_NAME = "structured_result"
+
+class BatchStatus(BaseModel):
+    """批次工作的狀態"""
+    batch_id: str
+    status: str
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    done: bool = False
+
+# custom_id → 成功結果或錯誤
+BatchResults = Dict[str, Union["ProviderCompletion", ProviderError]]
+
+# 狀態回調：(提供商名稱, 批次狀態)
+BatchStatusCallback = Callable[[str, BatchStatus], None]
+
+async def poll_until_done(
+    fetch_status: Callable[[], Awaitable[BatchStatus]],
+    poll_interval: float,
+    timeout: float,
+    on_status: Optional[Callable[[BatchStatus], None]] = None
+) -> BatchStatus:
+    """定期查詢批次狀態直到結束；超過 timeout 時拋出 ProviderTimeoutError"""
+    deadline = time.monotonic() + timeout
+    while True:
+        status = await fetch_status()
+        if on_status:
+            on_status(status)
+        if status.done:
+            return status
+        if time.monotonic() + poll_interval > deadline:
+            raise ProviderTimeoutError(f"Batch {status.batch_id} still {status.status} after {timeout:g}s")
+        await asyncio.sleep(poll_interval)
+
+def chunk_prompts(prompts: Dict[str, str], max_requests: int) -> List[Dict[str, str]]:
+    """依提供商單一批次的請求數上限切分"""
+    items = list(prompts.items())
+    return [dict(items[i:i + max_requests]) for i in range(0, len(items), max_requests)]
+
+class BatchCollector:
+    """
+    收集同一提供商的請求，湊齊後以批次工作送出
+    
+    兩種送出時機：
+        - expected：預期的單元數；每個單元必須呼叫 request() 或 skip() 一次
+        - window：未指定 expected 時，最後一個請求後 window 秒內沒有新請求就送出
+    """
+    
+    def __init__(
+        self,
+        provider: "BaseAIProvider",
+        expected: Optional[int] = None,
+        window: float = 2.0,
+        poll_interval: float = 30.0,
+        timeout: float = 24 * 3600,
+        on_status: Optional[BatchStatusCallback] = None
+    ):
+        """
+        參數：
+            provider: 支援批次的提供商（supports_batch 為 True）
+            expected: 預期的單元數，None 表示依 window 送出
+            window: 未指定 expected 時的閒置送出時間（秒）
+            poll_interval: 查詢批次狀態的間隔（秒）
+            timeout: 等待批次完成的上限（秒）
+            on_status: 每次查詢到批次狀態時的回調
+        """
+        self.provider = provider
+        self.expected = expected
+        self.window = window
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.on_status = on_status
+        self.submitted_requests = 0
+        
+        self._arrived = 0
+        self._next_id = 0
+        self._prompts: Dict[str, str] = {}
+        self._schemas: Dict[str, dict] = {}  # custom_id → 結構化輸出的 JSON Schema
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.Task] = None
+        self._batch_tasks: set = set()
+    
+    async def request(self, prompt: str, response_schema: Optional[dict] = None) -> "ProviderCompletion":
+        """
+        登記一個請求並等待批次結果（失敗時拋出 ProviderError）
+        
+        指定 response_schema 時要求該請求以符合此 JSON Schema 的結構化輸出回傳
+        """
+        custom_id = f"req-{self._next_id}"
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._prompts[custom_id] = prompt
+        if response_schema is not None:
+            self._schemas[custom_id] = response_schema
+        self._futures[custom_id] = future
+        self._arrive()
+        return await future
+    
+    def skip(self):
+        """此單元不需要調用提供商"""
+        self._arrive()
+    
+    def _arrive(self):
+        self._arrived += 1
+        if self.expected is not None:
+            if self._arrived >= self.expected:
+                self._flush()
+            return
+        # 依閒置時間送出：每個新請求都重新計時
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.create_task(self._flush_after_wait())
+    
+    async def _flush_after_wait(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        self._flush()
+    
+    def _flush(self):
+        """將目前收集到的請求送出"""
+        if not self._prompts:
+            return
+        prompts, schemas, futures = self._prompts, self._schemas, self._futures
+        self._prompts, self._schemas, self._futures = {}, {}, {}
+        self.submitted_requests += len(prompts)
+        
+        # 保留任務參照，避免批次在完成前被回收
+        task = asyncio.create_task(self._run(prompts, futures, schemas))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+    
+    async def _run(
+        self,
+        prompts: Dict[str, str],
+        futures: Dict[str, asyncio.Future],
+        schemas: Optional[Dict[str, dict]] = None
+    ):
+        """送出批次（超過單一批次上限時切分），並把結果分派給各請求"""
+        provider = self.provider
+        name = provider.provider_name
+        chunks = chunk_prompts(prompts, provider.max_batch_requests)
+        logger.info(f"Submitting {len(prompts)} requests to the {name} batch API in {len(chunks)} job(s)")
+        
+        on_status = (lambda status: self.on_status(name, status)) if self.on_status else None
+        outcomes = await asyncio.gather(
+            *(
+                provider.complete_batch(
+                    chunk,
+                    poll_interval=self.poll_interval,
+                    timeout=self.timeout,
+                    on_status=on_status,
+                    response_schemas={
+                        custom_id: schemas[custom_id] for custom_id in chunk if custom_id in schemas
+                    } if schemas else None
+                )
+                for chunk in chunks
+            ),
+            return_exceptions=True
+        )
+        
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, BaseException):
+                error = provider._classify_error(outcome) if isinstance(outcome, Exception) else ProviderError(
+                    "Batch was cancelled", name
+                )
+                logger.error(f"{name} batch failed: {error}")
+                for custom_id in chunk:
+                    if not futures[custom_id].done():
+                        futures[custom_id].set_exception(error)
+                continue
+            
+            for custom_id in chunk:
+                future = futures[custom_id]
+                if future.done():
+                    continue
+                result = outcome.get(custom_id)
+                if result is None:
+                    result = ProviderError("No result returned for batch request", name)
+                if isinstance(result, ProviderError):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
@@ -0,0 +1,159 @@
+"""
+斷路器 - 提供商故障時快速失敗，不再讓每個提示詞都等到逾時
+
+狀態轉換：
+┌─────────────────────────────────────────────────────────┐
+│            連續失敗 ≥ failure_threshold                   │
+│            或近期錯誤率 ≥ error_rate_threshold              │
+│  CLOSED ─────────────────────────────────────► OPEN      │
+│    ▲                                            │       │
+│    │ 試探成功                    open_duration 後 │       │
+│    │                                            ▼       │
+│    └─────────────────────────────────────── HALF_OPEN   │
+│                 試探失敗 → 回到 OPEN                      │
+└─────────────────────────────────────────────────────────┘
+
+OPEN 時呼叫 before_call() 會直接拋出 CircuitOpenError；HALF_OPEN 時
+一次只放行一個試探請求，其他請求同樣快速失敗。只有逾時與服務端錯誤
+計入失敗（見 is_outage_error）。狀態依 (提供商, 模型) 共用。
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from .errors import CircuitOpenError
+from ...models.config import CircuitBreakerConfig
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """單一 (提供商, 模型) 的斷路器"""
+    
+    def __init__(self, name: str, config: Optional[CircuitBreakerConfig] = None):
+        self.name = name
+        self.config = config or CircuitBreakerConfig()
+        self._state = STATE_CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=self.config.window_size)  # True = 失敗
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> str:
+        """目前狀態（OPEN 冷卻結束後視為 HALF_OPEN）"""
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+    
+    def _refresh(self, now: float):
+        """OPEN 冷卻結束時轉為 HALF_OPEN（呼叫者需持有鎖）"""
+        if self._state == STATE_OPEN and now - self._opened_at >= self.config.open_duration:
+            self._state = STATE_HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"Circuit for {self.name} half-open, probing")
+    
+    def before_call(self, check_only: bool = False) -> bool:
+        """
+        請求送出前檢查
+        
+        參數：
+            check_only: 只檢查是否可能放行，不佔用半開狀態的試探名額
+        
+        返回：
+            bool: 此請求是否為半開狀態的試探請求
+        
+        例外：
+            CircuitOpenError: 斷開中或已有試探請求進行中
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self._state == STATE_CLOSED:
+                return False
+            if self._state == STATE_HALF_OPEN and not self._probe_in_flight:
+                if not check_only:
+                    self._probe_in_flight = True
+                return not check_only
+            retry_in = max(0.0, self.config.open_duration - (now - self._opened_at))
+            raise CircuitOpenError(
+                f"Circuit open after repeated failures; next probe in {retry_in:.0f}s"
+            )
+    
+    def record_success(self, probe: bool = False):
+        """請求成功；試探成功時關閉斷路器"""
+        with self._lock:
+            self._consecutive_failures = 0
+            self._outcomes.append(False)
+            if probe or self._state == STATE_HALF_OPEN:
+                self._state = STATE_CLOSED
+                self._probe_in_flight = False
+                self._outcomes.clear()
+                logger.info(f"Circuit for {self.name} closed")
+    
+    def record_failure(self, probe: bool = False):
+        """請求失敗（逾時或服務端錯誤）；達到門檻或試探失敗時斷開"""
+        with self._lock:
+            self._consecutive_failures += 1
+            self._outcomes.append(True)
+            if probe or self._state == STATE_HALF_OPEN:
+                self._open("probe failed")
+                return
+            if self._state != STATE_CLOSED:
+                return
+            
+            if self._consecutive_failures >= self.config.failure_threshold:
+                self._open(f"{self._consecutive_failures} consecutive failures")
+            elif len(self._outcomes) >= self.config.min_calls:
+                error_rate = sum(self._outcomes) / len(self._outcomes)
+                if error_rate >= self.config.error_rate_threshold:
+                    self._open(f"error rate {error_rate:.0%}")
+    
+    def record_ignored(self, probe: bool = False):
+        """請求結束但不代表提供商健康與否（被取消、驗證錯誤等）；釋放試探名額"""
+        if probe:
+            with self._lock:
+                self._probe_in_flight = False
+    
+    def _open(self, reason: str):
+        """斷開（呼叫者需持有鎖）"""
+        self._state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        logger.warning(f"Circuit for {self.name} opened: {reason}")
+    
+    def reset(self):
+        """手動關閉斷路器"""
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._consecutive_failures = 0
+            self._outcomes.clear()
+            self._probe_in_flight = False
+
+# 全域註冊表：(provider_key, model) → CircuitBreaker
+_registry: Dict[Tuple[str, str], CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+def get_circuit_breaker(provider_key: str, model: str) -> CircuitBreaker:
+    """取得 (提供商, 模型) 共用的斷路器"""
+    key = (provider_key, model)
+    with _registry_lock:
+        breaker = _registry.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(f"{provider_key}/{model}")
+            _registry[key] = breaker
+        return breaker
+
+def reset_circuit_breakers(provider_key: Optional[str] = None):
+    """關閉註冊表中的斷路器"""
+    with _registry_lock:
+        for key, breaker in _registry.items():
+            if provider_key is None or key[0] == provider_key:
+                breaker.reset()
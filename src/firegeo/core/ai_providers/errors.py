@@ -0,0 +1,131 @@
+"""
+AI 提供商錯誤類型 - 以結構化例外取代 "Error: ..." 字串
+
+類型階層：
+┌─────────────────────────────────────────────────────────┐
+│  ProviderError (error_type="unknown")                    │
+│     ├── ProviderTimeoutError  "timeout"        可重試     │
+│     ├── RateLimitError        "rate_limit"     可重試     │
+│     ├── ServerError           "server"         可重試     │
+│     ├── AuthenticationError   "auth"           不可重試   │
+│     ├── ContentFilterError    "content_filter" 不可重試   │
+│     ├── CircuitOpenError      "circuit_open"   不可重試   │
+│     └── BudgetExceededError   "budget"         不可重試   │
+└─────────────────────────────────────────────────────────┘
+
+各提供商在 _translate_error 中把 SDK 的例外轉換為上述類型；
+HTTP 狀態碼的共通對應由 error_from_status 處理。
+"""
+
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Mapping, Optional
+
+class ProviderError(Exception):
+    """AI 提供商調用失敗"""
+    
+    error_type = "unknown"
+    retryable = False
+    
+    def __init__(self, message: str, provider: str = "", status_code: Optional[int] = None):
+        super().__init__(message)
+        self.message = message
+        self.provider = provider
+        self.status_code = status_code
+        self.attempts = 1  # 放棄前的嘗試次數（由重試引擎更新）
+    
+    def __str__(self) -> str:
+        prefix = f"{self.provider} " if self.provider else ""
+        status = f" (HTTP {self.status_code})" if self.status_code else ""
+        return f"{prefix}{self.error_type} error{status}: {self.message}"
+
+class ProviderTimeoutError(ProviderError):
+    """請求逾時"""
+    error_type = "timeout"
+    retryable = True
+
+class RateLimitError(ProviderError):
+    """超出提供商的速率限制或配額"""
+    error_type = "rate_limit"
+    retryable = True
+    
+    def __init__(
+        self,
+        message: str,
+        provider: str = "",
+        status_code: Optional[int] = 429,
+        retry_after: Optional[float] = None
+    ):
+        super().__init__(message, provider, status_code)
+        self.retry_after = retry_after  # 提供商建議的等待秒數（Retry-After）
+
+class ServerError(ProviderError):
+    """提供商服務端錯誤、過載或連線中斷"""
+    error_type = "server"
+    retryable = True
+
+class AuthenticationError(ProviderError):
+    """API 金鑰無效或沒有權限"""
+    error_type = "auth"
+
+class ContentFilterError(ProviderError):
+    """提示詞或回應被內容安全機制擋下"""
+    error_type = "content_filter"
+
+class CircuitOpenError(ProviderError):
+    """斷路器斷開中，請求未送出即失敗"""
+    error_type = "circuit_open"
+
+class BudgetExceededError(ProviderError):
+    """分析已達成本上限，請求未送出"""
+    error_type = "budget"
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """解析 Retry-After / retry-after-ms 標頭（秒數或 HTTP 日期）"""
+    if not headers:
+        return None
+    
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def error_from_status(
+    status_code: int,
+    message: str,
+    provider: str = "",
+    headers: Optional[Mapping[str, str]] = None
+) -> ProviderError:
+    """依 HTTP 狀態碼建立對應的錯誤類型"""
+    if status_code in (401, 403):
+        return AuthenticationError(message, provider, status_code)
+    if status_code == 408:
+        return ProviderTimeoutError(message, provider, status_code)
+    if status_code == 429:
+        return RateLimitError(message, provider, status_code, retry_after=parse_retry_after(headers))
+    if status_code >= 500:
+        return ServerError(message, provider, status_code)
+    return ProviderError(message, provider, status_code)
+
+def is_outage_error(error: ProviderError) -> bool:
+    """是否代表提供商不健康（計入斷路器的失敗）；驗證、內容過濾等請求本身的問題不計入"""
+    return isinstance(error, (ProviderTimeoutError, ServerError))
+
+def is_overload_error(error: ProviderError) -> bool:
+    """是否為應降低並行數的壅塞訊號（429、逾時、5xx 過載）"""
+    return isinstance(error, (RateLimitError, ProviderTimeoutError, ServerError))
@@ -1,18 +1,58 @@
 """簡化的Google提供商"""
 
-import google.generativeai as genai
 import asyncio
-from .base import BaseAIProvider
+from typing import AsyncIterator, Optional, Tuple, Union
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from google.generativeai.types import BlockedPromptException, StopCandidateException
+from .base import BaseAIProvider, ProviderCompletion
+from .streaming import StreamUsage
+from .errors import (
+    ProviderError,
+    ProviderTimeoutError,
+    RateLimitError,
+    ServerError,
+    AuthenticationError,
+    ContentFilterError,
+    error_from_status,
+)
+from ..gemini_client import bind_async_client
 import logging
 
 logger = logging.getLogger(__name__)
 
+def gemini_token_counts(response) -> Tuple[int, int]:
+    """從 Gemini 回應的 usage_metadata 取得 (輸入 token, 輸出 token)；未回報時為 (0, 0)"""
+    metadata = getattr(response, "usage_metadata", None)
+    if not metadata:
+        return 0, 0
+    return metadata.prompt_token_count or 0, metadata.candidates_token_count or 0
+
+def translate_gemini_error(error: BaseException, provider: str = "Google") -> ProviderError:
+    """將 Gemini 調用的例外轉換為 ProviderError 子類（GoogleProvider 與品牌檢測器共用）"""
+    if isinstance(error, ProviderError):
+        return error
+    if isinstance(error, (BlockedPromptException, StopCandidateException)):
+        return ContentFilterError(str(error), provider)
+    if isinstance(error, (asyncio.TimeoutError, google_exceptions.DeadlineExceeded)):
+        return ProviderTimeoutError(str(error) or "Request timed out", provider, 504)
+    if isinstance(error, google_exceptions.ResourceExhausted):
+        return RateLimitError(str(error), provider)
+    if isinstance(error, (google_exceptions.Unauthenticated, google_exceptions.PermissionDenied)):
+        return AuthenticationError(str(error), provider, error.code)
+    if isinstance(error, (google_exceptions.ServerError, google_exceptions.ServiceUnavailable)):
+        return ServerError(str(error), provider, error.code)
+    if isinstance(error, google_exceptions.GoogleAPICallError) and error.code:
+        return error_from_status(int(error.code), str(error), provider)
+    return ProviderError(str(error), provider)
+
 class GoogleProvider(BaseAIProvider):
     """Google 提供商實現"""
     
+    provider_key = "google"
+    
     def __init__(self, api_key: str, model: str = "gemini-2.5-flash"):
         super().__init__(api_key)
-        genai.configure(api_key=api_key)
         self.selected_model = model
         self.available_models = ["gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-pro"]
         self.model = genai.GenerativeModel(model)
@@ -21,25 +61,65 @@ class GoogleProvider(BaseAIProvider):
     def provider_name(self) -> str:
         return "Google"
     
-    async def get_response(self, prompt: str) -> str:
+    async def _generate(self, prompt: str) -> ProviderCompletion:
         """獲取Google回應"""
-        try:
-            logger.info(f"Google API: Calling Gemini model with prompt length: {len(prompt)}")
-            # 移除速率限制 - 由於已限制分析提示詞數量上限，不易達到 RPM 限制
-            # await self._rate_limit_delay(120)  # Google較中等的RPM限制
-            
-            # 異步執行同步的API調用
-            loop = asyncio.get_event_loop()
-            def _sync_call():
-                response = self.model.generate_content(prompt)
-                return response.text
-            
-            response_text = await loop.run_in_executor(None, _sync_call)
-            logger.info(f"Google API: Successfully received response with length: {len(response_text) if response_text else 0}")
-            return response_text or "Empty response"
-        except Exception as e:
-            logger.error(f"Google API error: {e}")
-            return f"Error: {str(e)}"
+        logger.info(f"Google API: Calling Gemini model with prompt length: {len(prompt)}")
+        
+        # 原生非同步調用（共用 gRPC 連線，不佔用執行緒池）
+        bind_async_client(self.model, self.api_key)
+        # 重試由 BaseAIProvider.complete 統一處理，停用 gRPC 內建重試
+        response = await self.model.generate_content_async(prompt, request_options={"retry": None})
+        
+        finish_reason = self._check_blocked(response)
+        
+        response_text = response.text
+        logger.info(f"Google API: Successfully received response with length: {len(response_text) if response_text else 0}")
+        prompt_tokens, completion_tokens = gemini_token_counts(response)
+        return ProviderCompletion(
+            text=response_text or "",
+            model=self.selected_model,
+            finish_reason=finish_reason,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens
+        )
+    
+    async def _generate_stream(self, prompt: str) -> AsyncIterator[Union[str, StreamUsage]]:
+        """以串流方式獲取 Google 回應片段（每個片段的 usage_metadata 為累計值，取最後一個）"""
+        bind_async_client(self.model, self.api_key)
+        response = await self.model.generate_content_async(
+            prompt, stream=True, request_options={"retry": None}
+        )
+        prompt_tokens = completion_tokens = 0
+        async for chunk in response:
+            self._check_blocked(chunk)
+            counts = gemini_token_counts(chunk)
+            if any(counts):
+                prompt_tokens, completion_tokens = counts
+            # 只有 finish_reason 等中繼資料的片段沒有文字部分
+            if chunk.parts:
+                yield chunk.text
+        if prompt_tokens or completion_tokens:
+            yield StreamUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    
+    def _check_blocked(self, response) -> Optional[str]:
+        """
+        檢查提示詞或回應是否被安全機制擋下（此時 response.text 會拋出 ValueError）
+        
+        返回：
+            候選回應的 finish_reason 名稱
+        """
+        block_reason = getattr(response.prompt_feedback, "block_reason", None)
+        if block_reason:
+            raise ContentFilterError(f"Prompt blocked: {block_reason}", self.provider_name)
+        candidate = response.candidates[0] if response.candidates else None
+        finish_reason = getattr(candidate.finish_reason, "name", None) if candidate else None
+        if finish_reason in ("SAFETY", "BLOCKLIST", "PROHIBITED_CONTENT", "RECITATION"):
+            raise ContentFilterError(f"Response blocked: {finish_reason}", self.provider_name)
+        return finish_reason
+    
+    def _translate_error(self, error: Exception) -> ProviderError:
+        """將 Google API 例外轉換為 ProviderError 子類"""
+        return translate_gemini_error(error, self.provider_name)
     
     def is_available(self) -> bool:
         """檢查Google是否可用"""
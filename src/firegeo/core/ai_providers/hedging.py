@@ -0,0 +1,127 @@
+"""
+對沖請求 - 降低單一緩慢請求造成的尾端延遲
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  run_hedged(make_call, state, policy)                    │
+│     │                                                   │
+│     ├── 送出主要請求                                      │
+│     ├── 超過近期延遲的 p95（至少 min_delay）仍未完成？        │
+│     │     ├── 對沖預算足夠 → 送出重複請求                   │
+│     │     └── 預算不足     → 繼續等待主要請求                │
+│     └── 採用第一個成功的結果，取消另一個                      │
+│         （兩者都失敗時拋出主要請求的錯誤）                     │
+└─────────────────────────────────────────────────────────┘
+
+延遲樣本與預算依 (提供商, 模型) 共用，見 get_hedge_state。對沖請求
+同樣經過速率限制與並行控制，額外的請求數記錄在 ProviderCompletion
+與 TokenUsage 的 hedged_requests。
+"""
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from ...models.config import HedgePolicy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class HedgeState:
+    """單一 (提供商, 模型) 的近期延遲樣本與對沖預算"""
+    
+    def __init__(self, max_samples: int = 200):
+        self._latencies: Deque[float] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.primary_requests = 0
+        self.hedged_requests = 0
+    
+    def record_latency(self, latency: float):
+        """記錄一次成功請求的延遲"""
+        with self._lock:
+            self._latencies.append(latency)
+    
+    def hedge_delay(self, policy: HedgePolicy) -> Optional[float]:
+        """對沖前應等待的秒數；樣本不足時返回 None（不對沖）"""
+        with self._lock:
+            if len(self._latencies) < policy.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(policy.percentile * len(ordered)))
+        return max(policy.min_delay, ordered[index])
+    
+    def record_primary(self):
+        with self._lock:
+            self.primary_requests += 1
+    
+    def try_spend(self, policy: HedgePolicy) -> bool:
+        """在預算內時記錄一次對沖並返回 True"""
+        with self._lock:
+            allowed = policy.budget_ratio * self.primary_requests + policy.budget_burst
+            if self.hedged_requests >= allowed:
+                return False
+            self.hedged_requests += 1
+            return True
+
+async def run_hedged(
+    make_call: Callable[[], Awaitable[T]],
+    state: HedgeState,
+    policy: HedgePolicy,
+    label: str = ""
+) -> Tuple[T, int, bool]:
+    """
+    執行可能被對沖的請求
+    
+    參數：
+        make_call: 建立一次請求的協程函數（主要與對沖請求各呼叫一次）
+        state: 延遲樣本與預算
+        policy: 對沖設定
+        label: 日誌使用的名稱
+    
+    返回：
+        (結果, 送出的對沖請求數, 結果是否來自對沖請求)
+    """
+    state.record_primary()
+    primary = asyncio.ensure_future(make_call())
+    
+    delay = state.hedge_delay(policy) if policy.enabled else None
+    if delay is None:
+        return await primary, 0, False
+    
+    hedge = None
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not state.try_spend(policy):
+            return await primary, 0, False
+        
+        logger.info(f"{label} request exceeded {delay:.2f}s, sending hedged request")
+        hedge = asyncio.ensure_future(make_call())
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    return task.result(), 1, task is hedge
+        # 兩個請求都失敗
+        return primary.result(), 1, False
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+# 全域註冊表：(provider_key, model) → HedgeState
+_registry: Dict[Tuple[str, str], HedgeState] = {}
+_registry_lock = threading.Lock()
+
+def get_hedge_state(provider_key: str, model: str) -> HedgeState:
+    """取得 (提供商, 模型) 共用的對沖狀態"""
+    key = (provider_key, model)
+    with _registry_lock:
+        state = _registry.get(key)
+        if state is None:
+            state = HedgeState()
+            _registry[key] = state
+        return state
@@ -16,13 +16,19 @@ OpenAI 提供商實現 - GPT-4o 模型整合
 │  核心方法：                                              │
 │  ┌─────────────────────────────────────────────────┐   │
 │  │ • provider_name → "OpenAI"                      │   │
-│  │ • get_response → 獲取 GPT-4o 回應                │   │
+│  │ • _generate → 獲取 GPT-4o 回應                   │   │
+│  │ • _generate_stream → 串流獲取回應片段              │   │
+│  │ • complete_batch → 以 Batch API 送出大量提示詞     │   │
 │  │ • is_available → 檢查 API 金鑰可用性              │   │
 │  └─────────────────────────────────────────────────┘   │
 └─────────────────────────────────────────────────────────┘
 
 API 調用流程：
-用戶提示詞 → 速率限制檢查 → OpenAI API 呼叫 → 處理回應 → 返回結果
+用戶提示詞 → 速率限制 (RPM/TPM) → OpenAI API 呼叫 → 處理回應 → 返回結果
+                                          └── 失敗 → ProviderError 子類
+
+批次模式：
+提示詞 JSONL → files.create → batches.create → 輪詢狀態 → 下載輸出/錯誤檔 → 依 custom_id 分派
 
 依賴關係：
 - openai: OpenAI 官方 Python SDK
@@ -30,9 +36,21 @@ API 調用流程：
 - logging: 錯誤日誌記錄
 """
 
+import json
+from typing import AsyncIterator, Callable, Dict, Optional, Union
+
 import openai
-import asyncio
-from .base import BaseAIProvider
+from .base import BaseAIProvider, ProviderCompletion
+from .batch import STRUCTURED_OUTPUT_NAME, BatchResults, BatchStatus, poll_until_done
+from .streaming import StreamUsage
+from .errors import (
+    ProviderError,
+    ProviderTimeoutError,
+    ServerError,
+    ContentFilterError,
+    error_from_status,
+)
+from ..adaptive_concurrency import parse_rate_limit_headers
 import logging
 
 logger = logging.getLogger(__name__)
@@ -45,25 +63,31 @@ class OpenAIProvider(BaseAIProvider):
     
     特色：
     - 使用最新 GPT-4o 模型
-    - 支援高速率限制 (1000 RPM)
+    - 共用 RPM/TPM 令牌桶速率限制
     - 異步 API 調用
-    - 完整錯誤處理
+    - 結構化錯誤類型（見 errors.py）
     """
     
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
+    provider_key = "openai"
+    supports_batch = True
+    max_batch_requests = 50000  # Batch API 單一輸入檔的請求數上限
+    
+    def __init__(self, api_key: str, model: str = "gpt-4o", base_url: Optional[str] = None):
         """
         初始化增強版 OpenAI 提供商
         
         參數：
             api_key (str): OpenAI API 金鑰
             model (str): 使用的模型，預設 gpt-4o
+            base_url (str): API 位址，預設使用 SDK 的設定（OPENAI_BASE_URL 或官方端點）
             
         建立的物件：
             self.client: OpenAI 異步客戶端實例
             self.selected_model: 選定的模型名稱
         """
         super().__init__(api_key)
-        self.client = openai.AsyncOpenAI(api_key=api_key)
+        # 重試由 BaseAIProvider.complete 統一處理，停用 SDK 內建重試
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
         self.selected_model = model
         self.available_models = ["gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "gpt-3.5-turbo"]
     
@@ -83,28 +107,19 @@ class OpenAIProvider(BaseAIProvider):
         """
         return "OpenAI"
     
-    async def get_response(self, prompt: str) -> str:
+    async def _generate(self, prompt: str) -> ProviderCompletion:
         """
         獲取 OpenAI GPT-4o 的回應
         
         完整流程圖：
         ┌─────────────────┐
-        │   接收用戶提示詞   │
-        └─────────┬───────┘
-                  │
-        ┌─────────▼───────┐
-        │   開始錯誤處理    │ ◄─── try-except 區塊
-        └─────────┬───────┘
-                  │
-        ┌─────────▼───────┐
-        │  執行速率限制延遲  │ ◄─── _rate_limit_delay(1000)
-        │   (1000 RPM)    │      每分鐘最多 1000 次請求
+        │   接收用戶提示詞   │ ◄─── 速率限制已由 complete() 取得
         └─────────┬───────┘
                   │
         ┌─────────▼───────┐
         │ 建立 API 請求參數 │
         │ ┌─────────────┐ │
-        │ │model: gpt-4o│ │ ◄─── 使用最新 GPT-4o 模型
+        │ │model: gpt-4o│ │ ◄─── 使用選定的模型
         │ │max_tokens:  │ │
         │ │  4000       │ │ ◄─── 最大回應長度
         │ │temperature: │ │
@@ -113,77 +128,217 @@ class OpenAIProvider(BaseAIProvider):
         └─────────┬───────┘
                   │
         ┌─────────▼───────┐
-        │  呼叫 OpenAI API │ ◄─── client.chat.completions.create()
+        │  呼叫 OpenAI API │ ◄─── client.chat.completions.with_raw_response.create()
         │     (異步調用)    │
         └─────────┬───────┘
                   │
         ┌─────────▼───────┐
-        │   API 回應成功？  │
+        │  被內容過濾擋下？  │ ◄─── finish_reason == "content_filter"
         └───┬─────────┬───┘
-            │ Y       │ N
+            │ N       │ Y
             │         │
-    ┌───────▼───────┐ │
-    │  提取回應文本    │ │ ◄─── response.choices[0].message.content
-    │ (第一個選擇)    │ │
-    └───────┬───────┘ │
-            │         │
-    ┌───────▼───────┐ │
-    │   返回成功結果   │ │
-    └───────┬───────┘ │
-            │         │
-            │    ┌────▼─────┐
-            │    │ 捕獲異常   │ ◄─── except Exception
-            │    └────┬─────┘
-            │         │
-            │    ┌────▼─────┐
-            │    │ 記錄錯誤   │ ◄─── logger.error()
-            │    └────┬─────┘
-            │         │
-            │    ┌────▼─────┐
-            │    │返回錯誤訊息│
-            │    └────┬─────┘
-            │         │
-        ┌───▼─────────▼───┐
-        │    完成處理      │
-        └─────────────────┘
+    ┌───────▼───────┐ ┌▼──────────────────┐
+    │  提取回應文本    │ │ 拋出 ContentFilterError │
+    │ (第一個選擇)    │ └───────────────────┘
+    └───────┬───────┘
+            │
+    ┌───────▼───────┐
+    │   返回成功結果   │
+    └───────────────┘
         
         參數：
             prompt (str): 發送給 GPT-4o 的提示詞
             
         返回：
-            str: GPT-4o 的回應文本，或錯誤訊息
+            ProviderCompletion: GPT-4o 的回應文本
             
         錯誤處理：
-            - 網路連接錯誤
-            - API 金鑰無效
-            - 速率限制超出
-            - 模型暫時不可用
-            - 其他未預期錯誤
-            
-        速率限制：
-            - 1000 RPM (每分鐘請求數)
-            - 自動延遲確保不超出限制
+            SDK 例外由 _translate_error 轉換為：
+            - ProviderTimeoutError: 請求逾時
+            - RateLimitError: 速率限制超出（含 Retry-After）
+            - AuthenticationError: API 金鑰無效
+            - ServerError: 連線失敗或模型暫時不可用
+        """
+        # 使用 with_raw_response 以讀取 x-ratelimit-* 標頭（供自適應並行控制）
+        raw_response = await self.client.chat.completions.with_raw_response.create(
+            **self._chat_params(prompt)  # 模型、用戶提示詞、最大回應長度、創意度
+        )
+        response = raw_response.parse()
+        
+        choice = response.choices[0]
+        if choice.finish_reason == "content_filter":
+            raise ContentFilterError("Response was blocked by the content filter", self.provider_name)
+        
+        usage = response.usage
+        return ProviderCompletion(
+            text=choice.message.content or "",
+            model=response.model or self.selected_model,
+            finish_reason=choice.finish_reason,
+            rate_limit=parse_rate_limit_headers(raw_response.headers),
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0
+        )
+    
+    async def _generate_stream(self, prompt: str) -> AsyncIterator[Union[str, StreamUsage]]:
+        """以串流方式獲取 OpenAI 回應片段（最後一個片段帶有 token 用量）"""
+        stream = await self.client.chat.completions.create(
+            **self._chat_params(prompt),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        try:
+            async for chunk in stream:
+                if chunk.usage:
+                    yield StreamUsage(
+                        prompt_tokens=chunk.usage.prompt_tokens,
+                        completion_tokens=chunk.usage.completion_tokens
+                    )
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta and choice.delta.content:
+                    yield choice.delta.content
+                if choice.finish_reason == "content_filter":
+                    raise ContentFilterError("Response was blocked by the content filter", self.provider_name)
+        finally:
+            await stream.close()
+    
+    def _chat_params(self, prompt: str, response_schema: Optional[dict] = None) -> dict:
+        """Chat Completions 的請求參數（同步與批次共用）；指定 response_schema 時使用 strict 結構化輸出"""
+        params = {
+            "model": self.selected_model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature
+        }
+        if response_schema is not None:
+            params["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": STRUCTURED_OUTPUT_NAME, "schema": response_schema, "strict": True}
+            }
+        return params
+    
+    async def complete_batch(
+        self,
+        prompts: Dict[str, str],
+        poll_interval: float = 30.0,
+        timeout: float = 24 * 3600,
+        on_status: Optional[Callable[[BatchStatus], None]] = None,
+        response_schemas: Optional[Dict[str, dict]] = None
+    ) -> BatchResults:
+        """
+        以 OpenAI Batch API 送出一個批次工作並等待結果
+        
+        流程：
+            1. 將提示詞寫成 JSONL（每行一個 /v1/chat/completions 請求）並上傳
+            2. 建立 24 小時完成窗口的批次工作
+            3. 輪詢直到 completed / failed / expired / cancelled
+            4. 下載輸出檔與錯誤檔，依 custom_id 轉為結果或錯誤
         """
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._chat_params(prompt, (response_schemas or {}).get(custom_id))
+            })
+            for custom_id, prompt in prompts.items()
+        ]
         try:
-            # 移除速率限制 - 由於已限制分析提示詞數量上限，不易達到 RPM 限制
-            # await self._rate_limit_delay(1000)  # OpenAI較高的RPM限制
-            
-            # 建立並發送 API 請求
-            response = await self.client.chat.completions.create(
-                model=self.selected_model,                         # 使用選定的模型
-                messages=[{"role": "user", "content": prompt}],    # 用戶角色的提示詞
-                max_tokens=4000,                                   # 最大回應長度
-                temperature=0.7                                    # 創意度：0=確定，1=創意
+            input_file = await self.client.files.create(
+                file=("batch_input.jsonl", "\n".join(lines).encode("utf-8"), "application/jsonl"),
+                purpose="batch"
             )
+            batch = await self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            logger.info(f"OpenAI batch {batch.id} created with {len(prompts)} requests")
+            
+            async def fetch_status() -> BatchStatus:
+                nonlocal batch
+                batch = await self.client.batches.retrieve(batch.id)
+                counts = batch.request_counts
+                return BatchStatus(
+                    batch_id=batch.id,
+                    status=batch.status,
+                    total=counts.total if counts else len(prompts),
+                    completed=counts.completed if counts else 0,
+                    failed=counts.failed if counts else 0,
+                    done=batch.status in ("completed", "failed", "expired", "cancelled")
+                )
             
-            # 提取並返回 AI 回應文本
-            return response.choices[0].message.content
+            try:
+                await poll_until_done(fetch_status, poll_interval, timeout, on_status)
+            except ProviderTimeoutError:
+                await self.client.batches.cancel(batch.id)
+                raise
             
+            if batch.status == "failed":
+                errors = batch.errors.data if batch.errors and batch.errors.data else []
+                detail = "; ".join(error.message or error.code or "" for error in errors)
+                raise ProviderError(f"Batch {batch.id} failed: {detail or 'unknown error'}", self.provider_name)
+            
+            results: BatchResults = {}
+            # expired / cancelled 的批次仍可能有部分完成的輸出
+            for file_id in (batch.error_file_id, batch.output_file_id):
+                if file_id:
+                    content = await self.client.files.content(file_id)
+                    for line in content.text.splitlines():
+                        if line.strip():
+                            entry = json.loads(line)
+                            results[entry.get("custom_id", "")] = self._parse_batch_entry(entry)
+        except ProviderError:
+            raise
         except Exception as e:
-            # 記錄錯誤詳情
-            logger.error(f"OpenAI API error: {e}")
-            # 返回使用者友善的錯誤訊息
-            return f"Error: {str(e)}"
+            raise self._classify_error(e) from e
+        
+        for custom_id in prompts:
+            if custom_id not in results:
+                results[custom_id] = ProviderError(f"Batch request was not completed ({batch.status})", self.provider_name)
+        return results
+    
+    def _parse_batch_entry(self, entry: dict):
+        """將批次輸出檔的一行轉為 ProviderCompletion 或 ProviderError"""
+        response = entry.get("response") or {}
+        body = response.get("body") or {}
+        status_code = response.get("status_code")
+        if entry.get("error") or status_code != 200:
+            error = entry.get("error") or body.get("error") or {}
+            message = error.get("message") or f"HTTP {status_code}"
+            if error.get("code") == "content_filter":
+                return ContentFilterError(message, self.provider_name, status_code)
+            return error_from_status(status_code or 500, message, self.provider_name)
+        
+        choice = body["choices"][0]
+        if choice.get("finish_reason") == "content_filter":
+            return ContentFilterError("Response was blocked by the content filter", self.provider_name)
+        usage = body.get("usage") or {}
+        return ProviderCompletion(
+            text=(choice.get("message") or {}).get("content") or "",
+            model=body.get("model") or self.selected_model,
+            finish_reason=choice.get("finish_reason"),
+            batch=True,
+            prompt_tokens=usage.get("prompt_tokens") or 0,
+            completion_tokens=usage.get("completion_tokens") or 0
+        )
+    
+    def _translate_error(self, error: Exception) -> ProviderError:
+        """將 OpenAI SDK 例外轉換為 ProviderError 子類"""
+        if isinstance(error, openai.APITimeoutError):
+            return ProviderTimeoutError(str(error), self.provider_name)
+        if isinstance(error, openai.APIConnectionError):
+            return ServerError(str(error), self.provider_name)
+        if isinstance(error, openai.APIStatusError):
+            if getattr(error, "code", None) == "content_filter":
+                return ContentFilterError(str(error), self.provider_name, error.status_code)
+            return error_from_status(error.status_code, str(error), self.provider_name, error.response.headers)
+        return super()._translate_error(error)
+    
+    async def aclose(self):
+        """關閉 OpenAI 客戶端的連線池"""
+        await self.client.close()
     
     def is_available(self) -> bool:
         """
@@ -1,61 +1,176 @@
 """簡化的Perplexity提供商"""
 
-import httpx
+import asyncio
 import json
-from .base import BaseAIProvider
+import httpx
+from typing import Any, AsyncIterator, Dict, Optional, Union
+from .base import BaseAIProvider, ProviderCompletion
+from .streaming import StreamUsage
+from .errors import ProviderError, ProviderTimeoutError, ServerError, error_from_status
+from ..adaptive_concurrency import parse_rate_limit_headers
 import logging
 
 logger = logging.getLogger(__name__)
 
+def usage_from_payload(usage: Optional[Dict[str, Any]]) -> StreamUsage:
+    """
+    解析回應的 usage 欄位
+    
+    Sonar 模型每個請求都會執行網路搜尋並按請求計費；有 num_search_queries 時以其為準
+    """
+    usage = usage or {}
+    return StreamUsage(
+        prompt_tokens=usage.get("prompt_tokens") or 0,
+        completion_tokens=usage.get("completion_tokens") or 0,
+        search_requests=usage.get("num_search_queries") or 1
+    )
+
+# httpx 的 HTTP/2 支援需要額外安裝 h2 套件（httpx[http2]）
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 class PerplexityProvider(BaseAIProvider):
     """Perplexity 提供商實現"""
-    
-    def __init__(self, api_key: str, model: str = "sonar"):
+
+    provider_key = "perplexity"
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "sonar",
+        timeout: float = 60.0,
+        max_connections: int = 10,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True
+    ):
         super().__init__(api_key)
         self.base_url = "https://api.perplexity.ai"
         self.selected_model = model
         self.available_models = ["sonar", "sonar-pro"]
-    
+
+        # 連線池設定：客戶端在首次請求時建立，之後所有請求共用
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
     @property
     def provider_name(self) -> str:
         return "Perplexity"
-    
-    async def get_response(self, prompt: str) -> str:
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """取得長期共用的 HTTP 客戶端（keep-alive 連線池，支援時使用 HTTP/2）"""
+        loop = asyncio.get_running_loop()
+        # 連線池綁定建立時的事件迴圈，換了迴圈就重新建立
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                http2=self.http2,
+                limits=self.limits,
+                timeout=self.timeout
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def chat_completion(self, payload: Dict[str, Any]) -> httpx.Response:
+        """以共用連線發送 chat/completions 請求"""
+        client = self._get_client()
+        return await client.post("/chat/completions", json=payload)
+
+    def _payload(self, prompt: str) -> Dict[str, Any]:
+        """chat/completions 的請求內容（同步與串流共用）"""
+        return {
+            "model": self.selected_model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature
+        }
+
+    async def _generate(self, prompt: str) -> ProviderCompletion:
         """獲取Perplexity回應"""
-        try:
-            # 移除速率限制 - 由於已限制分析提示詞數量上限，不易達到 RPM 限制
-            # await self._rate_limit_delay(50)  # Perplexity較低的RPM限制
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.selected_model,
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 4000,
-                "temperature": 0.7
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=payload,
-                    timeout=60.0
+        response = await self.chat_completion(self._payload(prompt))
+        
+        if response.status_code != 200:
+            raise error_from_status(
+                response.status_code,
+                response.text[:200] or f"HTTP {response.status_code}",
+                self.provider_name,
+                response.headers
+            )
+        
+        data = response.json()
+        choice = data["choices"][0]
+        usage = usage_from_payload(data.get("usage"))
+        return ProviderCompletion(
+            text=choice["message"]["content"] or "",
+            model=data.get("model", self.selected_model),
+            finish_reason=choice.get("finish_reason"),
+            rate_limit=parse_rate_limit_headers(response.headers),
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            search_requests=usage.search_requests
+        )
+    
+    async def _generate_stream(self, prompt: str) -> AsyncIterator[Union[str, StreamUsage]]:
+        """以 SSE 串流獲取Perplexity回應片段（usage 欄位為累計值，結束後回報最後一個）"""
+        client = self._get_client()
+        payload = {**self._payload(prompt), "stream": True}
+        async with client.stream("POST", "/chat/completions", json=payload) as response:
+            if response.status_code != 200:
+                body = (await response.aread()).decode("utf-8", "replace")
+                raise error_from_status(
+                    response.status_code,
+                    body[:200] or f"HTTP {response.status_code}",
+                    self.provider_name,
+                    response.headers
                 )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data["choices"][0]["message"]["content"]
-                else:
-                    return f"Error: HTTP {response.status_code}"
-                    
-        except Exception as e:
-            logger.error(f"Perplexity API error: {e}")
-            return f"Error: {str(e)}"
+            usage = None
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                usage = event.get("usage") or usage
+                choices = event.get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if delta:
+                    yield delta
+        yield usage_from_payload(usage)
+
+    def _translate_error(self, error: Exception) -> ProviderError:
+        """將 httpx 例外轉換為 ProviderError 子類"""
+        if isinstance(error, httpx.TimeoutException):
+            return ProviderTimeoutError(str(error) or "Request timed out", self.provider_name)
+        if isinstance(error, httpx.TransportError):
+            return ServerError(str(error) or type(error).__name__, self.provider_name)
+        return super()._translate_error(error)
     
+    async def aclose(self):
+        """關閉共用的 HTTP 客戶端（綁定其他事件迴圈的客戶端無法在此關閉，只釋放參照）"""
+        if (
+            self._client is not None
+            and not self._client.is_closed
+            and self._client_loop is asyncio.get_running_loop()
+        ):
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+
     def is_available(self) -> bool:
         """檢查Perplexity是否可用"""
-        return bool(self.api_key)
\ No newline at end of file
+        return bool(self.api_key)
@@ -0,0 +1,102 @@
+"""
+重試引擎 - 指數退避 + 完全抖動，支援 Retry-After 與總時限
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  call_with_retry(attempt, policy, classify)              │
+│     │                                                   │
+│     ├── 第 n 次嘗試：attempt(剩餘可用的逾時秒數)            │
+│     │     └── 成功 → 返回 (結果, 嘗試次數)                  │
+│     │                                                   │
+│     └── 失敗 → classify(例外) → ProviderError              │
+│            ├── 不可重試 / 次數用盡 / 超過總時限 → 拋出        │
+│            └── 可重試 → 等待後重試                         │
+│                  等待 = max(Retry-After,                  │
+│                            random(0, min(上限, 基準 × 2ⁿ⁻¹))) │
+└─────────────────────────────────────────────────────────┘
+
+完全抖動讓同時失敗的大量請求分散重試，不會同步衝擊提供商；
+提供商給出 Retry-After 時至少等待該秒數。
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+
+from .errors import ProviderError, ProviderTimeoutError, RateLimitError
+from ...models.config import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+def backoff_delay(policy: RetryPolicy, attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    計算第 attempt 次失敗後的等待秒數
+    
+    參數：
+        policy: 重試設定
+        attempt: 已失敗的次數（從 1 開始）
+        retry_after: 提供商建議的等待秒數
+    """
+    ceiling = min(policy.max_delay, policy.base_delay * (2 ** (attempt - 1)))
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+async def call_with_retry(
+    attempt: Callable[[float], Awaitable[T]],
+    policy: RetryPolicy,
+    classify: Callable[[BaseException], ProviderError],
+    label: str = ""
+) -> Tuple[T, int]:
+    """
+    以重試設定執行 attempt
+    
+    參數：
+        attempt: 執行一次請求的協程函數，參數為此次嘗試可用的逾時秒數
+        policy: 重試設定
+        classify: 將例外轉換為 ProviderError（決定是否可重試）
+        label: 日誌使用的名稱
+    
+    返回：
+        (結果, 嘗試次數)
+    
+    例外：
+        ProviderError: 最後一次失敗的錯誤，attempts 屬性記錄嘗試次數
+    """
+    deadline = time.monotonic() + policy.deadline
+    attempts = 0
+    
+    while True:
+        attempts += 1
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining <= 0:
+                raise ProviderTimeoutError(f"Deadline of {policy.deadline:.0f}s exceeded")
+            result = await attempt(min(policy.attempt_timeout, remaining))
+            return result, attempts
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = classify(e)
+            error.attempts = attempts
+            if error is not e:
+                error.__cause__ = e
+            
+            if not error.retryable or attempts >= policy.max_attempts:
+                raise error
+            
+            retry_after = error.retry_after if isinstance(error, RateLimitError) else None
+            delay = backoff_delay(policy, attempts, retry_after)
+            if time.monotonic() + delay >= deadline:
+                raise error
+            
+            logger.warning(
+                f"{label} attempt {attempts}/{policy.max_attempts} failed ({error.error_type}), "
+                f"retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
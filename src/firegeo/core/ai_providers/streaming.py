@@ -0,0 +1,158 @@
+"""
+串流回應 - 以 async for 逐段取得 AI 回應文字
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  stream = provider.stream(prompt)                        │
+│     │                                                   │
+│     ├── async for delta in stream:  ← 文字片段依序到達      │
+│     │     └── 每次嘗試：provider._stream_once               │
+│     │           斷路器 → 速率限制 → 並行名額 → _generate_stream │
+│     │                                                   │
+│     ├── 第一段文字之前失敗 → 依 retry_policy 退避後重試       │
+│     ├── 已輸出文字後失敗   → 直接拋出 ProviderError          │
+│     │                     （無法無痕重試，呼叫端已看到部分文字）│
+│     └── 完成後 stream.completion() → ProviderCompletion    │
+│           （含 token 用量、首段延遲與成功那次嘗試的耗時）      │
+└─────────────────────────────────────────────────────────┘
+
+串流不使用對沖請求；單次等待下一段文字的上限為 attempt_timeout。
+提供商在串流結尾回報的 token 用量以 StreamUsage 傳遞，不會交給呼叫端。
+"""
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
+
+from pydantic import BaseModel
+
+from .errors import ProviderTimeoutError, RateLimitError
+from .retry import backoff_delay
+
+if TYPE_CHECKING:
+    from .base import BaseAIProvider, ProviderCompletion
+
+logger = logging.getLogger(__name__)
+
+class StreamUsage(BaseModel):
+    """提供商在串流結尾回報的 token 用量（由 _generate_stream 產生）"""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    search_requests: int = 0
+
+class ProviderStream:
+    """
+    單一提示詞的串流回應
+    
+    作用：
+        - async for 逐段取得文字（第一段之前的可重試失敗會自動重試）
+        - text / attempts / time_to_first_delta 記錄串流進度
+        - usage 記錄提供商回報的 token 用量（未回報時為 None）
+        - completion() 在串流結束後返回與 complete() 相同的結果類型
+        - 不讀完就結束時以 aclose()（或 async with）釋放資源
+    """
+    
+    def __init__(self, provider: "BaseAIProvider", prompt: str):
+        self.provider = provider
+        self.prompt = prompt
+        self.attempts = 0
+        self.time_to_first_delta: Optional[float] = None  # 開始到第一段文字的秒數（含重試）
+        self.usage: Optional[StreamUsage] = None
+        self._parts: List[str] = []
+        self._started: Optional[float] = None
+        # 最後一次嘗試的首段延遲與總耗時（對應 ProviderCompletion 的 time_to_first_byte / latency）
+        self._attempt_first_byte: Optional[float] = None
+        self._attempt_latency: Optional[float] = None
+        self._iterator: Optional[AsyncIterator[str]] = None
+    
+    @property
+    def text(self) -> str:
+        """目前已收到的文字"""
+        return "".join(self._parts)
+    
+    def __aiter__(self) -> AsyncIterator[str]:
+        if self._iterator is None:
+            self._iterator = self._iterate()
+        return self._iterator
+    
+    async def aclose(self):
+        """提前結束串流並立即釋放並行名額與連線（不需讀完時呼叫）"""
+        if self._iterator is not None:
+            await self._iterator.aclose()
+    
+    async def __aenter__(self) -> "ProviderStream":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def _iterate(self) -> AsyncIterator[str]:
+        provider = self.provider
+        policy = provider.retry_policy
+        self._started = time.monotonic()
+        deadline = self._started + policy.deadline
+        
+        while True:
+            self.attempts += 1
+            remaining = deadline - time.monotonic()
+            emitted = False
+            self.usage = None
+            self._attempt_first_byte = None
+            try:
+                if remaining <= 0:
+                    raise ProviderTimeoutError(f"Deadline of {policy.deadline:.0f}s exceeded", provider.provider_name)
+                attempt_started = time.monotonic()
+                attempt_stream = provider._stream_once(self.prompt, min(policy.attempt_timeout, remaining))
+                try:
+                    async for delta in attempt_stream:
+                        if isinstance(delta, StreamUsage):
+                            self.usage = delta
+                            continue
+                        if not emitted:
+                            emitted = True
+                            now = time.monotonic()
+                            self._attempt_first_byte = now - attempt_started
+                            if self.time_to_first_delta is None:
+                                self.time_to_first_delta = now - self._started
+                        self._parts.append(delta)
+                        yield delta
+                finally:
+                    # 提前結束時立即關閉單次請求，釋放並行名額與連線
+                    await attempt_stream.aclose()
+                self._attempt_latency = time.monotonic() - attempt_started
+                return
+            except Exception as e:
+                error = provider._classify_error(e)
+                error.attempts = self.attempts
+                if error is not e:
+                    error.__cause__ = e
+                
+                if emitted or not error.retryable or self.attempts >= policy.max_attempts:
+                    logger.error(f"{provider.provider_name} stream error after {self.attempts} attempt(s): {error}")
+                    raise error
+                
+                retry_after = error.retry_after if isinstance(error, RateLimitError) else None
+                delay = backoff_delay(policy, self.attempts, retry_after)
+                if time.monotonic() + delay >= deadline:
+                    raise error
+                logger.warning(
+                    f"{provider.provider_name} stream attempt {self.attempts}/{policy.max_attempts} failed "
+                    f"({error.error_type}), retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+    
+    def completion(self) -> "ProviderCompletion":
+        """串流結束後的完整結果"""
+        from .base import ProviderCompletion
+        usage = self.usage or StreamUsage()
+        return ProviderCompletion(
+            text=self.text,
+            model=self.provider.selected_model,
+            attempts=self.attempts,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            search_requests=usage.search_requests,
+            latency=self._attempt_latency,
+            time_to_first_byte=self._attempt_first_byte
+        )
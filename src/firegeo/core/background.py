@@ -0,0 +1,189 @@
+"""
+背景分析執行器 - 在長期運行的事件迴圈執行緒中執行分析
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  Streamlit 腳本執行緒                背景執行緒（事件迴圈）   │
+│                                                         │
+│  runner.submit(request) ──────────▶ run_analysis(...)   │
+│     → BackgroundRun                    │                │
+│                                        │ 回調            │
+│  st.fragment 定期 drain() ◀── queue.Queue（執行緒安全）    │
+│     └── 進度、串流預覽                   │                │
+│  run.cancel() ────────────────────▶ 取消分析工作          │
+│                                                         │
+│  提供商實例（ProviderPool）、Gemini 客戶端與回應快取       │
+│  綁定背景事件迴圈，跨多次分析與多個工作階段共用              │
+└─────────────────────────────────────────────────────────┘
+
+腳本執行緒不再呼叫 asyncio.run，因此分析期間頁面仍可操作，
+也不必每次分析都重建事件迴圈與連線池。
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import ResponseCache
+from .checkpoint import CheckpointLog
+from .gemini_client import close_async_clients
+from .pipeline import ProviderPool, create_response_cache, run_analysis
+from ..models.analysis import (
+    AIProviderResponse,
+    PromptAnalysisResult,
+    SimpleAnalysisRequest,
+    SimpleAnalysisResult,
+)
+from ..models.config import StreamlitConfig
+
+logger = logging.getLogger(__name__)
+
+# 更新事件種類（事件為 (種類, *參數)，參數同對應的調度器回調）
+UPDATE_UNIT = "unit"      # (prompt_result, response, completed_units, total_units)
+UPDATE_PROMPT = "prompt"  # (prompt_result, completed_units, total_units)
+UPDATE_BATCH = "batch"    # (provider_name, batch_status)
+UPDATE_STREAM = "stream"  # (prompt_idx, provider_name, text, mentioned)
+
+
+class BackgroundRun:
+    """背景執行中的一次分析：進度事件佇列、取消與結果"""
+
+    def __init__(self, request: SimpleAnalysisRequest, run_id: Optional[str] = None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.request = request
+        self.updates: "queue.Queue[Tuple[Any, ...]]" = queue.Queue()
+        self.future: Optional[concurrent.futures.Future] = None
+
+    def drain(self) -> List[Tuple[Any, ...]]:
+        """取出目前所有的更新事件（不阻塞）"""
+        events = []
+        while True:
+            try:
+                events.append(self.updates.get_nowait())
+            except queue.Empty:
+                return events
+
+    def cancel(self) -> bool:
+        """要求取消分析；已結束時返回 False"""
+        return self.future.cancel() if self.future is not None else False
+
+    @property
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.future is not None and self.future.cancelled()
+
+    def result(self) -> SimpleAnalysisResult:
+        """分析結果；失敗時重新拋出例外，取消時拋出 CancelledError"""
+        return self.future.result(timeout=0)
+
+
+class BackgroundAnalysisRunner:
+    """
+    在專用執行緒的事件迴圈中執行分析
+
+    多次分析可同時進行（例如多個工作階段），實際同時進行的提供商
+    請求仍由各提供商全域共用的自適應並行與速率限制控制。
+    """
+
+    def __init__(self, config: Optional[StreamlitConfig] = None):
+        self.config = config or StreamlitConfig()
+        self.provider_pool = ProviderPool()
+        self.response_cache: Optional[ResponseCache] = None
+        self._cache_opened = False
+        self.active_runs: Dict[str, BackgroundRun] = {}  # 執行 ID → 進行中的分析
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="analysis-runner", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and not self._loop.is_closed()
+
+    def submit(self, request: SimpleAnalysisRequest, checkpoint: Optional[CheckpointLog] = None) -> BackgroundRun:
+        """
+        在背景事件迴圈中開始分析，立即返回
+
+        指定 checkpoint 時以其執行 ID 作為 run_id，已記錄的單元直接還原（續跑）
+        """
+        run = BackgroundRun(request, checkpoint.run_id if checkpoint is not None else None)
+        if run.run_id in self.active_runs:
+            raise ValueError(f"Run {run.run_id} is already in progress")
+        self.active_runs[run.run_id] = run
+        run.future = asyncio.run_coroutine_threadsafe(self._execute(run, checkpoint), self._loop)
+        run.future.add_done_callback(lambda _: self.active_runs.pop(run.run_id, None))
+        return run
+
+    async def _execute(self, run: BackgroundRun, checkpoint: Optional[CheckpointLog] = None) -> SimpleAnalysisResult:
+        updates = run.updates
+
+        def on_unit_complete(prompt_result: PromptAnalysisResult, response: AIProviderResponse, completed_units: int, total_units: int):
+            updates.put((UPDATE_UNIT, prompt_result, response, completed_units, total_units))
+
+        def on_prompt_complete(prompt_result: PromptAnalysisResult, completed_units: int, total_units: int):
+            updates.put((UPDATE_PROMPT, prompt_result, completed_units, total_units))
+
+        def on_batch_status(provider_name: str, status):
+            updates.put((UPDATE_BATCH, provider_name, status))
+
+        def on_stream_update(prompt_idx: int, provider_name: str, text: str, mentioned):
+            updates.put((UPDATE_STREAM, prompt_idx, provider_name, text, dict(mentioned)))
+
+        if not self._cache_opened:
+            # 快取在首次分析時開啟，之後所有分析共用
+            self.response_cache = create_response_cache(self.config)
+            self._cache_opened = True
+
+        return await run_analysis(
+            run.request,
+            self.config,
+            on_unit_complete=on_unit_complete,
+            on_prompt_complete=on_prompt_complete,
+            on_batch_status=on_batch_status,
+            on_stream_update=on_stream_update,
+            provider_pool=self.provider_pool,
+            response_cache=self.response_cache,
+            checkpoint=checkpoint
+        )
+
+    def shutdown(self, timeout: float = 10.0):
+        """關閉共用的連線與快取並停止事件迴圈"""
+        if not self.running:
+            return
+
+        async def close():
+            await self.provider_pool.aclose()
+            await close_async_clients()
+            if self.response_cache is not None:
+                self.response_cache.close()
+                self.response_cache = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(close(), self._loop).result(timeout)
+        except Exception as e:
+            logger.warning(f"Failed to close background runner resources: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+
+
+# 行程內共用的執行器（所有 Streamlit 工作階段共用）
+_runner: Optional[BackgroundAnalysisRunner] = None
+_runner_lock = threading.Lock()
+
+def get_background_runner(config: Optional[StreamlitConfig] = None) -> BackgroundAnalysisRunner:
+    """取得共用的背景執行器，首次使用時建立並啟動"""
+    global _runner
+    with _runner_lock:
+        if _runner is None or not _runner.running:
+            _runner = BackgroundAnalysisRunner(config)
+        return _runner
@@ -0,0 +1,409 @@
+"""
+本地品牌比對器 - 以 Aho-Corasick 自動機在送出 LLM 前先判斷明確的情況
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  BrandMatcher(brands, aliases)                           │
+│     │                                                   │
+│     ├── 完整名稱 / 別名 → 完整比對模式                      │
+│     └── 多字品牌的關鍵字（如 "Microsoft Teams" → teams）     │
+│           → 部分比對模式                                  │
+│                                                         │
+│  classify(text) 單次掃描所有模式，逐一品牌判斷：             │
+│     ├── 完整名稱明確出現（非全小寫、非句首）→ 提及 (local_match) │
+│     ├── 名稱與關鍵字都未出現          → 未提及 (local_absent) │
+│     └── 其他（全小寫、句首、只出現關鍵字）→ 模糊，交給 LLM 判斷 │
+└─────────────────────────────────────────────────────────┘
+
+全小寫或位於句首（首字母必然大寫）的出現視為模糊，因為品牌名常是
+一般單字（例如 "notion"、"Monday is a good day"）；含數字、符號或
+非 ASCII 字元的名稱（如 "monday.com"、中文品牌）則不受此限制。
+
+模式與文本的連續空白都合併為單一空格後比對（"Microsoft  Teams"
+也符合 "Microsoft Teams"），並保留位置對應以取回原文中的字串。
+
+串流回應使用 incremental() 取得 IncrementalMatcher：沿用自動機的
+掃描狀態逐段比對，品牌名稱一出現就暫定為已提及。
+"""
+
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..models.analysis import BrandDetectionResult
+
+# 判斷來源
+METHOD_LOCAL_MATCH = "local_match"          # 本地比對：名稱明確出現
+METHOD_LOCAL_ABSENT = "local_absent"        # 本地比對：名稱與關鍵字均未出現
+METHOD_LOCAL_AMBIGUOUS = "local_ambiguous"  # 模糊但沒有可用的 LLM，僅依本地結果判斷
+METHOD_LLM = "llm"                          # 交由 LLM 檢測
+METHOD_ERROR = "error"                      # LLM 檢測失敗
+
+# 拆分多字品牌時忽略的泛用字
+GENERIC_TOKENS = {
+    "the", "and", "com", "net", "org", "inc", "ltd", "llc", "corp", "co",
+    "app", "apps", "software", "tools", "group", "technologies", "labs",
+}
+
+_TOKEN_SPLIT = re.compile(r"[\W_]+", re.UNICODE)
+
+# 需要合併的空白：連續空白，或單一的非空格空白（換行、Tab）
+_COLLAPSIBLE_WHITESPACE = re.compile(r"\s{2,}|[^\S ]")
+
+# 句首判斷時略過的前導字元（引號、括號、Markdown 標記、項目符號）
+_SENTENCE_LEAD_CHARS = set("\"'“‘「『(*_#>-•")
+_SENTENCE_END_CHARS = set(".!?。！？")
+
+# 模式種類
+_FULL = 0
+_PARTIAL = 1
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 多模式字串比對自動機
+
+    建立後單次掃描文本即可找出所有模式的所有出現位置，
+    時間複雜度為 O(文本長度 + 匹配數)，與模式數量無關。
+    scan() 可傳入上一次的狀態，支援分段（串流）掃描。
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        # 1. 建立字典樹
+        for pattern_id, pattern in enumerate(self.patterns):
+            node = 0
+            for ch in pattern:
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][ch] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = next_node
+            self._out[node] = self._out[node] + (pattern_id,)
+
+        # 2. BFS 建立失敗連結，並合併輸出
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def scan(self, text: str, state: int = 0) -> Tuple[List[Tuple[int, int]], int]:
+        """
+        掃描文本
+
+        參數：
+            text: 要掃描的文本（應已正規化為小寫）
+            state: 起始狀態（分段掃描時傳入上一段的結束狀態）
+
+        返回：
+            ([(pattern_id, 結束位置), ...], 結束狀態)
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        matches: List[Tuple[int, int]] = []
+        for index, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = index + 1
+                for pattern_id in out[state]:
+                    matches.append((pattern_id, end))
+        return matches, state
+
+
+def _normalize(text: str) -> str:
+    """轉小寫；少數字元轉小寫後長度會改變，此時逐字處理以保持位置對應"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(ch.lower() if len(ch.lower()) == 1 else ch for ch in text)
+
+
+def _collapse_whitespace(text: str, base: int = 0) -> Tuple[str, Optional[List[int]]]:
+    """
+    將空白序列合併為單一空格（與模式的正規化相同）
+
+    返回：
+        (合併後的文字, 每個字元在原文中的位置（加上 base）)；
+        沒有需要合併的空白時位置為 None，表示位置不變
+    """
+    if not _COLLAPSIBLE_WHITESPACE.search(text):
+        return text, None
+    parts: List[str] = []
+    offsets: List[int] = []
+    position = 0
+    for match in _COLLAPSIBLE_WHITESPACE.finditer(text):
+        parts.append(text[position:match.start()])
+        offsets.extend(range(base + position, base + match.start()))
+        parts.append(" ")
+        offsets.append(base + match.start())
+        position = match.end()
+    parts.append(text[position:])
+    offsets.extend(range(base + position, base + len(text)))
+    return "".join(parts), offsets
+
+
+def _at_sentence_start(text: str, start: int) -> bool:
+    """原文 start 位置是否為句首（前面只有空白與前導符號，再往前是文本開頭、換行或句末標點）"""
+    index = start - 1
+    while index >= 0:
+        ch = text[index]
+        if ch == "\n" or ch in _SENTENCE_END_CHARS:
+            return True
+        if not ch.isspace() and ch not in _SENTENCE_LEAD_CHARS:
+            return False
+        index -= 1
+    return True
+
+
+def _needs_boundary(pattern: str) -> bool:
+    """純 ASCII 的模式才需要檢查字詞邊界（中文等不以空白分詞）"""
+    return pattern.isascii()
+
+
+def _is_case_sensitive_word(pattern: str) -> bool:
+    """只含英文字母與空白的名稱可能是一般單字，全小寫或位於句首時視為模糊"""
+    return all(ch.isalpha() or ch.isspace() for ch in pattern) and pattern.isascii()
+
+
+class BrandMatcher:
+    """
+    以單一 Aho-Corasick 自動機比對所有品牌名稱、別名和關鍵字
+
+    作用：
+        - classify(): 將每個品牌分為「本地已判定」或「需要 LLM 判斷」
+        - 判定結果標記 detection_method，說明由哪條路徑決定
+    """
+
+    def __init__(self, brands: Sequence[str], aliases: Optional[Dict[str, Sequence[str]]] = None):
+        self.brands = list(dict.fromkeys(brands))
+        aliases = aliases or {}
+
+        # 模式文字 → [(品牌, 種類)]；同一文字可能屬於多個品牌
+        pattern_owners: Dict[str, List[Tuple[str, int]]] = {}
+
+        def add(pattern: str, brand: str, kind: int):
+            pattern = " ".join(_normalize(pattern).split())
+            if pattern:
+                owners = pattern_owners.setdefault(pattern, [])
+                if (brand, kind) not in owners:
+                    owners.append((brand, kind))
+
+        for brand in self.brands:
+            for name in [brand, *aliases.get(brand, [])]:
+                add(name, brand, _FULL)
+                tokens = [t for t in _TOKEN_SPLIT.split(_normalize(name)) if t]
+                if len(tokens) > 1:
+                    for token in tokens:
+                        if len(token) >= 3 and token not in GENERIC_TOKENS:
+                            add(token, brand, _PARTIAL)
+
+        self._patterns = list(pattern_owners)
+        self._owners = [pattern_owners[p] for p in self._patterns]
+        self._automaton = AhoCorasick(self._patterns)
+
+    def find(self, text: str) -> Dict[str, Dict[str, List[str]]]:
+        """
+        找出每個品牌的出現情況
+
+        返回：
+            品牌 → {"strong": [...], "weak": [...], "partial": [...]}，
+            列表內容為文本中實際出現的字串
+        """
+        normalized, offsets = _collapse_whitespace(_normalize(text))
+        hits: Dict[str, Dict[str, List[str]]] = {
+            brand: {"strong": [], "weak": [], "partial": []} for brand in self.brands
+        }
+        matches, _ = self._automaton.scan(normalized)
+        for pattern_id, end in matches:
+            for brand, category, original in self._resolve_match(pattern_id, end, text, normalized, offsets):
+                hits[brand][category].append(original)
+        return hits
+    
+    def _resolve_match(
+        self,
+        pattern_id: int,
+        end: int,
+        text: str,
+        normalized: str,
+        offsets: Optional[Sequence[int]] = None
+    ) -> List[Tuple[str, str, str]]:
+        """
+        檢查一次模式出現的字詞邊界並分類
+
+        參數：
+            end: 在正規化文本中的結束位置
+            offsets: 正規化文本每個字元在原文中的位置；None 表示位置相同
+
+        返回：
+            [(品牌, "strong" / "weak" / "partial", 文本中實際出現的字串)]；
+            不符合字詞邊界時為空列表
+        """
+        pattern = self._patterns[pattern_id]
+        start = end - len(pattern)
+        if _needs_boundary(pattern):
+            if start > 0 and normalized[start - 1].isalnum():
+                return []
+            if end < len(normalized) and normalized[end].isalnum():
+                return []
+
+        if offsets is not None:
+            start, end = offsets[start], offsets[end - 1] + 1
+        original = text[start:end]
+        resolved = []
+        for brand, kind in self._owners[pattern_id]:
+            if kind == _PARTIAL:
+                resolved.append((brand, "partial", original))
+            elif _is_case_sensitive_word(pattern) and (original.islower() or _at_sentence_start(text, start)):
+                resolved.append((brand, "weak", original))
+            else:
+                resolved.append((brand, "strong", original))
+        return resolved
+    
+    def incremental(self) -> "IncrementalMatcher":
+        """建立串流文本使用的增量比對器"""
+        return IncrementalMatcher(self)
+
+    def classify(self, text: str) -> Tuple[Dict[str, BrandDetectionResult], Dict[str, BrandDetectionResult]]:
+        """
+        本地判斷每個品牌
+
+        返回：
+            (已判定結果: 品牌 → BrandDetectionResult,
+             模糊品牌: 品牌 → 僅依本地比對的暫定結果（local_ambiguous），應交由 LLM 確認)
+        """
+        resolved: Dict[str, BrandDetectionResult] = {}
+        ambiguous: Dict[str, BrandDetectionResult] = {}
+
+        for brand, found in self.find(text).items():
+            if found["strong"]:
+                resolved[brand] = BrandDetectionResult(
+                    brand_name=brand,
+                    mentioned=True,
+                    reasoning=f"Local match: '{found['strong'][0]}' appears in the response",
+                    detection_method=METHOD_LOCAL_MATCH
+                )
+            elif not found["weak"] and not found["partial"]:
+                resolved[brand] = BrandDetectionResult(
+                    brand_name=brand,
+                    mentioned=False,
+                    reasoning="Local match: neither the brand name, its aliases nor its key terms appear in the response",
+                    detection_method=METHOD_LOCAL_ABSENT
+                )
+            elif found["weak"]:
+                ambiguous[brand] = BrandDetectionResult(
+                    brand_name=brand,
+                    mentioned=True,
+                    reasoning=f"Ambiguous local match: '{found['weak'][0]}' is lowercase or starts a sentence "
+                              f"and may be a common word",
+                    detection_method=METHOD_LOCAL_AMBIGUOUS
+                )
+            else:
+                ambiguous[brand] = BrandDetectionResult(
+                    brand_name=brand,
+                    mentioned=False,
+                    reasoning=f"Ambiguous local match: only the partial term '{found['partial'][0]}' appears",
+                    detection_method=METHOD_LOCAL_AMBIGUOUS
+                )
+
+        return resolved, ambiguous
+
+
+class IncrementalMatcher:
+    """
+    串流文本的增量比對器
+
+    作用：每收到一段文字就從上一段的自動機狀態繼續掃描，品牌名稱明確
+    出現（strong）時立即記入 mentioned。結尾剛好落在目前文字末端的
+    匹配要等下一段（或 finish()）才能確認右側字詞邊界。
+    只負責暫定結果；串流結束後仍以 classify() 的完整流程判定。
+    """
+
+    def __init__(self, matcher: BrandMatcher):
+        self.matcher = matcher
+        self.text = ""
+        self.mentioned: Dict[str, str] = {}  # 品牌 → 文本中實際出現的名稱
+        self._normalized = ""  # 轉小寫並合併空白後的文本
+        self._offsets: List[int] = []  # 正規化文本每個字元在原文中的位置
+        self._state = 0
+        self._pending: List[Tuple[int, int]] = []
+
+    def feed(self, delta: str) -> List[str]:
+        """
+        加入一段文字
+
+        返回：
+            這段文字中新判定為已提及的品牌
+        """
+        if not delta:
+            return []
+        offset = len(self._normalized)
+        normalized_delta, delta_offsets = _collapse_whitespace(_normalize(delta), len(self.text))
+        if delta_offsets is None:
+            delta_offsets = range(len(self.text), len(self.text) + len(delta))
+        if normalized_delta.startswith(" ") and self._normalized.endswith(" "):
+            # 空白序列跨越兩段文字
+            normalized_delta, delta_offsets = normalized_delta[1:], delta_offsets[1:]
+        self.text += delta
+        self._normalized += normalized_delta
+        self._offsets.extend(delta_offsets)
+
+        matches, self._state = self.matcher._automaton.scan(normalized_delta, self._state)
+        candidates = self._pending + [(pattern_id, offset + end) for pattern_id, end in matches]
+        self._pending = []
+
+        newly_mentioned: List[str] = []
+        for pattern_id, end in candidates:
+            if end == len(self._normalized) and _needs_boundary(self.matcher._patterns[pattern_id]):
+                # 右側可能還有字母（例如 "Notion" 後接 "al"），等下一段再判斷
+                self._pending.append((pattern_id, end))
+                continue
+            newly_mentioned.extend(self._accept(pattern_id, end))
+        return newly_mentioned
+
+    def finish(self) -> List[str]:
+        """串流結束：確認仍在等待右側邊界的匹配"""
+        pending, self._pending = self._pending, []
+        newly_mentioned: List[str] = []
+        for pattern_id, end in pending:
+            newly_mentioned.extend(self._accept(pattern_id, end))
+        return newly_mentioned
+
+    def _accept(self, pattern_id: int, end: int) -> List[str]:
+        newly_mentioned = []
+        for brand, category, original in self.matcher._resolve_match(
+            pattern_id, end, self.text, self._normalized, self._offsets
+        ):
+            if category == "strong" and brand not in self.mentioned:
+                self.mentioned[brand] = original
+                newly_mentioned.append(brand)
+        return newly_mentioned
+
+
+@lru_cache(maxsize=32)
+def _cached_matcher(brands: Tuple[str, ...], aliases: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> BrandMatcher:
+    return BrandMatcher(brands, dict(aliases))
+
+
+def get_brand_matcher(brands: Sequence[str], aliases: Optional[Dict[str, Sequence[str]]] = None) -> BrandMatcher:
+    """取得已編譯的比對器；相同品牌組合在整個分析中只編譯一次"""
+    alias_key = tuple(sorted(
+        (brand, tuple(names)) for brand, names in (aliases or {}).items() if names
+    ))
+    return _cached_matcher(tuple(brands), alias_key)
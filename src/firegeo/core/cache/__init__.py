@@ -0,0 +1,17 @@
+"""快取模組 - 提供持久化的鍵值儲存與 AI 回應快取"""
+
+from .sqlite_store import SQLiteStore, default_cache_dir
+from .detection_memo import DetectionMemo, get_detection_memo
+from .response_cache import ResponseCache, CACHE_USE, CACHE_REFRESH, CACHE_BYPASS, CACHE_MODES
+
+__all__ = [
+    "SQLiteStore",
+    "default_cache_dir",
+    "ResponseCache",
+    "CACHE_USE",
+    "CACHE_REFRESH",
+    "CACHE_BYPASS",
+    "CACHE_MODES",
+    "DetectionMemo",
+    "get_detection_memo",
+]
@@ -0,0 +1,125 @@
+"""
+品牌檢測備忘 - 相同輸入的檢測結果直接重用，不再調用 Gemini
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  make_key(回應文本, 問題, 品牌集合, 別名, 檢測模型, 提示版本)  │
+│     │                                                   │
+│     ├── 記憶體 LRU 命中 → 直接返回                         │
+│     ├── 磁碟 SQLiteStore 命中（選用）→ 放回 LRU 後返回       │
+│     └── 未命中 → 由檢測器正常檢測，完成後寫入兩層            │
+└─────────────────────────────────────────────────────────┘
+
+檢測是 (文本, 問題, 品牌集合) 的純函數；快取的回應、重新匯出都會
+產生完全相同的輸入。檢測模型或提示詞版本變更時鍵也會改變，舊結果
+自然失效。
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+
+from ...models.analysis import BrandDetectionResult
+from .sqlite_store import SQLiteStore, default_cache_dir
+
+DetectionResults = Dict[str, BrandDetectionResult]
+
+class DetectionMemo:
+    """
+    兩層檢測結果備忘（記憶體 LRU + 選用的磁碟儲存）
+    
+    以品牌為鍵的結果字典為單位儲存；品牌順序不影響鍵。
+    """
+    
+    def __init__(self, max_entries: int = 2048, store: Optional[SQLiteStore] = None):
+        """
+        參數：
+            max_entries: 記憶體中保留的檢測結果數量
+            store: 磁碟儲存，None 表示只使用記憶體
+        """
+        self.max_entries = max_entries
+        self.store = store
+        self._entries: "OrderedDict[str, DetectionResults]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(
+        text: str,
+        question: str,
+        brands: Sequence[str],
+        aliases: Optional[Dict[str, Sequence[str]]],
+        model_name: str,
+        prompt_version: str
+    ) -> str:
+        """由檢測輸入計算備忘鍵"""
+        brand_set = sorted(set(brands))
+        alias_items = sorted(
+            (brand, sorted(names)) for brand, names in (aliases or {}).items()
+            if brand in brand_set and names
+        )
+        payload = json.dumps(
+            [text, question, brand_set, alias_items, model_name, prompt_version],
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _remember(self, key: str, results: DetectionResults):
+        """寫入記憶體 LRU 並淘汰最久未使用的項目"""
+        with self._lock:
+            self._entries[key] = results
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    async def get(self, key: str) -> Optional[DetectionResults]:
+        """讀取檢測結果（返回副本，呼叫者可自由修改）"""
+        with self._lock:
+            results = self._entries.get(key)
+            if results is not None:
+                self._entries.move_to_end(key)
+        
+        if results is None and self.store is not None:
+            raw = await self.store.get(key)
+            if raw is not None:
+                results = {
+                    brand: BrandDetectionResult(**data)
+                    for brand, data in json.loads(raw).items()
+                }
+                self._remember(key, results)
+        
+        if results is None:
+            return None
+        return {brand: result.model_copy() for brand, result in results.items()}
+    
+    async def set(self, key: str, results: DetectionResults):
+        """寫入檢測結果"""
+        results = {brand: result.model_copy() for brand, result in results.items()}
+        self._remember(key, results)
+        if self.store is not None:
+            raw = json.dumps(
+                {brand: result.model_dump() for brand, result in results.items()},
+                ensure_ascii=False
+            )
+            await self.store.set(key, raw)
+    
+    def clear(self):
+        """清除記憶體中的結果"""
+        with self._lock:
+            self._entries.clear()
+
+# 行程內共用的備忘：記憶體版與磁碟版各一個，跨分析重用
+_shared_memos: Dict[bool, DetectionMemo] = {}
+_shared_lock = threading.Lock()
+
+def get_detection_memo(persistent: bool = False) -> DetectionMemo:
+    """取得行程內共用的檢測備忘；persistent=True 時額外寫入 ~/.cache/firegeo/detections.sqlite3"""
+    with _shared_lock:
+        memo = _shared_memos.get(persistent)
+        if memo is None:
+            store = SQLiteStore(default_cache_dir() / "detections.sqlite3") if persistent else None
+            memo = DetectionMemo(store=store)
+            _shared_memos[persistent] = memo
+        return memo
@@ -0,0 +1,73 @@
+"""
+AI 回應快取 - 以內容雜湊為鍵，重複執行相同提示詞時免費且幾乎即時
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  make_key(提供商, 模型, 提示詞, temperature, max_tokens)    │
+│     │                                                   │
+│     ├── use     → 命中直接返回；未命中調用 AI 並寫入         │
+│     ├── refresh → 一律調用 AI，以新回應覆寫快取              │
+│     └── bypass  → 不讀也不寫                              │
+│                                                         │
+│  SQLiteStore：TTL 過期 + 筆數 / 大小上限的 LRU 淘汰          │
+└─────────────────────────────────────────────────────────┘
+
+錯誤回應不會寫入快取（由 AnalysisScheduler 判斷）。
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional, Union
+
+from .sqlite_store import SQLiteStore, default_cache_dir
+
+# 每次分析的快取模式
+CACHE_USE = "use"          # 讀取並寫入快取
+CACHE_REFRESH = "refresh"  # 不讀取，但以新回應覆寫快取
+CACHE_BYPASS = "bypass"    # 完全不使用快取
+
+CACHE_MODES = [CACHE_USE, CACHE_REFRESH, CACHE_BYPASS]
+
+class ResponseCache:
+    """
+    AI 提供商回應的持久化快取
+    
+    快取鍵為 (提供商, 模型, 提示詞, temperature, max_tokens) 的 SHA-256，
+    只要任一參數改變就不會命中。
+    """
+    
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 5000,
+        max_bytes: int = 200 * 1024 * 1024
+    ):
+        self.store = SQLiteStore(
+            path or default_cache_dir() / "responses.sqlite3",
+            ttl_seconds=ttl_seconds,
+            max_entries=max_entries,
+            max_bytes=max_bytes
+        )
+    
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, temperature: float, max_tokens: int) -> str:
+        """由請求參數計算內容定址的快取鍵"""
+        payload = json.dumps(
+            [provider, model, prompt, temperature, max_tokens],
+            ensure_ascii=False,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    async def get(self, key: str) -> Optional[str]:
+        """讀取快取的回應文本"""
+        return await self.store.get(key)
+    
+    async def set(self, key: str, response_text: str):
+        """寫入回應文本"""
+        await self.store.set(key, response_text)
+    
+    def close(self):
+        self.store.close()
@@ -0,0 +1,128 @@
+"""SQLite 鍵值儲存 - 支援 TTL 過期與依容量的 LRU 淘汰"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+def default_cache_dir() -> Path:
+    """快取目錄：FIREGEO_CACHE_DIR 環境變數，預設 ~/.cache/firegeo"""
+    return Path(os.getenv("FIREGEO_CACHE_DIR", Path.home() / ".cache" / "firegeo"))
+
+class SQLiteStore:
+    """
+    以 SQLite 實作的持久化鍵值儲存
+    
+    - 每筆資料有過期時間 (TTL)
+    - 筆數或總大小超過上限時，依最後存取時間淘汰最舊的資料
+    - 同步方法以鎖保護，非同步方法在執行緒中執行，不阻塞事件迴圈
+    """
+    
+    def __init__(
+        self,
+        path: Union[str, Path],
+        ttl_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 5000,
+        max_bytes: int = 200 * 1024 * 1024
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)")
+        self._conn.commit()
+    
+    def get_sync(self, key: str) -> Optional[str]:
+        """讀取資料；過期時刪除並返回 None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+    
+    def set_sync(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        """寫入資料並視需要淘汰舊資料"""
+        now = time.time()
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO entries (key, value, size, created_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (key, value, size, now, now + ttl, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+    
+    def _evict(self, now: float):
+        """刪除過期資料，再依 LRU 淘汰直到符合筆數與大小上限（呼叫者需持有鎖）"""
+        self._conn.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+        count, total_size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+        
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall()
+        evict_keys = []
+        for key, size in rows:
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            evict_keys.append((key,))
+            count -= 1
+            total_size -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evict_keys)
+    
+    def delete_sync(self, key: str):
+        """刪除單筆資料"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+    
+    def clear_sync(self):
+        """清除所有資料"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+    
+    async def get(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get_sync, key)
+    
+    async def set(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        await asyncio.to_thread(self.set_sync, key, value, ttl_seconds)
+    
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.delete_sync, key)
+    
+    def close(self):
+        """關閉資料庫連線"""
+        with self._lock:
+            self._conn.close()
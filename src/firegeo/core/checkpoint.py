@@ -0,0 +1,225 @@
+"""
+分析檢查點 - 每個完成的 (提示詞, 提供商) 單元立即寫入持久化日誌，中斷後可續跑
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  <快取目錄>/checkpoints/<run_id>.jsonl                    │
+│     第一行：{"type": "run", 請求（不含 API 金鑰）, 指紋}     │
+│     之後每行：{"type": "unit", 提示詞索引, 提供商, 回應}      │
+│                                                         │
+│  分析中：單元成功完成 → record() 附加一行並 flush           │
+│          （回應或品牌檢測失敗的單元不記錄，續跑時重試）       │
+│  續跑：load() → 已完成的單元直接填入結果，不再派發           │
+│  完成：complete() 刪除日誌                                │
+└─────────────────────────────────────────────────────────┘
+
+指紋涵蓋提示詞、品牌、提供商與模型；與檢查點不符的請求不能續跑，
+避免把不同分析的結果混在一起。行程在寫入途中結束時，最後一行可能
+不完整，讀取時略過。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from .brand_matcher import METHOD_ERROR
+from .cache import default_cache_dir
+from ..models.analysis import AIProviderResponse, SimpleAnalysisRequest
+
+logger = logging.getLogger(__name__)
+
+# (提示詞索引, 提供商名稱) → 已完成的回應
+CompletedUnits = Dict[Tuple[int, str], AIProviderResponse]
+
+# 執行 ID 會成為檔名，只允許英數字、底線與連字號
+RUN_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# 不影響分析單元的請求欄位（續跑時可以不同）
+VOLATILE_REQUEST_FIELDS = {
+    "api_keys", "cache_mode", "stream_responses", "hedge_requests", "execution_mode", "batch_detection", "budget_usd"
+}
+
+
+def is_unit_complete(response: AIProviderResponse) -> bool:
+    """回應成功且每個品牌都有檢測結果（檢測失敗的單元續跑時要重新檢測）"""
+    if response.error:
+        return False
+    return all(result.detection_method != METHOD_ERROR for result in response.brand_detections.values())
+
+
+def default_checkpoint_dir() -> Path:
+    return default_cache_dir() / "checkpoints"
+
+
+def request_fingerprint(request: SimpleAnalysisRequest) -> str:
+    """依提示詞、品牌、提供商與模型計算請求指紋"""
+    payload = request.model_dump(exclude=VOLATILE_REQUEST_FIELDS)
+    payload["providers"] = sorted(provider for provider, key in request.api_keys.items() if key)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class CheckpointMismatchError(ValueError):
+    """請求與檢查點記錄的分析不同"""
+
+
+class CheckpointLog:
+    """
+    單次分析的檢查點日誌（JSONL，只附加）
+
+    record() 可從任何執行緒呼叫；每筆寫入後立即 flush 到作業系統，行程
+    崩潰也不會遺失已完成的單元；close() 時 fsync（每筆 fsync 會在事件
+    迴圈中阻塞數毫秒）。
+    """
+
+    def __init__(self, run_id: Optional[str] = None, directory: Optional[Union[str, Path]] = None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        if not RUN_ID_PATTERN.match(self.run_id):
+            raise ValueError(f"Invalid run ID '{self.run_id}' (use letters, digits, '_' or '-')")
+        self.directory = Path(directory) if directory is not None else default_checkpoint_dir()
+        self.path = self.directory / f"{self.run_id}.jsonl"
+        self._lock = threading.Lock()
+        self._file = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def _read_lines(self) -> List[dict]:
+        entries = []
+        with open(self.path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 寫入途中中斷的最後一行
+                    logger.warning(f"Skipping unreadable line {line_no} in checkpoint {self.path}")
+        return entries
+
+    def load_request(self) -> SimpleAnalysisRequest:
+        """讀取檢查點記錄的請求（API 金鑰已移除，續跑時需重新提供）"""
+        entries = self._read_lines()
+        if not entries or entries[0].get("type") != "run":
+            raise ValueError(f"Checkpoint {self.path} has no run header")
+        return SimpleAnalysisRequest.model_validate(entries[0]["request"])
+
+    def load(self) -> CompletedUnits:
+        """讀取已完成的單元；檢查點不存在時返回空字典"""
+        if not self.exists():
+            return {}
+        completed: CompletedUnits = {}
+        for entry in self._read_lines():
+            if entry.get("type") != "unit":
+                continue
+            response = AIProviderResponse.model_validate(entry["response"])
+            if not is_unit_complete(response):
+                continue
+            completed[(entry["prompt_index"], entry["provider"])] = response
+        return completed
+
+    def open(self, request: SimpleAnalysisRequest):
+        """
+        開始寫入；新的檢查點先寫入請求，既有的檢查點確認是同一個分析
+
+        例外：
+            CheckpointMismatchError: 請求與檢查點記錄的分析不同
+        """
+        fingerprint = request_fingerprint(request)
+        with self._lock:
+            if self.exists():
+                entries = self._read_lines()
+                recorded = entries[0].get("fingerprint") if entries else None
+                if recorded != fingerprint:
+                    raise CheckpointMismatchError(
+                        f"Checkpoint {self.run_id} belongs to a different analysis (prompts, brands or models differ)"
+                    )
+                self._file = open(self.path, "a", encoding="utf-8")
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._append({
+                "type": "run",
+                "run_id": self.run_id,
+                "created_at": datetime.now().isoformat(),
+                "fingerprint": fingerprint,
+                "request": request.model_dump(mode="json", exclude={"api_keys"}) | {
+                    "api_keys": {provider: "" for provider, key in request.api_keys.items() if key}
+                },
+            })
+
+    def record(self, prompt_idx: int, provider_name: str, response: AIProviderResponse):
+        """記錄一個成功完成的單元（回應或品牌檢測失敗的單元不記錄）"""
+        if not is_unit_complete(response):
+            return
+        with self._lock:
+            if self._file is None:
+                return
+            self._append({
+                "type": "unit",
+                "prompt_index": prompt_idx,
+                "provider": provider_name,
+                "response": response.model_dump(mode="json"),
+            })
+
+    def _append(self, entry: dict):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    def complete(self):
+        """分析完整結束：關閉並刪除檢查點"""
+        self.delete()
+
+    def delete(self):
+        """刪除檢查點（放棄續跑）"""
+        self.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def list_checkpoints(directory: Optional[Union[str, Path]] = None) -> List[dict]:
+    """
+    列出可續跑的檢查點（依建立時間由新到舊）
+
+    返回：
+        [{"run_id", "created_at", "target_brand", "prompts", "providers", "completed_units"}]
+    """
+    directory = Path(directory) if directory is not None else default_checkpoint_dir()
+    if not directory.exists():
+        return []
+    checkpoints = []
+    for path in directory.glob("*.jsonl"):
+        log = CheckpointLog(path.stem, directory)
+        try:
+            entries = log._read_lines()
+        except OSError as e:
+            logger.warning(f"Failed to read checkpoint {path}: {e}")
+            continue
+        if not entries or entries[0].get("type") != "run":
+            continue
+        header = entries[0]
+        request = header["request"]
+        checkpoints.append({
+            "run_id": log.run_id,
+            "created_at": header.get("created_at", ""),
+            "target_brand": request.get("target_brand", ""),
+            "prompts": len(request.get("prompts", [])),
+            "providers": list(request.get("api_keys", {})),
+            "completed_units": sum(1 for entry in entries if entry.get("type") == "unit"),
+        })
+    return sorted(checkpoints, key=lambda checkpoint: checkpoint["created_at"], reverse=True)
@@ -0,0 +1,150 @@
+"""
+檢測微批次器 - 將多個回應的品牌檢測合併成一次 Gemini 調用
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  submit(text, brands, question)  ← 來自各提示詞/各提供商    │
+│     │                                                   │
+│     ├── 加入待處理批次，返回等待結果的 Future                 │
+│     ├── 批次第一筆：啟動計時器（max_wait 秒後送出）            │
+│     └── 超過 token 預算或筆數上限：立即送出目前批次             │
+│                                                         │
+│  _flush() → run_batch(items) → 依序將結果分派回各 Future     │
+└─────────────────────────────────────────────────────────┘
+
+冗長的檢測說明在每個批次只送一次，大幅減少輸入 token 與 RPM 用量。
+實際的提示詞組裝與解析由 run_batch（SimpleBrandDetector）負責。
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from ..models.analysis import BrandDetectionResult
+from .rate_limiter import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionItem(BaseModel):
+    """批次中的單一檢測項目"""
+    item_id: str
+    text: str
+    brands: List[str]
+    question: str
+
+    @property
+    def estimated_tokens(self) -> int:
+        """此項目在批次提示詞中約佔的 token 數"""
+        return estimate_tokens(self.text) + estimate_tokens(self.question) + 10 * len(self.brands)
+
+
+# run_batch: 檢測項目列表 → 與輸入同順序的結果列表
+BatchRunner = Callable[[List[DetectionItem]], Awaitable[List[Dict[str, BrandDetectionResult]]]]
+
+
+class DetectionBatcher:
+    """
+    檢測微批次器
+
+    作用：在短時間窗口內收集檢測請求，達到時間、token 預算或筆數上限時
+    以一次 run_batch 調用處理整批。
+    """
+
+    def __init__(
+        self,
+        run_batch: BatchRunner,
+        max_wait: float = 0.25,
+        max_batch_tokens: int = 24000,
+        max_batch_size: int = 8
+    ):
+        """
+        參數：
+            run_batch: 處理一整批檢測項目的協程函數
+            max_wait: 批次第一筆進入後最多等待的秒數
+            max_batch_tokens: 單一批次的估計輸入 token 上限
+            max_batch_size: 單一批次的最多項目數
+        """
+        self.run_batch = run_batch
+        self.max_wait = max_wait
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+
+        self._pending: List[DetectionItem] = []
+        self._futures: List[asyncio.Future] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._next_id = 0
+        self._batch_tasks: set = set()
+
+    async def submit(self, text: str, brands: List[str], question: str) -> Dict[str, BrandDetectionResult]:
+        """提交一個檢測請求並等待所屬批次完成"""
+        item = DetectionItem(item_id=f"r{self._next_id}", text=text, brands=brands, question=question)
+        self._next_id += 1
+
+        # 加入後會超出 token 預算時，先送出目前的批次
+        if self._pending and self._pending_tokens + item.estimated_tokens > self.max_batch_tokens:
+            self._flush()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(item)
+        self._futures.append(future)
+        self._pending_tokens += item.estimated_tokens
+
+        if len(self._pending) >= self.max_batch_size or self._pending_tokens >= self.max_batch_tokens:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_wait())
+
+        return await future
+
+    async def _flush_after_wait(self):
+        """時間窗口結束後送出批次"""
+        await asyncio.sleep(self.max_wait)
+        self._timer = None
+        self._flush()
+
+    def _flush(self):
+        """將目前的待處理項目作為一個批次送出"""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+
+        if not self._pending:
+            return
+
+        items, futures = self._pending, self._futures
+        self._pending, self._futures, self._pending_tokens = [], [], 0
+
+        # 保留任務參照，避免批次在完成前被回收
+        task = asyncio.create_task(self._run(items, futures))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run(self, items: List[DetectionItem], futures: List[asyncio.Future]):
+        """執行批次並把結果分派給各請求"""
+        logger.info(f"Running detection batch with {len(items)} responses")
+        results: List[Dict[str, BrandDetectionResult]] = []
+        error: Optional[Exception] = None
+        finished = False
+        try:
+            results = await self.run_batch(items)
+            finished = True
+        except Exception as e:
+            error = e
+        finally:
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+            # 批次失敗、被取消或結果數量不足時，仍要結束其餘的 Future，否則提交者會永遠等待
+            for future in futures:
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                elif finished:
+                    future.set_exception(RuntimeError("Detection batch returned fewer results than requests"))
+                else:
+                    future.cancel()
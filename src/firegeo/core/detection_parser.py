@@ -0,0 +1,442 @@
+"""
+檢測輸出解析 - 結構化輸出的 JSON Schema 與線性時間的 JSON 擷取器
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  檢測 LLM 調用                                            │
+│     ├── Gemini：response_schema（to_gemini_schema 轉換）   │
+│     └── Batch API：OpenAI json_schema / Anthropic 強制工具 │
+│                                                         │
+│  parse_detection_json(模型輸出)                           │
+│     ├── json.loads 整段輸出（結構化輸出的正常情況）           │
+│     └── 失敗 → JsonExtractor 單次掃描擷取：                 │
+│           ├── 只在候選區塊內追蹤字串、跳脫與括號堆疊          │
+│           ├── 括號閉合 → json.loads 該區塊（區塊互不重疊）     │
+│           │     失敗時改為解析其直接子區塊                     │
+│           ├── 輸出被截斷 → 補上未閉合的字串與括號後再試一次     │
+│           └── 區塊失敗 → 從下一個左括號重新掃描（有額度上限）    │
+│     仍失敗 → parse_fallback(模型輸出, 請求的品牌)：             │
+│           ├── 只看前 MAX_FALLBACK_INPUT_CHARS 個字元         │
+│           ├── 品牌名稱的預編譯交替模式（依品牌組合快取）        │
+│           │     + 模組層級預編譯的判斷詞模式，單次 finditer   │
+│           └── 品牌之後 MAX_VERDICT_DISTANCE 字元內的第一個     │
+│                 判斷（true/false 優先於 mentioned/found）    │
+└─────────────────────────────────────────────────────────┘
+
+重新掃描的字元數不超過輸入長度，json.loads 的輸入最多是兩層互不重疊
+的區塊，因此最壞情況也是線性時間。說明文字中的引號或括號不會吞掉
+後面真正的 JSON，舊的一層巢狀正規表達式則常只取到單一檢測項目。
+備用解析只接受請求中的品牌，不會把任意單字當成品牌名稱。
+"""
+
+import functools
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 結構化輸出的 JSON Schema（OpenAI strict 模式：所有欄位必填、不允許額外欄位）
+_DETECTION_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "brand_name": {"type": "string"},
+        "mentioned": {"type": "boolean"},
+        "confidence": {"type": "number"},
+        "reasoning": {"type": "string"},
+    },
+    "required": ["brand_name", "mentioned", "confidence", "reasoning"],
+    "additionalProperties": False,
+}
+
+# 單一回應、多個品牌（_detect_with_llm）
+DETECTIONS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "detections": {"type": "array", "items": _DETECTION_ITEM_SCHEMA},
+    },
+    "required": ["detections"],
+    "additionalProperties": False,
+}
+
+# 多個回應合併成一次調用（_detect_batch_with_llm）
+RESPONSES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "responses": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "detections": {"type": "array", "items": _DETECTION_ITEM_SCHEMA},
+                },
+                "required": ["id", "detections"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["responses"],
+    "additionalProperties": False,
+}
+
+# 單一品牌（detect_single_brand）
+SINGLE_BRAND_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "brand_mentioned": {"type": "boolean"},
+        "confidence": {"type": "number"},
+        "reasoning": {"type": "string"},
+    },
+    "required": ["brand_mentioned", "confidence", "reasoning"],
+    "additionalProperties": False,
+}
+
+# Gemini 的 response_schema 只支援 OpenAPI Schema 的子集
+_GEMINI_UNSUPPORTED_KEYS = {"additionalProperties"}
+
+# 備用解析的輸入上限（字元）；檢測輸出通常只有數 KB，超過的部分不解析
+MAX_FALLBACK_INPUT_CHARS = 32_000
+# 品牌名稱之後多遠內的判斷詞屬於該品牌（字元）
+MAX_VERDICT_DISTANCE = 200
+
+# 判斷詞：布林字面值比描述詞明確（'"mentioned": false' 應取 false）
+_VERDICT_PATTERN = (
+    r"(?P<literal>(?<![\w-])(?:true|false|yes|no)(?![\w-]))"
+    r"|(?P<phrase>(?<![\w-])(?:not\s+mentioned|not\s+found|mentioned|found|absent|present)(?![\w-]))"
+)
+_POSITIVE_VERDICTS = {"true", "yes", "mentioned", "found", "present"}
+_WHITESPACE = re.compile(r"\s+")
+
+_OPENERS = {"{": "}", "[": "]"}
+# 擷取器只需要停在這些字元上，其餘字元整段略過
+_STRUCTURAL_CHARS = re.compile(r'[{}\[\]"\\]')
+
+
+def to_gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """移除 Gemini response_schema 不支援的欄位（遞迴）"""
+    converted = {}
+    for key, value in schema.items():
+        if key in _GEMINI_UNSUPPORTED_KEYS:
+            continue
+        if isinstance(value, dict):
+            value = to_gemini_schema(value)
+        converted[key] = value
+    return converted
+
+
+class JsonExtractor:
+    """
+    從自由文字中擷取 JSON 物件或陣列的單次掃描擷取器
+
+    可分段 feed()（例如串流輸出），狀態跨段保留；以預先編譯的字元類別
+    跳過一般文字。候選區塊外的引號與不成對的右括號視為一般文字。閉合的
+    區塊無法解析時（例如「{ 說明文字 {"detections": ...} }」），改為逐一
+    解析其直接子區塊；子區塊互不重疊，因此總解析量仍不超過輸入長度的兩倍。
+
+    候選區塊失敗（括號種類不符，或區塊與子區塊都無法解析）時，從區塊
+    起點之後的下一個左括號重新掃描，避免說明文字中的引號或括號（如
+    'Note the "{" char. {...}'）吞掉後面真正的 JSON。到結尾仍未閉合且
+    無法修復時，只從落在字串內的下一個左括號重新掃描：字串外的巢狀
+    區塊屬於同一個被截斷的值，修復與子區塊已經處理過，單獨取出只會
+    得到殘缺的片段。重新掃描的字元數以已輸入的字元數為上限，額度用完
+    後改為從失敗處繼續，因此總掃描量不超過輸入長度的兩倍。
+    """
+
+    def __init__(self):
+        self.values: List[Any] = []  # 依出現順序擷取到的值
+        self._parts: List[str] = []  # 目前候選區塊在先前各段的文字
+        self._parts_length = 0
+        self._stack: List[str] = []  # 預期的右括號
+        self._children: List[Tuple[int, int]] = []  # 已閉合的直接子區塊（區塊內的起訖位置）
+        self._child_start = 0
+        self._next_opener: Optional[int] = None  # 區塊起點之後第一個左括號（區塊內的位置）
+        self._next_string_opener: Optional[int] = None  # 區塊起點之後第一個在字串內的左括號
+        self._in_string = False
+        self._escaped = False  # 上一段以字串內的反斜線結尾
+        self._rescan_budget = 0  # 還可以重新掃描的字元數
+
+    def feed(self, text: str) -> List[Any]:
+        """處理一段文字，返回這段文字中完成的值"""
+        self._rescan_budget += len(text)
+        completed = self._scan(text)
+        self.values.extend(completed)
+        return completed
+
+    def finish(self) -> List[Any]:
+        """
+        輸入結束：嘗試修復被截斷的最後一個區塊（補上未閉合的字串與括號）
+
+        修復與子區塊都失敗時，從下一個左括號重新掃描剩下的文字。
+
+        返回：
+            修復、子區塊或重新掃描解析成功的值，否則為空列表
+        """
+        values: List[Any] = []
+        while self._stack:
+            text = "".join(self._parts)
+            repaired = text
+            if self._in_string:
+                if self._escaped:
+                    repaired = repaired[:-1]
+                repaired += '"'
+            repaired = repaired.rstrip().rstrip(",")
+            if repaired.endswith(":"):
+                repaired += " null"
+            value = self._load(repaired + "".join(reversed(self._stack)))
+            recovered = [value] if value is not None else self._load_children(text)
+            if recovered:
+                self._reset()
+                values.extend(recovered)
+                break
+            retry = self._rewind(text, self._next_string_opener)
+            if retry is None:
+                break
+            values.extend(self._scan(retry))
+        self.values.extend(values)
+        return values
+
+    def _scan(self, text: str) -> List[Any]:
+        completed: List[Any] = []
+        while text is not None:
+            text = self._scan_once(text, completed)
+        return completed
+
+    def _scan_once(self, text: str, completed: List[Any]) -> Optional[str]:
+        """
+        掃描一段文字，完成的值加入 completed
+
+        返回：
+            候選區塊失敗且需要重新掃描時，返回要重新掃描的文字（含本段剩餘部分），否則為 None
+        """
+        stack = self._stack
+        start = 0 if stack else None  # 目前候選區塊在本段的起點
+        skip_until = 0  # 被跳脫的字元
+        if self._escaped and text:
+            skip_until, self._escaped = 1, False
+
+        for match in _STRUCTURAL_CHARS.finditer(text):
+            pos = match.start()
+            if pos < skip_until:
+                continue
+            char = match.group()
+            if not stack:
+                # 候選區塊外：只尋找左括號
+                if char in _OPENERS:
+                    stack.append(_OPENERS[char])
+                    start = pos
+                continue
+
+            if self._in_string:
+                if char in _OPENERS and self._next_string_opener is None:
+                    self._next_string_opener = self._parts_length + pos - start
+                    if self._next_opener is None:
+                        self._next_opener = self._next_string_opener
+                elif char == "\\":
+                    skip_until = pos + 2
+                    self._escaped = pos + 1 >= len(text)
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in _OPENERS:
+                if len(stack) == 1:
+                    self._child_start = self._parts_length + pos - start
+                if self._next_opener is None:
+                    self._next_opener = self._parts_length + pos - start
+                stack.append(_OPENERS[char])
+            elif char != stack.pop():
+                # 括號種類不符：不是 JSON，從下一個左括號重新掃描
+                retry = self._rewind("".join(self._parts) + text[start:pos + 1], self._next_opener)
+                if retry is not None:
+                    return retry + text[pos + 1:]
+                start = None
+            elif len(stack) == 1:
+                self._children.append((self._child_start, self._parts_length + pos - start + 1))
+            elif not stack:
+                self._parts.append(text[start:pos + 1])
+                block = "".join(self._parts)
+                values = self._load_block(block)
+                if values:
+                    completed.extend(values)
+                    self._reset()
+                else:
+                    retry = self._rewind(block, self._next_opener)
+                    if retry is not None:
+                        return retry + text[pos + 1:]
+                start = None
+
+        if stack:
+            self._parts.append(text[start:])
+            self._parts_length += len(text) - start
+        return None
+
+    def _rewind(self, block: str, offset: Optional[int]) -> Optional[str]:
+        """
+        放棄失敗的候選區塊
+
+        返回：
+            區塊內從 offset（重新掃描的左括號）開始的文字；沒有左括號或重新掃描額度不足時為 None
+        """
+        self._reset()
+        if offset is None or len(block) - offset > self._rescan_budget:
+            return None
+        self._rescan_budget -= len(block) - offset
+        return block[offset:]
+
+    def _load_block(self, text: str) -> List[Any]:
+        """解析閉合的區塊；失敗時改為解析其直接子區塊"""
+        value = self._load(text)
+        if value is not None:
+            return [value]
+        return self._load_children(text)
+
+    def _load_children(self, text: str) -> List[Any]:
+        values = []
+        for child_start, child_end in self._children:
+            value = self._load(text[child_start:child_end])
+            if value is not None:
+                values.append(value)
+        return values
+
+    def _reset(self):
+        self._parts.clear()
+        self._parts_length = 0
+        self._stack.clear()
+        self._children.clear()
+        self._next_opener = None
+        self._next_string_opener = None
+        self._in_string = False
+        self._escaped = False
+
+    @staticmethod
+    def _load(text: str) -> Optional[Any]:
+        try:
+            return json.loads(text)
+        except (json.JSONDecodeError, RecursionError):
+            return None
+
+
+def extract_json(text: str) -> Optional[Any]:
+    """
+    擷取文字中第一個 JSON 物件；沒有物件時返回第一個陣列，都沒有時返回 None
+
+    掃描到第一個物件即停止。
+    """
+    extractor = JsonExtractor()
+    first_array = None
+    for start in range(0, len(text), 4096):
+        for value in extractor.feed(text[start:start + 4096]):
+            if isinstance(value, dict):
+                return value
+            if first_array is None and isinstance(value, list):
+                first_array = value
+    for value in extractor.finish():
+        if isinstance(value, dict):
+            return value
+        if first_array is None and isinstance(value, list):
+            first_array = value
+    return first_array
+
+
+def parse_detection_json(text: str) -> Optional[Dict[str, Any]]:
+    """
+    解析檢測模型的輸出
+
+    返回：
+        JSON 物件；只找到陣列時包裝成 {"detections": 陣列}；無法解析時返回 None
+    """
+    try:
+        value = json.loads(text)
+    except (json.JSONDecodeError, RecursionError):
+        value = extract_json(text)
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, list):
+        return {"detections": value}
+    return None
+
+
+@functools.lru_cache(maxsize=256)
+def _fallback_pattern(brands: Tuple[str, ...]) -> "re.Pattern[str]":
+    """品牌名稱（長的優先，名稱內的空白可對應任意空白）與判斷詞合併成一個預編譯模式；相同品牌組合重用"""
+    names = sorted({brand for brand in brands if brand.strip()}, key=len, reverse=True)
+    brand_alternation = "|".join(r"\s+".join(re.escape(word) for word in name.split()) for name in names)
+    return re.compile(
+        rf"(?P<brand>(?<!\w)(?:{brand_alternation})(?!\w))|{_VERDICT_PATTERN}",
+        re.IGNORECASE
+    )
+
+
+def parse_fallback(text: str, brands: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    從無法解析為 JSON 的檢測輸出中，找出請求品牌的判斷
+
+    單次掃描：每個品牌出現後、下一個品牌出現前且在 MAX_VERDICT_DISTANCE
+    字元內的判斷詞屬於該品牌，布林字面值優先於描述詞。同一品牌在不同
+    位置的判斷互相矛盾時信心值為 0（級聯時升級重新檢測）；沒有判斷的
+    品牌不列出。
+
+    返回：
+        檢測列表（同 {"detections": [...]} 的項目格式，依 brands 順序）
+    """
+    brands = [brand for brand in dict.fromkeys(brands) if brand.strip()]
+    if not brands or not text:
+        return []
+    if len(text) > MAX_FALLBACK_INPUT_CHARS:
+        logger.warning(f"Fallback parsing only the first {MAX_FALLBACK_INPUT_CHARS} of {len(text)} characters")
+        text = text[:MAX_FALLBACK_INPUT_CHARS]
+
+    canonical = {_WHITESPACE.sub(" ", brand.strip().lower()): brand for brand in brands}
+    verdicts: Dict[str, Tuple[bool, str]] = {}
+    contradicted = set()
+    current: Optional[str] = None  # 正在等待判斷的品牌
+    current_start = 0
+    phrase: Optional[Tuple[bool, int]] = None  # 目前品牌之後的第一個描述詞 (判斷, 結束位置)
+
+    def settle(verdict: Optional[Tuple[bool, int]]):
+        if current is None or verdict is None:
+            return
+        mentioned, end = verdict
+        snippet = _WHITESPACE.sub(" ", text[current_start:end])[:120]
+        previous = verdicts.get(current)
+        if previous is None:
+            verdicts[current] = (mentioned, snippet)
+        elif previous[0] != mentioned:
+            contradicted.add(current)
+
+    for match in _fallback_pattern(tuple(brands)).finditer(text):
+        if current is not None and match.start() - current_start > MAX_VERDICT_DISTANCE:
+            settle(phrase)
+            current, phrase = None, None
+        if match.lastgroup == "brand":
+            settle(phrase)
+            current = canonical.get(_WHITESPACE.sub(" ", match.group().lower()))
+            current_start, phrase = match.start(), None
+        elif current is None:
+            continue
+        elif match.lastgroup == "literal":
+            settle((match.group().lower() in _POSITIVE_VERDICTS, match.end()))
+            current, phrase = None, None
+        elif phrase is None:
+            word = _WHITESPACE.sub(" ", match.group().lower())
+            phrase = (word in _POSITIVE_VERDICTS, match.end())
+    settle(phrase)
+
+    detections = []
+    for brand in brands:
+        if brand not in verdicts:
+            continue
+        mentioned, snippet = verdicts[brand]
+        detection = {
+            "brand_name": brand,
+            "mentioned": mentioned,
+            "reasoning": f"Fallback parsing from: {snippet}",
+        }
+        if brand in contradicted:
+            detection["confidence"] = 0.0
+        detections.append(detection)
+    return detections
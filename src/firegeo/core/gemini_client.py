@@ -0,0 +1,64 @@
+"""
+Gemini 非同步客戶端管理 - 以原生 gRPC asyncio 調用取代執行緒池
+
+架構：
+┌─────────────────────────────────────────────────────────┐
+│  bind_async_client(model, api_key)                       │
+│     │                                                   │
+│     └── get_async_client(api_key)                        │
+│            │                                            │
+│            └── 每個 (事件迴圈, API 金鑰) 共用一個            │
+│                GenerativeServiceAsyncClient（連線重用）    │
+└─────────────────────────────────────────────────────────┘
+
+genai.GenerativeModel.generate_content_async 預設使用 genai.configure
+設定的全域客戶端；gRPC asyncio 通道綁定建立時的事件迴圈，且全域設定
+只能有一把金鑰。因此這裡依事件迴圈與金鑰快取客戶端，並在每次調用前
+綁定到模型上。調用被取消（例如逾時）時，gRPC 請求也會一併取消，
+不會留下背景執行緒。
+"""
+
+import asyncio
+import logging
+import weakref
+
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+from google.api_core import client_options as client_options_lib
+
+logger = logging.getLogger(__name__)
+
+# 事件迴圈 → (API 金鑰 → 非同步客戶端)；事件迴圈被回收時自動移除
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, glm.GenerativeServiceAsyncClient]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_client(api_key: str) -> glm.GenerativeServiceAsyncClient:
+    """取得目前事件迴圈中此 API 金鑰共用的 Gemini 非同步客戶端"""
+    loop = asyncio.get_running_loop()
+    loop_clients = _clients.setdefault(loop, {})
+    client = loop_clients.get(api_key)
+    if client is None:
+        client = glm.GenerativeServiceAsyncClient(
+            transport="grpc_asyncio",
+            client_options=client_options_lib.ClientOptions(api_key=api_key),
+        )
+        loop_clients[api_key] = client
+    return client
+
+
+def bind_async_client(model: genai.GenerativeModel, api_key: str) -> genai.GenerativeModel:
+    """讓模型的 generate_content_async 使用此金鑰在目前事件迴圈中的共用客戶端"""
+    model._async_client = get_async_client(api_key)
+    return model
+
+
+async def close_async_clients():
+    """關閉目前事件迴圈中所有 Gemini 客戶端的 gRPC 通道"""
+    loop_clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in loop_clients.values():
+        try:
+            await client.transport.close()
+        except Exception as e:
+            logger.warning(f"Failed to close Gemini client: {e}")
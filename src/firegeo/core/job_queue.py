@@ -0,0 +1,326 @@
+"""
+分析工作佇列 - 有上限的工作佇列與共用資源的非同步工作者
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  submit(request) → 工作 ID                               │
+│     │  佇列已滿 → JobQueueFullError                       │
+│     ▼                                                   │
+│  asyncio.Queue（上限 queue_size）                         │
+│     │                                                   │
+│     ▼                                                   │
+│  工作者 × workers（同一事件迴圈）                           │
+│     ├── run_analysis(provider_pool, response_cache)      │
+│     │     └── 提供商實例、連線池與回應快取跨工作共用；       │
+│     │         速率限制、自適應並行與斷路器本來就全域共用      │
+│     ├── 進度 → 訂閱者（events）                            │
+│     └── 完成 → 保存結果（移除 API 金鑰）                    │
+│                                                         │
+│  cancel(job_id)：排隊中直接標記取消；執行中取消該工作        │
+└─────────────────────────────────────────────────────────┘
+
+已結束的工作最多保留 max_finished_jobs 筆，超過時移除最舊的。
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .cache import ResponseCache
+from .gemini_client import close_async_clients
+from .pipeline import ProviderPool, create_response_cache, run_analysis
+from ..models.analysis import (
+    AIProviderResponse,
+    AnalysisJobInfo,
+    PromptAnalysisResult,
+    SimpleAnalysisRequest,
+    SimpleAnalysisResult,
+)
+from ..models.config import StreamlitConfig
+
+logger = logging.getLogger(__name__)
+
+# 工作狀態
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobQueueFullError(RuntimeError):
+    """排隊中的工作已達上限"""
+
+
+def redact_api_keys(request: SimpleAnalysisRequest) -> SimpleAnalysisRequest:
+    """移除請求中的 API 金鑰（只保留使用了哪些提供商）"""
+    return request.model_copy(update={"api_keys": {provider: "***" for provider in request.api_keys}})
+
+
+class AnalysisJob:
+    """單一分析工作：請求、進度、結果與事件訂閱者"""
+
+    def __init__(self, request: SimpleAnalysisRequest):
+        self.job_id = uuid.uuid4().hex
+        self.request = request
+        self.status = JOB_QUEUED
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.total_units = 0
+        self.completed_units = 0
+        self.prompt_results: List[PromptAnalysisResult] = []
+        self.result: Optional[SimpleAnalysisResult] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self._subscribers: List[asyncio.Queue] = []
+
+    @property
+    def finished(self) -> bool:
+        return self.status in JOB_FINISHED_STATES
+
+    def info(self) -> AnalysisJobInfo:
+        return AnalysisJobInfo(
+            job_id=self.job_id,
+            status=self.status,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            total_prompts=len(self.request.prompts),
+            completed_prompts=len(self.prompt_results),
+            total_units=self.total_units,
+            completed_units=self.completed_units,
+            error=self.error
+        )
+
+    def publish(self, event: Dict[str, Any]):
+        """將事件送給所有訂閱者"""
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+    def status_event(self) -> Dict[str, Any]:
+        return {"event": "status", **self.info().model_dump(mode="json")}
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished_at = datetime.now()
+        # 結果已保存，不再保留金鑰
+        self.request = redact_api_keys(self.request)
+        self.publish(self.status_event())
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        訂閱工作事件，直到工作結束
+
+        先送出目前狀態與已完成的提示詞結果，之後依序送出：
+        progress（單元完成）、prompt（提示詞完成）、status（狀態改變）
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        # 快照與註冊之間沒有 await，不會漏掉事件
+        snapshot = [self.status_event()] + [
+            {"event": "prompt", "result": prompt_result.model_dump(mode="json")}
+            for prompt_result in self.prompt_results
+        ]
+        if self.finished:
+            for event in snapshot:
+                yield event
+            return
+        self._subscribers.append(queue)
+        try:
+            for event in snapshot:
+                yield event
+            while True:
+                event = await queue.get()
+                yield event
+                if event["event"] == "status" and event["status"] in JOB_FINISHED_STATES:
+                    return
+        finally:
+            self._subscribers.remove(queue)
+
+
+class JobQueue:
+    """
+    有上限的分析工作佇列
+
+    所有工作在同一事件迴圈中執行，共用 ProviderPool 與回應快取；
+    必須在該事件迴圈中呼叫 start() 與 aclose()。
+    """
+
+    def __init__(
+        self,
+        config: Optional[StreamlitConfig] = None,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        max_finished_jobs: Optional[int] = None,
+        default_api_keys: Optional[Dict[str, str]] = None
+    ):
+        """
+        參數：
+            config: 分析設定（並行、快取、批次），預設為 StreamlitConfig()
+            workers / queue_size / max_finished_jobs: 預設取自 config.service_*
+            default_api_keys: 請求未提供 API 金鑰時使用的金鑰（例如服務的環境變數）
+        """
+        self.config = config or StreamlitConfig()
+        self.workers = workers or self.config.service_workers
+        self.queue_size = queue_size or self.config.service_queue_size
+        self.max_finished_jobs = max_finished_jobs or self.config.service_max_finished_jobs
+        self.default_api_keys = default_api_keys or {}
+
+        self.provider_pool = ProviderPool(max_size=self.config.service_max_pooled_providers)
+        self.response_cache: Optional[ResponseCache] = None
+        self.jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._worker_tasks)
+
+    def start(self):
+        """啟動工作者（在服務的事件迴圈中呼叫）"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self.response_cache = create_response_cache(self.config)
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"analysis-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Job queue started with {self.workers} workers (queue size {self.queue_size})")
+
+    async def aclose(self):
+        """停止工作者、取消執行中的工作並關閉共用的連線與快取"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        for job in self.jobs.values():
+            if not job.finished:
+                job.finish(JOB_CANCELLED, "Service shutting down")
+        await self.provider_pool.aclose()
+        await close_async_clients()
+        if self.response_cache is not None:
+            self.response_cache.close()
+            self.response_cache = None
+
+    def submit(self, request: SimpleAnalysisRequest) -> AnalysisJob:
+        """
+        加入分析工作
+
+        例外：
+            RuntimeError: 工作佇列尚未啟動
+            ValueError: 請求沒有提示詞或沒有任何 API 金鑰
+            JobQueueFullError: 排隊中的工作已達上限
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        if not request.api_keys and self.default_api_keys:
+            request = request.model_copy(update={"api_keys": dict(self.default_api_keys)})
+        if not request.prompts:
+            raise ValueError("Request has no prompts")
+        if not request.api_keys:
+            raise ValueError("Request has no API keys and the service has no default keys")
+
+        job = AnalysisJob(request)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(f"Job queue is full ({self.queue_size} queued)") from None
+        self.jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[AnalysisJob]:
+        """取消工作；已結束的工作不受影響。找不到工作時返回 None"""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.status == JOB_QUEUED:
+            # 工作者取出時會略過
+            job.finish(JOB_CANCELLED)
+            self._evict_finished()
+        elif job.task is not None:
+            job.task.cancel()
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        counts = {status: 0 for status in (JOB_QUEUED, JOB_RUNNING, *JOB_FINISHED_STATES)}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pooled_providers": len(self.provider_pool),
+            **counts
+        }
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != JOB_QUEUED:
+                    continue
+                job.task = asyncio.create_task(self._execute(job))
+                try:
+                    await asyncio.wait({job.task})
+                finally:
+                    # 工作者被取消（服務關閉）時一併取消工作
+                    if not job.task.done():
+                        job.task.cancel()
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: AnalysisJob):
+        job.status = JOB_RUNNING
+        job.started_at = datetime.now()
+        job.publish(job.status_event())
+
+        def on_unit_complete(prompt_result: PromptAnalysisResult, response: AIProviderResponse, completed_units: int, total_units: int):
+            job.completed_units = completed_units
+            job.total_units = total_units
+            job.publish({
+                "event": "progress",
+                "prompt_index": prompt_result.prompt_index,
+                "provider": response.provider,
+                "completed_units": completed_units,
+                "total_units": total_units,
+                "error": response.error
+            })
+
+        def on_prompt_complete(prompt_result: PromptAnalysisResult, completed_units: int, total_units: int):
+            job.prompt_results.append(prompt_result)
+            job.publish({"event": "prompt", "result": prompt_result.model_dump(mode="json")})
+
+        try:
+            result = await run_analysis(
+                job.request,
+                self.config,
+                on_unit_complete=on_unit_complete,
+                on_prompt_complete=on_prompt_complete,
+                provider_pool=self.provider_pool,
+                response_cache=self.response_cache
+            )
+        except asyncio.CancelledError:
+            job.finish(JOB_CANCELLED)
+            raise
+        except Exception as e:
+            logger.exception(f"Analysis job {job.job_id} failed")
+            job.finish(JOB_FAILED, str(e) or type(e).__name__)
+        else:
+            job.result = result.model_copy(update={"request": redact_api_keys(result.request)})
+            job.finish(JOB_COMPLETED)
+        finally:
+            self._evict_finished()
+
+    def _evict_finished(self):
+        """已結束的工作超過上限時，移除最早建立的"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
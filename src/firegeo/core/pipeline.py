@@ -0,0 +1,300 @@
+"""
+分析流程 - Streamlit 介面與命令列共用的完整分析執行流程
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  run_analysis(request, config, 回調...)                   │
+│     │                                                   │
+│     ├── create_providers：依金鑰與模型建立 AI 提供商          │
+│     ├── SimpleBrandDetector：檢測備忘 + 本地比對 + Gemini   │
+│     │     級聯（快速模型 → 信心不足才升級；                   │
+│     │     批次檢測時改用 Batch API 提供商）                   │
+│     ├── create_response_cache：持久化回應快取               │
+│     ├── CheckpointLog（選用）：還原已完成的單元，           │
+│     │     每個單元完成即寫入，中斷後可續跑                    │
+│     ├── TokenTracker：分析與檢測共用的用量、成本與延遲統計      │
+│     ├── estimate_analysis_cost：開始前預估成本；設定 budget_usd │
+│     │     時排程器以同一預估器在派發前預留額度                  │
+│     ├── 結束後把實際用量加入 UsageHistory，改善之後的預估       │
+│     ├── AnalysisScheduler.run：並行調度並依完成順序回報        │
+│     └── 結束時關閉提供商連線、Gemini 客戶端與快取              │
+└─────────────────────────────────────────────────────────┘
+
+所有連線都綁定目前的事件迴圈，因此每次分析都在同一個事件迴圈中
+建立並關閉。長期運行的服務（見 server.py）則傳入 ProviderPool 與共用的
+回應快取，讓同一事件迴圈上的多個分析共用連線池，由擁有者統一關閉。
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .checkpoint import CheckpointLog, is_unit_complete
+from .cache import DetectionMemo, ResponseCache, get_detection_memo
+from .gemini_client import close_async_clients
+from .scheduler import (
+    AnalysisScheduler,
+    BatchStatusCallback,
+    PromptCompleteCallback,
+    StreamUpdateCallback,
+    UnitCompleteCallback,
+    close_providers,
+    create_batch_detection_provider,
+    create_providers,
+    estimate_analysis_cost,
+)
+from .ai_providers.base import BaseAIProvider
+from .simple_detector import SimpleBrandDetector
+from .token_tracking import CostEstimator, TokenTracker, get_usage_history
+from ..models.analysis import SimpleAnalysisRequest, SimpleAnalysisResult
+from ..models.config import StreamlitConfig
+
+logger = logging.getLogger(__name__)
+
+
+def create_response_cache(config: StreamlitConfig) -> Optional[ResponseCache]:
+    """依設定開啟持久化回應快取；無法開啟時不使用快取"""
+    if not config.response_cache_enabled:
+        return None
+    try:
+        return ResponseCache(
+            ttl_seconds=config.response_cache_ttl_hours * 3600,
+            max_entries=config.response_cache_max_entries,
+            max_bytes=config.response_cache_max_mb * 1024 * 1024
+        )
+    except Exception as e:
+        logger.warning(f"Response cache unavailable: {e}")
+        return None
+
+
+def create_detection_memo(config: StreamlitConfig) -> DetectionMemo:
+    """取得跨分析共用的檢測備忘；磁碟無法使用時退回記憶體備忘"""
+    if config.detection_memo_persistent:
+        try:
+            return get_detection_memo(persistent=True)
+        except Exception as e:
+            logger.warning(f"Persistent detection memo unavailable: {e}")
+    return get_detection_memo()
+
+
+class ProviderPool:
+    """
+    跨分析共用的提供商實例
+
+    以 (provider_key, model, api_key, 是否對沖) 為鍵，相同設定的分析共用
+    同一個提供商實例與其連線池；速率限制器、自適應並行與斷路器本來就以
+    (provider_key, model) 全域共用。只能在單一事件迴圈中使用。
+
+    最多保留 max_size 個實例，超過時依最近使用順序淘汰最舊的並呼叫 aclose()；
+    仍有分析在使用的實例要等 release_providers() 歸還後才關閉。
+    """
+
+    def __init__(self, max_size: int = 32):
+        self.max_size = max(1, max_size)
+        self._providers: "OrderedDict[Tuple[str, str, str, bool], BaseAIProvider]" = OrderedDict()
+        self._leases: Dict[int, int] = {}
+        self._retired: Dict[int, BaseAIProvider] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _key(provider: BaseAIProvider) -> Tuple[str, str, str, bool]:
+        return (provider.provider_key, provider.selected_model, provider.api_key, provider.hedge_policy.enabled)
+
+    @staticmethod
+    def _label(provider: BaseAIProvider) -> str:
+        return f"{provider.provider_name} {provider.selected_model} #{id(provider)}"
+
+    async def get_providers(self, request: SimpleAnalysisRequest) -> Dict[str, BaseAIProvider]:
+        """
+        取得請求所需的提供商（以顯示名稱為鍵）；已有相同設定的實例時重用
+
+        用完後必須呼叫 release_providers()，被淘汰的實例才能關閉。
+        """
+        requested = create_providers(request)
+        providers: Dict[str, BaseAIProvider] = {}
+        to_close: Dict[str, BaseAIProvider] = {}
+        async with self._lock:
+            for provider_name, provider in requested.items():
+                key = self._key(provider)
+                pooled = self._providers.setdefault(key, provider)
+                self._providers.move_to_end(key)
+                self._leases[id(pooled)] = self._leases.get(id(pooled), 0) + 1
+                providers[provider_name] = pooled
+                if pooled is not provider:
+                    to_close[f"{provider_name} (duplicate)"] = provider
+            # 淘汰最久未使用的實例；本次取得的都在尾端，不會被淘汰
+            while len(self._providers) > self.max_size:
+                _, evicted = self._providers.popitem(last=False)
+                if self._leases.get(id(evicted)):
+                    self._retired[id(evicted)] = evicted
+                else:
+                    to_close[self._label(evicted)] = evicted
+        if to_close:
+            await close_providers(to_close)
+        return providers
+
+    async def release_providers(self, providers: Dict[str, BaseAIProvider]):
+        """歸還 get_providers() 取得的提供商；已被淘汰且不再使用的實例在此關閉"""
+        to_close: Dict[str, BaseAIProvider] = {}
+        async with self._lock:
+            for provider in providers.values():
+                remaining = self._leases.get(id(provider), 0) - 1
+                if remaining > 0:
+                    self._leases[id(provider)] = remaining
+                    continue
+                self._leases.pop(id(provider), None)
+                retired = self._retired.pop(id(provider), None)
+                if retired is not None:
+                    to_close[self._label(retired)] = retired
+        if to_close:
+            await close_providers(to_close)
+
+    def __len__(self) -> int:
+        return len(self._providers)
+
+    async def aclose(self):
+        """關閉所有共用的提供商連線（包含已淘汰但仍未歸還的實例）"""
+        async with self._lock:
+            providers = {
+                self._label(provider): provider
+                for provider in [*self._providers.values(), *self._retired.values()]
+            }
+            self._providers.clear()
+            self._retired.clear()
+            self._leases.clear()
+        await close_providers(providers)
+
+
+def record_usage_history(result: SimpleAnalysisResult):
+    """把分析的實際用量加入用量歷史（供之後的成本預估使用）"""
+    detected_responses = sum(
+        1
+        for prompt_result in result.results_by_prompt
+        for response in prompt_result.ai_responses.values()
+        if not response.error
+    ) - result.resumed_units
+    try:
+        get_usage_history().record(result.token_usage, max(0, detected_responses))
+    except Exception as e:
+        logger.warning(f"Failed to update usage history: {e}")
+
+
+async def run_analysis(
+    request: SimpleAnalysisRequest,
+    config: Optional[StreamlitConfig] = None,
+    on_unit_complete: Optional[UnitCompleteCallback] = None,
+    on_prompt_complete: Optional[PromptCompleteCallback] = None,
+    on_batch_status: Optional[BatchStatusCallback] = None,
+    on_stream_update: Optional[StreamUpdateCallback] = None,
+    provider_pool: Optional[ProviderPool] = None,
+    response_cache: Optional[ResponseCache] = None,
+    checkpoint: Optional[CheckpointLog] = None,
+) -> SimpleAnalysisResult:
+    """
+    執行完整分析
+
+    參數：
+        request: 分析請求（api_keys 決定使用哪些提供商；沒有 Google 金鑰時只使用本地比對）
+        config: 並行、快取與批次設定，預設為 StreamlitConfig()
+        其餘回調同 AnalysisScheduler.run
+        provider_pool: 共用的提供商實例；指定時分析結束後歸還給 pool，不關閉提供商與 Gemini 客戶端
+        response_cache: 共用的回應快取；指定時不另外開啟，結束後也不關閉
+        checkpoint: 檢查點日誌；已記錄的單元直接還原，每個成功的單元完成即寫入，
+            分析完整結束後刪除（中斷或有單元的回應、品牌檢測失敗時保留，以便續跑）
+
+    返回：
+        SimpleAnalysisResult: 完整分析結果
+    """
+    config = config or StreamlitConfig()
+    completed = None
+    if checkpoint is not None:
+        checkpoint.open(request)
+        completed = checkpoint.load()
+        if completed:
+            logger.info(f"Resuming run {checkpoint.run_id}: {len(completed)} units restored from checkpoint")
+
+        def record_unit(prompt_result, response, completed_units, total_units):
+            checkpoint.record(prompt_result.prompt_index, response.provider, response)
+            if on_unit_complete:
+                on_unit_complete(prompt_result, response, completed_units, total_units)
+    else:
+        record_unit = on_unit_complete
+
+    batch_timeout = config.batch_timeout_hours * 3600
+
+    owns_providers = provider_pool is None
+    if provider_pool is not None:
+        providers = await provider_pool.get_providers(request)
+    else:
+        providers = create_providers(request)
+    batch_detection_provider = create_batch_detection_provider(request)
+    # 分析與品牌檢測的用量記錄在同一個追蹤器
+    token_tracker = TokenTracker()
+    cost_estimator = CostEstimator()
+    estimate = estimate_analysis_cost(request, cost_estimator, config)
+    if request.budget_usd is not None and not estimate.within_budget:
+        logger.warning(
+            f"Estimated cost ${estimate.total_cost:.4f} exceeds the budget of ${request.budget_usd:.4f}; "
+            "the run stops dispatching once the budget is reached"
+        )
+    detector = SimpleBrandDetector(
+        request.api_keys.get("google"),
+        model_name=config.detection_model,
+        fast_model_name=config.detection_fast_model,
+        escalation_confidence=config.detection_escalation_confidence,
+        memo=create_detection_memo(config),
+        batch_provider=batch_detection_provider,
+        batch_poll_interval=config.batch_poll_interval,
+        batch_timeout=batch_timeout,
+        token_tracker=token_tracker
+    )
+    owns_cache = response_cache is None
+    if owns_cache:
+        response_cache = create_response_cache(config)
+    scheduler = AnalysisScheduler(
+        providers,
+        detector,
+        max_concurrency=config.max_concurrency,
+        response_cache=response_cache,
+        batch_poll_interval=config.batch_poll_interval,
+        batch_timeout=batch_timeout,
+        token_tracker=token_tracker,
+        cost_estimator=cost_estimator
+    )
+
+    try:
+        result = await scheduler.run(
+            request,
+            on_unit_complete=record_unit,
+            on_prompt_complete=on_prompt_complete,
+            on_batch_status=on_batch_status,
+            on_stream_update=on_stream_update,
+            completed=completed
+        )
+        result.estimated_cost = estimate.total_cost
+        record_usage_history(result)
+        if checkpoint is not None:
+            result.run_id = checkpoint.run_id
+            failed = any(
+                not is_unit_complete(response)
+                for prompt_result in result.results_by_prompt
+                for response in prompt_result.ai_responses.values()
+            )
+            if not failed:
+                checkpoint.complete()
+        return result
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+        # 連線綁定目前的事件迴圈，分析結束時一併關閉（共用的資源由擁有者關閉）
+        if not owns_providers:
+            await provider_pool.release_providers(providers)
+        to_close = dict(providers) if owns_providers else {}
+        if batch_detection_provider is not None:
+            to_close["batch_detection"] = batch_detection_provider
+        await close_providers(to_close)
+        if owns_providers:
+            await close_async_clients()
+        if owns_cache and response_cache is not None:
+            response_cache.close()
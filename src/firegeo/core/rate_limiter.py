@@ -0,0 +1,200 @@
+"""
+速率限制器 - 以令牌桶同時控制每分鐘請求數 (RPM) 與每分鐘 token 數 (TPM)
+
+架構：
+┌─────────────────────────────────────────────────────────┐
+│  get_rate_limiter(provider_key, model)                   │
+│     │                                                   │
+│     └── 全域註冊表：每個 (提供商, 模型) 共用一個 RateLimiter   │
+│            │                                            │
+│            ├── RPM 令牌桶：每次請求消耗 1                   │
+│            └── TPM 令牌桶：每次請求預留估計 token 數         │
+│                           回應後依實際用量多退少補          │
+└─────────────────────────────────────────────────────────┘
+
+同一事件迴圈中的所有任務共用同一組令牌桶；檢查與扣除在同一把
+執行緒鎖內完成，因此多個並行任務（甚至多個 Streamlit 工作階段）
+都不會超發配額。限制值來自 SUPPORTED_PROVIDERS，可用環境變數覆寫：
+    - OPENAI_RPM / OPENAI_TPM：只覆寫提供商預設值，不影響有個別設定的模型
+    - GOOGLE_GEMINI_2_5_FLASH_LITE_RPM 等：覆寫單一模型
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+import logging
+from typing import Dict, Optional, Tuple
+
+from ..models.config import SUPPORTED_PROVIDERS, RateLimitConfig
+
+logger = logging.getLogger(__name__)
+
+# 尚未得知實際輸出長度時，為每次請求預留的輸出 token 數
+EXPECTED_OUTPUT_TOKENS = 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估計文本的 token 數（約 4 個字元 = 1 token）"""
+    return len(text) // 4 + 1 if text else 0
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    容量為每分鐘配額，以 capacity / 60 的速度持續補充。
+    允許暫時為負（事後補扣實際用量），之後的請求會等待補回。
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.refill_per_second = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        """依經過時間補充令牌"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """取得 amount 個令牌前還需等待的秒數（0 表示可立即取得）"""
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+
+class RateLimiter:
+    """
+    RPM + TPM 速率限制器
+
+    作用：
+        - acquire(): 在送出請求前等待，直到兩個令牌桶都有足夠額度
+        - settle(): 回應後以實際 token 數修正預留量
+    rpm / tpm 為 0 表示不限制。
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._request_bucket = TokenBucket(rpm) if rpm > 0 else None
+        self._token_bucket = TokenBucket(tpm) if tpm > 0 else None
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: int) -> float:
+        """嘗試同時扣除兩個令牌桶；成功返回 0，否則返回需等待的秒數"""
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+
+            if self._request_bucket:
+                self._request_bucket.refill(now)
+                wait = max(wait, self._request_bucket.wait_time(1))
+
+            if self._token_bucket:
+                self._token_bucket.refill(now)
+                # 單次請求超過整分鐘配額時，最多等待桶滿即可
+                amount = min(tokens, self._token_bucket.capacity)
+                wait = max(wait, self._token_bucket.wait_time(amount))
+
+            if wait > 0:
+                return wait
+
+            if self._request_bucket:
+                self._request_bucket.tokens -= 1
+            if self._token_bucket:
+                self._token_bucket.tokens -= tokens
+            return 0.0
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """
+        等待直到可以送出一個使用約 tokens 個 token 的請求
+
+        返回：
+            float: 實際等待的秒數
+        """
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def settle(self, reserved_tokens: int, actual_tokens: int):
+        """以實際 token 用量修正先前的預留量（多退少補）"""
+        if not self._token_bucket:
+            return
+        with self._lock:
+            self._token_bucket.refill(time.monotonic())
+            self._token_bucket.tokens = min(
+                self._token_bucket.capacity,
+                self._token_bucket.tokens + reserved_tokens - actual_tokens
+            )
+
+
+# 全域註冊表：(provider_key, model) → RateLimiter
+_registry: Dict[Tuple[str, str], RateLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def _apply_env_override(limit: RateLimitConfig, env_prefix: str) -> RateLimitConfig:
+    """以 <env_prefix>_RPM / <env_prefix>_TPM 環境變數覆寫限制值"""
+    rpm = os.getenv(f"{env_prefix}_RPM")
+    tpm = os.getenv(f"{env_prefix}_TPM")
+    if not (rpm or tpm):
+        return limit
+    return RateLimitConfig(
+        rpm=int(rpm) if rpm else limit.rpm,
+        tpm=int(tpm) if tpm else limit.tpm
+    )
+
+
+def _model_env_prefix(provider_key: str, model: str) -> str:
+    """單一模型的環境變數前綴，例如 google / gemini-2.5-flash-lite → GOOGLE_GEMINI_2_5_FLASH_LITE"""
+    return re.sub(r"[^0-9A-Za-z]+", "_", f"{provider_key}_{model}").upper()
+
+
+def resolve_rate_limit(provider_key: str, model: str) -> RateLimitConfig:
+    """
+    取得指定提供商與模型的速率限制設定
+
+    優先順序：模型環境變數 > 模型設定 > 提供商環境變數 > 提供商設定。
+    提供商環境變數（例如 GOOGLE_RPM）只覆寫提供商預設值，
+    不會把 gemini-2.5-flash-lite 等限制較高的模型壓到同一個值。
+    """
+    provider_info = SUPPORTED_PROVIDERS.get(provider_key)
+    if provider_info is None:
+        limit = _apply_env_override(RateLimitConfig(), provider_key.upper())
+    elif model in provider_info.model_rate_limits:
+        limit = provider_info.model_rate_limits[model]
+    else:
+        limit = _apply_env_override(provider_info.rate_limit, provider_key.upper())
+    return _apply_env_override(limit, _model_env_prefix(provider_key, model))
+
+
+def get_rate_limiter(provider_key: str, model: str) -> RateLimiter:
+    """取得 (提供商, 模型) 共用的速率限制器，首次使用時建立"""
+    key = (provider_key, model)
+    with _registry_lock:
+        limiter = _registry.get(key)
+        if limiter is None:
+            limit = resolve_rate_limit(provider_key, model)
+            limiter = RateLimiter(rpm=limit.rpm, tpm=limit.tpm)
+            _registry[key] = limiter
+            logger.info(f"Rate limiter for {provider_key}/{model}: {limit.rpm} RPM, {limit.tpm} TPM")
+        return limiter
+
+
+def reset_rate_limiters(provider_key: Optional[str] = None):
+    """清除註冊表中的限制器（設定變更後重新載入）"""
+    with _registry_lock:
+        if provider_key is None:
+            _registry.clear()
+        else:
+            for key in [k for k in _registry if k[0] == provider_key]:
+                del _registry[key]
@@ -0,0 +1,729 @@
+"""
+分析排程器 - 並行調度所有 (提示詞, 提供商) 組合
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│                  AnalysisScheduler                       │
+├─────────────────────────────────────────────────────────┤
+│  1. 為每個 (提示詞, 提供商) 組合建立一個任務                  │
+│  2. 每個任務先取得提供商信號量，再取得全域信號量               │
+│     （實際並行數由提供商的 AIMD 控制器自適應調整）            │
+│  3. 查詢回應快取 → 未命中才調用 AI；回應到達即釋放信號量，      │
+│     再執行品牌檢測（受檢測器自己的並行與速率限制）              │
+│     (process_single_provider)                           │
+│  4. 依完成順序回報進度，結果依提示詞順序存放                   │
+│                                                         │
+│  批次模式 (execution_mode="batch")：                        │
+│     支援 Batch API 的提供商不佔用信號量，各單元向該提供商的       │
+│     BatchCollector 登記；所有單元到齊後整批送出，結果回來後照常    │
+│     執行品牌檢測                                            │
+│                                                         │
+│  串流 (stream_responses)：                                 │
+│     回應逐段到達時以增量比對器暫定已提及的品牌並回報              │
+│     (on_stream_update)；完整文本到齊後才執行正式的品牌檢測       │
+│                                                         │
+│  用量追蹤 (TokenTracker)：                                  │
+│     每次實際的提供商調用（不含快取命中）記錄 token、成本、        │
+│     延遲與首段延遲；檢測器的 LLM 調用記錄在同一個追蹤器          │
+│                                                         │
+│  成本上限 (budget_usd)：                                    │
+│     快取未命中、即將調用前以 CostEstimator 預估單元成本並向       │
+│     BudgetGuard 預留；加上進行中的預估會超過上限時等待它們結算，   │
+│     已花費 + 本單元的預估超過上限時不再派發，                    │
+│     單元以 error_type="budget" 結束（檢查點不記錄，可提高上限續跑）│
+└─────────────────────────────────────────────────────────┘
+
+總耗時從「各提示詞延遲的總和」降為接近「最慢的單一調用」，
+同時受全域與各提供商的並行上限保護。
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime
+from typing import AsyncContextManager, Callable, Dict, List, Optional, Tuple
+
+from .ai_providers import (
+    BaseAIProvider,
+    ProviderCompletion,
+    ProviderError,
+    OpenAIProvider,
+    AnthropicProvider,
+    GoogleProvider,
+    PerplexityProvider,
+    BatchCollector,
+    BatchStatus,
+    BudgetExceededError,
+)
+from .cache import ResponseCache, CACHE_USE, CACHE_BYPASS
+from .simple_detector import SimpleBrandDetector
+from .brand_matcher import get_brand_matcher
+from .rate_limiter import estimate_tokens
+from .token_tracking import BudgetGuard, CostEstimator, ProviderPlan, TokenTracker
+from .token_tracking.history import DETECTION_PROVIDER_SUFFIX
+from ..models.analysis import (
+    CostEstimate,
+    SimpleAnalysisRequest,
+    SimpleAnalysisResult,
+    AIProviderResponse,
+    PromptAnalysisResult,
+    TokenUsage,
+)
+from ..models.config import SUPPORTED_PROVIDERS, StreamlitConfig, HedgePolicy
+
+logger = logging.getLogger(__name__)
+
+# 單元完成回調：(部分提示詞結果, 剛完成的回應, 已完成單元數, 總單元數)
+UnitCompleteCallback = Callable[[PromptAnalysisResult, AIProviderResponse, int, int], None]
+
+# 提示詞完成回調：(提示詞結果, 已完成單元數, 總單元數)
+PromptCompleteCallback = Callable[[PromptAnalysisResult, int, int], None]
+
+# 批次狀態回調：(提供商名稱, 批次狀態)
+BatchStatusCallback = Callable[[str, BatchStatus], None]
+
+# 串流更新回調：(提示詞索引, 提供商名稱, 目前文字, 暫定已提及的品牌 → 出現的名稱)
+StreamUpdateCallback = Callable[[int, str, str, Dict[str, str]], None]
+
+# 單一單元的串流回調：(目前文字, 暫定已提及的品牌 → 出現的名稱)
+UnitStreamCallback = Callable[[str, Dict[str, str]], None]
+
+# 執行模式
+EXECUTION_INTERACTIVE = "interactive"  # 即時調用所有提供商
+EXECUTION_BATCH = "batch"              # 支援的提供商改用 Batch API（較便宜、不佔同步速率限制）
+EXECUTION_MODES = (EXECUTION_INTERACTIVE, EXECUTION_BATCH)
+
+# 透過 Batch API 執行品牌檢測時使用的模型（依序選用第一個有金鑰的提供商）
+BATCH_DETECTION_MODELS = {
+    "openai": "gpt-4o-mini",
+    "anthropic": "claude-3-5-haiku-20241022",
+}
+
+
+# 提供商鍵 → (提供商類別, 未選擇模型時的預設模型)，依此順序建立與顯示
+PROVIDER_CLASSES = {
+    "openai": (OpenAIProvider, "gpt-4o"),
+    "anthropic": (AnthropicProvider, "claude-sonnet-4-20250514"),
+    "google": (GoogleProvider, "gemini-2.5-flash"),
+    "perplexity": (PerplexityProvider, "sonar"),
+}
+
+
+def create_providers(request: SimpleAnalysisRequest) -> Dict[str, BaseAIProvider]:
+    """依請求中的 API 金鑰和選定模型初始化 AI 提供商"""
+    providers: Dict[str, BaseAIProvider] = {}
+    for provider_key, (provider_class, default_model) in PROVIDER_CLASSES.items():
+        if request.api_keys.get(provider_key):
+            model = request.selected_models.get(provider_key, default_model)
+            provider = provider_class(request.api_keys[provider_key], model)
+            providers[provider.provider_name] = provider
+    for provider in providers.values():
+        provider.hedge_policy = HedgePolicy(enabled=request.hedge_requests)
+    return providers
+
+
+def plan_providers(request: SimpleAnalysisRequest) -> Dict[str, ProviderPlan]:
+    """不建立提供商實例，列出分析將使用的提供商與模型（成本預估用）"""
+    plans: Dict[str, ProviderPlan] = {}
+    for provider_key, (provider_class, default_model) in PROVIDER_CLASSES.items():
+        if request.api_keys.get(provider_key):
+            plans[SUPPORTED_PROVIDERS[provider_key].display_name] = ProviderPlan(
+                provider_key=provider_key,
+                model=request.selected_models.get(provider_key, default_model),
+                batch=request.execution_mode == EXECUTION_BATCH and provider_class.supports_batch
+            )
+    return plans
+
+
+def plan_detection(
+    request: SimpleAnalysisRequest,
+    config: Optional[StreamlitConfig] = None
+) -> Tuple[Optional[str], Optional[str], bool, str]:
+    """
+    品牌檢測將使用的 LLM（與 create_batch_detection_provider / SimpleBrandDetector 的選擇一致）
+
+    返回：
+        (首先使用的模型，只用本地比對時為 None；級聯升級的模型，未級聯時為 None；
+         是否透過 Batch API；用量記錄中的名稱)
+    """
+    config = config or StreamlitConfig()
+    if request.execution_mode == EXECUTION_BATCH and request.batch_detection:
+        for provider_key, model in BATCH_DETECTION_MODELS.items():
+            if request.api_keys.get(provider_key):
+                label = SUPPORTED_PROVIDERS[provider_key].display_name + DETECTION_PROVIDER_SUFFIX
+                return model, None, True, label
+    if request.api_keys.get("google"):
+        label = "Google" + DETECTION_PROVIDER_SUFFIX
+        fast_model = config.detection_fast_model
+        if fast_model and fast_model != config.detection_model:
+            return fast_model, config.detection_model, False, label
+        return config.detection_model, None, False, label
+    return None, None, False, ""
+
+
+def estimate_analysis_cost(
+    request: SimpleAnalysisRequest,
+    estimator: Optional[CostEstimator] = None,
+    config: Optional[StreamlitConfig] = None
+) -> CostEstimate:
+    """分析開始前預估用量與成本（不建立提供商、不發出任何請求）"""
+    estimator = estimator or CostEstimator()
+    detection_model, escalation_model, detection_batch, detection_label = plan_detection(request, config)
+    return estimator.estimate(
+        request,
+        plan_providers(request),
+        detection_model,
+        detection_batch,
+        detection_label,
+        escalation_model
+    )
+
+
+def create_batch_detection_provider(request: SimpleAnalysisRequest) -> Optional[BaseAIProvider]:
+    """
+    為批次品牌檢測建立提供商
+
+    只有批次模式且啟用 batch_detection 時才建立；沒有可用金鑰時返回 None
+    （檢測器照常使用 Gemini 或本地比對）。
+    """
+    if request.execution_mode != EXECUTION_BATCH or not request.batch_detection:
+        return None
+    for provider_key, model in BATCH_DETECTION_MODELS.items():
+        if request.api_keys.get(provider_key):
+            provider_class, _ = PROVIDER_CLASSES[provider_key]
+            return provider_class(request.api_keys[provider_key], model)
+    return None
+
+
+async def close_providers(providers: Dict[str, BaseAIProvider]):
+    """關閉所有提供商的連線資源（個別失敗不影響其他提供商）"""
+    results = await asyncio.gather(
+        *(provider.aclose() for provider in providers.values()),
+        return_exceptions=True
+    )
+    for provider_name, outcome in zip(providers, results):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Failed to close {provider_name}: {outcome}")
+
+
+def default_provider_limits() -> Dict[str, int]:
+    """
+    從 SUPPORTED_PROVIDERS 取得各提供商的並行上限（以顯示名稱為鍵）
+
+    實際同時進行的請求數由各提供商的自適應控制器決定，這裡只是上限。
+    """
+    return {
+        info.display_name: info.max_adaptive_concurrency
+        for info in SUPPORTED_PROVIDERS.values()
+    }
+
+
+class AnalysisScheduler:
+    """
+    分析排程器
+
+    作用：將整個分析拆成 (提示詞, 提供商) 單元並同時派發
+    - 全域並行上限：限制同時進行的單元總數
+    - 提供商並行上限：避免單一提供商被同時大量請求
+    - 結果依提示詞順序輸出
+    """
+
+    def __init__(
+        self,
+        providers: Dict[str, BaseAIProvider],
+        detector: SimpleBrandDetector,
+        max_concurrency: Optional[int] = None,
+        provider_limits: Optional[Dict[str, int]] = None,
+        response_cache: Optional[ResponseCache] = None,
+        batch_poll_interval: Optional[float] = None,
+        batch_timeout: Optional[float] = None,
+        token_tracker: Optional[TokenTracker] = None,
+        cost_estimator: Optional[CostEstimator] = None,
+    ):
+        """
+        初始化排程器
+
+        參數：
+            providers: 提供商名稱 → 提供商實例
+            detector: 品牌檢測器
+            max_concurrency: 全域並行上限，預設取自 StreamlitConfig
+            provider_limits: 提供商名稱 → 並行上限，預設取自 SUPPORTED_PROVIDERS
+            response_cache: 回應快取，None 表示不使用快取
+            batch_poll_interval: 批次模式查詢批次狀態的間隔（秒），預設取自 StreamlitConfig
+            batch_timeout: 批次模式等待批次完成的上限（秒），預設取自 StreamlitConfig
+            token_tracker: 用量追蹤器（可與檢測器共用），預設建立新的；每次 run 開始時清空
+            cost_estimator: 請求設定 budget_usd 時預估單元成本，預設使用共用的用量歷史
+        """
+        self.providers = providers
+        self.detector = detector
+        self.max_concurrency = max_concurrency or StreamlitConfig().max_concurrency
+        self.provider_limits = provider_limits or default_provider_limits()
+        self.response_cache = response_cache
+        self.cache_stats: Dict[str, int] = {}
+        config = StreamlitConfig()
+        self.batch_poll_interval = batch_poll_interval or config.batch_poll_interval
+        self.batch_timeout = batch_timeout or config.batch_timeout_hours * 3600
+        self.batch_collectors: Dict[str, BatchCollector] = {}
+        self.token_tracker = token_tracker or TokenTracker()
+        self.cost_estimator = cost_estimator
+        self.budget: Optional[BudgetGuard] = None
+
+    async def run(
+        self,
+        request: SimpleAnalysisRequest,
+        on_unit_complete: Optional[UnitCompleteCallback] = None,
+        on_prompt_complete: Optional[PromptCompleteCallback] = None,
+        on_batch_status: Optional[BatchStatusCallback] = None,
+        on_stream_update: Optional[StreamUpdateCallback] = None,
+        completed: Optional[Dict[Tuple[int, str], AIProviderResponse]] = None,
+    ) -> SimpleAnalysisResult:
+        """
+        執行完整分析
+
+        參數：
+            request: 分析請求
+            on_unit_complete: 每個 (提示詞, 提供商) 單元完成時的回調（依完成順序）
+            on_prompt_complete: 某提示詞的所有提供商都完成時的回調（依完成順序）
+            on_batch_status: 批次模式下每次查詢到批次狀態時的回調
+            on_stream_update: 啟用 stream_responses 時，每收到一段回應文字的回調
+            completed: 續跑時已完成的單元 (提示詞索引, 提供商名稱) → 回應；直接填入結果，
+                不再派發，也不觸發回調
+
+        返回：
+            SimpleAnalysisResult: results_by_prompt 依提示詞順序排列
+        """
+        start_time = datetime.now()
+        self.cache_stats = {"hits": 0, "misses": 0, "writes": 0}
+        self.token_tracker.clear_history()
+        self.budget = None
+        if request.budget_usd is not None:
+            self.cost_estimator = self.cost_estimator or CostEstimator()
+            self.budget = BudgetGuard(request.budget_usd, self.token_tracker)
+
+        result = SimpleAnalysisResult(
+            request=request,
+            total_prompts=len(request.prompts)
+        )
+
+        # 信號量在執行中的事件迴圈內建立
+        global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        provider_semaphores = {
+            name: asyncio.Semaphore(max(1, self.provider_limits.get(name, self.max_concurrency)))
+            for name in self.providers
+        }
+
+        # 續跑：只保留仍屬於這次分析的已完成單元
+        restored = {
+            (prompt_idx, provider_name): response
+            for (prompt_idx, provider_name), response in (completed or {}).items()
+            if 0 <= prompt_idx < len(request.prompts) and provider_name in self.providers
+        }
+        pending_by_provider = {
+            name: sum(1 for prompt_idx in range(len(request.prompts)) if (prompt_idx, name) not in restored)
+            for name in self.providers
+        }
+
+        # 批次模式：每個支援 Batch API 的提供商一個收集器，所有提示詞到齊後整批送出
+        self.batch_collectors = {}
+        if request.execution_mode == EXECUTION_BATCH:
+            self.batch_collectors = {
+                name: BatchCollector(
+                    provider,
+                    expected=pending_by_provider[name],
+                    poll_interval=self.batch_poll_interval,
+                    timeout=self.batch_timeout,
+                    on_status=on_batch_status
+                )
+                for name, provider in self.providers.items()
+                if provider.supports_batch and pending_by_provider[name]
+            }
+
+        async def run_unit(prompt_idx: int, provider_name: str) -> Tuple[int, str, AIProviderResponse]:
+            if provider_name in self.batch_collectors:
+                # 批次單元須全部同時登記才會送出，因此不佔用信號量
+                response = await self.process_single_provider(
+                    provider_name,
+                    self.providers[provider_name],
+                    request.prompts[prompt_idx],
+                    request
+                )
+                return prompt_idx, provider_name, response
+
+            on_stream = None
+            if request.stream_responses and on_stream_update is not None:
+                def on_stream(text: str, mentioned: Dict[str, str]):
+                    on_stream_update(prompt_idx, provider_name, text, mentioned)
+
+            @contextlib.asynccontextmanager
+            async def provider_slot():
+                # 先取得提供商名額再佔用全域名額，避免等待中的任務佔住全域名額
+                async with provider_semaphores[provider_name]:
+                    async with global_semaphore:
+                        yield
+
+            response = await self.process_single_provider(
+                provider_name,
+                self.providers[provider_name],
+                request.prompts[prompt_idx],
+                request,
+                on_stream=on_stream,
+                slot=provider_slot()
+            )
+            return prompt_idx, provider_name, response
+
+        # 預先建立所有提示詞結果，完成的回應會即時填入（部分結果）
+        result.results_by_prompt = [
+            PromptAnalysisResult(prompt=prompt, prompt_index=prompt_idx)
+            for prompt_idx, prompt in enumerate(request.prompts)
+        ]
+        for (prompt_idx, provider_name), response in restored.items():
+            result.results_by_prompt[prompt_idx].ai_responses[provider_name] = response
+            if response.token_usage is not None:
+                # 續跑時已完成單元的花費仍計入本次分析
+                self.token_tracker.add(response.token_usage)
+        for prompt_result in result.results_by_prompt:
+            if self.providers and len(prompt_result.ai_responses) == len(self.providers):
+                prompt_result.ai_responses = {
+                    name: prompt_result.ai_responses[name] for name in self.providers
+                }
+                result.completed_prompts += 1
+        result.resumed_units = len(restored)
+
+        # 一次派發所有尚未完成的 (提示詞, 提供商) 組合
+        unit_tasks: List[asyncio.Task] = [
+            asyncio.create_task(run_unit(prompt_idx, provider_name))
+            for prompt_idx in range(len(request.prompts))
+            for provider_name in self.providers
+            if (prompt_idx, provider_name) not in restored
+        ]
+        total_units = len(unit_tasks) + len(restored)
+        completed_units = len(restored)
+
+        try:
+            # 依完成順序處理結果，最快的提供商決定 UI 的反應速度
+            for next_done in asyncio.as_completed(unit_tasks):
+                prompt_idx, provider_name, response = await next_done
+                prompt_result = result.results_by_prompt[prompt_idx]
+                prompt_result.ai_responses[provider_name] = response
+                completed_units += 1
+
+                if on_unit_complete:
+                    on_unit_complete(prompt_result, response, completed_units, total_units)
+
+                if len(prompt_result.ai_responses) == len(self.providers):
+                    # 提示詞完成後依提供商順序排列，確保顯示穩定
+                    prompt_result.ai_responses = {
+                        name: prompt_result.ai_responses[name] for name in self.providers
+                    }
+                    result.completed_prompts += 1
+
+                    if on_prompt_complete:
+                        on_prompt_complete(prompt_result, completed_units, total_units)
+        finally:
+            # 發生例外或被取消時，清理尚未完成的任務
+            for task in unit_tasks:
+                if not task.done():
+                    task.cancel()
+
+        if self.response_cache is not None and request.cache_mode != CACHE_BYPASS:
+            result.cache_stats = dict(self.cache_stats)
+        if getattr(self.detector, "memo", None) is not None:
+            result.cache_stats["detection_memo_hits"] = self.detector.memo_hits
+        all_responses = [
+            response
+            for prompt_result in result.results_by_prompt
+            for response in prompt_result.ai_responses.values()
+        ]
+        if request.hedge_requests:
+            result.hedge_stats = {
+                "hedged": sum(response.hedged_requests for response in all_responses),
+                "hedge_wins": sum(1 for response in all_responses if response.hedge_won),
+            }
+        result.token_usage = list(self.token_tracker.usage_history)
+        result.total_cost = self.token_tracker.get_total_cost()
+        result.usage_by_provider = self.token_tracker.get_usage_by_provider()
+        if self.budget is not None:
+            result.budget_skipped_units = self.budget.skipped
+            if self.budget.skipped:
+                logger.warning(
+                    f"Budget of ${request.budget_usd:.4f} reached: {self.budget.skipped} unit(s) not dispatched"
+                )
+        result.concurrency_limits = {
+            name: provider.concurrency_limiter.limit for name, provider in self.providers.items()
+        }
+        result.circuit_states = {
+            name: provider.circuit_breaker.state for name, provider in self.providers.items()
+        }
+        logger.info(f"Adaptive concurrency limits after run: {result.concurrency_limits}")
+        result.analysis_duration = (datetime.now() - start_time).total_seconds()
+        return result
+
+    async def process_single_provider(
+        self,
+        provider_name: str,
+        provider: BaseAIProvider,
+        prompt: str,
+        request: SimpleAnalysisRequest,
+        on_stream: Optional[UnitStreamCallback] = None,
+        slot: Optional[AsyncContextManager] = None
+    ) -> AIProviderResponse:
+        """
+        處理單個 AI 提供商的完整流程（快取查詢 + AI 調用 + 品牌檢測）
+
+        提供商調用失敗時不執行品牌檢測，錯誤類型記錄在 error / error_type。
+        提供 on_stream 時以串流調用提供商，品牌檢測仍在完整文本到齊後執行。
+        slot（提供商 / 全域名額）只在取得回應期間持有；品牌檢測在名額釋放後
+        執行，不會讓提供商名額閒置等待檢測。
+        實際調用的用量記錄在 token_tracker 並附在 token_usage；processing_time 為整個單元的耗時。
+        """
+        started = time.monotonic()
+        try:
+            # 1. 獲取 AI 回應（快取命中時不調用提供商）
+            async with slot or contextlib.nullcontext():
+                completion, cached, reserved = await self._get_response(
+                    provider_name, provider, prompt, request, on_stream
+                )
+            ai_response_text = completion.text
+        except ProviderError as e:
+            return AIProviderResponse(
+                provider=provider_name,
+                model=provider.selected_model,
+                prompt=prompt,
+                response_text="",
+                processing_time=time.monotonic() - started,
+                error=str(e),
+                error_type=e.error_type,
+                attempts=e.attempts
+            )
+        token_usage = None if cached else self._track_usage(provider_name, provider, prompt, completion)
+
+        try:
+            # 2. 執行品牌檢測
+            brand_detections = await self.detector.detect_multiple_brands(
+                text=ai_response_text,
+                target_brand=request.target_brand,
+                competitors=request.competitors,
+                question=prompt,
+                aliases=request.brand_aliases
+            )
+
+            # 3. 創建回應對象
+            return AIProviderResponse(
+                provider=provider_name,
+                model=provider.selected_model,
+                prompt=prompt,
+                response_text=ai_response_text,
+                brand_detections=brand_detections,
+                token_usage=token_usage,
+                processing_time=time.monotonic() - started,
+                cached=cached,
+                batch=completion.batch,
+                attempts=completion.attempts,
+                hedged_requests=completion.hedged_requests,
+                hedge_won=completion.hedge_won
+            )
+
+        except Exception as e:
+            logger.error(f"Error processing {provider_name}: {e}")
+            return AIProviderResponse(
+                provider=provider_name,
+                model=getattr(provider, 'selected_model', 'unknown'),
+                prompt=prompt,
+                response_text=ai_response_text,
+                token_usage=token_usage,
+                processing_time=time.monotonic() - started,
+                error=str(e),
+                error_type="detection",
+                attempts=completion.attempts
+            )
+        finally:
+            # 檢測完成後實際用量都已記錄，釋放預留的預估成本
+            await self._release_budget(reserved)
+
+    def _track_usage(
+        self,
+        provider_name: str,
+        provider: BaseAIProvider,
+        prompt: str,
+        completion: ProviderCompletion
+    ) -> TokenUsage:
+        """
+        記錄一次實際的提供商調用
+
+        以請求時選定的模型查詢定價（API 回傳的模型名稱可能帶有日期後綴）；
+        提供商未回傳用量時以本地估計代替並標記 estimated。
+        """
+        prompt_tokens, completion_tokens = completion.prompt_tokens, completion.completion_tokens
+        estimated = not completion.has_usage
+        if estimated:
+            prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion.text)
+        return self.token_tracker.track_usage(
+            provider_name,
+            provider.selected_model,
+            prompt_tokens,
+            completion_tokens,
+            search_requests=completion.search_requests,
+            hedged_requests=completion.hedged_requests,
+            latency=completion.latency,
+            time_to_first_byte=completion.time_to_first_byte,
+            batch=completion.batch,
+            estimated=estimated
+        )
+
+    async def _get_response(
+        self,
+        provider_name: str,
+        provider: BaseAIProvider,
+        prompt: str,
+        request: SimpleAnalysisRequest,
+        on_stream: Optional[UnitStreamCallback] = None
+    ) -> Tuple[ProviderCompletion, bool, float]:
+        """
+        依快取模式取得回應
+
+        返回：
+            (回應, 是否來自快取, 向成本上限預留的預估成本)；快取命中時 attempts 與預留皆為 0
+
+        例外：
+            ProviderError: 提供商調用失敗（失敗結果不寫入快取）
+            BudgetExceededError: 已達成本上限，未調用提供商
+        """
+        cache = self.response_cache
+        if cache is None or request.cache_mode == CACHE_BYPASS:
+            reserved = await self._reserve_budget(provider_name, provider, prompt, request)
+            try:
+                return await self._complete(provider_name, provider, prompt, request, on_stream), False, reserved
+            except BaseException:
+                await self._release_budget(reserved)
+                raise
+
+        key = cache.make_key(
+            provider.provider_key or provider_name,
+            provider.selected_model,
+            prompt,
+            provider.temperature,
+            provider.max_tokens
+        )
+
+        if request.cache_mode == CACHE_USE:
+            try:
+                cached_text = await cache.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache read failed: {e}")
+                cached_text = None
+            if cached_text is not None:
+                self.cache_stats["hits"] += 1
+                if provider_name in self.batch_collectors:
+                    self.batch_collectors[provider_name].skip()
+                return ProviderCompletion(text=cached_text, model=provider.selected_model, attempts=0), True, 0.0
+        self.cache_stats["misses"] += 1
+
+        reserved = await self._reserve_budget(provider_name, provider, prompt, request)
+        try:
+            completion = await self._complete(provider_name, provider, prompt, request, on_stream)
+        except BaseException:
+            await self._release_budget(reserved)
+            raise
+
+        if completion.text:
+            try:
+                await cache.set(key, completion.text)
+                self.cache_stats["writes"] += 1
+            except Exception as e:
+                logger.warning(f"Response cache write failed: {e}")
+        return completion, False, reserved
+
+    async def _reserve_budget(
+        self,
+        provider_name: str,
+        provider: BaseAIProvider,
+        prompt: str,
+        request: SimpleAnalysisRequest
+    ) -> float:
+        """
+        調用前為單元預留預估成本（提供商調用 + 品牌檢測）
+
+        加上進行中單元的預估會超過上限時，等待它們結算後再判斷；批次單元
+        必須全部登記才會送出，因此不等待。
+
+        返回：
+            預留的金額（未設定成本上限時為 0）
+
+        例外：
+            BudgetExceededError: 已花費 + 本單元會超過上限（批次單元：加上進行中的預估），
+                或模型沒有定價、無法計入上限
+        """
+        if self.budget is None:
+            return 0.0
+        detection_model = escalation_model = None
+        if self.detector.llm_available:
+            detection_model = self.detector.detection_model
+            fast_model = getattr(self.detector, "fast_detection_model", None)
+            if fast_model:
+                detection_model, escalation_model = fast_model, detection_model
+        batch = provider_name in self.batch_collectors
+        projected = self.cost_estimator.project_unit(
+            ProviderPlan(
+                provider_key=provider.provider_key,
+                model=provider.selected_model,
+                max_tokens=provider.max_tokens,
+                batch=batch
+            ),
+            prompt,
+            1 + len(request.competitors),
+            detection_model,
+            detection_batch=getattr(self.detector, "batch_collector", None) is not None,
+            escalation_model=escalation_model
+        )
+        if not await self.budget.reserve(projected, wait=not batch):
+            if batch:
+                # 批次工作等待所有預期的單元，未調用的單元也要回報
+                self.batch_collectors[provider_name].skip()
+            if projected <= 0:
+                raise BudgetExceededError(
+                    f"No pricing for {provider.selected_model}; a budget of "
+                    f"${self.budget.limit_usd:.4f} cannot be enforced (request not sent)",
+                    provider_name
+                )
+            raise BudgetExceededError(
+                f"Budget of ${self.budget.limit_usd:.4f} reached "
+                f"(spent ${self.token_tracker.get_total_cost():.4f}, request not sent)",
+                provider_name
+            )
+        return projected
+
+    async def _release_budget(self, reserved: float):
+        if self.budget is not None and reserved:
+            await self.budget.release(reserved)
+
+    async def _complete(
+        self,
+        provider_name: str,
+        provider: BaseAIProvider,
+        prompt: str,
+        request: SimpleAnalysisRequest,
+        on_stream: Optional[UnitStreamCallback] = None
+    ) -> ProviderCompletion:
+        """
+        調用提供商
+
+        - 批次模式：由該提供商的 BatchCollector 併入批次工作
+        - 提供 on_stream：串流接收，每段文字後以增量比對器更新暫定的已提及品牌
+        - 其他：一般的 complete()
+        """
+        collector = self.batch_collectors.get(provider_name)
+        if collector is not None:
+            return await collector.request(prompt)
+        if on_stream is None:
+            return await provider.complete(prompt)
+
+        brands = [request.target_brand] + request.competitors
+        incremental = get_brand_matcher(brands, request.brand_aliases).incremental()
+        async with provider.stream(prompt) as stream:
+            async for delta in stream:
+                incremental.feed(delta)
+                on_stream(incremental.text, dict(incremental.mentioned))
+        incremental.finish()
+        on_stream(incremental.text, dict(incremental.mentioned))
+        return stream.completion()
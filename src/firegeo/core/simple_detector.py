@@ -1,26 +1,206 @@
-"""簡化的品牌檢測系統 - 只使用Gemini 2.5 Flash"""
+"""簡化的品牌檢測系統 - 檢測備忘 + 本地 Aho-Corasick 預篩 + Gemini 級聯（Flash-Lite → Flash）或 Batch API"""
 
 import asyncio
+import functools
 import json
 import logging
-from typing import Dict, List, Any
+import time
+from typing import Dict, List, Any, Optional, Tuple
 import google.generativeai as genai
 
 from ..models.analysis import BrandDetectionResult
+from .rate_limiter import get_rate_limiter, estimate_tokens
+from .gemini_client import bind_async_client
+from .brand_matcher import get_brand_matcher, METHOD_ERROR, METHOD_LOCAL_AMBIGUOUS
+from .cache import DetectionMemo, get_detection_memo
+from .detection_batcher import DetectionBatcher, DetectionItem
+from .detection_parser import (
+    DETECTIONS_SCHEMA,
+    RESPONSES_SCHEMA,
+    SINGLE_BRAND_SCHEMA,
+    parse_detection_json,
+    parse_fallback,
+    to_gemini_schema,
+)
+from .ai_providers.base import BaseAIProvider
+from .ai_providers.batch import BatchCollector
+from .ai_providers.retry import call_with_retry
+from .ai_providers.google_provider import gemini_token_counts, translate_gemini_error
+from .ai_providers.errors import is_overload_error
+from .adaptive_concurrency import get_concurrency_limiter
+from .token_tracking import TokenTracker
+from .token_tracking.history import DETECTION_PROVIDER_SUFFIX
+from ..models.config import RetryPolicy
 
 logger = logging.getLogger(__name__)
 
+# 檢測提示詞版本；修改提示詞或解析方式時遞增，使舊的檢測備忘失效
+DETECTION_PROMPT_VERSION = "4"
+
+# 級聯檢測層級（記錄在 BrandDetectionResult.detection_tier）
+TIER_FAST = "fast"      # 快速、便宜的模型先判斷所有模糊品牌
+TIER_STRONG = "strong"  # 信心不足或判斷矛盾的品牌升級到此模型（未級聯時為唯一的模型）
+
+# 所有檢測提示詞共用的判斷準則
+DETECTION_GUIDELINES = """Consider the following when detecting brand mentions:
+- Direct brand name mentions
+- Product names clearly associated with the brand
+- Company abbreviations or common variations
+- Contextual references where the brand is clearly implied
+- Ignore generic industry terms unless specifically referring to this brand"""
+
+@functools.lru_cache(maxsize=None)
+def _gemini_generation_config(schema_json: str) -> Dict[str, Any]:
+    return {
+        "response_mime_type": "application/json",
+        "response_schema": to_gemini_schema(json.loads(schema_json)),
+    }
+
+
+def gemini_generation_config(response_schema: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Gemini 結構化輸出的 generation_config（轉換結果依 schema 快取）"""
+    if response_schema is None:
+        return None
+    return _gemini_generation_config(json.dumps(response_schema, sort_keys=True))
+
+
+def parse_confidence(value: Any) -> Optional[float]:
+    """將模型回報的信心值轉為 0–1；缺少或無法解讀時返回 None（百分比會換算）"""
+    if isinstance(value, bool):
+        return None
+    try:
+        confidence = float(value)
+    except (TypeError, ValueError):
+        return None
+    if confidence != confidence:  # NaN
+        return None
+    if confidence > 1:
+        confidence /= 100
+    return min(max(confidence, 0.0), 1.0)
+
+
 class SimpleBrandDetector:
     """極簡化的品牌檢測器"""
     
-    def __init__(self, google_api_key: str):
+    def __init__(
+        self,
+        google_api_key: Optional[str],
+        model_name: str = "gemini-2.5-flash",
+        use_local_prefilter: bool = True,
+        batch_window: float = 0.25,
+        max_batch_tokens: int = 24000,
+        memo: Optional[DetectionMemo] = None,
+        use_memo: bool = True,
+        retry_policy: Optional[RetryPolicy] = None,
+        batch_provider: Optional[BaseAIProvider] = None,
+        batch_poll_interval: float = 30.0,
+        batch_timeout: float = 24 * 3600,
+        token_tracker: Optional[TokenTracker] = None,
+        fast_model_name: Optional[str] = None,
+        escalation_confidence: float = 0.7
+    ):
+        """
+        參數：
+            google_api_key: Google API 金鑰（None 時只使用本地比對）
+            model_name: 檢測使用的 Gemini 模型
+            use_local_prefilter: 是否先以本地比對判定明確的品牌
+            batch_window: 微批次收集時間窗口（秒），0 表示停用微批次
+            max_batch_tokens: 單一批次的估計輸入 token 上限
+            memo: 檢測備忘，預設使用行程內共用的記憶體備忘
+            use_memo: 是否重用相同輸入的檢測結果
+            retry_policy: Gemini 調用的重試設定
+            batch_provider: 支援 Batch API 的提供商；設定時改以批次工作執行 LLM 檢測
+            batch_poll_interval: 批次模式查詢批次狀態的間隔（秒）
+            batch_timeout: 批次模式等待批次完成的上限（秒）
+            token_tracker: 記錄每次檢測 LLM 調用的 token 用量與延遲（提供商名稱為 detection_usage_label）
+            fast_model_name: 級聯檢測先使用的快速 Gemini 模型；None 時只使用 model_name
+            escalation_confidence: 快速模型信心值低於此值的品牌以 model_name 重新檢測
+        """
         self.google_api_key = google_api_key
+        self.model_name = model_name
+        self.fast_model_name = fast_model_name if fast_model_name != model_name else None
+        self.escalation_confidence = escalation_confidence
+        self.use_local_prefilter = use_local_prefilter
         self._configure_gemini()
+        
+        # 批次檢測：檢測提示詞在短暫閒置後一起送出成一個批次工作
+        self.batch_collector = BatchCollector(
+            batch_provider,
+            poll_interval=batch_poll_interval,
+            timeout=batch_timeout
+        ) if batch_provider is not None else None
+        if self.batch_collector is not None:
+            # 批次工作本身耗時較長，微批次可以收集更久、合併更多回應
+            batch_window = max(batch_window, 2.0)
+            max_batch_size = 20
+        else:
+            max_batch_size = 8
+        self.batcher = DetectionBatcher(
+            functools.partial(self._detect_batch_with_llm, tier=self.first_tier),
+            max_wait=batch_window,
+            max_batch_tokens=max_batch_tokens,
+            max_batch_size=max_batch_size
+        ) if batch_window > 0 else None
+        # 升級的品牌同樣合併成較少的調用
+        self.escalation_batcher = DetectionBatcher(
+            functools.partial(self._detect_batch_with_llm, tier=TIER_STRONG),
+            max_wait=batch_window,
+            max_batch_tokens=max_batch_tokens,
+            max_batch_size=max_batch_size
+        ) if batch_window > 0 and self.cascade_enabled else None
+        self.memo = (memo or get_detection_memo()) if use_memo else None
+        self.memo_hits = 0
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.token_tracker = token_tracker
     
     def _configure_gemini(self):
-        """配置Gemini API"""
-        genai.configure(api_key=self.google_api_key)
-        self.model = genai.GenerativeModel("gemini-2.5-flash")
+        """配置Gemini API（使用原生非同步客戶端，見 gemini_client）；沒有金鑰時只使用本地比對"""
+        self.model = genai.GenerativeModel(self.model_name) if self.google_api_key else None
+        self.fast_model = (
+            genai.GenerativeModel(self.fast_model_name)
+            if self.google_api_key and self.fast_model_name else None
+        )
+    
+    @property
+    def llm_available(self) -> bool:
+        """是否能使用 LLM（Gemini 或批次提供商）處理本地無法判定的品牌"""
+        return self.model is not None or self.batch_collector is not None
+    
+    @property
+    def cascade_enabled(self) -> bool:
+        """是否先以快速模型檢測、只升級信心不足的品牌（批次模式不使用級聯）"""
+        return self.fast_model is not None and self.batch_collector is None
+    
+    @property
+    def first_tier(self) -> str:
+        """模糊品牌首先交給的層級"""
+        return TIER_FAST if self.cascade_enabled else TIER_STRONG
+    
+    @property
+    def detection_model(self) -> str:
+        """實際執行檢測的模型名稱（級聯時為升級使用的模型；批次模式為批次提供商的模型）"""
+        if self.batch_collector is not None:
+            return self.batch_collector.provider.selected_model
+        return self.model_name
+    
+    @property
+    def fast_detection_model(self) -> Optional[str]:
+        """級聯的快速模型名稱；未使用級聯時為 None"""
+        return self.fast_model_name if self.cascade_enabled else None
+    
+    @property
+    def memo_model_key(self) -> str:
+        """檢測備忘鍵中的模型部分（級聯的結果取決於兩個模型與升級門檻）"""
+        if self.cascade_enabled:
+            return f"{self.fast_model_name}>{self.model_name}@{self.escalation_confidence}"
+        return self.detection_model
+    
+    @property
+    def detection_usage_label(self) -> str:
+        """檢測調用在 TokenTracker 中的提供商名稱（與分析用的提供商分開統計）"""
+        if self.batch_collector is not None:
+            return f"{self.batch_collector.provider.provider_name}{DETECTION_PROVIDER_SUFFIX}"
+        return f"Google{DETECTION_PROVIDER_SUFFIX}"
     
     async def detect_single_brand(
         self, 
@@ -32,12 +212,7 @@ class SimpleBrandDetector:
         
         prompt = f"""Please analyze if the brand '{brand}' is mentioned in the following AI response.
 
-Consider the following when detecting brand mentions:
-- Direct brand name mentions
-- Product names clearly associated with the brand
-- Company abbreviations or common variations
-- Contextual references where the brand is clearly implied
-- Ignore generic industry terms unless specifically referring to this brand
+{DETECTION_GUIDELINES}
 
 Original Question: {question}
 
@@ -46,22 +221,34 @@ AI Response: {text}
 Response Requirements:
 - Return only valid JSON format
 - Use boolean value for brand_mentioned
+- Provide a confidence between 0 and 1 for the decision
 - Provide brief reasoning for the decision
 
 Expected JSON Format:
 {{
   "brand_mentioned": true/false,
+  "confidence": 0.0-1.0,
   "reasoning": "Brief explanation of detection logic"
 }}"""
 
         try:
-            response = await self._call_gemini(prompt)
-            parsed_response = self._parse_json_response(response)
+            response = await self._call_llm(prompt, response_schema=SINGLE_BRAND_SCHEMA)
+            parsed_response = self._parse_json_response(response, [brand])
+            if "brand_mentioned" not in parsed_response and parsed_response.get("detections"):
+                # 備用解析的結果是檢測列表格式
+                detection = parsed_response["detections"][0]
+                parsed_response = {
+                    "brand_mentioned": detection["mentioned"],
+                    "reasoning": detection["reasoning"],
+                    "confidence": detection.get("confidence"),
+                }
             
             return BrandDetectionResult(
                 brand_name=brand,
                 mentioned=parsed_response.get("brand_mentioned", False),
-                reasoning=parsed_response.get("reasoning", "No reasoning provided")
+                reasoning=parsed_response.get("reasoning", "No reasoning provided"),
+                confidence=parse_confidence(parsed_response.get("confidence")),
+                detection_tier=TIER_STRONG
             )
         except Exception as e:
             logger.error(f"Error detecting brand {brand}: {e}")
@@ -76,12 +263,104 @@ Expected JSON Format:
         text: str,
         target_brand: str,
         competitors: List[str],
-        question: str
+        question: str,
+        aliases: Optional[Dict[str, List[str]]] = None
     ) -> Dict[str, BrandDetectionResult]:
-        """使用單一 API 調用檢測多個品牌的提及情況"""
+        """
+        檢測多個品牌的提及情況
         
+        流程：
+            0. 相同輸入已檢測過時，直接返回備忘的結果
+            1. 本地 Aho-Corasick 比對，直接判定明確出現或明確未出現的品牌
+            2. 只把模糊的品牌交給 Gemini（啟用微批次時與其他回應合併成一次調用）
+               級聯時先交給快速模型，信心不足、判斷矛盾或失敗的品牌再升級到 model_name
+            3. 沒有 Gemini 時，模糊品牌使用本地暫定結果
+        """
         all_brands = [target_brand] + competitors
-        results = {}
+        
+        memo_key = None
+        if self.memo is not None:
+            memo_key = self.memo.make_key(
+                text, question, all_brands, aliases,
+                self.memo_model_key, DETECTION_PROMPT_VERSION
+            )
+            try:
+                memoized = await self.memo.get(memo_key)
+            except Exception as e:
+                logger.warning(f"Detection memo read failed: {e}")
+                memoized = None
+            if memoized is not None and all(brand in memoized for brand in all_brands):
+                self.memo_hits += 1
+                return {brand: memoized[brand] for brand in all_brands}
+        
+        results: Dict[str, BrandDetectionResult] = {}
+        llm_brands = all_brands
+        
+        if self.use_local_prefilter:
+            matcher = get_brand_matcher(all_brands, aliases)
+            resolved, ambiguous = matcher.classify(text)
+            results.update(resolved)
+            llm_brands = [brand for brand in dict.fromkeys(all_brands) if brand in ambiguous]
+            
+            if llm_brands and not self.llm_available:
+                results.update(ambiguous)
+                llm_brands = []
+        
+        if llm_brands:
+            llm_results = await self._detect_tier(text, llm_brands, question, self.first_tier)
+            if self.cascade_enabled:
+                escalate = [brand for brand in llm_brands if self._needs_escalation(llm_results[brand])]
+                if escalate:
+                    escalated = await self._detect_tier(text, escalate, question, TIER_STRONG)
+                    for brand, result in escalated.items():
+                        # 升級失敗時保留快速模型的判斷
+                        if result.detection_method != METHOD_ERROR or llm_results[brand].detection_method == METHOD_ERROR:
+                            llm_results[brand] = result
+            results.update(llm_results)
+        
+        results = {brand: results[brand] for brand in all_brands}
+        
+        # 失敗或僅有本地暫定的結果不寫入備忘，之後仍會重新檢測
+        if memo_key is not None and all(
+            result.detection_method not in (METHOD_ERROR, METHOD_LOCAL_AMBIGUOUS)
+            for result in results.values()
+        ):
+            try:
+                await self.memo.set(memo_key, results)
+            except Exception as e:
+                logger.warning(f"Detection memo write failed: {e}")
+        
+        return results
+    
+    async def _detect_tier(
+        self,
+        text: str,
+        brands: List[str],
+        question: str,
+        tier: str
+    ) -> Dict[str, BrandDetectionResult]:
+        """以指定層級檢測；啟用微批次時與其他回應合併成同一次調用"""
+        batcher = self.batcher if tier == self.first_tier else self.escalation_batcher
+        if batcher is not None:
+            return await batcher.submit(text, brands, question)
+        return await self._detect_with_llm(text, brands, question, tier)
+    
+    def _needs_escalation(self, result: BrandDetectionResult) -> bool:
+        """快速模型的結果是否需要升級：失敗、缺少或無法解讀信心值、信心不足"""
+        return (
+            result.detection_method == METHOD_ERROR
+            or result.confidence is None
+            or result.confidence < self.escalation_confidence
+        )
+    
+    async def _detect_with_llm(
+        self,
+        text: str,
+        all_brands: List[str],
+        question: str,
+        tier: str = TIER_STRONG
+    ) -> Dict[str, BrandDetectionResult]:
+        """使用單一 LLM 調用檢測多個品牌的提及情況"""
         
         # 構建批量檢測提示詞
         brands_list = "\n".join([f"- {brand}" for brand in all_brands])
@@ -91,12 +370,7 @@ Expected JSON Format:
 Brands to check:
 {brands_list}
 
-Consider the following when detecting brand mentions:
-- Direct brand name mentions
-- Product names clearly associated with the brand
-- Company abbreviations or common variations
-- Contextual references where the brand is clearly implied
-- Ignore generic industry terms unless specifically referring to this brand
+{DETECTION_GUIDELINES}
 
 Original Question: {question}
 
@@ -105,6 +379,7 @@ AI Response: {text}
 Response Requirements:
 - Return only valid JSON format
 - For each brand, provide a boolean value for mentioned
+- For each brand, provide a confidence between 0 and 1 for the decision
 - Provide brief reasoning for each decision
 
 Expected JSON Format:
@@ -113,6 +388,7 @@ Expected JSON Format:
     {{
       "brand_name": "Brand Name",
       "mentioned": true/false,
+      "confidence": 0.0-1.0,
       "reasoning": "Brief explanation"
     }},
     ...
@@ -120,113 +396,294 @@ Expected JSON Format:
 }}"""
 
         try:
-            response = await self._call_gemini(batch_prompt)
-            parsed_response = self._parse_json_response(response)
+            response = await self._call_llm(batch_prompt, tier, DETECTIONS_SCHEMA)
+            parsed_response = self._parse_json_response(response, all_brands)
             
             # 處理批量檢測結果
-            detections = parsed_response.get("detections", [])
-            
-            # 建立結果字典，確保所有品牌都有結果
-            for brand in all_brands:
-                results[brand] = BrandDetectionResult(
-                    brand_name=brand,
-                    mentioned=False,
-                    reasoning="No detection result found"
-                )
-            
-            # 更新實際檢測結果
-            for detection in detections:
-                brand_name = detection.get("brand_name", "")
-                if brand_name in all_brands:
-                    results[brand_name] = BrandDetectionResult(
-                        brand_name=brand_name,
-                        mentioned=detection.get("mentioned", False),
-                        reasoning=detection.get("reasoning", "No reasoning provided")
-                    )
+            return self._build_results(all_brands, parsed_response.get("detections", []), tier)
             
         except Exception as e:
             logger.error(f"Error in batch brand detection: {e}")
-            # 出錯時為所有品牌返回失敗結果
-            for brand in all_brands:
-                results[brand] = BrandDetectionResult(
-                    brand_name=brand,
-                    mentioned=False,
-                    reasoning=f"Batch detection error: {str(e)}"
-                )
+            return self._error_results(all_brands, f"Batch detection error: {str(e)}", tier)
+    
+    async def _detect_batch_with_llm(
+        self,
+        items: List[DetectionItem],
+        tier: str = TIER_STRONG
+    ) -> List[Dict[str, BrandDetectionResult]]:
+        """
+        以單一 LLM 調用檢測多個回應（供 DetectionBatcher 使用）
+        
+        說明只送一次；每個回應以 id 區分，結果依 id 拆回各回應。
+        模型漏掉的回應會個別重新檢測。
+        """
+        if len(items) == 1:
+            item = items[0]
+            return [await self._detect_with_llm(item.text, item.brands, item.question, tier)]
+        
+        sections = []
+        for item in items:
+            brands_list = "\n".join([f"- {brand}" for brand in item.brands])
+            sections.append(f"""### Response id: {item.item_id}
+Original Question: {item.question}
+
+Brands to check:
+{brands_list}
+
+AI Response:
+{item.text}""")
+        responses_block = "\n\n".join(sections)
+        
+        batch_prompt = f"""Please analyze which of the listed brands are mentioned in each of the AI responses below.
+Each response has its own id, original question and list of brands to check.
+
+{DETECTION_GUIDELINES}
+
+{responses_block}
+
+Response Requirements:
+- Return only valid JSON format
+- Include one entry per response id
+- For each brand listed under a response, provide a boolean value for mentioned
+- For each brand, provide a confidence between 0 and 1 for the decision
+- Provide brief reasoning for each decision
+
+Expected JSON Format:
+{{
+  "responses": [
+    {{
+      "id": "Response id",
+      "detections": [
+        {{
+          "brand_name": "Brand Name",
+          "mentioned": true/false,
+          "confidence": 0.0-1.0,
+          "reasoning": "Brief explanation"
+        }},
+        ...
+      ]
+    }},
+    ...
+  ]
+}}"""
+
+        try:
+            response = await self._call_llm(batch_prompt, tier, RESPONSES_SCHEMA)
+            # 備用解析無法對應回應 ID，不傳品牌；解析失敗的回應視為缺少結果
+            parsed_response = self._parse_json_response(response, [])
+        except Exception as e:
+            logger.error(f"Error in multi-response brand detection: {e}")
+            return [
+                self._error_results(item.brands, f"Batch detection error: {str(e)}", tier)
+                for item in items
+            ]
+        
+        detections_by_id = {
+            str(entry.get("id")): entry.get("detections", [])
+            for entry in parsed_response.get("responses", [])
+            if isinstance(entry, dict)
+        }
+        
+        results: List[Optional[Dict[str, BrandDetectionResult]]] = []
+        missing = []
+        for index, item in enumerate(items):
+            if item.item_id in detections_by_id:
+                results.append(self._build_results(item.brands, detections_by_id[item.item_id], tier))
+            else:
+                results.append(None)
+                missing.append(index)
+        
+        # 批次回應中缺少的項目個別重新檢測
+        if missing:
+            logger.warning(f"Detection batch missing {len(missing)}/{len(items)} responses, retrying individually")
+            retried = await asyncio.gather(*(
+                self._detect_with_llm(items[index].text, items[index].brands, items[index].question, tier)
+                for index in missing
+            ))
+            for index, result in zip(missing, retried):
+                results[index] = result
         
         return results
     
-    async def _call_gemini(self, prompt: str) -> str:
-        """調用Gemini API"""
-        loop = asyncio.get_event_loop()
+    def _build_results(
+        self,
+        brands: List[str],
+        detections: List[Dict[str, Any]],
+        tier: str = TIER_STRONG
+    ) -> Dict[str, BrandDetectionResult]:
+        """
+        將 LLM 的檢測列表轉為結果字典，確保所有品牌都有結果
+
+        模型漏掉的品牌（包括回應無法解析的情況）標記為 error，不會被當成
+        「未提及」寫入檢測備忘，級聯時會升級重新檢測；同一品牌出現互相矛盾
+        的判斷時信心值為 0，同樣會升級。
+        """
+        results = self._error_results(brands, "No detection result found", tier)
+        
+        # 更新實際檢測結果
+        seen = set()
+        for detection in detections:
+            if not isinstance(detection, dict):
+                continue
+            brand_name = detection.get("brand_name", "")
+            if brand_name not in results:
+                continue
+            result = BrandDetectionResult(
+                brand_name=brand_name,
+                mentioned=detection.get("mentioned", False),
+                reasoning=detection.get("reasoning", "No reasoning provided"),
+                confidence=parse_confidence(detection.get("confidence")),
+                detection_tier=tier
+            )
+            if brand_name in seen and results[brand_name].mentioned != result.mentioned:
+                result.confidence = 0.0
+            seen.add(brand_name)
+            results[brand_name] = result
+        return results
+    
+    def _error_results(
+        self,
+        brands: List[str],
+        reasoning: str,
+        tier: str = TIER_STRONG
+    ) -> Dict[str, BrandDetectionResult]:
+        """出錯時為所有品牌返回失敗結果"""
+        return {
+            brand: BrandDetectionResult(
+                brand_name=brand,
+                mentioned=False,
+                reasoning=reasoning,
+                detection_method=METHOD_ERROR,
+                detection_tier=tier
+            )
+            for brand in brands
+        }
+    
+    async def _call_llm(
+        self,
+        prompt: str,
+        tier: str = TIER_STRONG,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        調用檢測 LLM：設定批次提供商時併入批次工作，否則以該層級的 Gemini 模型即時調用
+        
+        response_schema 使模型以結構化輸出回傳符合該 JSON Schema 的結果
+        """
+        if self.batch_collector is not None:
+            completion = await self.batch_collector.request(prompt, response_schema)
+            self._track_usage(
+                prompt, completion.text, completion.prompt_tokens, completion.completion_tokens, batch=True
+            )
+            if not completion.text:
+                raise ValueError("Empty response from batch detection")
+            return completion.text.strip()
+        return await self._call_gemini(prompt, tier, response_schema)
+    
+    def _track_usage(
+        self,
+        prompt: str,
+        response_text: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency: Optional[float] = None,
+        batch: bool = False,
+        model_name: Optional[str] = None
+    ):
+        """記錄一次檢測調用的用量；模型未回傳用量時以本地估計代替"""
+        if self.token_tracker is None:
+            return
+        estimated = not (prompt_tokens or completion_tokens)
+        if estimated:
+            prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(response_text)
+        self.token_tracker.track_usage(
+            self.detection_usage_label,
+            model_name or self.detection_model,
+            prompt_tokens,
+            completion_tokens,
+            latency=latency,
+            time_to_first_byte=latency,
+            batch=batch,
+            estimated=estimated
+        )
+    
+    async def _call_gemini(
+        self,
+        prompt: str,
+        tier: str = TIER_STRONG,
+        response_schema: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """調用Gemini API（tier 為 fast 時使用級聯的快速模型；指定 response_schema 時要求 JSON 輸出）"""
+        generation_config = gemini_generation_config(response_schema)
+        model, model_name = (self.fast_model, self.fast_model_name) if tier == TIER_FAST else (self.model, self.model_name)
+        if model is None:
+            raise ValueError("Google API key is required for LLM brand detection")
+        
+        # 與 GoogleProvider 共用同一模型的 RPM/TPM 額度與自適應並行上限
+        rate_limiter = get_rate_limiter("google", model_name)
+        concurrency_limiter = get_concurrency_limiter("google", model_name)
         
-        def _sync_call():
-            response = self.model.generate_content(prompt)
-            if not response.text:
-                raise ValueError("Empty response from Gemini")
-            return response.text.strip()
+        async def attempt(timeout: float) -> Tuple[str, Tuple[int, int], float]:
+            reserved_tokens = estimate_tokens(prompt) + 500
+            await rate_limiter.acquire(reserved_tokens)
+            try:
+                await concurrency_limiter.acquire()
+            except BaseException:
+                # 等待並行名額時被取消，退回預留的 token
+                rate_limiter.settle(reserved_tokens, estimate_tokens(prompt))
+                raise
+            started = time.monotonic()
+            try:
+                # 原生非同步調用；逾時會直接取消 gRPC 請求，重試由 call_with_retry 處理
+                bind_async_client(model, self.google_api_key)
+                response = await asyncio.wait_for(
+                    model.generate_content_async(
+                        prompt,
+                        generation_config=generation_config,
+                        request_options={"retry": None}
+                    ),
+                    timeout=timeout
+                )
+                if not response.text:
+                    raise ValueError("Empty response from Gemini")
+            except BaseException as e:
+                rate_limiter.settle(reserved_tokens, estimate_tokens(prompt))
+                overloaded = isinstance(e, Exception) and is_overload_error(translate_gemini_error(e))
+                concurrency_limiter.release(overloaded=overloaded)
+                raise
+            latency = time.monotonic() - started
+            concurrency_limiter.release(latency=latency)
+            response_text = response.text.strip()
+            token_counts = gemini_token_counts(response)
+            rate_limiter.settle(
+                reserved_tokens,
+                sum(token_counts) or estimate_tokens(prompt) + estimate_tokens(response_text)
+            )
+            return response_text, token_counts, latency
         
-        return await asyncio.wait_for(
-            loop.run_in_executor(None, _sync_call), 
-            timeout=60.0
+        (response_text, (prompt_tokens, completion_tokens), latency), _ = await call_with_retry(
+            attempt,
+            self.retry_policy,
+            lambda error: translate_gemini_error(error, "Gemini detector"),
+            label="Gemini detector"
         )
+        self._track_usage(prompt, response_text, prompt_tokens, completion_tokens, latency, model_name=model_name)
+        return response_text
     
-    def _parse_json_response(self, response: str) -> Dict[str, Any]:
+    def _parse_json_response(self, response: str, brands: List[str]) -> Dict[str, Any]:
         """解析JSON回應 - 支援單品牌和批量檢測格式"""
-        try:
-            # 嘗試直接解析
-            return json.loads(response)
-        except json.JSONDecodeError:
-            # 嘗試提取JSON區塊 - 改進的正則表達式
-            import re
-            
-            # 尋找完整的JSON對象（支援嵌套）
-            json_match = re.search(r'\{(?:[^{}]|{[^{}]*})*\}', response, re.DOTALL)
-            if json_match:
-                try:
-                    return json.loads(json_match.group())
-                except json.JSONDecodeError:
-                    pass
-            
-            # 嘗試尋找數組格式
-            array_match = re.search(r'\[(?:[^\[\]]|\[[^\[\]]*\])*\]', response, re.DOTALL)
-            if array_match:
-                try:
-                    array_data = json.loads(array_match.group())
-                    # 如果找到數組，包裝成批量檢測格式
-                    return {"detections": array_data}
-                except json.JSONDecodeError:
-                    pass
-            
-            # 嘗試從文本中提取結構化信息
-            logger.warning(f"JSON parse failed, attempting fallback parsing. Response: {response[:200]}...")
-            return self._fallback_parse(response)
-    
-    def _fallback_parse(self, response: str) -> Dict[str, Any]:
-        """當JSON解析失敗時的備用解析方法"""
-        import re
-        
-        # 查找品牌提及的模式
-        mentions = []
-        
-        # 常見的品牌名稱模式
-        brand_patterns = [
-            r'(\w+).*?mentioned.*?(true|false)',
-            r'(\w+).*?(?:is|was).*?(mentioned|not mentioned|found|not found)',
-            r'Brand.*?(\w+).*?(true|false|yes|no)',
-        ]
-        
-        for pattern in brand_patterns:
-            matches = re.findall(pattern, response, re.IGNORECASE)
-            for match in matches:
-                brand_name = match[0]
-                mentioned = match[1].lower() in ['true', 'yes', 'mentioned', 'found']
-                mentions.append({
-                    "brand_name": brand_name,
-                    "mentioned": mentioned,
-                    "reasoning": f"Fallback parsing from: {match[0]} {match[1]}"
-                })
+        # 結構化輸出通常可直接解析；自由文字以線性時間的擷取器取出 JSON 區塊
+        parsed = parse_detection_json(response)
+        if parsed is not None:
+            return parsed
         
+        # 嘗試從文本中提取結構化信息
+        logger.warning(f"JSON parse failed, attempting fallback parsing. Response: {response[:200]}...")
+        return self._fallback_parse(response, brands)
+    
+    def _fallback_parse(self, response: str, brands: List[str]) -> Dict[str, Any]:
+        """當JSON解析失敗時的備用解析方法（只接受請求的品牌）"""
+        mentions = parse_fallback(response, brands)
         if mentions:
             return {"detections": mentions}
         
@@ -1,6 +1,18 @@
-"""Token 追蹤模組 - 提供 API 用量統計和成本計算功能"""
+"""Token 追蹤模組 - 提供 API 用量統計、成本計算、成本預估與成本上限功能"""
 
 from .tracker import TokenTracker
 from .cost_calculator import CostCalculator
+from .history import UsageHistory, get_usage_history
+from .estimator import CostEstimator, ProviderPlan, count_tokens
+from .budget import BudgetGuard
 
-__all__ = ["TokenTracker", "CostCalculator"]
\ No newline at end of file
+__all__ = [
+    "TokenTracker",
+    "CostCalculator",
+    "UsageHistory",
+    "get_usage_history",
+    "CostEstimator",
+    "ProviderPlan",
+    "count_tokens",
+    "BudgetGuard",
+]
@@ -0,0 +1,75 @@
+"""成本上限 - 派發調用前預留預估成本，額度不足時等待進行中的單元結算，實際花費達上限後不再派發"""
+
+import asyncio
+
+from .tracker import TokenTracker
+
+
+class BudgetGuard:
+    """
+    單次分析的成本上限
+
+    與速率限制的預留 / 修正相同的做法：每個單元調用前以預估成本
+    reserve()，完成後 release()，此時實際花費已記錄在 TokenTracker。
+
+    排程器一次派發所有單元，而預估是偏高的上限，若把所有進行中的預估
+    加總後直接拒絕，遠在實際花費達上限前就會略過大部分單元。因此：
+        - 已花費 + 本單元的預估超過上限 → 拒絕並保持耗盡，之後的單元都不再調用
+        - 已花費 + 進行中的預估 + 本單元的預估超過上限 → 等待進行中的單元
+          結算（release）後以實際花費重新判斷
+    批次單元要等所有單元登記後才一起送出，不能等待（wait=False），
+    此時額度不足只略過該單元，不標記耗盡。
+
+    預估成本為 0 的單元（模型沒有定價）一律拒絕：它的實際花費同樣無法
+    計算，放行就等於不受上限約束。
+    """
+
+    def __init__(self, limit_usd: float, tracker: TokenTracker):
+        self.limit_usd = limit_usd
+        self.tracker = tracker
+        self.reserved = 0.0  # 進行中單元的預估成本
+        self.in_flight = 0  # 進行中的單元數
+        self.exhausted = False
+        self.skipped = 0  # 被拒絕的單元數
+        self._condition = asyncio.Condition()
+
+    @property
+    def committed(self) -> float:
+        """已花費 + 進行中的預估"""
+        return self.tracker.get_total_cost() + self.reserved
+
+    async def reserve(self, projected: float, wait: bool = True) -> bool:
+        """
+        為即將派發的單元預留預估成本
+
+        返回：
+            True 表示可以派發；已花費 + 本單元會超過上限時返回 False
+            （wait=False 時，進行中的預估使額度不足也返回 False；
+            沒有定價的單元也返回 False，但不標記耗盡）
+        """
+        async with self._condition:
+            if projected <= 0:
+                self.skipped += 1
+                return False
+            while True:
+                spent = self.tracker.get_total_cost()
+                if self.exhausted or spent + projected > self.limit_usd:
+                    self.exhausted = True
+                    self.skipped += 1
+                    return False
+                if not self.in_flight or spent + self.reserved + projected <= self.limit_usd:
+                    self.reserved += projected
+                    self.in_flight += 1
+                    return True
+                if not wait:
+                    self.skipped += 1
+                    return False
+                # 等待進行中的單元結算後，以實際花費重新判斷
+                await self._condition.wait()
+
+    async def release(self, projected: float):
+        """單元結束（實際用量已記錄在追蹤器），釋放預留的預估成本並喚醒等待的單元；projected 須大於 0"""
+        async with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.reserved = max(0.0, self.reserved - projected) if self.in_flight else 0.0
+            self._condition.notify_all()
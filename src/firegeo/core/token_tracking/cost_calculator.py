@@ -1,7 +1,25 @@
 """成本計算器 - 計算各種 AI 模型的使用成本"""
 
+import logging
+import re
 from typing import Dict, Optional
 
+logger = logging.getLogger(__name__)
+
+# Batch API（OpenAI、Anthropic）以同步價格的一半計費
+BATCH_DISCOUNT = 0.5
+
+# 模型別名 → PRICING 中的名稱（SUPPORTED_PROVIDERS 使用的別名與 API 回傳的完整名稱不同）
+MODEL_ALIASES = {
+    "claude-sonnet-4-0": "claude-sonnet-4-20250514",
+    "claude-3-7-sonnet-latest": "claude-3-7-sonnet-20250219",
+    "claude-3-5-haiku-latest": "claude-3-5-haiku-20241022",
+    "claude-opus-4-1": "claude-opus-4-1-20250805",
+}
+
+# API 回傳的模型名稱常帶有日期後綴（例如 gpt-4o-2024-08-06、gpt-4o-mini-2024-07-18）
+_DATE_SUFFIX = re.compile(r"-(\d{4}-\d{2}-\d{2}|\d{8})$")
+
 class CostCalculator:
     """AI 模型成本計算器"""
     
@@ -12,16 +30,21 @@ class CostCalculator:
         "gpt-4o-mini": {"input": 0.15, "output": 0.6},  # $0.15/$0.6 per 1M tokens
         "gpt-4-turbo": {"input": 10.0, "output": 30.0},  # 估計價格
         "gpt-3.5-turbo": {"input": 0.5, "output": 1.5},  # 估計價格
+        "gpt-4.1": {"input": 2.0, "output": 8.0},  # $2/$8 per 1M tokens
+        "gpt-5": {"input": 1.25, "output": 10.0},  # $1.25/$10 per 1M tokens
         
         # Anthropic 定價
         "claude-sonnet-4-20250514": {"input": 3.0, "output": 15.0},  # $3/$15 per 1M tokens
         "claude-3-5-sonnet-20241022": {"input": 3.0, "output": 15.0},  # 使用 Sonnet 4 定價
         "claude-opus-4-1-20250805": {"input": 15.0, "output": 75.0},  # $15/$75 per 1M tokens
         "claude-3-opus-20240229": {"input": 15.0, "output": 75.0},  # 使用 Opus 4.1 定價
+        "claude-3-7-sonnet-20250219": {"input": 3.0, "output": 15.0},  # $3/$15 per 1M tokens
+        "claude-3-5-haiku-20241022": {"input": 0.8, "output": 4.0},  # $0.80/$4 per 1M tokens
         
         # Google 定價
         "gemini-2.5-flash": {"input": 0.3, "output": 2.5},  # $0.30/$2.5 per 1M tokens（新統一定價）
         "gemini-2.5-flash-lite": {"input": 0.1, "output": 0.4},  # $0.10/$0.40 per 1M tokens
+        "gemini-2.5-pro": {"input": 1.25, "output": 10.0},  # $1.25/$10 per 1M tokens（≤200K 輸入）
         "gemini-pro": {"input": 0.5, "output": 1.5},  # 估計價格
         
         # Perplexity 定價（特殊計費方式：包含搜尋費用）
@@ -31,12 +54,34 @@ class CostCalculator:
         },
         "sonar-pro": {
             "input": 4.0, "output": 20.0,  # $3/750K tokens ≈ $4/1M, $15/750K ≈ $20/1M
-            "search_cost": 5.0  # $5/1000 searches
+            "search_cost": 6.0  # $6/1000 requests（與 SUPPORTED_PROVIDERS 的說明一致）
         }
     }
     
+    def resolve_model(self, model: str) -> Optional[str]:
+        """
+        將模型名稱對應到 PRICING 的鍵
+        
+        依序嘗試：完整名稱 → 別名 → 去掉日期後綴；都找不到時返回 None
+        """
+        if model in self.PRICING:
+            return model
+        alias = MODEL_ALIASES.get(model)
+        if alias in self.PRICING:
+            return alias
+        base = _DATE_SUFFIX.sub("", model)
+        if base in self.PRICING:
+            return base
+        alias = MODEL_ALIASES.get(base)
+        return alias if alias in self.PRICING else None
+    
+    def get_pricing(self, model: str) -> Optional[Dict[str, float]]:
+        """模型的定價（每 1M tokens 的 USD）；未知的模型返回 None"""
+        resolved = self.resolve_model(model)
+        return self.PRICING[resolved] if resolved else None
+    
     def calculate_cost(self, model: str, input_tokens: int, output_tokens: int, 
-                      search_requests: int = 0) -> float:
+                      search_requests: int = 0, batch: bool = False) -> float:
         """
         計算模型使用成本
         
@@ -45,16 +90,22 @@ class CostCalculator:
             input_tokens: 輸入 token 數量
             output_tokens: 輸出 token 數量  
             search_requests: 搜尋請求次數（Perplexity 專用）
+            batch: 是否透過 Batch API（token 成本打折）
             
         Returns:
             總成本（美元）
         """
-        pricing = self.PRICING.get(model, {"input": 0, "output": 0})
+        pricing = self.get_pricing(model)
+        if pricing is None:
+            logger.debug(f"No pricing for model {model}; cost counted as 0")
+            pricing = {"input": 0, "output": 0}
         
         # 基本 token 成本計算
         input_cost = (input_tokens / 1_000_000) * pricing["input"]
         output_cost = (output_tokens / 1_000_000) * pricing["output"]
         token_cost = input_cost + output_cost
+        if batch:
+            token_cost *= BATCH_DISCOUNT
         
         # Perplexity 搜尋成本計算
         search_cost = 0
@@ -133,7 +184,7 @@ class CostCalculator:
             }
         }
         
-        return model_info.get(model, {
+        return model_info.get(self.resolve_model(model) or model, {
             "display_name": model,
             "description": "模型資訊待更新",
             "cost_tier": "Unknown",
@@ -0,0 +1,275 @@
+"""
+成本預估 - 分析開始前依提示詞與過去的用量預估 token 數與成本
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  CostEstimator.estimate(request, 提供商計畫, 檢測模型)      │
+│     │                                                   │
+│     ├── 輸入 token：本地計算提示詞 token（tiktoken，         │
+│     │     未安裝時以字元數估計）                            │
+│     ├── 輸出 token：UsageHistory 中該模型的平均值，          │
+│     │     沒有歷史時取 min(max_tokens, 預期輸出長度)          │
+│     ├── 品牌檢測：每則回應的平均檢測用量（沒有歷史時依回應       │
+│     │     長度與品牌數估計，假設全部交給 LLM）                │
+│     │     級聯時另計升級模型（沒有歷史時以 ESCALATION_RATE 估計）│
+│     └── CostCalculator 定價（含別名對應與批次折扣）            │
+│                                                         │
+│  project_unit()：單一 (提示詞, 提供商) 的預估成本，           │
+│     排程器以此在派發前向 BudgetGuard 預留額度                 │
+└─────────────────────────────────────────────────────────┘
+
+預估不扣除快取命中與檢測備忘，是偏高的上限。
+"""
+
+import functools
+import logging
+from typing import Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .cost_calculator import CostCalculator
+from .history import UsageHistory, get_usage_history, DETECTION_PROVIDER_SUFFIX
+from ..rate_limiter import EXPECTED_OUTPUT_TOKENS, estimate_tokens
+from ...models.analysis import CostEstimate, CostEstimateLine, SimpleAnalysisRequest, TokenUsage
+
+# tiktoken 為選用依賴：pip install "llm-brand-detector[estimate]"
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 每則聊天訊息的格式 token（角色、分隔符號）
+MESSAGE_OVERHEAD_TOKENS = 8
+
+# 沒有歷史時的檢測提示詞估計：固定說明 + 每個品牌的輸入 / 輸出 token
+DETECTION_OVERHEAD_TOKENS = 300
+DETECTION_TOKENS_PER_BRAND = 15
+DETECTION_OUTPUT_TOKENS_PER_BRAND = 40
+
+# 沒有歷史時，級聯檢測預估升級到較強模型的比例
+ESCALATION_RATE = 0.3
+
+
+class ProviderPlan(BaseModel):
+    """分析將使用的一個提供商（預估用）"""
+    provider_key: str
+    model: str
+    max_tokens: int = 4000
+    batch: bool = False  # 是否透過 Batch API
+
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    """tiktoken 編碼（首次使用可能需要下載詞表；失敗時改用字元數估計）"""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, falling back to character estimates: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    本地計算文字的 token 數
+
+    使用 GPT-4o 系列的 o200k_base 編碼；其他提供商的分詞器不同，
+    但比字元數估計接近。tiktoken 不可用時退回 estimate_tokens。
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class CostEstimator:
+    """分析成本預估器"""
+
+    def __init__(self, history: Optional[UsageHistory] = None, calculator: Optional[CostCalculator] = None):
+        self.history = history if history is not None else get_usage_history()
+        self.calculator = calculator or CostCalculator()
+
+    def project_call(self, plan: ProviderPlan, prompt: str) -> Tuple[TokenUsage, bool]:
+        """
+        預估一次提供商調用
+
+        返回：
+            (預估用量, 輸出長度是否來自歷史平均)
+        """
+        prompt_tokens = count_tokens(prompt) + MESSAGE_OVERHEAD_TOKENS
+        pricing = self.calculator.get_pricing(plan.model) or {}
+        averages = self.history.model_averages(plan.model)
+        if averages is not None:
+            _, completion_tokens, search_requests = averages
+            completion_tokens = min(plan.max_tokens, round(completion_tokens))
+            search_requests = round(search_requests) if "search_cost" in pricing else 0
+        else:
+            completion_tokens = min(plan.max_tokens, EXPECTED_OUTPUT_TOKENS)
+            search_requests = 1 if "search_cost" in pricing else 0
+        usage = TokenUsage(
+            provider=plan.provider_key,
+            model=plan.model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            search_requests=search_requests,
+            cost_estimate=self.calculator.calculate_cost(
+                plan.model, prompt_tokens, completion_tokens, search_requests, plan.batch
+            ),
+            batch=plan.batch,
+            estimated=True
+        )
+        return usage, averages is not None
+
+    def project_detection(
+        self,
+        model: str,
+        response_tokens: int,
+        question: str,
+        brand_count: int,
+        batch: bool = False,
+        share: float = 1.0
+    ) -> Tuple[TokenUsage, bool]:
+        """
+        預估一則回應的品牌檢測用量
+
+        有歷史時使用每則回應的平均檢測用量（已反映本地比對省下的調用
+        與級聯的升級比例），否則假設整則回應連同所有品牌都交給 LLM，
+        再乘上 share（級聯升級模型的預估比例）。
+
+        返回：
+            (預估用量, 是否來自歷史平均)
+        """
+        averages = self.history.detection_averages(model)
+        if averages is not None:
+            prompt_tokens, completion_tokens = (round(value) for value in averages)
+        else:
+            prompt_tokens = (
+                DETECTION_OVERHEAD_TOKENS + response_tokens + count_tokens(question)
+                + DETECTION_TOKENS_PER_BRAND * brand_count
+            )
+            completion_tokens = DETECTION_OUTPUT_TOKENS_PER_BRAND * brand_count
+            prompt_tokens, completion_tokens = round(prompt_tokens * share), round(completion_tokens * share)
+        usage = TokenUsage(
+            provider=f"detection{DETECTION_PROVIDER_SUFFIX}",
+            model=model,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            cost_estimate=self.calculator.calculate_cost(model, prompt_tokens, completion_tokens, batch=batch),
+            batch=batch,
+            estimated=True
+        )
+        return usage, averages is not None
+
+    def project_unit(
+        self,
+        plan: ProviderPlan,
+        prompt: str,
+        brand_count: int,
+        detection_model: Optional[str] = None,
+        detection_batch: bool = False,
+        escalation_model: Optional[str] = None
+    ) -> float:
+        """單一 (提示詞, 提供商) 單元的預估成本：提供商調用 + 其回應的品牌檢測（含級聯升級）"""
+        call, _ = self.project_call(plan, prompt)
+        cost = call.cost_estimate or 0.0
+        if detection_model:
+            detection, _ = self.project_detection(
+                detection_model, call.completion_tokens, prompt, brand_count, detection_batch
+            )
+            cost += detection.cost_estimate or 0.0
+        if detection_model and escalation_model:
+            escalation, _ = self.project_detection(
+                escalation_model, call.completion_tokens, prompt, brand_count, share=ESCALATION_RATE
+            )
+            cost += escalation.cost_estimate or 0.0
+        return cost
+
+    def estimate(
+        self,
+        request: SimpleAnalysisRequest,
+        plans: Dict[str, ProviderPlan],
+        detection_model: Optional[str] = None,
+        detection_batch: bool = False,
+        detection_label: str = f"detection{DETECTION_PROVIDER_SUFFIX}",
+        escalation_model: Optional[str] = None
+    ) -> CostEstimate:
+        """
+        預估整個分析的用量與成本
+
+        參數：
+            request: 分析請求（提示詞、品牌與 budget_usd）
+            plans: 提供商名稱 → 提供商計畫
+            detection_model: 品牌檢測使用的 LLM；None 表示只使用本地比對
+            detection_batch: 品牌檢測是否透過 Batch API
+            detection_label: 檢測在預估中的提供商名稱
+            escalation_model: 級聯檢測升級使用的模型；None 表示未使用級聯
+        """
+        brand_count = 1 + len(request.competitors)
+        lines = []
+        detection_line = escalation_line = None
+        if detection_model:
+            detection_line = CostEstimateLine(
+                provider=detection_label,
+                model=detection_model,
+                batch=detection_batch,
+                priced=self.calculator.get_pricing(detection_model) is not None
+            )
+            if escalation_model:
+                escalation_line = CostEstimateLine(
+                    provider=detection_label,
+                    model=escalation_model,
+                    priced=self.calculator.get_pricing(escalation_model) is not None
+                )
+
+        for name, plan in plans.items():
+            line = CostEstimateLine(
+                provider=name,
+                model=plan.model,
+                batch=plan.batch,
+                priced=self.calculator.get_pricing(plan.model) is not None
+            )
+            for prompt in request.prompts:
+                call, from_history = self.project_call(plan, prompt)
+                self._add(line, call)
+                line.from_history = from_history
+                if detection_line is not None:
+                    detection, from_history = self.project_detection(
+                        detection_model, call.completion_tokens, prompt, brand_count, detection_batch
+                    )
+                    self._add(detection_line, detection)
+                    detection_line.from_history = from_history
+                if escalation_line is not None:
+                    escalation, from_history = self.project_detection(
+                        escalation_model, call.completion_tokens, prompt, brand_count, share=ESCALATION_RATE
+                    )
+                    self._add(escalation_line, escalation)
+                    escalation_line.from_history = from_history
+            lines.append(line)
+        for extra_line in (detection_line, escalation_line):
+            if extra_line is not None and extra_line.calls:
+                lines.append(extra_line)
+
+        total_cost = sum(line.cost for line in lines)
+        return CostEstimate(
+            lines=lines,
+            total_tokens=sum(line.prompt_tokens + line.completion_tokens for line in lines),
+            total_cost=total_cost,
+            budget_usd=request.budget_usd,
+            within_budget=request.budget_usd is None or total_cost <= request.budget_usd
+        )
+
+    @staticmethod
+    def _add(line: CostEstimateLine, usage: TokenUsage):
+        line.calls += 1
+        line.prompt_tokens += usage.prompt_tokens
+        line.completion_tokens += usage.completion_tokens
+        line.search_requests += usage.search_requests
+        line.cost += usage.cost_estimate or 0.0
@@ -0,0 +1,126 @@
+"""用量歷史 - 跨分析保存各模型的平均輸出長度與品牌檢測用量，供成本預估使用"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from ..cache import default_cache_dir
+from ...models.analysis import TokenUsage
+
+logger = logging.getLogger(__name__)
+
+# 檢測調用在 TokenTracker 中的提供商名稱後綴（見 SimpleBrandDetector.detection_usage_label）
+DETECTION_PROVIDER_SUFFIX = " (detection)"
+
+# 樣本數超過此值時將累計值減半，讓平均值偏向近期的分析
+HISTORY_WINDOW = 500
+
+
+class UsageHistory:
+    """
+    各模型的累計用量（JSON 檔，只保存 token 數，不含提示詞或回應內容）
+
+    - models：每次實際調用的輸入 / 輸出 token 與搜尋次數（本地估計的用量不計入）
+    - detection：每則完成檢測的回應平均花費的檢測 token（已反映本地比對與備忘省下的調用）
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self.path = Path(path) if path is not None else default_cache_dir() / "usage_history.json"
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Dict[str, Dict[str, float]]]] = None
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        if self._data is None:
+            try:
+                self._data = json.loads(self.path.read_text(encoding="utf-8"))
+            except FileNotFoundError:
+                self._data = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable usage history {self.path}: {e}")
+                self._data = {}
+            self._data.setdefault("models", {})
+            self._data.setdefault("detection", {})
+        return self._data
+
+    def model_averages(self, model: str) -> Optional[Tuple[float, float, float]]:
+        """模型每次調用的平均 (輸入 token, 輸出 token, 搜尋次數)；沒有歷史時返回 None"""
+        with self._lock:
+            stats = self._load()["models"].get(model)
+        if not stats or not stats.get("count"):
+            return None
+        count = stats["count"]
+        return stats["prompt_tokens"] / count, stats["completion_tokens"] / count, stats["search_requests"] / count
+
+    def detection_averages(self, model: str) -> Optional[Tuple[float, float]]:
+        """每則回應平均的檢測 (輸入 token, 輸出 token)；沒有歷史時返回 None"""
+        with self._lock:
+            stats = self._load()["detection"].get(model)
+        if not stats or not stats.get("count"):
+            return None
+        count = stats["count"]
+        return stats["prompt_tokens"] / count, stats["completion_tokens"] / count
+
+    def record(self, usages: Iterable[TokenUsage], detected_responses: int = 0):
+        """
+        加入一次分析的用量並寫回檔案
+
+        參數：
+            usages: 分析的所有使用記錄（TokenTracker.usage_history）
+            detected_responses: 完成品牌檢測的回應數（檢測用量以此平均）
+        """
+        detection: Dict[str, list] = {}
+        with self._lock:
+            data = self._load()
+            for usage in usages:
+                if usage.provider.endswith(DETECTION_PROVIDER_SUFFIX):
+                    totals = detection.setdefault(usage.model, [0, 0])
+                    totals[0] += usage.prompt_tokens
+                    totals[1] += usage.completion_tokens
+                elif not usage.estimated:
+                    self._add(data["models"], usage.model, 1, {
+                        "prompt_tokens": usage.prompt_tokens,
+                        "completion_tokens": usage.completion_tokens,
+                        "search_requests": usage.search_requests,
+                    })
+            if detected_responses:
+                for model, (prompt_tokens, completion_tokens) in detection.items():
+                    self._add(data["detection"], model, detected_responses, {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                    })
+            self._save(data)
+
+    @staticmethod
+    def _add(section: Dict[str, Dict[str, float]], model: str, count: int, values: Dict[str, float]):
+        stats = section.setdefault(model, {"count": 0})
+        stats["count"] += count
+        for key, value in values.items():
+            stats[key] = stats.get(key, 0) + value
+        if stats["count"] > HISTORY_WINDOW:
+            for key in stats:
+                stats[key] /= 2
+
+    def _save(self, data: dict):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Failed to save usage history {self.path}: {e}")
+
+
+# 行程內共用的用量歷史（依檔案路徑）
+_histories: Dict[Path, UsageHistory] = {}
+_histories_lock = threading.Lock()
+
+def get_usage_history() -> UsageHistory:
+    """取得目前快取目錄的用量歷史（FIREGEO_CACHE_DIR 改變時使用新的檔案）"""
+    path = default_cache_dir() / "usage_history.json"
+    with _histories_lock:
+        if path not in _histories:
+            _histories[path] = UsageHistory(path)
+        return _histories[path]
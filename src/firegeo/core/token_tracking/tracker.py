@@ -1,28 +1,48 @@
 """Token 使用追蹤器 - 記錄和統計 API 調用的 Token 用量"""
 
-from typing import List, Optional
+import threading
+from typing import Dict, List, Optional
 from .cost_calculator import CostCalculator
 from ...models.analysis import TokenUsage
 
 class TokenTracker:
-    """Token 使用量追蹤器"""
+    """
+    Token 使用量追蹤器
+    
+    每次記錄時同步更新累計值，查詢總成本與各提供商統計為 O(1)
+    （不必每次重新加總 usage_history）。可從多個執行緒記錄與查詢。
+    """
     
     def __init__(self):
         self.usage_history: List[TokenUsage] = []
         self.cost_calculator = CostCalculator()
+        self._lock = threading.Lock()
+        self._total_cost = 0.0
+        self._total_tokens = 0
+        self._provider_stats: Dict[str, dict] = {}
     
     def track_usage(self, provider: str, model: str, 
                    prompt_tokens: int, completion_tokens: int,
-                   search_requests: int = 0) -> TokenUsage:
+                   search_requests: int = 0,
+                   hedged_requests: int = 0,
+                   latency: Optional[float] = None,
+                   time_to_first_byte: Optional[float] = None,
+                   batch: bool = False,
+                   estimated: bool = False) -> TokenUsage:
         """
         記錄 Token 使用量
         
         Args:
             provider: AI 提供商名稱
-            model: 模型名稱
+            model: 模型名稱（請求時選定的模型，用於查詢定價）
             prompt_tokens: 輸入 token 數量
             completion_tokens: 輸出 token 數量
             search_requests: 搜尋請求次數（Perplexity 用）
+            hedged_requests: 對沖送出的額外請求數
+            latency: 成功請求的耗時（秒）
+            time_to_first_byte: 送出請求到收到第一段回應的秒數
+            batch: 是否透過 Batch API（以批次價格計算）
+            estimated: token 數是否為本地估計（提供商未回傳用量）
             
         Returns:
             TokenUsage 對象
@@ -34,39 +54,87 @@ class TokenTracker:
             completion_tokens=completion_tokens,
             total_tokens=prompt_tokens + completion_tokens,
             search_requests=search_requests,
+            hedged_requests=hedged_requests,
             cost_estimate=self.cost_calculator.calculate_cost(
-                model, prompt_tokens, completion_tokens, search_requests
-            )
+                model, prompt_tokens, completion_tokens, search_requests, batch
+            ),
+            latency=latency,
+            time_to_first_byte=time_to_first_byte,
+            batch=batch,
+            estimated=estimated
         )
-        
-        self.usage_history.append(usage)
+        return self.add(usage)
+    
+    def add(self, usage: TokenUsage) -> TokenUsage:
+        """加入已計算好的使用記錄（例如續跑時從檢查點還原的回應）"""
+        with self._lock:
+            self.usage_history.append(usage)
+            cost = usage.cost_estimate or 0
+            self._total_cost += cost
+            self._total_tokens += usage.total_tokens
+            
+            stats = self._provider_stats.get(usage.provider)
+            if stats is None:
+                stats = self._provider_stats[usage.provider] = {
+                    "total_tokens": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "search_requests": 0,
+                    "total_cost": 0.0,
+                    "calls": 0,
+                    "hedged_requests": 0,
+                    "_latency_sum": 0.0,
+                    "_latency_count": 0,
+                    "_ttfb_sum": 0.0,
+                    "_ttfb_count": 0
+                }
+            stats["total_tokens"] += usage.total_tokens
+            stats["prompt_tokens"] += usage.prompt_tokens
+            stats["completion_tokens"] += usage.completion_tokens
+            stats["search_requests"] += usage.search_requests
+            stats["total_cost"] += cost
+            stats["calls"] += 1
+            stats["hedged_requests"] += usage.hedged_requests
+            if usage.latency is not None:
+                stats["_latency_sum"] += usage.latency
+                stats["_latency_count"] += 1
+            if usage.time_to_first_byte is not None:
+                stats["_ttfb_sum"] += usage.time_to_first_byte
+                stats["_ttfb_count"] += 1
         return usage
     
     def get_total_cost(self) -> float:
         """獲取總成本"""
-        return sum(usage.cost_estimate or 0 for usage in self.usage_history)
+        return self._total_cost
     
     def get_total_tokens(self) -> int:
         """獲取總 token 數量"""
-        return sum(usage.total_tokens for usage in self.usage_history)
+        return self._total_tokens
     
     def get_usage_by_provider(self) -> dict:
-        """按提供商統計使用量"""
-        provider_stats = {}
-        for usage in self.usage_history:
-            if usage.provider not in provider_stats:
-                provider_stats[usage.provider] = {
-                    "total_tokens": 0,
-                    "total_cost": 0.0,
-                    "calls": 0
-                }
-            
-            provider_stats[usage.provider]["total_tokens"] += usage.total_tokens
-            provider_stats[usage.provider]["total_cost"] += (usage.cost_estimate or 0)
-            provider_stats[usage.provider]["calls"] += 1
+        """
+        按提供商統計使用量
         
+        每個提供商：calls、total_tokens、prompt_tokens、completion_tokens、search_requests、
+        total_cost、hedged_requests，以及 avg_latency / avg_time_to_first_byte（秒，沒有樣本時為 None）
+        """
+        provider_stats = {}
+        with self._lock:
+            for provider, stats in self._provider_stats.items():
+                summary = {key: value for key, value in stats.items() if not key.startswith("_")}
+                summary["avg_latency"] = (
+                    stats["_latency_sum"] / stats["_latency_count"] if stats["_latency_count"] else None
+                )
+                summary["avg_time_to_first_byte"] = (
+                    stats["_ttfb_sum"] / stats["_ttfb_count"] if stats["_ttfb_count"] else None
+                )
+                provider_stats[provider] = summary
         return provider_stats
     
     def clear_history(self):
         """清除使用歷史"""
-        self.usage_history.clear()
\ No newline at end of file
+        with self._lock:
+            self.usage_history.clear()
+            self._total_cost = 0.0
+            self._total_tokens = 0
+            self._provider_stats.clear()
@@ -30,10 +30,10 @@ TRANSLATIONS = {
         "analysis_config": "📝 分析設定",
         "target_brand": "🎯 目標品牌",
         "target_brand_placeholder": "例如：Asana、Monday.com、Trello",
-        "target_brand_help": "輸入您要分析的品牌名稱",
+        "target_brand_help": "輸入您要分析的品牌名稱，可用「|」附加別名，例如：Asana | Asana Inc",
         "competitors": "🏆 競爭對手品牌 (最多 10 個)",
         "competitors_placeholder": "每行輸入一個競爭對手：\nNotion\nClickUp\nJira",
-        "competitors_help": "輸入競爭對手品牌，每行一個。最多 10 個競爭對手。",
+        "competitors_help": "輸入競爭對手品牌，每行一個。最多 10 個競爭對手。可用「|」附加別名（產品名、縮寫），例如：Microsoft Teams | MS Teams",
         "analysis_prompts": "💬 分析提示詞 (最多 10 個)",
         "prompts_placeholder": "每行輸入一個提示詞：\n最佳的專案管理工具是什麼？\n推薦團隊協作平台\n哪個任務管理軟體最受歡迎？",
         "prompts_help": "輸入分析提示詞，每行一個。最多 10 個提示詞。",
@@ -43,6 +43,14 @@ TRANSLATIONS = {
         "running_analysis": "🔄 正在執行品牌分析...",
         "analysis_completed": "✅ 分析完成！",
         "analysis_failed": "❌ 分析失敗：",
+        "analysis_cancelled": "⏹️ 分析已取消",
+        "cancel_analysis": "⏹️ 取消分析",
+        "resume_analysis": "⏯️ 續跑中斷的分析",
+        "resume_analysis_help": "已完成的提供商調用保存在檢查點中，續跑時只調用尚未完成的部分（使用側邊欄的 API 金鑰）。",
+        "resume_button": "續跑",
+        "discard_checkpoint": "捨棄",
+        "checkpoint_units": "個調用已完成",
+        "resume_missing_keys": "⚠️ 續跑需要以下提供商的 API 金鑰：",
         
         # 進度狀態
         "progress_initializing": "🔧 初始化 AI 提供商...",
@@ -58,6 +66,7 @@ TRANSLATIONS = {
         "provide_target_brand": "⚠️ 請提供目標品牌。",
         "provide_prompts": "⚠️ 請提供至少一個分析提示詞。",
         "google_api_required": "⚠️ 需要 Google API 金鑰進行品牌檢測。",
+        "google_api_recommended": "ℹ️ 未提供 Google API 金鑰：品牌檢測僅使用本地比對，模糊的情況無法交由 Gemini 確認。",
         "provide_api_key": "⚠️ 請提供至少一個 AI 提供商 API 金鑰。",
         
         # 結果顯示
@@ -65,6 +74,48 @@ TRANSLATIONS = {
         "configure_analysis": "🎯 在上方設定您的分析並點擊「開始分析」來開始。",
         "completed_prompts": "已完成",
         "analysis_duration": "分析時間",
+        "cache_hits": "快取命中",
+        "cached_response": "(快取)",
+        "attempts": "嘗試次數",
+        "total_cost": "估計成本",
+        "total_tokens": "Token 用量",
+        "usage_by_provider": "用量與延遲",
+        "avg_latency": "平均延遲",
+        "time_to_first_byte": "首段延遲",
+        "estimated_usage": "提供商未回傳用量，為本地估計",
+        "concurrency_limit": "目前並行上限",
+        "circuit_state": "斷路器",
+        "circuit_closed": "正常",
+        "circuit_open": "斷開（快速失敗）",
+        "circuit_half_open": "半開（試探中）",
+        "hedge_requests": "對沖緩慢的請求",
+        "hedge_requests_help": "請求超過該提供商近期 p95 延遲仍未完成時，送出一份重複請求並採用先完成者（額外請求數受預算限制）",
+        "hedged_requests": "對沖請求",
+        "budget_usd": "成本上限（美元）",
+        "budget_help": "已花費加上進行中調用的預估成本達到上限後，不再派發新的調用；0 表示不設上限",
+        "projected_cost": "預估成本",
+        "estimate_details": "預估明細",
+        "estimate_help": "依本地計算的提示詞 token 與過去分析的平均輸出長度估計，未扣除快取命中；模型後的 (?) 表示沒有定價資料",
+        "estimate_over_budget": "預估超過成本上限，部分調用將被略過",
+        "budget_skipped": "因達到成本上限而略過的調用",
+        "hedge_wins": "對沖較快",
+        "detection_memo_hits": "重用的品牌檢測結果",
+        "response_cache": "回應快取",
+        "response_cache_help": "相同的提供商、模型與提示詞會直接使用先前的回應，不需再次付費調用",
+        "cache_mode_use": "使用快取",
+        "cache_mode_refresh": "重新取得並更新快取",
+        "cache_mode_bypass": "不使用快取",
+        "execution_mode": "執行模式",
+        "execution_mode_help": "批次模式將 OpenAI 與 Anthropic 的所有提示詞作為一個批次工作送出，約為一半價格且不佔用即時速率限制，但可能需要數分鐘到 24 小時才完成",
+        "execution_mode_interactive": "即時",
+        "execution_mode_batch": "批次（較便宜、較慢）",
+        "batch_detection": "品牌檢測也使用批次 API",
+        "batch_detection_help": "以 OpenAI 或 Anthropic 的 Batch API 與低價模型執行品牌檢測，取代即時的 Gemini 調用",
+        "batch_status": "批次工作",
+        "batch_response": "(批次)",
+        "stream_responses": "串流顯示回應",
+        "stream_responses_help": "回應生成時即時顯示部分文字，品牌名稱一出現就暫定為已提及；完整回應到齊後才以 LLM 確認模糊的品牌",
+        "live_responses": "⏳ 進行中的回應（暫定檢測結果）",
         "detection_summary": "📊 品牌檢測摘要",
         "ai_responses": "🤖 AI 回應",
         "response": "回應",
@@ -176,10 +227,10 @@ TRANSLATIONS = {
         "analysis_config": "📝 Analysis Configuration",
         "target_brand": "🎯 Target Brand",
         "target_brand_placeholder": "e.g., Asana, Monday.com, Trello",
-        "target_brand_help": "Enter the brand you want to analyze",
+        "target_brand_help": "Enter the brand you want to analyze. Add aliases with '|', e.g. Asana | Asana Inc",
         "competitors": "🏆 Competitor Brands (max 10)",
         "competitors_placeholder": "Enter one competitor per line:\nNotion\nClickUp\nJira",
-        "competitors_help": "Enter competitor brands, one per line. Maximum 10 competitors.",
+        "competitors_help": "Enter competitor brands, one per line. Maximum 10 competitors. Add aliases (product names, abbreviations) with '|', e.g. Microsoft Teams | MS Teams",
         "analysis_prompts": "💬 Analysis Prompts (max 10)",
         "prompts_placeholder": "Enter one prompt per line:\nWhat are the best project management tools?\nRecommend top team collaboration platforms\nWhich task management software is most popular?",
         "prompts_help": "Enter analysis prompts, one per line. Maximum 10 prompts.",
@@ -189,6 +240,14 @@ TRANSLATIONS = {
         "running_analysis": "🔄 Running brand analysis...",
         "analysis_completed": "✅ Analysis completed!",
         "analysis_failed": "❌ Analysis failed:",
+        "analysis_cancelled": "⏹️ Analysis cancelled",
+        "cancel_analysis": "⏹️ Cancel analysis",
+        "resume_analysis": "⏯️ Resume interrupted analyses",
+        "resume_analysis_help": "Completed provider calls are saved in a checkpoint; resuming only calls what is left (using the API keys in the sidebar).",
+        "resume_button": "Resume",
+        "discard_checkpoint": "Discard",
+        "checkpoint_units": "calls completed",
+        "resume_missing_keys": "⚠️ Resuming needs API keys for:",
         
         # Progress status
         "progress_initializing": "🔧 Initializing AI providers...",
@@ -204,6 +263,7 @@ TRANSLATIONS = {
         "provide_target_brand": "⚠️ Please provide a target brand.",
         "provide_prompts": "⚠️ Please provide at least one analysis prompt.",
         "google_api_required": "⚠️ Google API key is required for brand detection.",
+        "google_api_recommended": "ℹ️ No Google API key: brand detection uses local matching only, and ambiguous cases cannot be confirmed by Gemini.",
         "provide_api_key": "⚠️ Please provide at least one AI provider API key.",
         
         # Results display
@@ -211,6 +271,48 @@ TRANSLATIONS = {
         "configure_analysis": "🎯 Configure your analysis above and click 'Start Analysis' to begin.",
         "completed_prompts": "Completed",
         "analysis_duration": "Analysis Duration",
+        "cache_hits": "Cache Hits",
+        "cached_response": "(cached)",
+        "attempts": "Attempts",
+        "total_cost": "Estimated cost",
+        "total_tokens": "Tokens",
+        "usage_by_provider": "Usage and latency",
+        "avg_latency": "avg latency",
+        "time_to_first_byte": "time to first byte",
+        "estimated_usage": "the provider returned no usage; tokens are estimated locally",
+        "concurrency_limit": "Current concurrency limit",
+        "circuit_state": "Circuit breaker",
+        "circuit_closed": "closed",
+        "circuit_open": "open (failing fast)",
+        "circuit_half_open": "half-open (probing)",
+        "hedge_requests": "Hedge slow requests",
+        "hedge_requests_help": "When a request runs past the provider's recent p95 latency, send a duplicate and use whichever finishes first (extra requests are capped by a budget)",
+        "hedged_requests": "Hedged requests",
+        "budget_usd": "Budget cap (USD)",
+        "budget_help": "Stop dispatching new calls once spend plus the projected cost of in-flight calls reaches the cap; 0 means no cap",
+        "projected_cost": "Projected cost",
+        "estimate_details": "Estimate details",
+        "estimate_help": "Based on locally counted prompt tokens and average output lengths from past analyses; cache hits are not deducted. (?) after a model means it has no pricing data",
+        "estimate_over_budget": "the projection exceeds the budget cap, some calls will be skipped",
+        "budget_skipped": "Calls skipped because the budget cap was reached",
+        "hedge_wins": "hedge faster",
+        "detection_memo_hits": "Reused brand detection results",
+        "response_cache": "Response Cache",
+        "response_cache_help": "Reuse earlier responses for the same provider, model and prompt instead of paying for another call",
+        "cache_mode_use": "Use cache",
+        "cache_mode_refresh": "Refresh cache",
+        "cache_mode_bypass": "Bypass cache",
+        "execution_mode": "Execution Mode",
+        "execution_mode_help": "Batch mode submits all prompts for OpenAI and Anthropic as one batch job: about half price and outside the interactive rate limits, but it can take minutes up to 24 hours to finish",
+        "execution_mode_interactive": "Interactive",
+        "execution_mode_batch": "Batch (cheaper, slower)",
+        "batch_detection": "Run brand detection through the batch API too",
+        "batch_detection_help": "Use the OpenAI or Anthropic Batch API with a low-cost model for brand detection instead of interactive Gemini calls",
+        "batch_status": "Batch job",
+        "batch_response": "(batch)",
+        "stream_responses": "Stream responses",
+        "stream_responses_help": "Show partial text while responses are generated and mark brands as mentioned as soon as they appear; ambiguous brands are confirmed by the LLM once the full response arrives",
+        "live_responses": "⏳ Responses in progress (provisional detection)",
         "detection_summary": "📊 Brand Detection Summary",
         "ai_responses": "🤖 AI Responses",
         "response": "Response",
@@ -7,11 +7,18 @@ from .analysis import (
     PromptAnalysisResult,
     SimpleAnalysisResult,
     TokenUsage,
+    AnalysisJobInfo,
+    CostEstimate,
+    CostEstimateLine,
 )
 
 from .config import (
     StreamlitConfig,
     ProviderInfo,
+    RateLimitConfig,
+    RetryPolicy,
+    HedgePolicy,
+    CircuitBreakerConfig,
     SUPPORTED_PROVIDERS,
     DEFAULT_PROMPTS,
 )
@@ -24,10 +31,17 @@ __all__ = [
     "PromptAnalysisResult",
     "SimpleAnalysisResult",
     "TokenUsage",
+    "AnalysisJobInfo",
+    "CostEstimate",
+    "CostEstimateLine",
     
     # Config models
     "StreamlitConfig",
     "ProviderInfo",
+    "RateLimitConfig",
+    "RetryPolicy",
+    "HedgePolicy",
+    "CircuitBreakerConfig",
     "SUPPORTED_PROVIDERS",
     "DEFAULT_PROMPTS",
 ]
\ No newline at end of file
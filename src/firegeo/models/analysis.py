@@ -11,15 +11,25 @@ class EnhancedAnalysisRequest(BaseModel):
     prompts: List[str] = []
     api_keys: Dict[str, str] = {}  # AI提供商API金鑰
     selected_models: Dict[str, str] = {}  # 每個提供商選擇的模型
+    brand_aliases: Dict[str, List[str]] = {}  # 品牌 → 別名（產品名、縮寫等），供本地比對使用
+    cache_mode: str = "use"  # 回應快取模式：use（讀寫）/ refresh（只寫）/ bypass（不使用）
+    hedge_requests: bool = False  # 是否對緩慢的提供商請求送出對沖請求
+    execution_mode: str = "interactive"  # 執行模式：interactive（即時調用）/ batch（支援的提供商改用 Batch API）
+    batch_detection: bool = False  # 品牌檢測是否也透過 Batch API 執行
+    stream_responses: bool = False  # 是否以串流方式接收回應（即時顯示部分文字與暫定的品牌檢測）
+    budget_usd: Optional[float] = Field(default=None, gt=0)  # 成本上限（USD）：實際 + 進行中的預估花費達上限後不再派發新的調用
 
 # 保持向後兼容
 SimpleAnalysisRequest = EnhancedAnalysisRequest
 
 class BrandDetectionResult(BaseModel):
-    """品牌檢測結果 - 只包含布林值和推理"""
+    """品牌檢測結果 - 包含布林值、推理和判斷來源"""
     brand_name: str
     mentioned: bool
     reasoning: str
+    detection_method: str = "llm"  # 判斷來源：local_match / local_absent / local_ambiguous / llm / error
+    confidence: Optional[float] = None  # LLM 回報的信心值（0–1）；本地判定為 None
+    detection_tier: Optional[str] = None  # LLM 檢測使用的層級：fast（快速模型）/ strong（升級或未級聯）
 
 class AIProviderResponse(BaseModel):
     """增強的AI提供商回應 - 包含模型和成本信息"""
@@ -29,8 +39,14 @@ class AIProviderResponse(BaseModel):
     response_text: str
     brand_detections: Dict[str, BrandDetectionResult] = {}
     token_usage: Optional['TokenUsage'] = None  # 新增：token 使用統計
-    processing_time: float = 0.0
+    processing_time: float = 0.0  # 單元耗時（秒）：取得回應 + 品牌檢測
     error: Optional[str] = None
+    error_type: Optional[str] = None  # 失敗類型：timeout / rate_limit / auth / server / content_filter / circuit_open / budget / unknown / detection
+    cached: bool = False  # 回應是否來自快取
+    attempts: int = 0  # 提供商調用的嘗試次數（含重試；快取命中為 0）
+    hedged_requests: int = 0  # 額外送出的對沖請求數
+    hedge_won: bool = False  # 回應是否來自對沖請求
+    batch: bool = False  # 回應是否來自 Batch API
 
 class PromptAnalysisResult(BaseModel):
     """單一提示詞的分析結果"""
@@ -55,7 +71,12 @@ class TokenUsage(BaseModel):
     completion_tokens: int = 0
     total_tokens: int = 0
     search_requests: int = 0  # 新增：搜尋請求次數（Perplexity 用）
+    hedged_requests: int = 0  # 對沖送出的額外請求數（其 token 已含在上方用量中）
     cost_estimate: Optional[float] = None
+    latency: Optional[float] = None  # 成功請求的耗時（秒，不含重試與排隊；批次為 None）
+    time_to_first_byte: Optional[float] = None  # 送出請求到收到第一段回應的秒數
+    batch: bool = False  # 是否透過 Batch API（以批次價格計算）
+    estimated: bool = False  # 提供商未回傳用量，token 數為本地估計
 
 class EnhancedAnalysisResult(BaseModel):
     """增強的分析結果 - 包含成本追蹤"""
@@ -67,6 +88,49 @@ class EnhancedAnalysisResult(BaseModel):
     completed_prompts: int = 0
     analysis_duration: float = 0.0
     total_cost: float = 0.0  # 新增：總成本
+    cache_stats: Dict[str, int] = {}  # 回應快取統計：hits / misses / writes
+    concurrency_limits: Dict[str, int] = {}  # 分析結束時各提供商的自適應並行上限
+    circuit_states: Dict[str, str] = {}  # 分析結束時各提供商的斷路器狀態：closed / open / half_open
+    hedge_stats: Dict[str, int] = {}  # 對沖統計：hedged（額外請求數）/ hedge_wins（對沖較快的次數）
+    usage_by_provider: Dict[str, Dict[str, Any]] = {}  # 各提供商（含品牌檢測）的調用數、token、成本與平均延遲
+    run_id: Optional[str] = None  # 檢查點的執行 ID（可用於續跑）
+    resumed_units: int = 0  # 續跑時從檢查點還原、未重新調用的單元數
+    estimated_cost: Optional[float] = None  # 開始前預估的成本（USD）
+    budget_skipped_units: int = 0  # 因達到成本上限而未調用的單元數
 
 # 保持向後兼容
-SimpleAnalysisResult = EnhancedAnalysisResult
\ No newline at end of file
+SimpleAnalysisResult = EnhancedAnalysisResult
+
+class AnalysisJobInfo(BaseModel):
+    """分析工作狀態（HTTP 服務用）"""
+    job_id: str
+    status: str  # queued / running / completed / failed / cancelled
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    total_prompts: int = 0
+    completed_prompts: int = 0
+    total_units: int = 0  # (提示詞, 提供商) 調用總數，開始執行後才確定
+    completed_units: int = 0
+    error: Optional[str] = None
+
+class CostEstimateLine(BaseModel):
+    """單一提供商（或品牌檢測）的預估用量"""
+    provider: str
+    model: str
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    search_requests: int = 0
+    cost: float = 0.0
+    batch: bool = False  # 以 Batch API 價格計算
+    priced: bool = True  # 模型是否有定價（否則成本以 0 計）
+    from_history: bool = False  # 輸出長度是否來自過去分析的平均值（否則為預設值）
+
+class CostEstimate(BaseModel):
+    """分析開始前的成本預估（未扣除快取命中，為上限估計）"""
+    lines: List[CostEstimateLine] = []
+    total_tokens: int = 0
+    total_cost: float = 0.0
+    budget_usd: Optional[float] = None
+    within_budget: bool = True
@@ -7,6 +7,51 @@ class StreamlitConfig(BaseModel):
     """Streamlit 應用配置"""
     max_competitors: int = 10
     max_prompts: int = 10
+    max_concurrency: int = 64  # 全域同時進行的 (提示詞, 提供商) 調用上限；各提供商另由自適應控制調整
+    response_cache_enabled: bool = True  # 是否啟用持久化回應快取
+    response_cache_ttl_hours: float = 168.0  # 快取回應的有效時間（預設 7 天）
+    response_cache_max_entries: int = 5000  # 快取筆數上限
+    response_cache_max_mb: int = 200  # 快取大小上限 (MB)
+    detection_memo_persistent: bool = True  # 檢測備忘是否同時寫入磁碟（否則只保留在記憶體）
+    detection_model: str = "gemini-2.5-flash"  # 品牌檢測模型（級聯時為升級使用的模型）
+    detection_fast_model: Optional[str] = "gemini-2.5-flash-lite"  # 級聯檢測先使用的快速模型；None 停用級聯
+    detection_escalation_confidence: float = 0.7  # 快速模型信心值低於此值的品牌升級重新檢測
+    batch_poll_interval: float = 30.0  # 批次模式查詢批次工作狀態的間隔（秒）
+    batch_timeout_hours: float = 24.0  # 批次模式等待批次工作完成的上限（小時）
+    service_workers: int = 4  # HTTP 服務同時執行的分析工作數
+    service_queue_size: int = 100  # HTTP 服務排隊等待的分析工作上限（超過時拒絕新工作）
+    service_max_finished_jobs: int = 200  # HTTP 服務保留的已結束工作數（超過時移除最舊的）
+    service_max_pooled_providers: int = 32  # HTTP 服務共用的提供商實例上限（超過時關閉最久未使用的）
+
+class RateLimitConfig(BaseModel):
+    """速率限制設定（0 表示不限制）"""
+    rpm: int = 0  # 每分鐘請求數
+    tpm: int = 0  # 每分鐘 token 數
+
+class RetryPolicy(BaseModel):
+    """重試設定（指數退避 + 完全抖動）"""
+    max_attempts: int = 4  # 含第一次的最多嘗試次數
+    base_delay: float = 1.0  # 第一次重試的退避上限（秒），之後每次加倍
+    max_delay: float = 30.0  # 單次退避的上限（秒）
+    attempt_timeout: float = 60.0  # 單次嘗試的逾時（秒）
+    deadline: float = 180.0  # 含所有重試與等待的總時限（秒）
+
+class HedgePolicy(BaseModel):
+    """對沖請求設定：請求過慢時送出一份重複請求，採用先完成者"""
+    enabled: bool = False  # 預設關閉（會增加少量請求量）
+    percentile: float = 0.95  # 等待超過近期延遲的此百分位數才對沖
+    min_delay: float = 1.0  # 對沖前至少等待的秒數
+    min_samples: int = 10  # 累積足夠延遲樣本前不對沖
+    budget_ratio: float = 0.05  # 對沖請求數不超過一般請求數的此比例
+    budget_burst: int = 2  # 額外允許的對沖次數（樣本剛足夠時使用）
+
+class CircuitBreakerConfig(BaseModel):
+    """斷路器設定：提供商持續失敗時快速失敗，冷卻後以單一請求試探"""
+    failure_threshold: int = 5  # 連續失敗達此次數即斷開
+    error_rate_threshold: float = 0.5  # 近期錯誤率達此比例即斷開
+    window_size: int = 20  # 計算錯誤率的近期請求數
+    min_calls: int = 10  # 近期請求數達此數量才依錯誤率判斷
+    open_duration: float = 30.0  # 斷開後多久進入半開狀態試探（秒）
 
 class ProviderInfo(BaseModel):
     """AI提供商增強信息"""
@@ -15,12 +60,22 @@ class ProviderInfo(BaseModel):
     models: List[str] = []
     default_model: str = ""
     model_descriptions: Dict[str, str] = {}
+    max_concurrency: int = 4  # 此提供商同時進行的請求數（自適應控制的起始值）
+    max_adaptive_concurrency: int = 32  # 自適應控制可提高到的上限
+    rate_limit: RateLimitConfig = RateLimitConfig()  # 提供商預設速率限制
+    model_rate_limits: Dict[str, RateLimitConfig] = {}  # 個別模型的速率限制（覆寫預設）
 
 # 支援的 AI 提供商配置（2025年最新模型列表和定價）
 SUPPORTED_PROVIDERS: Dict[str, ProviderInfo] = {
     "openai": ProviderInfo(
         name="openai",
         display_name="OpenAI",
+        max_concurrency=10,
+        max_adaptive_concurrency=50,
+        rate_limit=RateLimitConfig(rpm=500, tpm=450_000),
+        model_rate_limits={
+            "gpt-4o-mini": RateLimitConfig(rpm=500, tpm=2_000_000),
+        },
         models=["gpt-4o", "gpt-4o-mini", "gpt-4.1", "gpt-5"],
         default_model="gpt-4o",
         model_descriptions={
@@ -33,6 +88,9 @@ SUPPORTED_PROVIDERS: Dict[str, ProviderInfo] = {
     "anthropic": ProviderInfo(
         name="anthropic", 
         display_name="Anthropic",
+        max_concurrency=5,
+        max_adaptive_concurrency=20,
+        rate_limit=RateLimitConfig(rpm=50, tpm=80_000),
         models=["claude-sonnet-4-0", "claude-3-7-sonnet-latest", "claude-3-5-haiku-20241022"],
         default_model="claude-sonnet-4-0",
         model_descriptions={
@@ -43,7 +101,14 @@ SUPPORTED_PROVIDERS: Dict[str, ProviderInfo] = {
     ),
     "google": ProviderInfo(
         name="google",
-        display_name="Google", 
+        display_name="Google",
+        max_concurrency=10,
+        max_adaptive_concurrency=50,
+        rate_limit=RateLimitConfig(rpm=1000, tpm=1_000_000),
+        model_rate_limits={
+            "gemini-2.5-flash-lite": RateLimitConfig(rpm=4000, tpm=4_000_000),
+            "gemini-2.5-pro": RateLimitConfig(rpm=150, tpm=2_000_000),
+        },
         models=["gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-2.5-pro"],
         default_model="gemini-2.5-flash",
         model_descriptions={
@@ -55,6 +120,9 @@ SUPPORTED_PROVIDERS: Dict[str, ProviderInfo] = {
     "perplexity": ProviderInfo(
         name="perplexity",
         display_name="Perplexity",
+        max_concurrency=5,
+        max_adaptive_concurrency=20,
+        rate_limit=RateLimitConfig(rpm=50),
         models=["sonar", "sonar-pro"],
         default_model="sonar",
         model_descriptions={
@@ -0,0 +1,190 @@
+"""
+HTTP 服務 - 以 API 提交分析工作、查詢進度與取得結果
+
+流程架構：
+┌─────────────────────────────────────────────────────────┐
+│  POST   /jobs               提交 SimpleAnalysisRequest    │
+│                              → 202 工作狀態（佇列滿 → 429）│
+│  POST   /estimate           預估 token 與成本（不調用提供商）│
+│  GET    /jobs               所有工作狀態                   │
+│  GET    /jobs/{id}          工作狀態                      │
+│  GET    /jobs/{id}/events   NDJSON 事件串流（直到工作結束） │
+│  GET    /jobs/{id}/result   SimpleAnalysisResult         │
+│  DELETE /jobs/{id}          取消工作                      │
+│  GET    /health             佇列與工作者統計               │
+│     │                                                   │
+│     ▼                                                   │
+│  JobQueue：有上限的佇列 + 共用提供商連線的非同步工作者       │
+└─────────────────────────────────────────────────────────┘
+
+需要選用依賴：pip install "llm-brand-detector[api]"
+設定 FIREGEO_API_TOKEN 時，所有請求都需帶上 Authorization: Bearer <token>。
+請求未提供 api_keys 時，使用服務環境變數中的 API 金鑰（同命令列介面）。
+"""
+
+import argparse
+import hmac
+import json
+import logging
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from .cli import load_api_keys
+from .core.job_queue import JOB_FINISHED_STATES, JobQueue, JobQueueFullError
+from .core.scheduler import estimate_analysis_cost
+from .models.analysis import AnalysisJobInfo, CostEstimate, SimpleAnalysisRequest, SimpleAnalysisResult
+from .models.config import StreamlitConfig
+
+try:
+    from fastapi import Depends, FastAPI, HTTPException, Request
+    from fastapi.responses import StreamingResponse
+    FASTAPI_AVAILABLE = True
+except ImportError:
+    FASTAPI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+API_TOKEN_ENV_VAR = "FIREGEO_API_TOKEN"
+
+
+def create_app(
+    config: Optional[StreamlitConfig] = None,
+    job_queue: Optional[JobQueue] = None,
+    api_token: Optional[str] = None
+) -> "FastAPI":
+    """
+    建立 FastAPI 應用；工作佇列隨應用啟動與關閉
+
+    參數：
+        config: 分析與服務設定，預設為 StreamlitConfig()
+        job_queue: 自訂的工作佇列，預設依 config 建立並使用環境變數中的 API 金鑰
+        api_token: 存取權杖，預設讀取 FIREGEO_API_TOKEN；未設定時不驗證
+    """
+    if not FASTAPI_AVAILABLE:
+        raise ImportError('The HTTP service requires FastAPI: pip install "llm-brand-detector[api]"')
+
+    job_queue = job_queue or JobQueue(config, default_api_keys=load_api_keys())
+    api_token = api_token if api_token is not None else os.getenv(API_TOKEN_ENV_VAR)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        job_queue.start()
+        try:
+            yield
+        finally:
+            await job_queue.aclose()
+
+    def check_token(request: Request):
+        if not api_token:
+            return
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), api_token.encode()):
+            raise HTTPException(status_code=401, detail="Invalid or missing bearer token")
+
+    app = FastAPI(
+        title="LLM Brand Detector",
+        description="Brand visibility analysis across AI providers",
+        lifespan=lifespan,
+        dependencies=[Depends(check_token)]
+    )
+    app.state.job_queue = job_queue
+
+    def get_job(job_id: str):
+        job = job_queue.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        return job
+
+    @app.post("/jobs", status_code=202, response_model=AnalysisJobInfo)
+    async def submit_job(request: SimpleAnalysisRequest):
+        try:
+            job = job_queue.submit(request)
+        except JobQueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        return job.info()
+
+    @app.post("/estimate", response_model=CostEstimate)
+    async def estimate(request: SimpleAnalysisRequest):
+        if not request.api_keys and job_queue.default_api_keys:
+            request = request.model_copy(update={"api_keys": dict(job_queue.default_api_keys)})
+        return estimate_analysis_cost(request, config=job_queue.config)
+
+    @app.get("/jobs", response_model=List[AnalysisJobInfo])
+    async def list_jobs():
+        return [job.info() for job in job_queue.jobs.values()]
+
+    @app.get("/jobs/{job_id}", response_model=AnalysisJobInfo)
+    async def job_status(job_id: str):
+        return get_job(job_id).info()
+
+    @app.get("/jobs/{job_id}/events")
+    async def job_events(job_id: str):
+        job = get_job(job_id)
+
+        async def ndjson():
+            async for event in job.events():
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    @app.get("/jobs/{job_id}/result", response_model=SimpleAnalysisResult)
+    async def job_result(job_id: str):
+        job = get_job(job_id)
+        if job.result is None:
+            detail = job.error or f"Job is {job.status}"
+            raise HTTPException(status_code=409 if job.status not in JOB_FINISHED_STATES else 410, detail=detail)
+        return job.result
+
+    @app.delete("/jobs/{job_id}", response_model=AnalysisJobInfo)
+    async def cancel_job(job_id: str):
+        get_job(job_id)
+        return job_queue.cancel(job_id).info()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok" if job_queue.running else "stopped", **job_queue.stats()}
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """HTTP 服務進入點"""
+    parser = argparse.ArgumentParser(
+        prog="llm-brand-detector-api",
+        description="Serve brand visibility analyses over HTTP with a bounded job queue.",
+        epilog=f"Set {API_TOKEN_ENV_VAR} to require a bearer token. Requests without api_keys use the "
+               "provider keys from the environment (same variables as llm-brand-detector-cli)."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="analysis jobs run at the same time")
+    parser.add_argument("--queue-size", type=int, default=None, help="queued jobs before new submissions get 429")
+    parser.add_argument("--concurrency", type=int, default=None, help="concurrent provider calls per job")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+    if uvicorn is None or not FASTAPI_AVAILABLE:
+        print('The HTTP service requires FastAPI and uvicorn: pip install "llm-brand-detector[api]"', file=sys.stderr)
+        return 2
+
+    updates = {
+        "service_workers": args.workers,
+        "service_queue_size": args.queue_size,
+        "max_concurrency": args.concurrency,
+    }
+    config = StreamlitConfig().model_copy(update={key: value for key, value in updates.items() if value})
+    uvicorn.run(create_app(config), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,22 +3,39 @@
 import streamlit as st
 import asyncio
 import json
+from concurrent.futures import CancelledError
 import pandas as pd
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import logging
 
-from firegeo.core.simple_detector import SimpleBrandDetector
-from firegeo.core.ai_providers.openai_provider import OpenAIProvider
-from firegeo.core.ai_providers.anthropic_provider import AnthropicProvider
-from firegeo.core.ai_providers.google_provider import GoogleProvider
-from firegeo.core.ai_providers.perplexity_provider import PerplexityProvider
+from firegeo.core.background import (
+    BackgroundRun,
+    get_background_runner,
+    UPDATE_BATCH,
+    UPDATE_PROMPT,
+    UPDATE_STREAM,
+    UPDATE_UNIT,
+)
+from firegeo.core.scheduler import EXECUTION_MODES, EXECUTION_BATCH, estimate_analysis_cost
+from firegeo.core.adaptive_concurrency import get_concurrency_limiter
+from firegeo.core.ai_providers.circuit_breaker import get_circuit_breaker
+from firegeo.core.cache import CACHE_MODES
+from firegeo.core.checkpoint import CheckpointLog, list_checkpoints
 from firegeo.models.analysis import SimpleAnalysisRequest, SimpleAnalysisResult, AIProviderResponse, PromptAnalysisResult
 from firegeo.models.config import StreamlitConfig, SUPPORTED_PROVIDERS, DEFAULT_PROMPTS
 from firegeo.utils.api_validation import validate_api_keys
 from firegeo.utils.export import create_json_export, create_csv_export
+from firegeo.utils.brand_input import parse_brand_entry, parse_brand_lines
 from firegeo.localization.i18n import get_text, set_language, get_current_language
 
+# 斷路器狀態圖示
+CIRCUIT_ICONS = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}
+
+# 讀取背景分析進度的間隔（秒，同時是串流預覽的重繪間隔）與同時顯示的串流數
+PROGRESS_POLL_INTERVAL = 0.5
+MAX_LIVE_STREAMS = 4
+
 # 設置日誌
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -70,6 +87,11 @@ class LLMBrandDetectorApp:
             st.session_state.current_analysis = None
         if 'analysis_in_progress' not in st.session_state:
             st.session_state.analysis_in_progress = False
+        if 'active_run' not in st.session_state:
+            st.session_state.active_run = None  # 背景執行中的分析 (BackgroundRun)
+            st.session_state.run_view = None  # 背景分析的進度顯示狀態
+        if 'run_message' not in st.session_state:
+            st.session_state.run_message = None  # 上一次分析結束時的訊息：(層級, 文字)
     
     def render_api_sidebar(self) -> tuple[Dict[str, str], Dict[str, str]]:
         """渲染增強版API設定側邊欄"""
@@ -106,6 +128,14 @@ class LLMBrandDetectorApp:
                             description = provider_info.model_descriptions.get(selected_model, "")
                             if description:
                                 st.caption(f"💡 {description}")
+                        
+                        # 顯示自適應並行控制目前學到的上限
+                        limiter = get_concurrency_limiter(provider_key, selected_model)
+                        st.caption(f"⚡ {get_text('concurrency_limit')}: {limiter.limit}/{limiter.max_limit}")
+                        
+                        # 顯示斷路器狀態
+                        circuit_state = get_circuit_breaker(provider_key, selected_model).state
+                        st.caption(f"{CIRCUIT_ICONS[circuit_state]} {get_text('circuit_state')}: {get_text(f'circuit_{circuit_state}')}")
             
             # 驗證按鈕
             if st.button(get_text("validate_apis")):
@@ -163,21 +193,77 @@ class LLMBrandDetectorApp:
                 help=get_text("prompts_help")
             )
         
-        # 解析輸入
-        competitors = [
-            line.strip() for line in competitors_text.split('\n') 
-            if line.strip()
-        ][:self.config.max_competitors]
+        # 解析輸入（支援「品牌 | 別名」格式）
+        target_brand, target_aliases = parse_brand_entry(target_brand)
+        competitors, brand_aliases = parse_brand_lines(competitors_text)
+        competitors = competitors[:self.config.max_competitors]
+        brand_aliases = {brand: names for brand, names in brand_aliases.items() if brand in competitors}
+        if target_aliases:
+            brand_aliases[target_brand] = target_aliases
         
         prompts = [
             line.strip() for line in prompts_text.split('\n') 
             if line.strip()
         ][:self.config.max_prompts]
         
+        cache_mode = "bypass"
+        if self.config.response_cache_enabled:
+            cache_mode = st.radio(
+                get_text("response_cache"),
+                options=CACHE_MODES,
+                format_func=lambda mode: get_text(f"cache_mode_{mode}"),
+                horizontal=True,
+                help=get_text("response_cache_help")
+            )
+        
+        hedge_requests = st.checkbox(
+            get_text("hedge_requests"),
+            value=False,
+            help=get_text("hedge_requests_help")
+        )
+        
+        budget_usd = st.number_input(
+            get_text("budget_usd"),
+            min_value=0.0,
+            value=0.0,
+            step=0.1,
+            format="%.2f",
+            help=get_text("budget_help")
+        )
+        
+        execution_mode = st.radio(
+            get_text("execution_mode"),
+            options=EXECUTION_MODES,
+            format_func=lambda mode: get_text(f"execution_mode_{mode}"),
+            horizontal=True,
+            help=get_text("execution_mode_help")
+        )
+        batch_detection = False
+        stream_responses = False
+        if execution_mode == EXECUTION_BATCH:
+            batch_detection = st.checkbox(
+                get_text("batch_detection"),
+                value=False,
+                help=get_text("batch_detection_help")
+            )
+        else:
+            stream_responses = st.checkbox(
+                get_text("stream_responses"),
+                value=True,
+                help=get_text("stream_responses_help")
+            )
+        
         return SimpleAnalysisRequest(
             target_brand=target_brand,
             competitors=competitors,
-            prompts=prompts
+            prompts=prompts,
+            brand_aliases=brand_aliases,
+            cache_mode=cache_mode,
+            hedge_requests=hedge_requests,
+            execution_mode=execution_mode,
+            batch_detection=batch_detection,
+            stream_responses=stream_responses,
+            budget_usd=budget_usd or None  # 0 表示不設上限
         )
     
     def render_analysis_button(
@@ -192,8 +278,7 @@ class LLMBrandDetectorApp:
         can_analyze = (
             request.target_brand and 
             request.prompts and 
-            any(api_keys.values()) and
-            api_keys.get("google")  # Google API是必需的（用於品牌檢測）
+            any(api_keys.values())
         )
         
         if not can_analyze:
@@ -201,203 +286,222 @@ class LLMBrandDetectorApp:
                 st.warning(get_text("provide_target_brand"))
             elif not request.prompts:
                 st.warning(get_text("provide_prompts"))
-            elif not api_keys.get("google"):
-                st.warning(get_text("google_api_required"))
             elif not any(api_keys.values()):
                 st.warning(get_text("provide_api_key"))
             return
         
+        # Google API 用於確認本地比對無法判定的品牌，缺少時仍可只用本地比對
+        if not api_keys.get("google"):
+            st.info(get_text("google_api_recommended"))
+        
+        self.render_cost_estimate(request.model_copy(update={"api_keys": {k: v for k, v in api_keys.items() if v}}))
+        
         if st.button(get_text("start_analysis"), type="primary", width='stretch', disabled=st.session_state.analysis_in_progress):
             # 更新請求中的API金鑰
             request.api_keys = {k: v for k, v in api_keys.items() if v}
             
-            # 設置進行中狀態
-            st.session_state.analysis_in_progress = True
-            
-            # 執行分析並顯示詳細進度
-            self.run_analysis_with_progress(request)
+            # 在背景執行緒開始分析，頁面在分析期間仍可操作
+            self.start_background_analysis(request)
+            st.rerun()
     
-    def run_analysis_with_progress(self, request: SimpleAnalysisRequest):
-        """執行分析並顯示實時進度"""
+    def render_cost_estimate(self, request: SimpleAnalysisRequest):
+        """分析開始前顯示預估的 token 與成本（不發出任何請求）"""
         from firegeo.localization import get_text
         
-        # 創建進度顯示區域
-        progress_placeholder = st.empty()
-        status_placeholder = st.empty()
-        
         try:
-            # 執行分析
-            result = asyncio.run(self.run_analysis_with_updates(request, progress_placeholder, status_placeholder))
-            
-            st.session_state.current_analysis = result
-            st.session_state.analysis_results.append(result)
-            
-            # 完成訊息
-            progress_placeholder.progress(1.0, text=get_text("analysis_completed"))
-            st.success(get_text("analysis_completed"))
-            
+            estimate = estimate_analysis_cost(request, config=self.config)
         except Exception as e:
-            st.error(f"{get_text('analysis_failed')} {str(e)}")
-            logger.error(f"Analysis error: {e}")
-        finally:
-            st.session_state.analysis_in_progress = False
-            st.rerun()
+            logger.warning(f"Cost estimate failed: {e}")
+            return
+        
+        text = (
+            f"💰 {get_text('projected_cost')}: \\${estimate.total_cost:.4f} · "
+            f"{get_text('total_tokens')}: {estimate.total_tokens:,}"
+        )
+        if estimate.within_budget:
+            st.caption(text)
+        else:
+            st.warning(f"{text} · {get_text('estimate_over_budget')} (\\${estimate.budget_usd:.2f})")
+        with st.expander(get_text("estimate_details"), expanded=False):
+            st.dataframe(
+                pd.DataFrame([
+                    {
+                        "Provider": line.provider,
+                        "Model": line.model if line.priced else f"{line.model} (?)",
+                        "Calls": line.calls,
+                        "Prompt Tokens": line.prompt_tokens,
+                        "Completion Tokens": line.completion_tokens,
+                        "Cost (USD)": round(line.cost, 5),
+                    }
+                    for line in estimate.lines
+                ]),
+                width='stretch',
+                hide_index=True
+            )
+            st.caption(get_text("estimate_help"))
     
-    async def run_analysis_with_updates(
-        self, 
-        request: SimpleAnalysisRequest,
-        progress_placeholder,
-        status_placeholder
-    ) -> SimpleAnalysisResult:
-        """執行品牌分析並實時更新進度"""
+    def render_active_analysis(self):
+        """顯示進行中分析的進度，或上一次分析結束時的訊息（完成、取消或失敗）"""
+        if st.session_state.run_message:
+            level, message = st.session_state.run_message
+            getattr(st, level)(message)
+            st.session_state.run_message = None
+        
+        if st.session_state.active_run is not None:
+            self.render_run_progress()
+    
+    def start_background_analysis(self, request: SimpleAnalysisRequest, checkpoint: Optional[CheckpointLog] = None):
+        """
+        交給背景執行器開始分析，進度由 render_run_progress 定期讀取
+        
+        每次分析都寫入檢查點；指定 checkpoint 時從該檢查點續跑
+        """
         from firegeo.localization import get_text
         
-        start_time = datetime.now()
+        # 使用金鑰的提供商數（實際的提供商、檢測器與快取由 run_analysis 建立）
+        provider_count = sum(1 for provider_key in SUPPORTED_PROVIDERS if request.api_keys.get(provider_key))
+        
+        st.session_state.active_run = get_background_runner(self.config).submit(request, checkpoint or CheckpointLog())
+        st.session_state.analysis_in_progress = True
+        st.session_state.run_view = {
+            "progress": 0.0,
+            "progress_text": f"{get_text('progress_calling_all')} - {len(request.prompts)} prompts x {provider_count} AI Providers",
+            "status": ("info", get_text("progress_initializing")),
+            # 進行中的串流：(提示詞索引, 提供商) → (目前文字, 暫定已提及的品牌)
+            "live_streams": {},
+        }
+    
+    def render_resume_options(self, api_keys: Dict[str, str]):
+        """列出中斷的分析（檢查點），可從中斷處續跑或捨棄"""
+        from firegeo.localization import get_text
         
-        result = SimpleAnalysisResult(
-            request=request,
-            total_prompts=len(request.prompts)
-        )
+        runner = get_background_runner(self.config)
+        checkpoints = [
+            checkpoint for checkpoint in list_checkpoints()
+            if checkpoint["run_id"] not in runner.active_runs
+        ]
+        if not checkpoints:
+            return
         
-        # 步驟 1: 初始化 AI 提供商
-        total_steps = len(request.prompts) * (len([k for k in request.api_keys.values() if k]) + 1) + 2  # +2 for init and finalize
-        current_step = 0
-        
-        progress_placeholder.progress(current_step / total_steps, text=get_text("progress_initializing"))
-        status_placeholder.info(get_text("progress_initializing"))
-        
-        # 初始化AI提供商（包含選定的模型）
-        providers = {}
-        if request.api_keys.get("openai"):
-            model = request.selected_models.get("openai", "gpt-4o")
-            providers["OpenAI"] = OpenAIProvider(request.api_keys["openai"], model)
-        if request.api_keys.get("anthropic"):
-            model = request.selected_models.get("anthropic", "claude-sonnet-4-20250514")
-            providers["Anthropic"] = AnthropicProvider(request.api_keys["anthropic"], model)
-        if request.api_keys.get("google"):
-            model = request.selected_models.get("google", "gemini-2.5-flash")
-            providers["Google"] = GoogleProvider(request.api_keys["google"], model)
-        if request.api_keys.get("perplexity"):
-            model = request.selected_models.get("perplexity", "sonar")
-            providers["Perplexity"] = PerplexityProvider(request.api_keys["perplexity"], model)
-        
-        if not request.api_keys.get("google"):
-            raise ValueError("Google API key is required for brand detection")
-        
-        detector = SimpleBrandDetector(request.api_keys["google"])
-        current_step += 1
-        
-        # 逐個處理提示詞
-        for prompt_idx, prompt in enumerate(request.prompts):
-            # 更新提示詞進度
-            prompt_progress = f"{get_text('progress_prompt')} {prompt_idx + 1}/{len(request.prompts)}: {prompt[:50]}..."
-            progress_placeholder.progress(current_step / total_steps, text=prompt_progress)
-            status_placeholder.info(prompt_progress)
-            
-            prompt_result = PromptAnalysisResult(
-                prompt=prompt,
-                prompt_index=prompt_idx
-            )
-            
-            # 並行獲取各AI提供商的回應
-            parallel_progress = f"{get_text('progress_calling_all')} - Prompt {prompt_idx + 1}/{len(request.prompts)}"
-            progress_placeholder.progress(current_step / total_steps, text=parallel_progress)
-            status_placeholder.info(parallel_progress)
-            
-            # 創建並行任務
-            ai_tasks = []
-            for provider_name, provider in providers.items():
-                task = asyncio.create_task(
-                    self.process_single_provider(
-                        provider_name, provider, prompt, detector, request
+        with st.expander(f"{get_text('resume_analysis')} ({len(checkpoints)})"):
+            st.caption(get_text("resume_analysis_help"))
+            for checkpoint in checkpoints[:10]:
+                total_units = checkpoint["prompts"] * len(checkpoint["providers"])
+                col1, col2, col3 = st.columns([4, 1, 1])
+                with col1:
+                    st.markdown(
+                        f"**{checkpoint['target_brand']}** - {checkpoint['completed_units']}/{total_units} "
+                        f"{get_text('checkpoint_units')} ({checkpoint['created_at'][:16].replace('T', ' ')})"
                     )
-                )
-                ai_tasks.append((provider_name, task))
-            
-            # 並行等待所有任務完成
-            completed_providers = 0
-            for provider_name, task in ai_tasks:
-                try:
-                    ai_response = await task
-                    prompt_result.ai_responses[provider_name] = ai_response
-                    completed_providers += 1
-                    
-                    # 更新進度
-                    current_step += 1
-                    parallel_progress = f"{get_text('progress_completed_providers')} {completed_providers}/{len(providers)} AI Providers - Prompt {prompt_idx + 1}/{len(request.prompts)}"
-                    progress_placeholder.progress(current_step / total_steps, text=parallel_progress)
-                    status_placeholder.info(parallel_progress)
-                    
-                except Exception as e:
-                    logger.error(f"Error with {provider_name}: {e}")
-                    error_response = AIProviderResponse(
-                        provider=provider_name,
-                        model=getattr(providers[provider_name], 'selected_model', 'unknown'),
-                        prompt=prompt,
-                        response_text=f"Error: {str(e)}",
-                        error=str(e)
-                    )
-                    prompt_result.ai_responses[provider_name] = error_response
-                    current_step += 1
-            
-            # 完成當前提示詞
-            completed_progress = f"{get_text('progress_completed_prompt')} {prompt_idx + 1}/{len(request.prompts)}"
-            progress_placeholder.progress(current_step / total_steps, text=completed_progress)
-            status_placeholder.success(completed_progress)
-            
-            result.results_by_prompt.append(prompt_result)
-            result.completed_prompts += 1
-        
-        # 最終化
-        progress_placeholder.progress((total_steps - 1) / total_steps, text=get_text("progress_finalizing"))
-        status_placeholder.info(get_text("progress_finalizing"))
+                with col2:
+                    resume = st.button(get_text("resume_button"), key=f"resume_{checkpoint['run_id']}")
+                with col3:
+                    discard = st.button(get_text("discard_checkpoint"), key=f"discard_{checkpoint['run_id']}")
+                
+                if discard:
+                    CheckpointLog(checkpoint["run_id"]).delete()
+                    st.rerun()
+                if resume:
+                    missing = [provider for provider in checkpoint["providers"] if not api_keys.get(provider)]
+                    if missing:
+                        st.warning(f"{get_text('resume_missing_keys')} {', '.join(SUPPORTED_PROVIDERS[p].display_name for p in missing)}")
+                        continue
+                    log = CheckpointLog(checkpoint["run_id"])
+                    request = log.load_request()
+                    request.api_keys = {provider: api_keys[provider] for provider in checkpoint["providers"]}
+                    self.start_background_analysis(request, log)
+                    st.rerun()
+    
+    def apply_run_update(self, view: Dict[str, Any], update: tuple, request: SimpleAnalysisRequest):
+        """將背景分析的一個更新事件套用到進度顯示狀態"""
+        from firegeo.localization import get_text
         
-        # 計算總分析時間
-        end_time = datetime.now()
-        result.analysis_duration = (end_time - start_time).total_seconds()
+        kind, *args = update
+        if kind == UPDATE_STREAM:
+            prompt_idx, provider_name, text, mentioned = args
+            view["live_streams"][(prompt_idx, provider_name)] = (text, mentioned)
+        elif kind == UPDATE_UNIT:
+            prompt_result, response, completed_units, total_units = args
+            view["live_streams"].pop((prompt_result.prompt_index, response.provider), None)
+            # 每個提供商完成即更新進度，不必等待同一提示詞中最慢的提供商
+            unit_progress = f"{get_text('progress_completed_providers')} {response.provider} - Prompt {prompt_result.prompt_index + 1}/{len(request.prompts)} ({completed_units}/{total_units} calls)"
+            view["progress"] = completed_units / max(total_units, 1)
+            view["progress_text"] = unit_progress
+            view["status"] = ("info", unit_progress)
+        elif kind == UPDATE_PROMPT:
+            prompt_result, completed_units, total_units = args
+            view["status"] = ("success", f"{get_text('progress_completed_prompt')} {prompt_result.prompt_index + 1}/{len(request.prompts)} ({completed_units}/{total_units} calls)")
+        elif kind == UPDATE_BATCH:
+            provider_name, status = args
+            view["status"] = ("info", f"{get_text('batch_status')} {provider_name} ({status.batch_id}): {status.status} - {status.completed + status.failed}/{status.total}")
+    
+    @st.fragment(run_every=PROGRESS_POLL_INTERVAL)
+    def render_run_progress(self):
+        """定期讀取背景分析的進度（只重繪此區塊）；分析結束時重新執行整個頁面"""
+        from firegeo.localization import get_text
         
-        return result
+        run = st.session_state.active_run
+        if run is None:
+            return
+        view = st.session_state.run_view
+        for update in run.drain():
+            self.apply_run_update(view, update, run.request)
+        
+        if run.done:
+            self.finish_background_analysis(run)
+            st.rerun(scope="app")
+        
+        st.progress(view["progress"], text=view["progress_text"])
+        level, message = view["status"]
+        getattr(st, level)(message)
+        if view["live_streams"]:
+            self.render_live_streams(st.empty(), view["live_streams"], run.request)
+        if st.button(get_text("cancel_analysis"), key=f"cancel_{run.run_id}"):
+            run.cancel()
+            st.rerun(scope="app")
     
-    async def process_single_provider(
-        self, 
-        provider_name: str, 
-        provider, 
-        prompt: str, 
-        detector, 
-        request: SimpleAnalysisRequest
-    ) -> AIProviderResponse:
-        """處理單個 AI 提供商的完整流程（AI 調用 + 品牌檢測）"""
+    def finish_background_analysis(self, run: BackgroundRun):
+        """保存背景分析的結果並清除進行中狀態"""
+        from firegeo.localization import get_text
+        
         try:
-            # 1. 獲取 AI 回應
-            ai_response_text = await provider.get_response(prompt)
-            
-            # 2. 執行品牌檢測
-            brand_detections = await detector.detect_multiple_brands(
-                text=ai_response_text,
-                target_brand=request.target_brand,
-                competitors=request.competitors,
-                question=prompt
-            )
-            
-            # 3. 創建回應對象
-            return AIProviderResponse(
-                provider=provider_name,
-                model=provider.selected_model,
-                prompt=prompt,
-                response_text=ai_response_text,
-                brand_detections=brand_detections,
-                processing_time=0.0
-            )
-            
+            result = run.result()
+        except CancelledError:
+            st.session_state.run_message = ("warning", get_text("analysis_cancelled"))
         except Exception as e:
-            logger.error(f"Error processing {provider_name}: {e}")
-            return AIProviderResponse(
-                provider=provider_name,
-                model=getattr(provider, 'selected_model', 'unknown'),
-                prompt=prompt,
-                response_text=f"Error: {str(e)}",
-                error=str(e)
-            )
+            st.session_state.run_message = ("error", f"{get_text('analysis_failed')} {str(e)}")
+            logger.error(f"Analysis error: {e}")
+        else:
+            st.session_state.current_analysis = result
+            st.session_state.analysis_results.append(result)
+            st.session_state.run_message = ("success", get_text("analysis_completed"))
+        finally:
+            st.session_state.active_run = None
+            st.session_state.run_view = None
+            st.session_state.analysis_in_progress = False
+    
+    def render_live_streams(self, placeholder, live_streams: Dict[tuple, tuple], request: SimpleAnalysisRequest):
+        """顯示進行中的串流回應與暫定的品牌檢測（品牌名稱一出現即標記）"""
+        from firegeo.localization import get_text
+        
+        all_brands = [request.target_brand] + request.competitors
+        streams = list(live_streams.items())[-MAX_LIVE_STREAMS:]
+        with placeholder.container():
+            st.caption(get_text("live_responses"))
+            
+            # 暫定檢測表格：✅ 已出現，⏳ 等待完整回應後確認
+            table_data = []
+            for (prompt_idx, provider_name), (text, mentioned) in streams:
+                row = {"AI Provider": f"{provider_name} (Prompt {prompt_idx + 1})"}
+                for brand in all_brands:
+                    row[brand] = "✅" if brand in mentioned else "⏳"
+                table_data.append(row)
+            if table_data:
+                st.dataframe(pd.DataFrame(table_data), width='stretch', hide_index=True)
+            
+            for (prompt_idx, provider_name), (text, mentioned) in streams:
+                st.markdown(f"**{provider_name}** - Prompt {prompt_idx + 1}")
+                st.text(text[-600:])
     
     def render_analysis_results(self):
         """渲染分析結果區域"""
@@ -414,13 +518,44 @@ class LLMBrandDetectorApp:
         progress = result.completed_prompts / max(result.total_prompts, 1)
         st.progress(progress, text=f"{get_text('completed_prompts')}: {result.completed_prompts}/{result.total_prompts} prompts")
         
-        col1, col2, col3 = st.columns([1, 1, 1])
+        col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
         with col1:
             st.metric(get_text("target_brand"), result.request.target_brand)
         with col2:
             st.metric(get_text("competitors"), len(result.request.competitors))
         with col3:
             st.metric(get_text("analysis_duration"), f"{result.analysis_duration:.1f}s")
+        with col4:
+            cache_lookups = result.cache_stats.get("hits", 0) + result.cache_stats.get("misses", 0)
+            st.metric(
+                get_text("cache_hits"),
+                f"{result.cache_stats.get('hits', 0)}/{cache_lookups}" if cache_lookups else "-",
+                help=f"{get_text('detection_memo_hits')}: {result.cache_stats.get('detection_memo_hits', 0)}"
+            )
+        
+        if result.token_usage:
+            total_tokens = sum(usage.total_tokens for usage in result.token_usage)
+            cost_text = f"💰 {get_text('total_cost')}: \\${result.total_cost:.4f}"
+            if result.estimated_cost is not None:
+                cost_text += f" ({get_text('projected_cost')}: \\${result.estimated_cost:.4f})"
+            st.caption(f"{cost_text} · {get_text('total_tokens')}: {total_tokens:,}")
+            self.render_usage_by_provider(result)
+        if result.concurrency_limits:
+            limits_text = ", ".join(f"{name} {limit}" for name, limit in result.concurrency_limits.items())
+            st.caption(f"⚡ {get_text('concurrency_limit')}: {limits_text}")
+        if any(state != "closed" for state in result.circuit_states.values()):
+            circuit_text = ", ".join(
+                f"{CIRCUIT_ICONS[state]} {name} {get_text(f'circuit_{state}')}"
+                for name, state in result.circuit_states.items()
+            )
+            st.caption(f"{get_text('circuit_state')}: {circuit_text}")
+        if result.hedge_stats:
+            st.caption(
+                f"🔀 {get_text('hedged_requests')}: {result.hedge_stats.get('hedged', 0)} "
+                f"({get_text('hedge_wins')}: {result.hedge_stats.get('hedge_wins', 0)})"
+            )
+        if result.budget_skipped_units:
+            st.warning(f"{get_text('budget_skipped')}: {result.budget_skipped_units}")
         
         # 逐個顯示提示詞結果
         for prompt_result in result.results_by_prompt:
@@ -432,7 +567,18 @@ class LLMBrandDetectorApp:
                 # AI回應內容
                 st.subheader(get_text("ai_responses"))
                 for provider, response in prompt_result.ai_responses.items():
-                    with st.expander(f"▶ {provider} {get_text('response')}"):
+                    cached_label = f" {get_text('cached_response')}" if response.cached else ""
+                    if response.batch:
+                        cached_label += f" {get_text('batch_response')}"
+                    with st.expander(f"▶ {provider} {get_text('response')}{cached_label}"):
+                        if response.attempts > 1:
+                            st.caption(f"{get_text('attempts')}: {response.attempts}")
+                        if response.token_usage is not None:
+                            usage = response.token_usage
+                            usage_text = f"{usage.total_tokens:,} tokens · \\${usage.cost_estimate or 0:.5f}"
+                            if usage.latency is not None:
+                                usage_text += f" · {usage.latency:.2f}s ({get_text('time_to_first_byte')} {usage.time_to_first_byte:.2f}s)"
+                            st.caption(usage_text + (f" · {get_text('estimated_usage')}" if usage.estimated else ""))
                         if response.error:
                             st.error(f"Error: {response.error}")
                         else:
@@ -447,6 +593,26 @@ class LLMBrandDetectorApp:
         # 匯出選項
         self.render_export_options(result)
     
+    def render_usage_by_provider(self, result: SimpleAnalysisResult):
+        """渲染各提供商（含品牌檢測）的用量、成本與平均延遲"""
+        from firegeo.localization import get_text
+        
+        with st.expander(f"📊 {get_text('usage_by_provider')}"):
+            rows = []
+            for provider, stats in result.usage_by_provider.items():
+                rows.append({
+                    "Provider": provider,
+                    "Calls": stats.get("calls", 0),
+                    "Prompt tokens": stats.get("prompt_tokens", 0),
+                    "Completion tokens": stats.get("completion_tokens", 0),
+                    "Cost (USD)": round(stats.get("total_cost", 0.0), 5),
+                    get_text("avg_latency"): None if stats.get("avg_latency") is None else round(stats["avg_latency"], 2),
+                    get_text("time_to_first_byte"): (
+                        None if stats.get("avg_time_to_first_byte") is None else round(stats["avg_time_to_first_byte"], 2)
+                    ),
+                })
+            st.dataframe(pd.DataFrame(rows), width='stretch', hide_index=True)
+    
     def render_detection_summary_table(self, prompt_result: PromptAnalysisResult, request: SimpleAnalysisRequest):
         """渲染品牌檢測摘要表格"""
         from firegeo.localization import get_text
@@ -475,8 +641,10 @@ class LLMBrandDetectorApp:
                     else:
                         row[brand] = "❓"
             else:
+                # 提供商調用失敗時未執行檢測
+                missing_mark = "⚠️" if ai_response and ai_response.error else "❓"
                 for brand in all_brands:
-                    row[brand] = "❓"
+                    row[brand] = missing_mark
             
             table_data.append(row)
         
@@ -552,6 +720,9 @@ class LLMBrandDetectorApp:
             
             # 分析按鈕
             self.render_analysis_button(request, api_keys)
+            self.render_active_analysis()
+            if not st.session_state.analysis_in_progress:
+                self.render_resume_options(api_keys)
             
             st.markdown("---")
             
@@ -2,9 +2,12 @@
 
 from .api_validation import validate_api_keys
 from .export import create_json_export, create_csv_export
+from .brand_input import parse_brand_entry, parse_brand_lines
 
 __all__ = [
     "validate_api_keys",
     "create_json_export", 
     "create_csv_export",
+    "parse_brand_entry",
+    "parse_brand_lines",
 ]
\ No newline at end of file
@@ -1,11 +1,29 @@
 """API金鑰驗證工具"""
 
 import asyncio
+import threading
 import openai
 import anthropic
 import google.generativeai as genai
-import httpx
-from typing import Dict
+from typing import Dict, Optional, Tuple
+
+from ..core.gemini_client import bind_async_client
+from ..core.ai_providers.perplexity_provider import PerplexityProvider
+
+# 驗證共用的 Perplexity 提供商：重複驗證同一金鑰時沿用其 keep-alive 連線池，
+# 金鑰變更時才關閉並重建
+_perplexity_provider: Optional[PerplexityProvider] = None
+_perplexity_lock = threading.Lock()
+
+def _get_perplexity_provider(api_key: str) -> Tuple[PerplexityProvider, Optional[PerplexityProvider]]:
+    """取得驗證用的共用提供商；返回 (提供商, 被取代而需要關閉的舊提供商)"""
+    global _perplexity_provider
+    with _perplexity_lock:
+        replaced = None
+        if _perplexity_provider is None or _perplexity_provider.api_key != api_key:
+            replaced = _perplexity_provider
+            _perplexity_provider = PerplexityProvider(api_key, timeout=10.0)
+        return _perplexity_provider, replaced
 
 async def validate_openai_key(api_key: str) -> bool:
     """驗證OpenAI API金鑰"""
@@ -43,12 +61,10 @@ async def validate_google_key(api_key: str) -> bool:
         return False
     
     try:
-        genai.configure(api_key=api_key)
         model = genai.GenerativeModel("gemini-2.5-flash-lite")
-        # 嘗試生成內容來驗證
-        response = await asyncio.get_event_loop().run_in_executor(
-            None, model.generate_content, "Hi"
-        )
+        # 嘗試生成內容來驗證（原生非同步調用）
+        bind_async_client(model, api_key)
+        response = await model.generate_content_async("Hi")
         return bool(response.text)
     except Exception as e:
         print(f"Google validation error: {e}")
@@ -59,27 +75,20 @@ async def validate_perplexity_key(api_key: str) -> bool:
     if not api_key:
         return False
     
+    provider, replaced = _get_perplexity_provider(api_key)
+    if replaced is not None:
+        await replaced.aclose()
     try:
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
         # 使用較新的模型和正確的端點
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.perplexity.ai/chat/completions",
-                headers=headers,
-                json={
-                    "model": "sonar",
-                    "messages": [{"role": "user", "content": "Hi"}],
-                    "max_tokens": 5
-                },
-                timeout=10.0
-            )
-            print(f"Perplexity validation response: {response.status_code}")
-            if response.status_code != 200:
-                print(f"Perplexity error: {response.text}")
-            return response.status_code == 200
+        response = await provider.chat_completion({
+            "model": "sonar",
+            "messages": [{"role": "user", "content": "Hi"}],
+            "max_tokens": 5
+        })
+        print(f"Perplexity validation response: {response.status_code}")
+        if response.status_code != 200:
+            print(f"Perplexity error: {response.text}")
+        return response.status_code == 200
     except Exception as e:
         print(f"Perplexity validation error: {e}")
         return False
@@ -0,0 +1,29 @@
+"""品牌輸入解析工具"""
+
+from typing import Dict, List, Tuple
+
+def parse_brand_entry(entry: str) -> Tuple[str, List[str]]:
+    """
+    解析單一品牌輸入，格式為「品牌 | 別名1 | 別名2」
+    
+    例如 "Microsoft Teams | MS Teams | Teams app" →
+    ("Microsoft Teams", ["MS Teams", "Teams app"])
+    """
+    parts = [part.strip() for part in entry.split("|")]
+    parts = [part for part in parts if part]
+    if not parts:
+        return "", []
+    return parts[0], parts[1:]
+
+def parse_brand_lines(text: str) -> Tuple[List[str], Dict[str, List[str]]]:
+    """解析多行品牌輸入（每行一個品牌），返回 (品牌列表, 品牌 → 別名)"""
+    brands: List[str] = []
+    aliases: Dict[str, List[str]] = {}
+    for line in text.split("\n"):
+        brand, brand_aliases = parse_brand_entry(line)
+        if not brand:
+            continue
+        brands.append(brand)
+        if brand_aliases:
+            aliases[brand] = brand_aliases
+    return brands, aliases
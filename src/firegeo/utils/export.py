@@ -14,10 +14,19 @@ def create_json_export(result: SimpleAnalysisResult) -> str:
         "analysis_summary": {
             "target_brand": result.request.target_brand,
             "competitors": result.request.competitors,
+            "brand_aliases": result.request.brand_aliases,
             "total_prompts": result.total_prompts,
             "completed_prompts": result.completed_prompts,
             "analysis_date": result.created_at.isoformat(),
-            "analysis_duration": result.analysis_duration
+            "analysis_duration": result.analysis_duration,
+            "cache_stats": result.cache_stats,
+            "concurrency_limits": result.concurrency_limits,
+            "circuit_states": result.circuit_states,
+            "hedge_stats": result.hedge_stats,
+            "total_cost": result.total_cost,
+            "estimated_cost": result.estimated_cost,
+            "budget_skipped_units": result.budget_skipped_units,
+            "usage_by_provider": result.usage_by_provider
         },
         "results": []
     }
@@ -36,6 +45,12 @@ def create_json_export(result: SimpleAnalysisResult) -> str:
                 "response_text": ai_response.response_text,
                 "processing_time": ai_response.processing_time,
                 "error": ai_response.error,
+                "error_type": ai_response.error_type,
+                "cached": ai_response.cached,
+                "batch": ai_response.batch,
+                "attempts": ai_response.attempts,
+                "hedged_requests": ai_response.hedged_requests,
+                "token_usage": ai_response.token_usage.model_dump() if ai_response.token_usage else None,
                 "brand_detections": {}
             }
             
@@ -43,7 +58,10 @@ def create_json_export(result: SimpleAnalysisResult) -> str:
             for brand, detection in ai_response.brand_detections.items():
                 response_data["brand_detections"][brand] = {
                     "mentioned": detection.mentioned,
-                    "reasoning": detection.reasoning
+                    "reasoning": detection.reasoning,
+                    "detection_method": detection.detection_method,
+                    "confidence": detection.confidence,
+                    "detection_tier": detection.detection_tier
                 }
             
             result_item["ai_responses"][provider] = response_data
@@ -0,0 +1,97 @@
+"""共用的測試設定：Batch API 替身伺服器與假的 AI 提供商"""
+
+import asyncio
+import importlib.util
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import pytest
+
+from firegeo.core.adaptive_concurrency import reset_concurrency_limiters
+from firegeo.core.ai_providers.base import BaseAIProvider, ProviderCompletion
+from firegeo.core.ai_providers.circuit_breaker import reset_circuit_breakers
+from firegeo.core.rate_limiter import reset_rate_limiters
+from firegeo.models.analysis import BrandDetectionResult
+
+STUB_SERVER_PATH = Path(__file__).parent.parent / "scripts" / "batch_stub_server.py"
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    """在背景執行緒啟動 scripts/batch_stub_server.py（批次工作 0.2 秒後完成）"""
+    spec = importlib.util.spec_from_file_location("batch_stub_server", STUB_SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.StubHandler.delay = 0.2
+    server = module.ThreadingHTTPServer(("127.0.0.1", 0), module.StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield SimpleNamespace(url=f"http://{host}:{port}", module=module)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def reset_registries():
+    """每個測試使用全新的速率限制器、並行控制器與斷路器"""
+    yield
+    reset_rate_limiters()
+    reset_concurrency_limiters()
+    reset_circuit_breakers()
+
+
+class FakeProvider(BaseAIProvider):
+    """依設定的延遲回傳固定文字的提供商，記錄收到的提示詞"""
+
+    provider_key = "fake"
+
+    def __init__(self, name: str, delay: float = 0.0, cost_tokens: int = 100):
+        super().__init__("test-key")
+        self.name = name
+        self.delay = delay
+        self.cost_tokens = cost_tokens
+        self.selected_model = "gpt-4o-mini"
+        self.prompts: List[str] = []
+
+    @property
+    def provider_name(self) -> str:
+        return self.name
+
+    async def _generate(self, prompt: str) -> ProviderCompletion:
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        return ProviderCompletion(
+            text=f"{self.name} recommends Acme for {prompt}",
+            model=self.selected_model,
+            prompt_tokens=self.cost_tokens,
+            completion_tokens=self.cost_tokens
+        )
+
+    def is_available(self) -> bool:
+        return True
+
+
+class FakeDetector:
+    """只做子字串比對的檢測器"""
+
+    llm_available = False
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    async def detect_multiple_brands(
+        self,
+        text: str,
+        target_brand: str,
+        competitors: List[str],
+        question: str = "",
+        aliases: Optional[Dict[str, List[str]]] = None
+    ) -> Dict[str, BrandDetectionResult]:
+        await asyncio.sleep(self.delay)
+        return {
+            brand: BrandDetectionResult(brand_name=brand, mentioned=brand in text, reasoning="substring")
+            for brand in [target_brand, *competitors]
+        }
@@ -0,0 +1,36 @@
+"""API 金鑰驗證共用的 Perplexity 連線"""
+
+import httpx
+
+from firegeo.utils import api_validation
+
+
+async def test_perplexity_validation_reuses_the_pooled_client(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.headers["Authorization"])
+        return httpx.Response(200, json={"choices": [{"message": {"content": "Hi"}}]})
+
+    original_get_client = api_validation.PerplexityProvider._get_client
+
+    def get_client(provider):
+        client = original_get_client(provider)
+        client._transport = httpx.MockTransport(handler)
+        return client
+
+    monkeypatch.setattr(api_validation.PerplexityProvider, "_get_client", get_client)
+    monkeypatch.setattr(api_validation, "_perplexity_provider", None)
+
+    assert await api_validation.validate_perplexity_key("key-a")
+    first = api_validation._perplexity_provider
+    client = first._client
+    assert await api_validation.validate_perplexity_key("key-a")
+    assert api_validation._perplexity_provider is first
+    assert first._client is client  # 同一事件迴圈內沿用連線池
+
+    assert await api_validation.validate_perplexity_key("key-b")
+    assert api_validation._perplexity_provider is not first
+    assert client.is_closed  # 金鑰變更時關閉舊的連線池
+    assert requests == ["Bearer key-a", "Bearer key-a", "Bearer key-b"]
+    await api_validation._perplexity_provider.aclose()
@@ -0,0 +1,95 @@
+"""BatchCollector 與 OpenAI Batch API 替身伺服器的整合測試"""
+
+import asyncio
+
+import pytest
+
+from firegeo.core.ai_providers import BatchCollector, OpenAIProvider, ProviderError
+from firegeo.core.detection_parser import DETECTIONS_SCHEMA
+
+
+@pytest.fixture
+def provider(stub_server):
+    return OpenAIProvider("sk-test", model="gpt-4o-mini", base_url=f"{stub_server.url}/v1")
+
+
+def batch_count(stub_server) -> int:
+    with stub_server.module._lock:
+        return len(stub_server.module._openai_batches)
+
+
+async def test_flushes_when_all_expected_units_arrive(provider, stub_server):
+    collector = BatchCollector(provider, expected=3, poll_interval=0.05, timeout=10)
+    before = batch_count(stub_server)
+
+    first = asyncio.create_task(collector.request("best CRM tools"))
+    second = asyncio.create_task(collector.request("best note apps"))
+    await asyncio.sleep(0.1)
+    # 尚未湊齊預期的單元數，不會送出
+    assert batch_count(stub_server) == before
+    assert not first.done()
+
+    collector.skip()  # 第三個單元快取命中
+    results = await asyncio.gather(first, second)
+
+    assert [completion.text for completion in results] == [
+        "[stub] Response to: best CRM tools",
+        "[stub] Response to: best note apps",
+    ]
+    assert all(completion.batch for completion in results)
+    assert collector.submitted_requests == 2
+    assert batch_count(stub_server) == before + 1
+
+
+async def test_all_skipped_units_submit_nothing(provider, stub_server):
+    collector = BatchCollector(provider, expected=2, poll_interval=0.05, timeout=10)
+    before = batch_count(stub_server)
+    collector.skip()
+    collector.skip()
+    await asyncio.sleep(0.1)
+    assert collector.submitted_requests == 0
+    assert batch_count(stub_server) == before
+
+
+async def test_window_flush_without_expected(provider):
+    collector = BatchCollector(provider, window=0.1, poll_interval=0.05, timeout=10)
+    results = await asyncio.gather(collector.request("a"), collector.request("b"))
+    assert [completion.text for completion in results] == ["[stub] Response to: a", "[stub] Response to: b"]
+    assert collector.submitted_requests == 2
+
+
+async def test_splits_requests_over_the_batch_limit(provider, stub_server):
+    provider.max_batch_requests = 2
+    collector = BatchCollector(provider, expected=5, poll_interval=0.05, timeout=10)
+    before = batch_count(stub_server)
+
+    prompts = [f"prompt {index}" for index in range(5)]
+    results = await asyncio.gather(*(collector.request(prompt) for prompt in prompts))
+
+    assert [completion.text for completion in results] == [f"[stub] Response to: {prompt}" for prompt in prompts]
+    assert batch_count(stub_server) == before + 3
+
+
+async def test_errors_are_delivered_to_their_own_request(provider):
+    collector = BatchCollector(provider, expected=3, poll_interval=0.05, timeout=10)
+    results = await asyncio.gather(
+        collector.request("good one"),
+        collector.request("bad one [stub-error]"),
+        collector.request("good two"),
+        return_exceptions=True
+    )
+
+    assert results[0].text == "[stub] Response to: good one"
+    assert isinstance(results[1], ProviderError)
+    assert results[2].text == "[stub] Response to: good two"
+
+
+async def test_structured_output_schema(provider):
+    collector = BatchCollector(provider, expected=1, poll_interval=0.05, timeout=10)
+    prompt = (
+        "Brands to check:\n- Acme\n- Globex\n\nAI Response: Acme is great\n\n"
+        "Response Requirements:\n...\nExpected JSON Format:\n{}"
+    )
+    completion = await collector.request(prompt, response_schema=DETECTIONS_SCHEMA)
+    assert '"brand_name": "Acme", "mentioned": true' in completion.text
+    assert '"brand_name": "Globex", "mentioned": false' in completion.text
@@ -0,0 +1,51 @@
+"""BrandMatcher 的本地判定"""
+
+from firegeo.core.brand_matcher import (
+    METHOD_LOCAL_ABSENT,
+    METHOD_LOCAL_AMBIGUOUS,
+    METHOD_LOCAL_MATCH,
+    BrandMatcher,
+)
+
+
+def classify(text: str, brands=("Notion", "Microsoft Teams", "monday.com")):
+    resolved, ambiguous = BrandMatcher(list(brands)).classify(text)
+    return {brand: result.detection_method for brand, result in {**resolved, **ambiguous}.items()}
+
+
+def test_capitalised_name_inside_a_sentence_is_a_match():
+    methods = classify("For notes we recommend Notion and monday.com.")
+    assert methods["Notion"] == METHOD_LOCAL_MATCH
+    assert methods["monday.com"] == METHOD_LOCAL_MATCH
+    assert methods["Microsoft Teams"] == METHOD_LOCAL_ABSENT
+
+
+def test_lowercase_and_sentence_initial_words_are_ambiguous():
+    assert classify("Take a notion of time.")["Notion"] == METHOD_LOCAL_AMBIGUOUS
+    assert classify("Notion is a vague idea.")["Notion"] == METHOD_LOCAL_AMBIGUOUS
+    assert classify("It works. Notion, however, is vague.")["Notion"] == METHOD_LOCAL_AMBIGUOUS
+    assert classify("Options:\n- Notion\n- Slack")["Notion"] == METHOD_LOCAL_AMBIGUOUS
+
+
+def test_names_with_symbols_are_not_treated_as_common_words():
+    assert classify("Monday.com leads the list.")["monday.com"] == METHOD_LOCAL_MATCH
+
+
+def test_whitespace_runs_match_and_map_back_to_the_original_text():
+    matcher = BrandMatcher(["Microsoft Teams"])
+    found = matcher.find("We use Microsoft  \n Teams daily.")
+    assert found["Microsoft Teams"]["strong"] == ["Microsoft  \n Teams"]
+
+
+def test_word_boundaries_are_respected():
+    assert classify("We tried Notional and Notions.")["Notion"] == METHOD_LOCAL_ABSENT
+
+
+def test_incremental_matcher_waits_for_the_word_boundary():
+    incremental = BrandMatcher(["Notion", "Microsoft Teams"]).incremental()
+    assert incremental.feed("We like Noti") == []
+    assert incremental.feed("on") == []  # 可能還會接著 "al"
+    assert incremental.feed(" and Microsoft \n") == ["Notion"]
+    assert incremental.feed(" Teams") == []
+    assert incremental.finish() == ["Microsoft Teams"]
+    assert incremental.mentioned["Microsoft Teams"] == "Microsoft \n Teams"
@@ -0,0 +1,152 @@
+"""成本上限：預留、等待結算與耗盡"""
+
+import asyncio
+
+from firegeo.core.scheduler import AnalysisScheduler
+from firegeo.core.token_tracking import BudgetGuard, TokenTracker
+from firegeo.models.analysis import SimpleAnalysisRequest, TokenUsage
+
+from .conftest import FakeDetector, FakeProvider
+
+
+def spend(tracker: TokenTracker, cost: float):
+    tracker.add(TokenUsage(provider="fake", model="fake", cost_estimate=cost))
+
+
+async def run_unit(guard: BudgetGuard, projected: float, actual: float, delay: float = 0.05) -> bool:
+    if not await guard.reserve(projected):
+        return False
+    await asyncio.sleep(delay)
+    spend(guard.tracker, actual)
+    await guard.release(projected)
+    return True
+
+
+async def test_concurrent_units_within_the_cap_are_not_rejected():
+    # 預估合計 $0.030 為上限的兩倍，但實際花費遠低於上限
+    guard = BudgetGuard(0.015, TokenTracker())
+    results = await asyncio.gather(*(run_unit(guard, 0.01, 0.00002) for _ in range(3)))
+    assert results == [True, True, True]
+    assert guard.skipped == 0
+    assert not guard.exhausted
+    assert guard.reserved == 0.0 and guard.in_flight == 0
+
+
+async def test_rejects_and_latches_when_spend_plus_projection_exceeds_the_cap():
+    tracker = TokenTracker()
+    spend(tracker, 0.009)
+    guard = BudgetGuard(0.01, tracker)
+    assert not await guard.reserve(0.002)
+    assert guard.exhausted
+    # 耗盡後即使很小的單元也不再派發
+    assert not await guard.reserve(0.0001)
+    assert guard.skipped == 2
+
+
+async def test_waiting_unit_is_rechecked_against_actual_spend():
+    guard = BudgetGuard(0.01, TokenTracker())
+    assert await guard.reserve(0.006)
+    waiting = asyncio.create_task(guard.reserve(0.006))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()  # 進行中的預估使額度不足，等待結算
+
+    spend(guard.tracker, 0.008)
+    await guard.release(0.006)
+    assert await waiting is False
+    assert guard.exhausted
+
+
+async def test_waiting_unit_proceeds_when_actual_spend_is_low():
+    guard = BudgetGuard(0.01, TokenTracker())
+    assert await guard.reserve(0.006)
+    waiting = asyncio.create_task(guard.reserve(0.006))
+    await asyncio.sleep(0.01)
+    spend(guard.tracker, 0.001)
+    await guard.release(0.006)
+    assert await waiting is True
+    assert guard.reserved == 0.006
+
+
+async def test_no_wait_reservation_skips_without_latching():
+    guard = BudgetGuard(0.01, TokenTracker())
+    assert await guard.reserve(0.006, wait=False)
+    assert not await guard.reserve(0.006, wait=False)
+    assert not guard.exhausted
+    assert await guard.reserve(0.003, wait=False)
+    assert guard.skipped == 1
+
+
+async def test_unpriced_units_are_refused_without_latching():
+    guard = BudgetGuard(0.01, TokenTracker())
+    assert not await guard.reserve(0.0)
+    assert guard.in_flight == 0 and guard.skipped == 1
+    assert not guard.exhausted
+    assert await guard.reserve(0.001)
+
+
+class FixedEstimator:
+    """每個單元都預估相同成本"""
+
+    def __init__(self, projected: float):
+        self.projected = projected
+
+    def project_unit(self, *args, **kwargs) -> float:
+        return self.projected
+
+
+async def test_scheduler_runs_every_unit_that_fits_the_cap():
+    request = SimpleAnalysisRequest(
+        target_brand="Acme",
+        prompts=[f"prompt {index}" for index in range(3)],
+        cache_mode="bypass",
+        budget_usd=0.015
+    )
+    provider = FakeProvider("a", delay=0.05, cost_tokens=10)
+    scheduler = AnalysisScheduler({"a": provider}, FakeDetector(), cost_estimator=FixedEstimator(0.01))
+
+    result = await scheduler.run(request)
+
+    assert result.budget_skipped_units == 0
+    assert [prompt_result.ai_responses["a"].error_type for prompt_result in result.results_by_prompt] == [None] * 3
+    assert 0 < result.total_cost < 0.015
+
+
+async def test_scheduler_stops_dispatching_once_spend_reaches_the_cap():
+    request = SimpleAnalysisRequest(
+        target_brand="Acme",
+        prompts=[f"prompt {index}" for index in range(4)],
+        cache_mode="bypass",
+        budget_usd=0.01
+    )
+    # 實際花費遠高於預估：第一批完成後已達上限
+    provider = FakeProvider("a", delay=0.05, cost_tokens=2_000_000)
+    scheduler = AnalysisScheduler(
+        {"a": provider}, FakeDetector(), provider_limits={"a": 1}, cost_estimator=FixedEstimator(0.001)
+    )
+
+    result = await scheduler.run(request)
+
+    error_types = [prompt_result.ai_responses["a"].error_type for prompt_result in result.results_by_prompt]
+    assert error_types[0] is None
+    assert error_types[1:] == ["budget"] * 3
+    assert result.budget_skipped_units == 3
+    assert len(provider.prompts) == 1
+
+
+async def test_scheduler_refuses_unpriced_units_when_a_budget_is_set():
+    request = SimpleAnalysisRequest(
+        target_brand="Acme",
+        prompts=["prompt 0", "prompt 1"],
+        cache_mode="bypass",
+        budget_usd=1.0
+    )
+    provider = FakeProvider("a")
+    scheduler = AnalysisScheduler({"a": provider}, FakeDetector(), cost_estimator=FixedEstimator(0.0))
+
+    result = await scheduler.run(request)
+
+    responses = [prompt_result.ai_responses["a"] for prompt_result in result.results_by_prompt]
+    assert [response.error_type for response in responses] == ["budget"] * 2
+    assert "No pricing" in responses[0].error
+    assert result.budget_skipped_units == 2
+    assert provider.prompts == []
@@ -0,0 +1,125 @@
+"""檢查點日誌與中斷後續跑"""
+
+import pytest
+
+from firegeo.core.checkpoint import CheckpointLog, CheckpointMismatchError, list_checkpoints
+from firegeo.core.pipeline import run_analysis
+from firegeo.core.brand_matcher import METHOD_ERROR
+from firegeo.models.analysis import AIProviderResponse, BrandDetectionResult, SimpleAnalysisRequest
+
+
+def make_request(prompts, **overrides) -> SimpleAnalysisRequest:
+    fields = dict(
+        target_brand="Acme",
+        competitors=["Globex"],
+        prompts=prompts,
+        api_keys={"openai": "sk-test"},
+        cache_mode="bypass"
+    )
+    fields.update(overrides)
+    return SimpleAnalysisRequest(**fields)
+
+
+def make_response(prompt: str, error: str = None) -> AIProviderResponse:
+    return AIProviderResponse(
+        provider="openai", model="gpt-4o-mini", prompt=prompt, response_text=f"answer to {prompt}", error=error
+    )
+
+
+def test_records_only_successful_units(tmp_path):
+    request = make_request(["p0", "p1"])
+    log = CheckpointLog("run-1", tmp_path)
+    log.open(request)
+    log.record(0, "openai", make_response("p0"))
+    log.record(1, "openai", make_response("p1", error="timeout"))
+    log.close()
+
+    restored = CheckpointLog("run-1", tmp_path).load()
+    assert list(restored) == [(0, "openai")]
+    assert restored[(0, "openai")].response_text == "answer to p0"
+
+    [summary] = list_checkpoints(tmp_path)
+    assert summary["run_id"] == "run-1"
+    assert summary["completed_units"] == 1
+    assert summary["prompts"] == 2
+
+
+def test_units_with_failed_detection_are_not_recorded(tmp_path):
+    request = make_request(["p0", "p1"])
+    response = make_response("p1")
+    response.brand_detections = {
+        "Acme": BrandDetectionResult(
+            brand_name="Acme", mentioned=False, reasoning="Detection failed", detection_method=METHOD_ERROR
+        )
+    }
+    log = CheckpointLog("run-detect", tmp_path)
+    log.open(request)
+    log.record(0, "openai", make_response("p0"))
+    log.record(1, "openai", response)
+    log.close()
+
+    # 品牌檢測失敗的單元續跑時要重新檢測
+    assert list(CheckpointLog("run-detect", tmp_path).load()) == [(0, "openai")]
+
+
+def test_loaded_request_has_no_api_keys(tmp_path):
+    log = CheckpointLog("run-keys", tmp_path)
+    log.open(make_request(["p0"]))
+    log.close()
+    loaded = CheckpointLog("run-keys", tmp_path).load_request()
+    assert loaded.api_keys == {"openai": ""}
+    assert loaded.prompts == ["p0"]
+
+
+def test_rejects_a_different_analysis(tmp_path):
+    log = CheckpointLog("run-2", tmp_path)
+    log.open(make_request(["p0"]))
+    log.close()
+
+    # 快取模式等不影響單元的欄位可以不同
+    CheckpointLog("run-2", tmp_path).open(make_request(["p0"], cache_mode="use"))
+    with pytest.raises(CheckpointMismatchError):
+        CheckpointLog("run-2", tmp_path).open(make_request(["another prompt"]))
+
+
+def test_skips_a_partially_written_line(tmp_path):
+    log = CheckpointLog("run-3", tmp_path)
+    log.open(make_request(["p0", "p1"]))
+    log.record(0, "openai", make_response("p0"))
+    log.close()
+    with open(log.path, "a", encoding="utf-8") as f:
+        f.write('{"type": "unit", "prompt_index": 1, "prov')
+
+    assert list(CheckpointLog("run-3", tmp_path).load()) == [(0, "openai")]
+
+
+def test_rejects_invalid_run_ids(tmp_path):
+    with pytest.raises(ValueError):
+        CheckpointLog("../escape", tmp_path)
+
+
+async def test_resume_restores_completed_units(stub_server, tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", f"{stub_server.url}/v1")
+    monkeypatch.setenv("FIREGEO_CACHE_DIR", str(tmp_path / "cache"))
+    request = make_request(["best CRM for Acme", "broken prompt [stub-error]"])
+
+    first = await run_analysis(request, checkpoint=CheckpointLog("resume", tmp_path))
+    [provider_name] = first.results_by_prompt[0].ai_responses
+    assert first.results_by_prompt[1].ai_responses[provider_name].error
+    # 有單元失敗時保留檢查點
+    checkpoint = CheckpointLog("resume", tmp_path)
+    assert checkpoint.exists()
+    assert list(checkpoint.load()) == [(0, provider_name)]
+
+    completed = []
+    second = await run_analysis(
+        request,
+        on_unit_complete=lambda prompt_result, response, done, total: completed.append(prompt_result.prompt_index),
+        checkpoint=checkpoint
+    )
+    assert second.resumed_units == 1
+    assert completed == [1]  # 只重新派發失敗的單元
+    assert second.results_by_prompt[0].ai_responses[provider_name].response_text == (
+        first.results_by_prompt[0].ai_responses[provider_name].response_text
+    )
+    assert second.run_id == "resume"
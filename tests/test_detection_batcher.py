@@ -0,0 +1,84 @@
+"""DetectionBatcher 的批次合併與結果分派"""
+
+import asyncio
+
+import pytest
+
+from firegeo.core.detection_batcher import DetectionBatcher
+from firegeo.models.analysis import BrandDetectionResult
+
+
+def detected(item):
+    return {brand: BrandDetectionResult(brand_name=brand, mentioned=brand in item.text, reasoning="batch")
+            for brand in item.brands}
+
+
+async def test_requests_within_the_window_share_one_batch():
+    batches = []
+
+    async def run_batch(items):
+        batches.append([item.text for item in items])
+        return [detected(item) for item in items]
+
+    batcher = DetectionBatcher(run_batch, max_wait=0.05)
+    results = await asyncio.gather(
+        batcher.submit("Acme is great", ["Acme"], "q1"),
+        batcher.submit("Globex is fine", ["Acme"], "q2")
+    )
+    assert batches == [["Acme is great", "Globex is fine"]]
+    assert [result["Acme"].mentioned for result in results] == [True, False]
+
+
+async def test_batch_size_limit_flushes_immediately():
+    batches = []
+
+    async def run_batch(items):
+        batches.append(len(items))
+        return [detected(item) for item in items]
+
+    batcher = DetectionBatcher(run_batch, max_wait=10, max_batch_size=2)
+    await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit(f"text {index}", ["Acme"], "q") for index in range(4))),
+        timeout=1
+    )
+    assert batches == [2, 2]
+
+
+async def test_batch_errors_reach_every_submitter():
+    async def run_batch(items):
+        raise ValueError("boom")
+
+    batcher = DetectionBatcher(run_batch, max_wait=0.01)
+    results = await asyncio.gather(
+        batcher.submit("a", ["Acme"], "q"), batcher.submit("b", ["Acme"], "q"), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_missing_results_fail_instead_of_hanging():
+    async def run_batch(items):
+        return [detected(items[0])]
+
+    batcher = DetectionBatcher(run_batch, max_wait=0.01)
+    results = await asyncio.wait_for(
+        asyncio.gather(batcher.submit("a", ["Acme"], "q"), batcher.submit("b", ["Acme"], "q"), return_exceptions=True),
+        timeout=1
+    )
+    assert isinstance(results[0], dict)
+    assert isinstance(results[1], RuntimeError)
+
+
+async def test_cancelled_batch_releases_submitters():
+    started = asyncio.Event()
+
+    async def run_batch(items):
+        started.set()
+        await asyncio.sleep(10)
+
+    batcher = DetectionBatcher(run_batch, max_wait=0.01)
+    submitted = asyncio.ensure_future(batcher.submit("a", ["Acme"], "q"))
+    await started.wait()
+    for task in list(batcher._batch_tasks):
+        task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(submitted, timeout=1)
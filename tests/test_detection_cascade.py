@@ -0,0 +1,57 @@
+"""級聯檢測：快速模型信心不足或漏掉的品牌升級到較強的模型"""
+
+import json
+
+from firegeo.core.brand_matcher import METHOD_LLM
+from firegeo.core.cache import DetectionMemo
+from firegeo.core.simple_detector import TIER_FAST, TIER_STRONG, SimpleBrandDetector
+
+# 兩個品牌都只以小寫出現，本地比對無法判定，交給 LLM
+TEXT = "Take a notion of the budget, then ask slack for feedback."
+
+
+def reply(*detections) -> str:
+    return json.dumps({"detections": [
+        {"brand_name": brand, "mentioned": mentioned, "reasoning": tier, "confidence": confidence}
+        for brand, mentioned, confidence, tier in detections
+    ]})
+
+
+def make_detector(replies):
+    detector = SimpleBrandDetector(
+        "test-key", batch_window=0, memo=DetectionMemo(), fast_model_name="gemini-2.5-flash-lite"
+    )
+    calls = []
+
+    async def call_gemini(prompt: str, tier: str = TIER_STRONG, response_schema=None) -> str:
+        calls.append((tier, prompt))
+        return replies[tier]
+
+    detector._call_gemini = call_gemini
+    return detector, calls
+
+
+async def test_low_confidence_and_missing_brands_are_escalated():
+    detector, calls = make_detector({
+        # 快速模型對 Notion 信心不足，漏掉 Slack
+        TIER_FAST: reply(("Notion", False, 0.4, "fast")),
+        TIER_STRONG: reply(("Notion", False, 0.9, "strong"), ("Slack", False, 0.95, "strong")),
+    })
+
+    results = await detector.detect_multiple_brands(TEXT, "Notion", ["Slack"], "Which tool?")
+
+    assert [tier for tier, _ in calls] == [TIER_FAST, TIER_STRONG]
+    assert all(result.detection_method == METHOD_LLM for result in results.values())
+    assert results["Notion"].reasoning == "strong" and results["Slack"].reasoning == "strong"
+
+
+async def test_confident_fast_results_are_not_escalated():
+    detector, calls = make_detector({
+        TIER_FAST: reply(("Notion", False, 0.9, "fast"), ("Slack", False, 0.8, "fast")),
+        TIER_STRONG: reply(),
+    })
+
+    results = await detector.detect_multiple_brands(TEXT, "Notion", ["Slack"], "Which tool?")
+
+    assert [tier for tier, _ in calls] == [TIER_FAST]
+    assert results["Slack"].reasoning == "fast"
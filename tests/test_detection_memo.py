@@ -0,0 +1,55 @@
+"""檢測備忘：只重用成功的 LLM 檢測結果"""
+
+from firegeo.core.brand_matcher import METHOD_ERROR, METHOD_LLM
+from firegeo.core.cache import DetectionMemo
+from firegeo.core.simple_detector import TIER_STRONG, SimpleBrandDetector
+
+TEXT = "Take a notion of the budget before choosing a tool."
+
+
+def make_detector(replies):
+    detector = SimpleBrandDetector("test-key", batch_window=0, memo=DetectionMemo())
+    calls = []
+
+    async def call_gemini(prompt: str, tier: str = TIER_STRONG, response_schema=None) -> str:
+        calls.append(prompt)
+        return replies[min(len(calls), len(replies)) - 1]
+
+    detector._call_gemini = call_gemini
+    return detector, calls
+
+
+async def test_successful_llm_results_are_memoized():
+    reply = '{"detections": [{"brand_name": "Notion", "mentioned": false, "reasoning": "common word"}]}'
+    detector, calls = make_detector([reply])
+
+    first = await detector.detect_multiple_brands(TEXT, "Notion", [], "Which tool?")
+    second = await detector.detect_multiple_brands(TEXT, "Notion", [], "Which tool?")
+
+    assert len(calls) == 1
+    assert detector.memo_hits == 1
+    assert first["Notion"].detection_method == METHOD_LLM
+    assert second["Notion"].reasoning == "common word"
+
+
+async def test_unparseable_reply_is_an_error_and_not_memoized():
+    detector, calls = make_detector(["Sorry, I cannot help with that."])
+
+    first = await detector.detect_multiple_brands(TEXT, "Notion", [], "Which tool?")
+    await detector.detect_multiple_brands(TEXT, "Notion", [], "Which tool?")
+
+    assert first["Notion"].detection_method == METHOD_ERROR
+    assert len(calls) == 2
+    assert detector.memo_hits == 0
+
+
+async def test_brands_left_out_by_the_model_are_errors():
+    reply = '{"detections": [{"brand_name": "Notion", "mentioned": false, "reasoning": "common word"}]}'
+    detector, calls = make_detector([reply])
+
+    results = await detector.detect_multiple_brands(TEXT + " Use asana daily.", "Notion", ["Asana"], "Which tool?")
+    await detector.detect_multiple_brands(TEXT + " Use asana daily.", "Notion", ["Asana"], "Which tool?")
+
+    assert results["Notion"].detection_method == METHOD_LLM
+    assert results["Asana"].detection_method == METHOD_ERROR
+    assert len(calls) == 2
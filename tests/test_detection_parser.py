@@ -0,0 +1,146 @@
+"""檢測輸出的 JSON 擷取器與備用解析"""
+
+import json
+import time
+
+import pytest
+
+from firegeo.core.detection_parser import (
+    MAX_FALLBACK_INPUT_CHARS,
+    JsonExtractor,
+    extract_json,
+    parse_detection_json,
+    parse_fallback,
+)
+
+DETECTIONS = {"detections": [
+    {"brand_name": "Acme", "mentioned": True, "confidence": 0.9, "reasoning": "Listed {first}"},
+    {"brand_name": "Globex", "mentioned": False, "confidence": 0.8, "reasoning": 'Not "listed"'},
+]}
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(DETECTIONS),
+    f"Here is the result:\n```json\n{json.dumps(DETECTIONS, indent=2)}\n```\nHope it helps!",
+    f'Note the "{{" char. {json.dumps(DETECTIONS)}',
+    f"Use {{braces like this: {json.dumps(DETECTIONS)} ] stuff",
+    f"Sets look like {{a, b}} and lists like [1, 2. Result: {json.dumps(DETECTIONS)}",
+])
+def test_extracts_the_detection_object(text):
+    assert parse_detection_json(text) == DETECTIONS
+
+
+def test_wraps_a_bare_array():
+    assert parse_detection_json(f"Result: {json.dumps(DETECTIONS['detections'])}") == DETECTIONS
+
+
+def test_repairs_truncated_output():
+    text = json.dumps(DETECTIONS)
+    parsed = parse_detection_json(f"Result: {text[:text.rindex('listed')]}")
+    assert [item["brand_name"] for item in parsed["detections"]] == ["Acme", "Globex"]
+    assert parsed["detections"][1]["reasoning"] == 'Not "'
+
+
+def test_truncated_value_is_not_split_into_fragments():
+    text = json.dumps(DETECTIONS)
+    # 截斷在鍵名中間無法修復；不應只取回第一個檢測項目
+    assert parse_detection_json(text[:text.index('"confidence": 0.8') + 5]) is None
+
+
+def test_unparseable_block_falls_back_to_children():
+    text = f"{{ the answer is {json.dumps(DETECTIONS)} }}"
+    assert parse_detection_json(text) == DETECTIONS
+
+
+@pytest.mark.parametrize("text", ["", "no json here", "{ note " * 50, "] } ) { ]" * 50])
+def test_returns_none_without_json(text):
+    assert parse_detection_json(text) is None
+
+
+def test_feed_in_chunks_matches_whole_input():
+    text = f'Prefix "{{" then {json.dumps(DETECTIONS)} and {{"second": [1, 2]}} tail'
+    extractor = JsonExtractor()
+    for index in range(0, len(text), 7):
+        extractor.feed(text[index:index + 7])
+    extractor.finish()
+    assert extractor.values == [DETECTIONS, {"second": [1, 2]}]
+
+
+def test_escaped_quote_across_chunks():
+    extractor = JsonExtractor()
+    extractor.feed('{"a": "x\\')
+    extractor.feed('"y"}')
+    assert extractor.values == [{"a": 'x"y'}]
+
+
+def test_extract_json_prefers_objects():
+    assert extract_json('[1, 2] then {"a": 1}') == {"a": 1}
+    assert extract_json("[1, 2]") == [1, 2]
+
+
+@pytest.mark.parametrize("build", [
+    lambda size: "{" * size,
+    lambda size: "[" * size,
+    lambda size: ("{ note " * size)[:size],
+    lambda size: ('{ "' * size)[:size],
+    lambda size: ('" { ] } [ "x' * size)[:size],
+])
+def test_pathological_input_scales_linearly(build):
+    def elapsed(size):
+        text = build(size)
+        started = time.perf_counter()
+        parse_detection_json(text)
+        return time.perf_counter() - started
+
+    small, large = elapsed(20_000), elapsed(200_000)
+    # 10 倍輸入：線性約 10 倍，二次方約 100 倍
+    assert large < max(small, 0.001) * 30
+
+
+BRANDS = ["Acme", "Globex", "Initech", "Microsoft Teams"]
+
+
+def test_fallback_reads_verdicts_for_requested_brands():
+    text = (
+        "Acme: mentioned = true\n"
+        "Globex was not mentioned in the response.\n"
+        "Microsoft Teams - found\n"
+        "Zendesk: true\n"
+    )
+    detections = {item["brand_name"]: item["mentioned"] for item in parse_fallback(text, BRANDS)}
+    assert detections == {"Acme": True, "Globex": False, "Microsoft Teams": True}
+
+
+def test_fallback_prefers_boolean_literals():
+    [detection] = parse_fallback('"brand_name": "Acme", "mentioned": false', ["Acme"])
+    assert detection["mentioned"] is False
+
+
+def test_fallback_verdict_must_be_near_the_brand():
+    text = "Acme " + "x " * 200 + "true"
+    assert parse_fallback(text, ["Acme"]) == []
+
+
+def test_fallback_contradicting_verdicts_have_zero_confidence():
+    [detection] = parse_fallback("Acme: true. Later on, Acme: false.", ["Acme"])
+    assert detection["mentioned"] is True
+    assert detection["confidence"] == 0.0
+
+
+def test_fallback_is_case_and_whitespace_insensitive():
+    detections = parse_fallback("MICROSOFT\n  teams: yes", ["Microsoft  Teams"])
+    assert [(item["brand_name"], item["mentioned"]) for item in detections] == [("Microsoft  Teams", True)]
+
+
+def test_fallback_respects_word_boundaries():
+    assert parse_fallback("Acmeville: true", ["Acme"]) == []
+
+
+def test_fallback_without_brands_or_text():
+    assert parse_fallback("Acme: true", []) == []
+    assert parse_fallback("", ["Acme"]) == []
+
+
+def test_fallback_ignores_text_beyond_the_input_limit():
+    text = "x " * MAX_FALLBACK_INPUT_CHARS + "Acme: true"
+    assert parse_fallback(text, ["Acme"]) == []
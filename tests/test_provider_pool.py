@@ -0,0 +1,86 @@
+"""ProviderPool 的共用與最近最少使用淘汰"""
+
+from typing import Dict
+
+import pytest
+
+from firegeo.core import pipeline
+from firegeo.core.pipeline import ProviderPool
+from firegeo.models.analysis import SimpleAnalysisRequest
+
+from .conftest import FakeProvider
+
+
+class ClosingProvider(FakeProvider):
+    """記錄是否已關閉的提供商"""
+
+    def __init__(self, name: str, api_key: str):
+        super().__init__(name)
+        self.api_key = api_key
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def keyed_providers(monkeypatch):
+    """以請求中的 openai 金鑰建立提供商，金鑰不同即為不同的 pool 項目"""
+    created = []
+
+    def create_providers(request: SimpleAnalysisRequest) -> Dict[str, FakeProvider]:
+        provider = ClosingProvider("fake", request.api_keys["openai"])
+        created.append(provider)
+        return {"fake": provider}
+
+    monkeypatch.setattr(pipeline, "create_providers", create_providers)
+    return created
+
+
+def make_request(api_key: str) -> SimpleAnalysisRequest:
+    return SimpleAnalysisRequest(
+        target_brand="Acme",
+        prompts=["prompt"],
+        api_keys={"openai": api_key}
+    )
+
+
+async def test_reuses_providers_with_the_same_settings(keyed_providers):
+    pool = ProviderPool()
+
+    first = await pool.get_providers(make_request("key-a"))
+    second = await pool.get_providers(make_request("key-a"))
+
+    assert first["fake"] is second["fake"]
+    assert len(pool) == 1
+    # 重複建立的實例立即關閉
+    assert keyed_providers[1].closed and not keyed_providers[0].closed
+    await pool.aclose()
+    assert keyed_providers[0].closed
+
+
+async def test_evicts_least_recently_used_provider(keyed_providers):
+    pool = ProviderPool(max_size=2)
+
+    for api_key in ["key-a", "key-b", "key-a", "key-c"]:
+        providers = await pool.get_providers(make_request(api_key))
+        await pool.release_providers(providers)
+
+    assert len(pool) == 2
+    key_a, key_b, _, key_c = keyed_providers
+    assert key_b.closed
+    assert not key_a.closed and not key_c.closed
+    await pool.aclose()
+
+
+async def test_evicted_provider_in_use_is_closed_on_release(keyed_providers):
+    pool = ProviderPool(max_size=1)
+
+    in_use = await pool.get_providers(make_request("key-a"))
+    await pool.get_providers(make_request("key-b"))
+
+    assert len(pool) == 1
+    assert not in_use["fake"].closed
+    await pool.release_providers(in_use)
+    assert in_use["fake"].closed
+    await pool.aclose()
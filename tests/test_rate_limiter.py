@@ -0,0 +1,106 @@
+"""令牌桶速率限制器、限制值的解析與提供商的額度預留"""
+
+import asyncio
+
+from firegeo.core.adaptive_concurrency import AdaptiveConcurrencyLimiter
+from firegeo.core.rate_limiter import RateLimiter, TokenBucket, resolve_rate_limit
+
+from .conftest import FakeProvider
+
+
+def test_bucket_refills_at_the_per_minute_rate():
+    bucket = TokenBucket(60)
+    bucket.tokens = 0.0
+    bucket.refill(bucket.updated_at + 2.0)
+    assert bucket.tokens == 2.0
+    bucket.refill(bucket.updated_at + 3600)
+    assert bucket.tokens == 60.0  # 不超過容量
+
+
+def test_bucket_wait_time():
+    bucket = TokenBucket(60)
+    bucket.tokens = 0.5
+    assert bucket.wait_time(0.5) == 0.0
+    assert bucket.wait_time(2.5) == 2.0
+
+
+def test_requests_beyond_rpm_must_wait():
+    limiter = RateLimiter(rpm=2)
+    assert limiter._try_acquire(0) == 0.0
+    assert limiter._try_acquire(0) == 0.0
+    assert limiter._try_acquire(0) > 0.0
+
+
+def test_tpm_reservation_is_settled_with_actual_usage():
+    limiter = RateLimiter(tpm=1000)
+    assert limiter._try_acquire(800) == 0.0
+    assert limiter._try_acquire(300) > 0.0  # 只剩約 200
+    limiter.settle(800, 100)  # 實際只用了 100，退回 700
+    assert limiter._try_acquire(300) == 0.0
+
+
+def test_oversized_request_only_waits_for_a_full_bucket():
+    limiter = RateLimiter(tpm=100)
+    assert limiter._try_acquire(500) == 0.0  # 桶滿時可以送出
+    assert limiter._token_bucket.tokens < 0  # 之後的請求等待補回
+
+
+async def test_acquire_waits_for_refill():
+    limiter = RateLimiter(rpm=600)  # 每 0.1 秒補一個
+    limiter._request_bucket.tokens = 0.0
+    waited = await limiter.acquire()
+    assert 0.0 < waited <= 0.2
+
+
+def test_unlimited_limiter_never_waits():
+    limiter = RateLimiter()
+    assert all(limiter._try_acquire(10_000) == 0.0 for _ in range(100))
+
+
+def test_provider_env_override_keeps_model_specific_limits(monkeypatch):
+    monkeypatch.setenv("GOOGLE_RPM", "120")
+    assert resolve_rate_limit("google", "gemini-2.5-flash").rpm == 120
+    assert resolve_rate_limit("google", "gemini-2.5-flash-lite").rpm == 4000
+
+
+def test_model_env_override(monkeypatch):
+    monkeypatch.setenv("GOOGLE_RPM", "120")
+    monkeypatch.setenv("GOOGLE_GEMINI_2_5_FLASH_LITE_RPM", "2000")
+    limit = resolve_rate_limit("google", "gemini-2.5-flash-lite")
+    assert (limit.rpm, limit.tpm) == (2000, 4_000_000)
+
+
+class LimitedProvider(FakeProvider):
+    """使用獨立速率與並行限制器的假提供商"""
+
+    def __init__(self, rate_limiter: RateLimiter, concurrency_limiter: AdaptiveConcurrencyLimiter):
+        super().__init__("limited", delay=1.0)
+        self._rate_limiter = rate_limiter
+        self._concurrency_limiter = concurrency_limiter
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        return self._rate_limiter
+
+    @property
+    def concurrency_limiter(self) -> AdaptiveConcurrencyLimiter:
+        return self._concurrency_limiter
+
+
+async def test_cancel_while_waiting_for_a_slot_returns_the_reservation():
+    rate_limiter = RateLimiter(tpm=100_000)
+    concurrency_limiter = AdaptiveConcurrencyLimiter("test", initial_limit=1, max_limit=1)
+    provider = LimitedProvider(rate_limiter, concurrency_limiter)
+    await concurrency_limiter.acquire()  # 佔住唯一的名額
+
+    call = asyncio.create_task(provider.complete("hello"))
+    await asyncio.sleep(0.05)
+    assert rate_limiter._token_bucket.tokens < 100_000 - 100  # 已預留輸出 token
+    call.cancel()
+    await asyncio.gather(call, return_exceptions=True)
+
+    # 只扣除提示詞的估計 token，預留的輸出 token 已退回
+    assert rate_limiter._token_bucket.tokens > 100_000 - 10
+    assert concurrency_limiter.in_flight == 1
+    concurrency_limiter.release()
+    assert concurrency_limiter.in_flight == 0
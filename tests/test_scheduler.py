@@ -0,0 +1,110 @@
+"""AnalysisScheduler 的派發順序與結果排列"""
+
+import asyncio
+import time
+
+from firegeo.core.scheduler import AnalysisScheduler
+from firegeo.models.analysis import SimpleAnalysisRequest
+
+from .conftest import FakeDetector, FakeProvider
+
+
+def make_request(prompt_count: int) -> SimpleAnalysisRequest:
+    return SimpleAnalysisRequest(
+        target_brand="Acme",
+        competitors=["Globex"],
+        prompts=[f"prompt {index}" for index in range(prompt_count)],
+        cache_mode="bypass"
+    )
+
+
+async def test_results_keep_prompt_and_provider_order():
+    providers = {"slow": FakeProvider("slow", delay=0.2), "fast": FakeProvider("fast", delay=0.01)}
+    scheduler = AnalysisScheduler(providers, FakeDetector())
+    completions = []
+    prompts_done = []
+
+    result = await scheduler.run(
+        make_request(3),
+        on_unit_complete=lambda prompt_result, response, done, total: completions.append(
+            (response.provider, prompt_result.prompt_index, done, total)
+        ),
+        on_prompt_complete=lambda prompt_result, done, total: prompts_done.append(prompt_result.prompt_index)
+    )
+
+    # 回調依完成順序：快的提供商先全部完成
+    assert [provider for provider, *_ in completions[:3]] == ["fast"] * 3
+    assert [done for *_, done, _ in completions] == list(range(1, 7))
+    assert all(total == 6 for *_, total in completions)
+    assert sorted(prompts_done) == [0, 1, 2]
+
+    # 結果依提示詞順序，每個提示詞內依提供商順序
+    assert [prompt_result.prompt_index for prompt_result in result.results_by_prompt] == [0, 1, 2]
+    for index, prompt_result in enumerate(result.results_by_prompt):
+        assert list(prompt_result.ai_responses) == ["slow", "fast"]
+        assert prompt_result.ai_responses["slow"].response_text == f"slow recommends Acme for prompt {index}"
+        assert prompt_result.ai_responses["fast"].brand_detections["Acme"].mentioned
+    assert result.completed_prompts == 3
+
+
+async def test_units_run_concurrently():
+    providers = {"a": FakeProvider("a", delay=0.2), "b": FakeProvider("b", delay=0.2)}
+    scheduler = AnalysisScheduler(providers, FakeDetector(), provider_limits={"a": 4, "b": 4})
+    started = time.monotonic()
+    await scheduler.run(make_request(4))
+    assert time.monotonic() - started < 0.6
+
+
+async def test_detection_does_not_hold_provider_slots():
+    # 提供商並行上限為 1：檢測期間若仍佔用名額，4 個單元需要約 4 × (0.05 + 0.3) 秒
+    provider = FakeProvider("a", delay=0.05)
+    scheduler = AnalysisScheduler({"a": provider}, FakeDetector(delay=0.3), provider_limits={"a": 1})
+    started = time.monotonic()
+    result = await scheduler.run(make_request(4))
+    assert time.monotonic() - started < 0.9
+    assert all(not prompt_result.ai_responses["a"].error for prompt_result in result.results_by_prompt)
+
+
+async def test_tracks_token_usage_of_provider_calls():
+    scheduler = AnalysisScheduler({"a": FakeProvider("a", cost_tokens=50)}, FakeDetector())
+    result = await scheduler.run(make_request(2))
+
+    usage = result.results_by_prompt[0].ai_responses["a"].token_usage
+    assert (usage.prompt_tokens, usage.completion_tokens, usage.total_tokens) == (50, 50, 100)
+    assert not usage.estimated
+    assert len(result.token_usage) == 2
+    assert result.total_cost > 0
+
+
+async def test_restored_units_are_not_dispatched():
+    provider = FakeProvider("a")
+    scheduler = AnalysisScheduler({"a": provider}, FakeDetector())
+    first = await scheduler.run(make_request(3))
+    restored = {(0, "a"): first.results_by_prompt[0].ai_responses["a"]}
+
+    provider.prompts.clear()
+    completions = []
+    result = await scheduler.run(
+        make_request(3),
+        on_unit_complete=lambda prompt_result, response, done, total: completions.append((done, total)),
+        completed=restored
+    )
+
+    assert provider.prompts == ["prompt 1", "prompt 2"]
+    assert completions == [(2, 3), (3, 3)]
+    assert result.resumed_units == 1
+    assert result.completed_prompts == 3
+    assert result.results_by_prompt[0].ai_responses["a"].response_text == "a recommends Acme for prompt 0"
+
+
+async def test_cancelling_run_cancels_pending_units():
+    provider = FakeProvider("a", delay=5)
+    scheduler = AnalysisScheduler({"a": provider}, FakeDetector())
+    task = asyncio.create_task(scheduler.run(make_request(2)))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    assert task.cancelled()